@@ -11,6 +11,35 @@ load_dotenv()
 # Telegram 配置
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 ALLOWED_USER_IDS = [int(user_id.strip()) for user_id in os.getenv("ALLOWED_USER_IDS", "").split(",") if user_id.strip()]
+# 处理消息的工作线程数（同一聊天内的消息仍按顺序处理）
+TELEGRAM_WORKERS = int(os.getenv("TELEGRAM_WORKERS", "4"))
+# 任务排队超过该秒数时记录警告
+TELEGRAM_LANE_WAIT_WARNING = float(os.getenv("TELEGRAM_LANE_WAIT_WARNING", "30"))
+
+# 出站消息速率限制：全局每秒最多发送条数，以及同一聊天两次发送的最小间隔（秒）
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+TELEGRAM_CHAT_INTERVAL = float(os.getenv("TELEGRAM_CHAT_INTERVAL", "1"))
+
+# 运行模式：polling（长轮询）或 webhook（内置 HTTP 服务器接收推送）
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+# Webhook 配置
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # 公网地址，如 https://bot.example.com
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN", "")
+# 不经过反向代理直接对外提供 HTTPS 时配置证书，否则由上游终止 TLS
+WEBHOOK_CERT = os.getenv("WEBHOOK_CERT", "")
+WEBHOOK_KEY = os.getenv("WEBHOOK_KEY", "")
+
+# 自建 Bot API 服务器（telegram-bot-api --local），可下载超过 20MB 的文件
+# 例如 TELEGRAM_API_BASE_URL=http://telegram-bot-api:8081/bot
+TELEGRAM_API_BASE_URL = os.getenv("TELEGRAM_API_BASE_URL", "")
+TELEGRAM_API_FILE_URL = os.getenv("TELEGRAM_API_FILE_URL", "")
+# 本地模式下 getFile 返回服务器上的绝对路径；服务器的数据目录挂载到本机其他位置时，
+# 用下面两项把服务器路径前缀替换为本机路径
+TELEGRAM_LOCAL_SERVER_DIR = os.getenv("TELEGRAM_LOCAL_SERVER_DIR", "/var/lib/telegram-bot-api")
+TELEGRAM_LOCAL_FILES_DIR = os.getenv("TELEGRAM_LOCAL_FILES_DIR", "")
 
 # Notion 配置
 NOTION_TOKEN = os.getenv("NOTION_TOKEN")
@@ -26,6 +55,26 @@ ZOTERO_API_KEY = os.getenv("ZOTERO_API_KEY", "")
 ZOTERO_USER_ID = os.getenv("ZOTERO_USER_ID", "")
 ZOTERO_FOLDER_ID = os.getenv("ZOTERO_FOLDER_ID", "")  # 默认文件夹 ID
 
+# 消息合并配置：相册和连续转发的消息在窗口内合并为一条笔记
+COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "True").lower() == "true"
+COALESCE_WINDOW = float(os.getenv("COALESCE_WINDOW", "2"))  # 消息到达间隔（秒）
+COALESCE_MAX_WAIT = float(os.getenv("COALESCE_MAX_WAIT", "15"))  # 单批最长等待（秒）
+COALESCE_MAX_ITEMS = int(os.getenv("COALESCE_MAX_ITEMS", "50"))
+
+# 本地数据目录（队列、索引等 SQLite 文件）
+DATA_DIR = os.getenv("DATA_DIR", "./data")
+
+# 持久化接收队列配置
+# 启用后消息先写入本地队列再处理，重启时不会丢失未处理的消息
+INGEST_QUEUE_ENABLED = os.getenv("INGEST_QUEUE_ENABLED", "True").lower() == "true"
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "5"))
+INGEST_RETRY_BASE_DELAY = float(os.getenv("INGEST_RETRY_BASE_DELAY", "10"))
+INGEST_RETRY_MAX_DELAY = float(os.getenv("INGEST_RETRY_MAX_DELAY", "600"))
+INGEST_POLL_INTERVAL = float(os.getenv("INGEST_POLL_INTERVAL", "5"))
+
+# 相同内容在该时间（秒）内重复发送时直接返回已保存的页面，0 表示只按消息 ID 去重
+IDEMPOTENCY_CONTENT_WINDOW = int(os.getenv("IDEMPOTENCY_CONTENT_WINDOW", "86400"))
+
 # 周报配置
 WEEKLY_REPORT_DAY = os.getenv("WEEKLY_REPORT_DAY", "Sunday")
 WEEKLY_REPORT_HOUR = int(os.getenv("WEEKLY_REPORT_HOUR", "20"))
@@ -54,6 +103,47 @@ PREDEFINED_TAG_CATEGORIES = [
 # 功能开关
 ENABLE_GEMINI = os.getenv("ENABLE_GEMINI", "True").lower() == "true"
 
+# 短内容批量分析配置：窗口期内的多条短消息合并为一次 Gemini 请求
+BATCH_ANALYSIS_WINDOW = float(os.getenv("BATCH_ANALYSIS_WINDOW", "3"))  # 收集窗口（秒）
+BATCH_ANALYSIS_MAX_ITEMS = int(os.getenv("BATCH_ANALYSIS_MAX_ITEMS", "10"))
+BATCH_ANALYSIS_MAX_CHARS = int(os.getenv("BATCH_ANALYSIS_MAX_CHARS", "6000"))
+
+# 两阶段保存：先不经过 AI 直接创建页面并回复链接，再在后台补充标题、摘要和标签
+TWO_PHASE_SAVE = os.getenv("TWO_PHASE_SAVE", "True").lower() == "true"
+
+# 内联搜索（@机器人 关键词）：从本地条目索引返回结果，不逐次调用 Notion 搜索
+INLINE_SEARCH_ENABLED = os.getenv("INLINE_SEARCH_ENABLED", "True").lower() == "true"
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "10"))  # Telegram 端缓存结果的秒数
+
+# /search 全文搜索：本地 FTS5 索引每页显示的结果数，以及每个页面索引的正文字符数
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "5"))
+SEARCH_CONTENT_LENGTH = int(os.getenv("SEARCH_CONTENT_LENGTH", "10000"))
+
+# 去重索引：重复发送已保存过的链接或近似内容时，不再抓取和分析
+# SimHash 汉明距离不超过 DEDUP_SIMHASH_DISTANCE 视为近似重复，短于 DEDUP_MIN_CONTENT_LENGTH 的内容不比较
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "True").lower() == "true"
+DEDUP_SIMHASH_DISTANCE = int(os.getenv("DEDUP_SIMHASH_DISTANCE", "3"))
+DEDUP_MIN_CONTENT_LENGTH = int(os.getenv("DEDUP_MIN_CONTENT_LENGTH", "200"))
+
+# Notion 写入：请求频率上限（Notion 平均允许每秒 3 次请求）和单批块的最多尝试次数
+NOTION_REQUESTS_PER_SECOND = int(os.getenv("NOTION_REQUESTS_PER_SECOND", "3"))
+NOTION_UPLOAD_MAX_ATTEMPTS = int(os.getenv("NOTION_UPLOAD_MAX_ATTEMPTS", "4"))
+
+# Notion 写入 outbox：Notion 不可用时写入先保存在本地，后台按顺序重放
+NOTION_OUTBOX_POLL_INTERVAL = float(os.getenv("NOTION_OUTBOX_POLL_INTERVAL", "30"))
+NOTION_OUTBOX_RETRY_MAX_DELAY = float(os.getenv("NOTION_OUTBOX_RETRY_MAX_DELAY", "600"))
+
+# Notion 数据库结构缓存时间（秒），写入前按缓存的结构在本地校验属性
+NOTION_SCHEMA_CACHE_TTL = float(os.getenv("NOTION_SCHEMA_CACHE_TTL", "600"))
+
+# 周报等读取页面内容时的并发数，请求频率仍受 NOTION_REQUESTS_PER_SECOND 限制
+NOTION_PAGE_FETCH_WORKERS = int(os.getenv("NOTION_PAGE_FETCH_WORKERS", "4"))
+
+# Notion 本地镜像：周报、统计等直接查询本地数据，后台按间隔（秒）同步变化的页面
+NOTION_MIRROR_ENABLED = os.getenv("NOTION_MIRROR_ENABLED", "True").lower() == "true"
+NOTION_MIRROR_POLL_INTERVAL = float(os.getenv("NOTION_MIRROR_POLL_INTERVAL", "300"))
+NOTION_MIRROR_RECONCILE_INTERVAL = float(os.getenv("NOTION_MIRROR_RECONCILE_INTERVAL", "86400"))
+
 # 检查必要的配置
 if not TELEGRAM_BOT_TOKEN:
     logging.error("错误：TELEGRAM_BOT_TOKEN 未设置")
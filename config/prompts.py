@@ -23,6 +23,27 @@ CONTENT_ANALYSIS_PROMPT = """
 {content}
 """
 
+# 用于批量分析多条短内容的提示
+BATCH_CONTENT_ANALYSIS_PROMPT = """
+下面有 {count} 条相互独立的短内容，每条都有一个 id。请分别分析每一条，并返回一个 JSON 数组，
+数组中每个元素对应一条内容，包含四个字段：
+
+1. id: 与输入相同的 id
+2. title: 内容的简洁标题（20 字以内）
+3. summary: 内容的摘要概括（100 字以内）
+4. tags: 3-5 个相关标签，优先从这些类别中选择：{categories}
+
+只需返回 JSON 数组，不要有其他文字。JSON 格式应该像这样：
+
+[
+    {{"id": 1, "title": "标题", "summary": "摘要", "tags": ["标签 1", "标签 2"]}},
+    {{"id": 2, "title": "标题", "summary": "摘要", "tags": ["标签 1", "标签 2"]}}
+]
+
+内容如下：
+{items_json}
+"""
+
 # PDF 分析提示（使用 Vision API）
 PDF_ANALYSIS_PROMPT = """
 你是一名专业的学术论文分析助手，你需要用英文思考，并用中文回答。{url_context}
@@ -13,6 +13,7 @@ from services.zotero_service import (
     sync_papers_to_notion,  # 导入同步论文到 Notion 的函数
     validate_collection_id,  # 导入验证集合 ID 的函数
 )
+from services.telegram_service.sender import reply_text
 
 logger = logging.getLogger(__name__)
 
@@ -28,10 +29,10 @@ def list_collections(update: Update, context: CallbackContext) -> None:
         # 获取格式化的收藏集列表
         collections_text = zotero_service.format_collection_list_for_telegram()
 
-        update.message.reply_text(collections_text)
+        reply_text(update.message, collections_text)
     except Exception as e:
         logger.error(f"列出 Zotero 收藏集时出错：{e}")
-        update.message.reply_text(f"⚠️ 获取 Zotero 收藏集时出错：{str(e)}")
+        reply_text(update.message, f"⚠️ 获取 Zotero 收藏集时出错：{str(e)}")
 
 
 def sync_papers_by_count(update: Update, context: CallbackContext) -> None:
@@ -53,35 +54,37 @@ def sync_papers_by_count(update: Update, context: CallbackContext) -> None:
                 collection_id = args[0]
                 # 确认是否是有效的收藏集 ID
                 if not validate_collection_id(collection_id):
-                    update.message.reply_text(f"⚠️ 无效的收藏集 ID: {collection_id}")
+                    reply_text(update.message, f"⚠️ 无效的收藏集 ID: {collection_id}")
                     return
                 # 如果有第二个参数，尝试解析为数量
                 if len(args) >= 2:
                     try:
                         count = int(args[1])
                     except ValueError:
-                        update.message.reply_text("⚠️ 无效的数量参数，使用默认值 5")
+                        reply_text(update.message, "⚠️ 无效的数量参数，使用默认值 5")
             else:
                 # 第一个参数不是收藏集 ID，尝试解析为数量
                 try:
                     count = int(args[0])
                 except ValueError:
-                    update.message.reply_text(
+                    reply_text(
+                        update.message,
                         "⚠️ 无效的参数，使用默认值：所有收藏集的 5 篇最新论文"
                     )
 
     # 执行同步并提供反馈
-    update.message.reply_text(
+    reply_text(
+        update.message,
         f"正在同步{'指定收藏集' if collection_id else '所有收藏集'}的 {count} 篇最新论文..."
     )
 
     try:
         # 直接使用导入的同步函数
         result_message = sync_papers_to_notion(collection_id, "count", count)
-        update.message.reply_text(result_message)
+        reply_text(update.message, result_message)
     except Exception as e:
         logger.error(f"同步论文时出错：{e}", exc_info=True)
-        update.message.reply_text(f"⚠️ 同步论文时出错：{str(e)}")
+        reply_text(update.message, f"⚠️ 同步论文时出错：{str(e)}")
 
 
 def sync_papers_by_days(update: Update, context: CallbackContext) -> None:
@@ -103,32 +106,34 @@ def sync_papers_by_days(update: Update, context: CallbackContext) -> None:
                 collection_id = args[0]
                 # 确认是否是有效的收藏集 ID
                 if not validate_collection_id(collection_id):
-                    update.message.reply_text(f"⚠️ 无效的收藏集 ID: {collection_id}")
+                    reply_text(update.message, f"⚠️ 无效的收藏集 ID: {collection_id}")
                     return
                 # 如果有第二个参数，尝试解析为天数
                 if len(args) >= 2:
                     try:
                         days = int(args[1])
                     except ValueError:
-                        update.message.reply_text("⚠️ 无效的天数参数，使用默认值 7")
+                        reply_text(update.message, "⚠️ 无效的天数参数，使用默认值 7")
             else:
                 # 第一个参数不是收藏集 ID，尝试解析为天数
                 try:
                     days = int(args[0])
                 except ValueError:
-                    update.message.reply_text(
+                    reply_text(
+                        update.message,
                         "⚠️ 无效的参数，使用默认值：所有收藏集的 7 天内论文"
                     )
 
     # 执行同步并提供反馈
-    update.message.reply_text(
+    reply_text(
+        update.message,
         f"正在同步{'指定收藏集' if collection_id else '所有收藏集'}的最近 {days} 天内添加的论文..."
     )
 
     try:
         # 直接使用导入的同步函数
         result_message = sync_papers_to_notion(collection_id, "days", days)
-        update.message.reply_text(result_message)
+        reply_text(update.message, result_message)
     except Exception as e:
         logger.error(f"同步论文时出错：{e}", exc_info=True)
-        update.message.reply_text(f"⚠️ 同步论文时出错：{str(e)}")
+        reply_text(update.message, f"⚠️ 同步论文时出错：{str(e)}")
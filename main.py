@@ -4,12 +4,19 @@ Telegram Notion Bot 主程序入口
 整合 bot_main 和 main 的功能，统一处理 SSL 证书验证和机器人初始化
 """
 
+import time
+
+# 记录进程启动时间，用于统计导入耗时和处理第一条更新前的启动耗时
+STARTUP_BEGIN = time.perf_counter()
+
+import argparse
+import importlib
 import logging
 import os
 import signal
 import sys
 import threading
-import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
 
@@ -18,19 +25,28 @@ import schedule
 # 导入 telegram 相关模块
 import telegram
 from dotenv import load_dotenv
-from telegram.ext import Updater
+from telegram.ext import TypeHandler, Updater
 from telegram.utils.request import Request
 
 # 导入其他服务和配置
 from config import (
     ALLOWED_USER_IDS,
+    BOT_MODE,
+    INGEST_QUEUE_ENABLED,
     LOG_LEVEL,
     TELEGRAM_BOT_TOKEN,
+    WEBHOOK_CERT,
+    WEBHOOK_KEY,
+    WEBHOOK_LISTEN,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET_TOKEN,
+    WEBHOOK_URL,
     WEEKLY_REPORT_DAY,
     WEEKLY_REPORT_HOUR,
 )
 from services.telegram_service import setup_telegram_bot
-from services.weekly_report import generate_weekly_report
+from services.telegram_service.files import get_bot_api_kwargs
 from utils.keep_alive import KEEP_ALIVE
 
 # 导入智能代理设置（替代 SSL helper）
@@ -54,7 +70,7 @@ load_dotenv()
 # 确保日志目录存在
 os.makedirs(os.path.join(root_dir, "logs"), exist_ok=True)
 
-# 配置日志系统
+# 配置日志系统（导入阶段可能已有模块输出过日志，force 确保使用这里的配置）
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
     level=getattr(logging, LOG_LEVEL),
@@ -62,8 +78,10 @@ logging.basicConfig(
         logging.FileHandler(os.path.join(root_dir, "logs", "bot.log"), mode="a"),
         logging.StreamHandler(),
     ],
+    force=True,
 )
 logger = logging.getLogger(__name__)
+logger.info(f"模块导入耗时 {time.perf_counter() - STARTUP_BEGIN:.3f} 秒")
 
 # 全局设置
 MAX_RETRIES = 5
@@ -71,9 +89,25 @@ RETRY_DELAY = 5  # seconds
 should_exit = False
 connection_check_interval = 600  # 10 分钟检查一次连接
 
+# 仅接收这些类型的更新
+ALLOWED_UPDATES = [
+    "message",
+    "callback_query",
+    "chat_member",
+    "inline_query",
+]
+
+# 处理函数及其依赖的模块，在等待网络检查时提前在后台导入
+HANDLER_MODULES = [
+    "handlers.paper_handlers",
+    "services.telegram_service.handlers.command_handlers",
+    "services.telegram_service.handlers.inline_handlers",
+    "services.telegram_service.handlers.message_handlers",
+]
+
 
 def init_bot(
-    token: str, disable_certificate_verification: bool = False
+    token: str, disable_certificate_verification: bool = False, mode: str = "polling"
 ) -> Optional[Updater]:
     """
     初始化 Telegram 机器人，提供证书验证选项
@@ -81,6 +115,7 @@ def init_bot(
     参数：
         token: Telegram Bot API 令牌
         disable_certificate_verification: 是否禁用 SSL 证书验证
+        mode: 运行模式，polling 模式下会清除已有的 webhook
 
     返回：
         Updater 对象，如果初始化成功
@@ -101,18 +136,28 @@ def init_bot(
             request = Request(**valid_request_kwargs)
 
             # 创建 Bot 对象
-            bot = telegram.Bot(token=token, request=request)
+            # 配置了自建 Bot API 服务器时使用它的地址
+            bot = telegram.Bot(token=token, request=request, **get_bot_api_kwargs())
 
-            # 确保没有活动的 webhook（webhook 会阻止轮询工作）
-            if monitor_telegram_webhook(bot):
-                logger.warning("发现活动的 webhook 配置，正在尝试清除...")
-                clear_webhook(bot)
-
-            # 测试连接
+            # 测试连接，同时检查是否有活动的 webhook（webhook 会阻止轮询工作），
+            # 两个请求互不依赖，并行执行
             logger.info("正在测试与 Telegram API 的连接...")
-            bot_info = bot.get_me()
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                me_future = executor.submit(bot.get_me)
+                webhook_future = (
+                    executor.submit(monitor_telegram_webhook, bot)
+                    if mode == "polling"
+                    else None
+                )
+                bot_info = me_future.result()
+                has_webhook = webhook_future.result() if webhook_future else False
+
             logger.info(f"成功连接到 Telegram! 机器人名称：{bot_info.first_name}")
 
+            if has_webhook:
+                logger.warning("发现活动的 webhook 配置，正在尝试清除...")
+                clear_webhook(bot)
+
             # 创建并返回 updater
             updater = Updater(bot=bot)
             # 打印 updater 信息以确认初始化成功
@@ -141,25 +186,65 @@ def init_bot(
     return None
 
 
+def preload_handlers():
+    """在后台线程中导入处理函数模块，与网络检查并行"""
+
+    def load():
+        started = time.perf_counter()
+        for module_name in HANDLER_MODULES:
+            try:
+                importlib.import_module(module_name)
+            except Exception as e:
+                # 导入错误会在注册处理函数时再次出现并被记录
+                logger.debug(f"预加载 {module_name} 失败：{e}")
+        logger.info(f"处理函数模块预加载耗时 {time.perf_counter() - started:.3f} 秒")
+
+    thread = threading.Thread(target=load, name="preload-handlers", daemon=True)
+    thread.start()
+    return thread
+
+
+def log_first_update(dispatcher):
+    """Dispatcher 处理第一条更新时记录从进程启动到开始处理的耗时"""
+    logged = threading.Event()
+
+    def record(update, context):
+        if not logged.is_set():
+            logged.set()
+            logger.info(
+                f"启动完成，处理第一条更新距进程启动 {time.perf_counter() - STARTUP_BEGIN:.3f} 秒"
+            )
+
+    # 放在其他处理函数之前的单独分组中，不影响更新的处理
+    dispatcher.add_handler(TypeHandler(telegram.Update, record), group=-1)
+
+
+def run_weekly_report():
+    """执行定时周报任务，周报模块在第一次执行时才导入"""
+    from services.weekly_report import generate_weekly_report
+
+    return generate_weekly_report()
+
+
 def schedule_weekly_report():
     """安排周报生成任务"""
     schedule_day = WEEKLY_REPORT_DAY.lower()
     schedule_hour = f"{WEEKLY_REPORT_HOUR:02d}:00"
 
     if schedule_day == "monday":
-        schedule.every().monday.at(schedule_hour).do(generate_weekly_report)
+        schedule.every().monday.at(schedule_hour).do(run_weekly_report)
     elif schedule_day == "tuesday":
-        schedule.every().tuesday.at(schedule_hour).do(generate_weekly_report)
+        schedule.every().tuesday.at(schedule_hour).do(run_weekly_report)
     elif schedule_day == "wednesday":
-        schedule.every().wednesday.at(schedule_hour).do(generate_weekly_report)
+        schedule.every().wednesday.at(schedule_hour).do(run_weekly_report)
     elif schedule_day == "thursday":
-        schedule.every().thursday.at(schedule_hour).do(generate_weekly_report)
+        schedule.every().thursday.at(schedule_hour).do(run_weekly_report)
     elif schedule_day == "friday":
-        schedule.every().friday.at(schedule_hour).do(generate_weekly_report)
+        schedule.every().friday.at(schedule_hour).do(run_weekly_report)
     elif schedule_day == "saturday":
-        schedule.every().saturday.at(schedule_hour).do(generate_weekly_report)
+        schedule.every().saturday.at(schedule_hour).do(run_weekly_report)
     else:  # 默认周日
-        schedule.every().sunday.at(schedule_hour).do(generate_weekly_report)
+        schedule.every().sunday.at(schedule_hour).do(run_weekly_report)
 
     logger.info(f"已安排周报生成任务：每{WEEKLY_REPORT_DAY} {schedule_hour}")
 
@@ -201,9 +286,58 @@ def signal_handler(sig, frame):
     should_exit = True
 
 
-def main():
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="Telegram Notion Bot")
+    parser.add_argument(
+        "--mode",
+        choices=["polling", "webhook"],
+        default=BOT_MODE if BOT_MODE in ("polling", "webhook") else "polling",
+        help="接收更新的方式：长轮询或 webhook（默认读取 BOT_MODE 环境变量）",
+    )
+    return parser.parse_args(argv)
+
+
+def run_webhook(updater) -> int:
+    """以 webhook 模式运行，直到收到退出信号"""
+    from services.telegram_service.webhook import start_webhook, stop_webhook
+
+    if not WEBHOOK_URL:
+        logger.error("错误：webhook 模式需要设置 WEBHOOK_URL")
+        return 1
+
+    try:
+        server = start_webhook(
+            updater,
+            webhook_url=WEBHOOK_URL,
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET_TOKEN,
+            cert=WEBHOOK_CERT or None,
+            key=WEBHOOK_KEY or None,
+            allowed_updates=ALLOWED_UPDATES,
+            drop_pending_updates=not INGEST_QUEUE_ENABLED,
+        )
+    except Exception as e:
+        logger.error(f"启动 webhook 服务器时发生错误：{e}", exc_info=True)
+        return 1
+
+    logger.info(
+        f"机器人已以 webhook 模式启动，正在等待推送（距进程启动 {time.perf_counter() - STARTUP_BEGIN:.3f} 秒）"
+    )
+    while not should_exit:
+        time.sleep(1)
+
+    stop_webhook(updater, server)
+    logger.info("机器人已停止")
+    return 0
+
+
+def main(argv=None):
     """主函数，启动机器人"""
-    logger.info("启动 TG-Notion 机器人...")
+    args = parse_args(argv)
+    logger.info(f"启动 TG-Notion 机器人（{args.mode} 模式）...")
 
     # 加载环境变量
     load_dotenv()
@@ -225,14 +359,20 @@ def main():
     if disable_ssl_verify:
         logger.warning("警告：SSL 证书验证已禁用。这可能会导致安全风险。")
 
+    # 导入处理函数模块与连接检查并行进行
+    preload_thread = preload_handlers()
+
     # 初始化机器人
-    updater = init_bot(token, disable_certificate_verification=disable_ssl_verify)
+    updater = init_bot(
+        token, disable_certificate_verification=disable_ssl_verify, mode=args.mode
+    )
 
     if not updater:
         logger.error("无法初始化机器人，程序将退出")
         return 1
 
     # 注册命令处理程序
+    preload_thread.join()
     updater = setup_telegram_bot(updater)
 
     # 设置定时任务
@@ -243,8 +383,8 @@ def main():
     scheduler_thread.daemon = True
     scheduler_thread.start()
 
-    # 启动连接检查线程
-    if KEEP_ALIVE:
+    # 启动连接检查线程（webhook 模式由 Telegram 主动推送，不需要保活）
+    if KEEP_ALIVE and args.mode == "polling":
         logger.info("启动连接保活线程...")
         connection_thread = threading.Thread(target=check_connection)
         connection_thread.daemon = True
@@ -254,6 +394,11 @@ def main():
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
 
+    log_first_update(updater.dispatcher)
+
+    if args.mode == "webhook":
+        return run_webhook(updater)
+
     # 启动机器人
     try:
         logger.info("启动机器人轮询...")
@@ -261,13 +406,9 @@ def main():
         # 使用更优的轮询参数
         updater.start_polling(
             timeout=30,  # 长轮询连接超时秒数
-            drop_pending_updates=True,  # 启动时删除待处理的更新
-            allowed_updates=[
-                "message",
-                "callback_query",
-                "chat_member",
-                "inline_query",
-            ],  # 仅接收这些类型的更新
+            # 启用接收队列时保留停机期间的消息，由队列负责去重和重试
+            drop_pending_updates=not INGEST_QUEUE_ENABLED,
+            allowed_updates=ALLOWED_UPDATES,
             bootstrap_retries=5,  # 重试连接次数
         )
 
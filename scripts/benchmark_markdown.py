@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Markdown → Notion 块转换基准测试
+
+对比旧版三遍处理（convert_to_notion_blocks → process_blocks_content → limit_blocks）
+和新的单遍编译器在大篇幅网页文章上的耗时，并检查输出是否满足 Notion API 的限制。
+旧版实现通过 git show 从 --legacy-ref 指定的提交（单遍编译器合入之前的任意提交）中读取，
+需要在 git 仓库中运行。
+
+用法：
+    # 使用生成的 100KB+ 示例文章
+    python scripts/benchmark_markdown.py --legacy-ref <旧版提交>
+    # 使用保存下来的网页文章
+    python scripts/benchmark_markdown.py --legacy-ref <旧版提交> article.md ...
+"""
+
+import argparse
+import ast
+import logging
+import random
+import statistics
+import subprocess
+import sys
+import time
+import types
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+from services.notion_service.content_converter import (  # noqa: E402
+    MAX_CHILDREN,
+    MAX_RICH_TEXT_ELEMENTS,
+    MAX_TEXT_LENGTH,
+    convert_to_notion_blocks,
+)
+
+logging.basicConfig(level=logging.WARNING)
+
+LEGACY_CONVERTER = "services/notion_service/content_converter.py"
+# process_blocks_content 原来在 database/common.py 中，该文件导入时会连接 Notion，只取出这两个函数
+LEGACY_COMMON = "services/notion_service/database/common.py"
+LEGACY_COMMON_FUNCTIONS = ("_split_text_into_chunks", "process_blocks_content")
+
+WORDS = (
+    "notion telegram gemini markdown article research model data network system "
+    "performance latency cache index query token block page user message server"
+).split()
+
+
+def generate_article(target_size=120_000, seed=42):
+    """生成类似抓取网页文章的 Markdown：标题、长段落、链接、强调、嵌套列表、代码和表格"""
+    rng = random.Random(seed)
+
+    def sentence(length=20):
+        words = []
+        for _ in range(length):
+            word = rng.choice(WORDS)
+            roll = rng.random()
+            if roll < 0.05:
+                word = f"**{word}**"
+            elif roll < 0.08:
+                word = f"*{word}*"
+            elif roll < 0.10:
+                word = f"`{word}`"
+            elif roll < 0.12:
+                word = f"[{word}](https://example.com/{word})"
+            words.append(word)
+        return " ".join(words).capitalize() + "."
+
+    parts = ["# " + sentence(6)]
+    section = 0
+    while sum(len(p) for p in parts) < target_size:
+        section += 1
+        parts.append(f"## Section {section}: {sentence(5)}")
+        for _ in range(rng.randint(2, 5)):
+            # 网页正文的段落通常很长，不少超过 2000 字符
+            parts.append(" ".join(sentence() for _ in range(rng.randint(3, 40))))
+            parts.append("")
+        for level in range(3):
+            for _ in range(rng.randint(1, 3)):
+                parts.append("  " * level + "- " + sentence(10))
+        parts.append("> " + sentence(15))
+        if section % 3 == 0:
+            parts.append("```python")
+            parts.extend(f"value_{n} = compute({n})" for n in range(rng.randint(5, 200)))
+            parts.append("```")
+        if section % 4 == 0:
+            parts.append("| name | value | note |")
+            parts.append("|------|-------|------|")
+            for n in range(rng.randint(3, 20)):
+                parts.append(f"| {rng.choice(WORDS)} | {n} | {sentence(4)} |")
+        parts.append("")
+    return "\n".join(parts)
+
+
+def git_show(ref, path):
+    """读取旧版提交中的文件内容"""
+    result = subprocess.run(
+        ["git", "show", f"{ref}:{path}"],
+        cwd=root_dir,
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+    )
+    if result.returncode != 0:
+        sys.exit(f"无法从 {ref} 读取 {path}：{result.stderr.strip()}")
+    return result.stdout
+
+
+def load_legacy(ref):
+    """把旧版提交中的转换函数加载到一个临时模块中"""
+    module = types.ModuleType("legacy_markdown_converter")
+    exec(compile(git_show(ref, LEGACY_CONVERTER), LEGACY_CONVERTER, "exec"), module.__dict__)
+
+    tree = ast.parse(git_show(ref, LEGACY_COMMON), LEGACY_COMMON)
+    tree.body = [
+        node
+        for node in tree.body
+        if isinstance(node, ast.FunctionDef) and node.name in LEGACY_COMMON_FUNCTIONS
+    ]
+    exec(compile(tree, LEGACY_COMMON, "exec"), module.__dict__)
+    if not all(hasattr(module, name) for name in LEGACY_COMMON_FUNCTIONS):
+        sys.exit(f"{ref} 中没有旧版的 process_blocks_content，请指定单遍编译器合入之前的提交")
+    return module
+
+
+def legacy_pipeline(legacy):
+    """旧版：转换后再两次遍历所有块检查长度"""
+
+    def run(content):
+        blocks = legacy.convert_to_notion_blocks(content)
+        blocks = legacy.process_blocks_content(blocks)
+        return legacy.limit_blocks(blocks)
+
+    return run
+
+
+def count_violations(blocks):
+    """统计不满足 Notion API 限制的块数"""
+    violations = 0
+    stack = list(blocks)
+    while stack:
+        block = stack.pop()
+        block_type = block.get("type") or next(k for k in block if k != "object")
+        data = block.get(block_type, {})
+        rich_text = data.get("rich_text", [])
+        if len(rich_text) > MAX_RICH_TEXT_ELEMENTS or any(
+            len(rt.get("text", {}).get("content", "")) > MAX_TEXT_LENGTH for rt in rich_text
+        ):
+            violations += 1
+        children = data.get("children", [])
+        if len(children) > MAX_CHILDREN:
+            violations += 1
+        stack.extend(children)
+    return violations
+
+
+def measure(func, content, runs):
+    timings = []
+    result = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = func(content)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比 Markdown → Notion 块转换的耗时")
+    parser.add_argument("files", nargs="*", help="Markdown 文件，默认使用生成的示例文章")
+    parser.add_argument("--runs", type=int, default=5, help="每种实现的运行次数")
+    parser.add_argument(
+        "--legacy-ref",
+        required=True,
+        help="读取旧版实现的 git 提交、分支或标签（单遍编译器合入之前）",
+    )
+    args = parser.parse_args()
+
+    legacy = load_legacy(args.legacy_ref)
+
+    if args.files:
+        articles = [(path, Path(path).read_text(encoding="utf-8")) for path in args.files]
+    else:
+        articles = [("generated", generate_article())]
+
+    # 旧版的日志输出不计入耗时
+    logging.getLogger(legacy.__name__).setLevel(logging.ERROR)
+
+    for name, content in articles:
+        legacy_time, legacy_blocks = measure(legacy_pipeline(legacy), content, args.runs)
+        new_time, new_blocks = measure(convert_to_notion_blocks, content, args.runs)
+
+        print(f"{name}：{len(content) / 1024:.1f} KB，{content.count(chr(10)) + 1} 行")
+        print(
+            f"  旧版三遍处理：{legacy_time * 1000:.1f} 毫秒，{len(legacy_blocks)} 个块，"
+            f"{count_violations(legacy_blocks)} 个块超出限制"
+        )
+        print(
+            f"  单遍编译器：  {new_time * 1000:.1f} 毫秒，{len(new_blocks)} 个块，"
+            f"{count_violations(new_blocks)} 个块超出限制"
+        )
+        print(f"  加速：{legacy_time / new_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+启动耗时基准测试
+
+测量两项指标：
+1. 冷启动导入耗时：在新的解释器进程中执行 import main 的时间
+2. 首条更新耗时：启动 main.py 到 Dispatcher 处理第一条更新的时间。
+   脚本会启动一个本地模拟 Bot API 服务器（通过 TELEGRAM_API_BASE_URL 指向它），
+   第一次 getUpdates 返回一条空更新，不需要真实的机器人令牌或网络连接
+
+用法：
+    python scripts/benchmark_startup.py --runs 5
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+# 设置日志
+logging.basicConfig(
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    level=logging.INFO,
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger(__name__)
+
+FAKE_TOKEN = "123456:benchmark-token"
+FIRST_UPDATE_PATTERN = re.compile(r"处理第一条更新距进程启动 ([\d.]+) 秒")
+IMPORT_PATTERN = re.compile(r"模块导入耗时 ([\d.]+) 秒")
+
+# 模拟 Bot API 对各方法的响应
+FAKE_RESULTS = {
+    "getMe": {
+        "id": 123456,
+        "is_bot": True,
+        "first_name": "Benchmark",
+        "username": "benchmark_bot",
+    },
+    "getWebhookInfo": {
+        "url": "",
+        "has_custom_certificate": False,
+        "pending_update_count": 0,
+    },
+    "getUpdates": [],
+}
+# 第一次 getUpdates（没有 offset）返回的更新，不包含消息，除计时外没有处理函数会处理它
+FIRST_UPDATES = [{"update_id": 1}]
+
+
+class FakeBotApiHandler(BaseHTTPRequestHandler):
+    """对所有 Bot API 方法返回固定结果的请求处理类"""
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", "0"))
+        request = self.rfile.read(length)
+
+        method = self.path.rsplit("/", 1)[-1]
+        result = FAKE_RESULTS.get(method, True)
+        if method == "getUpdates":
+            try:
+                offset = json.loads(request or b"{}").get("offset")
+            except ValueError:
+                offset = None
+            if offset:
+                # 模拟长轮询，避免客户端忙等
+                time.sleep(0.5)
+            else:
+                result = FIRST_UPDATES
+
+        body = json.dumps({"ok": True, "result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeBotApiServer(ThreadingHTTPServer):
+    """模拟 Bot API 服务器，忽略机器人进程退出时断开连接产生的错误"""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+def measure_import(runs):
+    """在新进程中测量 import main 的耗时"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", "import main"],
+            cwd=root_dir,
+            env=_bench_env(None),
+            check=True,
+            capture_output=True,
+        )
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def measure_first_update(runs, api_port, timeout=60):
+    """启动 main.py，读取日志中记录的处理第一条更新的耗时"""
+    timings = []
+    import_timings = []
+
+    for _ in range(runs):
+        process = subprocess.Popen(
+            [sys.executable, "main.py", "--mode", "polling"],
+            cwd=root_dir,
+            env=_bench_env(api_port),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
+        deadline = time.monotonic() + timeout
+        try:
+            for line in process.stdout:
+                match = IMPORT_PATTERN.search(line)
+                if match:
+                    import_timings.append(float(match.group(1)))
+                match = FIRST_UPDATE_PATTERN.search(line)
+                if match:
+                    timings.append(float(match.group(1)))
+                    break
+                if time.monotonic() > deadline:
+                    logger.error("等待处理第一条更新超时")
+                    break
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    return timings, import_timings
+
+
+def _bench_env(api_port):
+    """构造基准测试使用的环境变量：本地 API、临时数据目录、不使用代理"""
+    env = {
+        key: value
+        for key, value in os.environ.items()
+        if key.lower() not in ("http_proxy", "https_proxy", "all_proxy")
+    }
+    env.update(
+        {
+            "TELEGRAM_BOT_TOKEN": FAKE_TOKEN,
+            "KEEP_ALIVE": "false",
+            "DATA_DIR": _bench_env.data_dir,
+        }
+    )
+    if api_port:
+        env["TELEGRAM_API_BASE_URL"] = f"http://127.0.0.1:{api_port}/bot"
+    return env
+
+
+def _summary(name, timings):
+    if not timings:
+        return f"{name}：没有结果"
+    return (
+        f"{name}：中位数 {statistics.median(timings):.3f} 秒，"
+        f"最小 {min(timings):.3f} 秒，最大 {max(timings):.3f} 秒（{len(timings)} 次）"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量机器人启动耗时")
+    parser.add_argument("--runs", type=int, default=5, help="每项测量的次数")
+    args = parser.parse_args()
+
+    _bench_env.data_dir = tempfile.mkdtemp(prefix="bench-data-")
+
+    server = FakeBotApiServer(("127.0.0.1", 0), FakeBotApiHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        import_timings = measure_import(args.runs)
+        update_timings, logged_imports = measure_first_update(args.runs, server.server_address[1])
+    finally:
+        server.shutdown()
+
+    print(_summary("import main（含解释器启动）", import_timings))
+    print(_summary("main.py 内记录的模块导入", logged_imports))
+    print(_summary("启动到处理第一条更新", update_timings))
+    return 0 if update_timings else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
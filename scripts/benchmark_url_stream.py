@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+网页 → Notion 块流水线基准测试
+
+对比旧版（下载整个页面 → 完整 BeautifulSoup 树 → 整体 markdownify → 一次性转换所有块）
+和流式流水线（HTML 块 → Markdown 片段 → Notion 块 → 100 块一批）的：
+1. 第一批 100 个块就绪的时间，即可以开始写入 Notion 的时间
+2. 处理完整个页面的总耗时
+3. Python 内存分配峰值（tracemalloc）
+
+脚本会启动一个本地 HTTP 服务器按指定速率发送生成的大网页，不需要网络连接，也不会写入 Notion
+
+用法：
+    python scripts/benchmark_url_stream.py
+    python scripts/benchmark_url_stream.py --size 5000000 --rate 2000000
+"""
+
+import argparse
+import logging
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+import requests  # noqa: E402
+from bs4 import BeautifulSoup  # noqa: E402
+from markdownify import markdownify as md  # noqa: E402
+
+from services.notion_service.content_converter import (  # noqa: E402
+    MAX_CHILDREN,
+    convert_to_notion_blocks,
+    iter_block_batches,
+    iter_notion_blocks,
+)
+from services.url_service import REQUEST_HEADERS, UrlContentStream  # noqa: E402
+
+logging.basicConfig(level=logging.WARNING)
+
+WORDS = (
+    "notion telegram gemini markdown article research model data network system "
+    "performance latency cache index query token block page user message server"
+).split()
+
+SEND_CHUNK_SIZE = 16 * 1024
+
+
+def generate_page(target_size, seed=42):
+    """生成带导航、侧栏和长正文（段落、列表、代码、表格）的网页"""
+    rng = random.Random(seed)
+
+    def sentence(length=20):
+        words = []
+        for _ in range(length):
+            word = rng.choice(WORDS)
+            roll = rng.random()
+            if roll < 0.05:
+                word = f"<strong>{word}</strong>"
+            elif roll < 0.08:
+                word = f'<a href="https://example.com/{word}">{word}</a>'
+            words.append(word)
+        return " ".join(words) + "."
+
+    parts = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'><title>Benchmark article</title>",
+        "<style>body { font-family: sans-serif; }</style></head><body>",
+        "<header><nav><ul>" + "".join(f"<li><a href='/{w}'>{w}</a></li>" for w in WORDS) + "</ul></nav></header>",
+        "<div class='layout'><aside><p>sidebar</p></aside><article><h1>Benchmark article</h1>",
+    ]
+    size = sum(len(p) for p in parts)
+    section = 0
+    while size < target_size:
+        section += 1
+        chunk = [f"<h2>Section {section}</h2>"]
+        for _ in range(rng.randint(2, 5)):
+            chunk.append("<p>" + " ".join(sentence() for _ in range(rng.randint(3, 20))) + "</p>")
+        chunk.append("<ul>" + "".join(f"<li>{sentence(10)}</li>" for _ in range(rng.randint(2, 6))) + "</ul>")
+        if section % 3 == 0:
+            code = "\n".join(f"value_{n} = compute({n})" for n in range(rng.randint(5, 50)))
+            chunk.append(f"<pre><code>{code}</code></pre>")
+        if section % 4 == 0:
+            rows = "".join(
+                f"<tr><td>{rng.choice(WORDS)}</td><td>{n}</td></tr>" for n in range(rng.randint(3, 20))
+            )
+            chunk.append(f"<table><tr><th>name</th><th>value</th></tr>{rows}</table>")
+        text = "".join(chunk)
+        parts.append(text)
+        size += len(text)
+    parts.append("</article></div><footer><p>footer</p></footer><script>track();</script></body></html>")
+    return "".join(parts).encode("utf-8")
+
+
+class PageServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 流式读取结束后客户端会提前关闭连接，忽略 BrokenPipe
+        pass
+
+
+def make_handler(page, rate):
+    class PageHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(page)))
+            self.end_headers()
+            for start in range(0, len(page), SEND_CHUNK_SIZE):
+                self.wfile.write(page[start : start + SEND_CHUNK_SIZE])
+                if rate:
+                    time.sleep(SEND_CHUNK_SIZE / rate)
+
+        def log_message(self, format, *args):
+            pass
+
+    return PageHandler
+
+
+def legacy_blocks(url):
+    """旧版 extract_url_content 的处理方式：整页下载、解析并转换"""
+    response = requests.get(url, headers=REQUEST_HEADERS, timeout=10)
+    response.raise_for_status()
+    soup = BeautifulSoup(response.text, "html.parser")
+    title = soup.title.string if soup.title else ""
+    main_content = soup.find("article") or soup.find("main") or soup.body or soup
+    for element in main_content.find_all(["script", "style", "nav", "footer", "header"]):
+        element.extract()
+    content = f"# {title}\n\n{md(str(main_content), heading_style='ATX')}"
+    yield from iter_block_batches(convert_to_notion_blocks(content), MAX_CHILDREN)
+
+
+def stream_blocks(url):
+    """流式流水线"""
+    yield from iter_block_batches(iter_notion_blocks(UrlContentStream(url)), MAX_CHILDREN)
+
+
+def run(pipeline, url, trace_memory):
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    first_batch = None
+    blocks = 0
+    for batch in pipeline(url):
+        if first_batch is None:
+            first_batch = time.perf_counter() - started
+        blocks += len(batch)
+    total = time.perf_counter() - started
+    peak = 0
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return first_batch, total, blocks, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比整页转换和流式流水线")
+    parser.add_argument("--size", type=int, default=3_000_000, help="生成网页的字节数")
+    parser.add_argument("--rate", type=int, default=4_000_000, help="服务器发送速率（字节/秒），0 表示不限速")
+    args = parser.parse_args()
+
+    page = generate_page(args.size)
+    server = PageServer(("127.0.0.1", 0), make_handler(page, args.rate))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/article"
+
+    print(f"网页大小：{len(page) / 1024 / 1024:.1f} MB，发送速率：{args.rate / 1024 / 1024:.1f} MB/s")
+    for name, pipeline in (("整页转换", legacy_blocks), ("流式流水线", stream_blocks)):
+        first_batch, total, blocks, _ = run(pipeline, url, trace_memory=False)
+        _, _, _, peak = run(pipeline, url, trace_memory=True)
+        print(
+            f"  {name}：第一批就绪 {first_batch:.2f} 秒，总耗时 {total:.2f} 秒，"
+            f"{blocks} 个块，内存峰值 {peak / 1024 / 1024:.1f} MB"
+        )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+页面差异同步（block_sync）检查
+
+用一个本地的假 Notion 保存页面的块，返回的块和真实 API 一样补全默认字段
+（标题的 is_toggleable、待办的 checked、color、plain_text、href、完整的 annotations 等），
+检查 sync_page_children 的请求数：
+1. 内容没有变化时只读取页面，不发送任何写入请求
+2. 修改一个段落时只更新这一个块
+3. 末尾新增内容时只插入新块
+
+不需要网络连接，也不会写入 Notion；任何一项不符合预期时以非零状态退出
+
+用法：
+    python scripts/check_block_sync.py
+"""
+
+import copy
+import itertools
+import logging
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+from services.notion_service import block_sync  # noqa: E402
+from services.notion_service.content_converter import convert_to_notion_blocks  # noqa: E402
+
+logging.basicConfig(level=logging.WARNING)
+
+SAMPLE = """# 2024年第12周周报
+
+## 本周概览
+
+本周共保存 **12** 条笔记，其中 [3 条论文](https://example.com/papers)。
+
+- 第一条 *笔记*
+- 第二条 `笔记`
+
+1. 有序列表
+2. 第二项
+
+> 引用内容
+
+```python
+print("hello")
+```
+
+---
+
+### 标签统计
+
+最后一段文字。
+"""
+
+# 这些块类型的内容中 Notion 总会返回 color
+COLORED_TYPES = (
+    "paragraph",
+    "heading_1",
+    "heading_2",
+    "heading_3",
+    "bulleted_list_item",
+    "numbered_list_item",
+    "quote",
+    "to_do",
+    "toggle",
+    "callout",
+)
+
+
+def _notion_rich_text(item):
+    """按 Notion 返回的格式补全富文本对象"""
+    text = item.get("text", {})
+    link = text.get("link")
+    annotations = {
+        "bold": False,
+        "italic": False,
+        "strikethrough": False,
+        "underline": False,
+        "code": False,
+        "color": "default",
+    }
+    annotations.update(item.get("annotations", {}))
+    return {
+        "type": "text",
+        "text": {"content": text.get("content", ""), "link": link},
+        "annotations": annotations,
+        "plain_text": text.get("content", ""),
+        "href": link["url"] if link else None,
+    }
+
+
+class FakeNotion:
+    """保存页面块的假 Notion，只实现 block_sync 用到的接口"""
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self.tree = {}  # 父块 ID -> 子块列表
+        self.writes = 0
+        # notion.blocks.children.list、notion.blocks.delete
+        self.blocks = self
+        self.children = self
+
+    @staticmethod
+    def _payload(block_type, payload):
+        """按 Notion 返回的格式补全块的内容，返回 (内容, 子块)"""
+        payload = copy.deepcopy(payload)
+        children = payload.pop("children", [])
+        if "rich_text" in payload:
+            payload["rich_text"] = [_notion_rich_text(item) for item in payload["rich_text"]]
+        if block_type in COLORED_TYPES:
+            payload.setdefault("color", "default")
+        if block_type.startswith("heading_"):
+            payload.setdefault("is_toggleable", False)
+        if block_type == "to_do":
+            payload.setdefault("checked", False)
+        if block_type == "code":
+            payload.setdefault("caption", [])
+        return payload, children
+
+    def _store(self, block):
+        block_type = block["type"]
+        payload, children = self._payload(block_type, block[block_type])
+        block_id = f"{next(self._ids):032x}"
+        self.tree[block_id] = [self._store(child) for child in children]
+        return {
+            "object": "block",
+            "id": block_id,
+            "type": block_type,
+            "has_children": bool(children),
+            block_type: payload,
+        }
+
+    def load(self, page_id, blocks):
+        self.tree[page_id] = [self._store(block) for block in blocks]
+
+    def list(self, block_id, page_size=100, start_cursor=None):
+        start = int(start_cursor or 0)
+        results = self.tree.get(block_id, [])
+        page = results[start : start + page_size]
+        more = start + page_size < len(results)
+        return {
+            "results": copy.deepcopy(page),
+            "has_more": more,
+            "next_cursor": str(start + page_size) if more else None,
+        }
+
+    def delete(self, block_id):
+        self.writes += 1
+        for children in self.tree.values():
+            children[:] = [block for block in children if block["id"] != block_id]
+
+    def request(self, path, method, body=None, query=None):
+        self.writes += 1
+        parts = path.split("/")
+        if parts[-1] == "children":
+            parent = parts[1]
+            stored = [self._store(block) for block in body["children"]]
+            children = self.tree.setdefault(parent, [])
+            index = len(children)
+            if body.get("after"):
+                index = next(i for i, block in enumerate(children) if block["id"] == body["after"]) + 1
+            children[index:index] = stored
+            return {"results": stored}
+
+        block_id = parts[1]
+        for children in self.tree.values():
+            for block in children:
+                if block["id"] == block_id:
+                    block_type = block["type"]
+                    block[block_type] = self._payload(block_type, body[block_type])[0]
+        return {}
+
+
+def sync(fake, page_id, markdown):
+    fake.writes = 0
+    stats = block_sync.sync_page_children(page_id, convert_to_notion_blocks(markdown))
+    return stats, fake.writes
+
+
+def main():
+    fake = FakeNotion()
+    block_sync.notion = fake
+    block_sync.call_with_retry = lambda func, **kwargs: func(**kwargs)
+
+    page_id = "0" * 32
+    fake.load(page_id, convert_to_notion_blocks(SAMPLE))
+
+    edited = SAMPLE.replace("最后一段文字。", "最后一段文字（已修改）。")
+    appended = edited + "\n新增的一段。\n"
+    # (名称, 新内容, 预期的块数变化, 预期的写入请求数)
+    checks = (
+        ("内容不变", SAMPLE, {"updated": 0, "inserted": 0, "deleted": 0}, 0),
+        ("修改一个段落", edited, {"updated": 1, "inserted": 0, "deleted": 0}, 1),
+        # 新增的段落和它后面的空行在一次请求中插入
+        ("末尾新增一段", appended, {"updated": 0, "inserted": 2, "deleted": 0}, 1),
+    )
+
+    failed = False
+    for name, markdown, expected, expected_writes in checks:
+        stats, writes = sync(fake, page_id, markdown)
+        actual = {key: stats[key] for key in expected}
+        ok = actual == expected and writes == expected_writes
+        failed = failed or not ok
+        print(
+            f"{'✓' if ok else '✗'} {name}：更新 {stats['updated']}，插入 {stats['inserted']}，"
+            f"删除 {stats['deleted']}，不变 {stats['unchanged']}，写入请求 {writes} 次"
+        )
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+接收队列与消息合并的检查
+
+使用临时的数据目录和本地构造的 Telegram 更新，检查合并窗口中的消息对应的接收队列任务：
+1. 转发的非 PDF 文档进入合并窗口后，任务保持执行中状态，批次保存后才标记完成
+2. 普通消息先保存之前的合并批次；批次保存失败时只有批次的任务稍后重试，普通消息照常处理
+
+保存批次和单条消息的函数被替换为记录调用，不需要网络连接，也不会写入 Notion；
+任何一项不符合预期时以非零状态退出
+
+用法：
+    python scripts/check_ingest_coalesce.py
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from queue import Queue
+
+# 配置在导入时读取，需要先设置环境变量
+USER_ID = 1
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="ingest-check-")
+os.environ["ALLOWED_USER_IDS"] = str(USER_ID)
+os.environ["COALESCE_ENABLED"] = "True"
+os.environ["COALESCE_WINDOW"] = "0.5"
+
+# 添加项目根目录到 Python 路径
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+import requests  # noqa: E402
+from telegram import Bot, Update  # noqa: E402
+from telegram.ext import Dispatcher  # noqa: E402
+
+from services.telegram_service.handlers import message_handlers  # noqa: E402
+from services.telegram_service.ingest_queue import (  # noqa: E402
+    STATUS_DONE,
+    STATUS_PENDING,
+    STATUS_RUNNING,
+    IngestQueue,
+)
+
+# 状态变化最多等待的时间（秒）
+TIMEOUT = 5
+
+
+def build_update(bot, message_id, forwarded=False, document=None, text=None):
+    """构造一条私聊消息的更新"""
+    now = int(time.time())
+    message = {
+        "message_id": message_id,
+        "date": now,
+        "chat": {"id": USER_ID, "type": "private", "first_name": "Tester"},
+        "from": {"id": USER_ID, "is_bot": False, "first_name": "Tester"},
+    }
+    if forwarded:
+        message["forward_date"] = now
+        message["forward_sender_name"] = "Someone"
+    if document:
+        message["document"] = {
+            "file_id": f"file-{message_id}",
+            "file_unique_id": f"unique-{message_id}",
+            "file_name": document,
+        }
+        message["caption"] = f"文档 {message_id}"
+    if text:
+        message["text"] = text
+    return Update.de_json({"update_id": message_id, "message": message}, bot)
+
+
+def wait_for_status(queue, job_id, status):
+    """等待任务进入指定状态，返回最后读到的状态"""
+    deadline = time.monotonic() + TIMEOUT
+    while True:
+        current = queue.store.query_one("SELECT status FROM jobs WHERE id = ?", (job_id,))["status"]
+        if current == status or time.monotonic() > deadline:
+            return current
+        time.sleep(0.05)
+
+
+def submit(queue, kind, update):
+    job_id = queue.enqueue(kind, update)
+    queue.dispatch(job_id)
+    return job_id
+
+
+def main():
+    bot = Bot("123456:check-ingest-coalesce")
+    queue = IngestQueue()
+    queue.register("message", message_handlers.process_message)
+    queue.register("document", message_handlers.process_document)
+    queue.start(Dispatcher(bot, Queue()))
+
+    bursts = []
+    singles = []
+    fail_bursts = []
+
+    def process_burst(updates):
+        if fail_bursts:
+            raise requests.ConnectionError("模拟的网络错误")
+        bursts.append([update.message.message_id for update in updates])
+
+    message_handlers.process_burst = process_burst
+    message_handlers.process_single_message = lambda update, text, entities: singles.append(
+        update.message.message_id
+    )
+
+    results = []
+
+    def check(name, actual, expected):
+        ok = actual == expected
+        results.append(ok)
+        print(f"{'✓' if ok else '✗'} {name}：{actual}（预期 {expected}）")
+
+    # 1. 合并窗口中的文档任务在批次保存后才完成
+    document_job = submit(queue, "document", build_update(bot, 10, forwarded=True, document="notes.txt"))
+    time.sleep(0.2)
+    check("合并窗口结束前的任务状态", wait_for_status(queue, document_job, STATUS_RUNNING), STATUS_RUNNING)
+    check("合并窗口结束后的任务状态", wait_for_status(queue, document_job, STATUS_DONE), STATUS_DONE)
+    check("保存的批次", bursts, [[10]])
+
+    # 2. 批次保存失败时，触发保存的普通消息不受影响
+    fail_bursts.append(True)
+    forward_job = submit(queue, "message", build_update(bot, 20, forwarded=True, text="转发的内容"))
+    wait_for_status(queue, forward_job, STATUS_RUNNING)
+    text_job = submit(queue, "message", build_update(bot, 21, text="普通消息"))
+    check("普通消息的任务状态", wait_for_status(queue, text_job, STATUS_DONE), STATUS_DONE)
+    check("保存失败的批次任务状态", wait_for_status(queue, forward_job, STATUS_PENDING), STATUS_PENDING)
+    check("单独保存的消息", singles, [21])
+
+    queue.stop()
+    shutil.rmtree(os.environ["DATA_DIR"], ignore_errors=True)
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+本地模拟 Telegram 推送更新，用于离线测试 webhook 模式
+
+用法：
+    # 向正在运行的机器人（--mode webhook）发送一条文本消息
+    python scripts/fake_telegram_sender.py --secret <WEBHOOK_SECRET_TOKEN> --text "hello"
+
+    # 不依赖 Telegram 和机器人配置，启动一个只打印更新的本地 webhook 服务器并发送测试消息
+    python scripts/fake_telegram_sender.py --self-test
+"""
+
+import argparse
+import json
+import logging
+import queue
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+# 设置日志
+logging.basicConfig(
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    level=logging.INFO,
+    handlers=[logging.StreamHandler()],
+)
+logger = logging.getLogger(__name__)
+
+
+def build_text_update(update_id, user_id, text, message_id=None):
+    """
+    构造一条私聊文本消息的更新 JSON
+
+    参数：
+        update_id: 更新 ID
+        user_id: 发送者 ID（需要在 ALLOWED_USER_IDS 中）
+        text: 消息文本
+        message_id: 消息 ID，默认与 update_id 相同
+
+    返回：
+        dict: 符合 Bot API 格式的更新
+    """
+    entities = []
+    if text.startswith("/"):
+        entities.append(
+            {"type": "bot_command", "offset": 0, "length": len(text.split()[0])}
+        )
+
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": message_id or update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private", "first_name": "Tester"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Tester"},
+            "text": text,
+            "entities": entities,
+        },
+    }
+
+
+def send_update(url, secret, update):
+    """
+    向 webhook 地址发送一条更新
+
+    返回：
+        int: HTTP 状态码
+    """
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(update).encode("utf-8"),
+        headers={
+            "Content-Type": "application/json",
+            "X-Telegram-Bot-Api-Secret-Token": secret,
+        },
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def self_test(texts, user_id):
+    """启动本地 webhook 服务器，发送更新并确认它们进入了更新队列"""
+    from telegram import Bot
+
+    from services.telegram_service.webhook import WebhookServer
+
+    update_queue = queue.Queue()
+    server = WebhookServer(
+        Bot("123456:offline-self-test"),
+        update_queue,
+        listen="127.0.0.1",
+        port=0,
+        url_path="telegram",
+    )
+    server.start()
+    url = f"http://127.0.0.1:{server.port}{server.url_path}"
+
+    try:
+        bad_status = send_update(url, "wrong-secret", build_text_update(1, user_id, "x"))
+        logger.info(f"错误密钥的请求返回：{bad_status}（应为 403）")
+
+        for i, text in enumerate(texts, 1):
+            status = send_update(url, server.secret_token, build_text_update(i, user_id, text))
+            update = update_queue.get(timeout=5)
+            logger.info(f"发送 '{text}' → {status}，收到更新 {update.update_id}: {update.message.text}")
+    finally:
+        server.stop()
+
+    return 0 if bad_status == 403 else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟 Telegram 向 webhook 推送更新")
+    parser.add_argument("--url", default="http://127.0.0.1:8443/telegram", help="webhook 地址")
+    parser.add_argument("--secret", default="", help="WEBHOOK_SECRET_TOKEN")
+    parser.add_argument("--user-id", type=int, default=1, help="发送者用户 ID")
+    parser.add_argument("--text", action="append", help="消息文本，可重复指定")
+    parser.add_argument("--update-id", type=int, default=int(time.time()), help="起始更新 ID")
+    parser.add_argument("--self-test", action="store_true", help="启动本地服务器进行离线自测")
+    args = parser.parse_args()
+
+    texts = args.text or ["hello from fake sender"]
+
+    if args.self_test:
+        return self_test(texts, args.user_id)
+
+    for offset, text in enumerate(texts):
+        update = build_text_update(args.update_id + offset, args.user_id, text)
+        status = send_update(args.url, args.secret, update)
+        logger.info(f"发送更新 {update['update_id']}：'{text}' → HTTP {status}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
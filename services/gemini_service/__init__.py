@@ -4,17 +4,19 @@ Google Gemini API 服务模块
 提供内容分析、PDF 解析和周报生成等功能
 """
 
-# 导入客户端
+# 导入客户端（模型在第一次使用时才初始化）
 from .client import (
     GEMINI_API_KEY,
-    GEMINI_AVAILABLE,
     configure_gemini_api,
-    genai,
+    get_model,
+    get_vision_model,
+    is_gemini_available,
     model,
     vision_model,
 )
 
 # 导入内容分析功能
+from .batch_analyzer import analyze_short_content
 from .content_analyzer import analyze_content, enrich_analysis_with_metadata
 
 # 导入 PDF 分析功能
@@ -33,17 +35,18 @@ from .utils import (
 )
 
 # 导入周报功能
-from .weekly_summary import generate_weekly_summary, get_content_preview
+from .weekly_summary import generate_weekly_summary, get_content_preview, get_content_previews
 
 # 暴露所有公共函数，保持与原模块兼容
 __all__ = [
     # 客户端和配置
     'genai', 'model', 'vision_model', 
     'GEMINI_API_KEY', 'GEMINI_AVAILABLE',
-    'configure_gemini_api',
+    'configure_gemini_api', 'get_model', 'get_vision_model', 'is_gemini_available',
     
     # 内容分析
     'analyze_content',
+    'analyze_short_content',
     'enrich_analysis_with_metadata',
     
     # PDF 分析
@@ -54,6 +57,7 @@ __all__ = [
     # 周报功能
     'generate_weekly_summary',
     'get_content_preview',
+    'get_content_previews',
     
     # 工具函数
     'extract_property_text',
@@ -61,3 +65,12 @@ __all__ = [
     'extract_date',
     'extract_url'
 ]
+
+
+def __getattr__(name):
+    # GEMINI_AVAILABLE 和 genai 由 client 模块按需计算，避免导入时初始化
+    if name in ("GEMINI_AVAILABLE", "genai"):
+        from . import client
+
+        return getattr(client, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,247 @@
+"""
+短内容批量分析模块
+
+短消息只需要标签，逐条调用 analyze_content 会很快耗尽 15 RPM 的配额。
+本模块在一个很短的窗口内收集待分析的短内容（或直到达到条数/字符预算），
+用一个提示同时分析多条，再把结果分发给各自的调用方。每条结果仍按
+analyze_content 的缓存键单独缓存，之后的单条查询可以直接命中缓存。
+"""
+
+import json
+import logging
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future
+
+from config import (
+    BATCH_ANALYSIS_MAX_CHARS,
+    BATCH_ANALYSIS_MAX_ITEMS,
+    BATCH_ANALYSIS_WINDOW,
+    PREDEFINED_TAG_CATEGORIES,
+)
+from config.prompts import BATCH_CONTENT_ANALYSIS_PROMPT
+from utils.gemini_cache import get_content_hash, get_from_cache, save_to_cache
+
+from .client import model
+from .content_analyzer import analyze_content
+
+logger = logging.getLogger(__name__)
+
+# 与 analyze_content 相同的内容截断长度，保证缓存键一致
+CONTENT_LIMIT = 4000
+# 等待批量结果的最长时间（秒），超时后回退为单条分析
+RESULT_TIMEOUT = 120
+
+# 单例实例
+_batcher_instance = None
+_instance_lock = threading.Lock()
+
+
+def _cache_key(content):
+    return get_content_hash(content[:CONTENT_LIMIT])
+
+
+def _normalize_result(result):
+    """确保结果包含 title、summary 和列表形式的 tags"""
+    tags = result.get("tags", [])
+    if not isinstance(tags, list):
+        tags = []
+    return {
+        "title": str(result.get("title") or ""),
+        "summary": str(result.get("summary") or ""),
+        "tags": [str(tag) for tag in tags if tag],
+    }
+
+
+def parse_batch_response(text, count):
+    """
+    从模型响应中解析批量分析结果
+
+    参数：
+        text: 模型响应文本
+        count: 请求中的内容条数
+
+    返回：
+        dict: id（1 开始）-> 结果字典，解析失败的条目不包含在内
+    """
+    match = re.search(r"\[.*\]", text, re.DOTALL)
+    if not match:
+        return {}
+
+    try:
+        items = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return {}
+
+    results = {}
+    for index, item in enumerate(items, 1):
+        if not isinstance(item, dict):
+            continue
+        # 优先使用模型返回的 id，缺失时按顺序对应
+        try:
+            item_id = int(item.get("id", index))
+        except (TypeError, ValueError):
+            item_id = index
+        if 1 <= item_id <= count:
+            results[item_id] = _normalize_result(item)
+    return results
+
+
+class ShortContentBatcher:
+    """
+    短内容分析的微批处理器
+
+    调用方通过 submit() 获得一个 Future；后台线程在窗口期内收集请求，
+    达到窗口时长、最大条数或字符预算时发送一次批量请求
+    """
+
+    def __init__(
+        self,
+        window=BATCH_ANALYSIS_WINDOW,
+        max_items=BATCH_ANALYSIS_MAX_ITEMS,
+        max_chars=BATCH_ANALYSIS_MAX_CHARS,
+    ):
+        """
+        初始化批处理器
+
+        参数：
+            window: 收集窗口（秒），从第一条请求到达开始计算
+            max_items: 单批最大条数
+            max_chars: 单批内容总字符数预算
+        """
+        self.window = window
+        self.max_items = max_items
+        self.max_chars = max_chars
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="gemini-batcher", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, content):
+        """
+        提交一条待分析的短内容
+
+        参数：
+            content: 内容文本
+
+        返回：
+            Future: 结果为包含 title、summary、tags 的字典
+        """
+        future = Future()
+        self._queue.put((content[:CONTENT_LIMIT], future))
+        return future
+
+    def _collect(self):
+        """阻塞等待第一条请求，然后在窗口期内继续收集"""
+        batch = [self._queue.get()]
+        chars = len(batch[0][0])
+        deadline = time.monotonic() + self.window
+
+        while len(batch) < self.max_items:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+
+            batch.append(item)
+            chars += len(item[0])
+            if chars >= self.max_chars:
+                break
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._process(batch)
+            except Exception as e:
+                logger.error(f"批量分析短内容时出错：{e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _process(self, batch):
+        """分析一批内容并把结果分发给各个 Future"""
+        # 同一批中的重复内容只分析一次
+        unique = {}
+        for content, future in batch:
+            unique.setdefault(content, []).append(future)
+        contents = list(unique)
+
+        if len(contents) == 1:
+            results = {1: analyze_content(contents[0])}
+        else:
+            results = self._analyze_many(contents)
+
+        for index, content in enumerate(contents, 1):
+            result = results.get(index)
+            if result is None:
+                # 批量结果中缺失的条目回退为单条分析
+                logger.warning("批量分析结果缺少条目，改为单条分析")
+                result = analyze_content(content)
+            for future in unique[content]:
+                future.set_result(result)
+
+    def _analyze_many(self, contents):
+        """用一次请求分析多条内容，并逐条写入缓存"""
+        items_json = json.dumps(
+            [{"id": i, "content": c} for i, c in enumerate(contents, 1)],
+            ensure_ascii=False,
+            indent=2,
+        )
+        prompt = BATCH_CONTENT_ANALYSIS_PROMPT.format(
+            count=len(contents),
+            categories=", ".join(PREDEFINED_TAG_CATEGORIES),
+            items_json=items_json,
+        )
+
+        logger.info(f"发送批量内容分析请求，包含 {len(contents)} 条短内容")
+        response = model.generate_content(prompt)
+        results = parse_batch_response(response.text, len(contents))
+
+        for index, result in results.items():
+            save_to_cache(_cache_key(contents[index - 1]), result, "content_analysis")
+
+        return results
+
+
+def get_batcher():
+    """获取批处理器单例"""
+    global _batcher_instance
+    if _batcher_instance is None:
+        with _instance_lock:
+            if _batcher_instance is None:
+                _batcher_instance = ShortContentBatcher()
+    return _batcher_instance
+
+
+def analyze_short_content(content):
+    """
+    分析短内容，与其他并发的短内容请求合并为一次 Gemini 调用
+
+    参数：
+    content (str): 需要分析的内容
+
+    返回：
+    dict: 包含标题、摘要和标签的字典
+    """
+    if not content or len(content.strip()) == 0:
+        return {"title": "", "summary": "", "tags": []}
+
+    cached_result = get_from_cache(_cache_key(content), "content_analysis")
+    if cached_result:
+        logger.info("使用缓存的内容分析结果")
+        return cached_result
+
+    try:
+        return get_batcher().submit(content).result(timeout=RESULT_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"批量分析失败，改为单条分析：{e}")
+        return analyze_content(content)
@@ -1,22 +1,25 @@
 """
 Gemini API 客户端模块
 
-处理 Google Gemini API 的配置和初始化
+处理 Google Gemini API 的配置和初始化。
+google.generativeai 的导入和模型初始化都推迟到第一次使用时进行，
+避免拖慢机器人启动。
 """
 
 import logging
-
-import google.generativeai as genai
+import threading
 
 from config import GEMINI_API_KEY
 from utils.rate_limiter import RateLimiter
 
 logger = logging.getLogger(__name__)
 
-# 默认初始化
-model = None
-vision_model = None
-GEMINI_AVAILABLE = False
+# 模型实例，在第一次使用时初始化
+_model = None
+_vision_model = None
+_available = False
+_configured = False
+_configure_lock = threading.Lock()
 
 # 创建 Gemini API 请求限流器 (15 RPM = 每分钟 15 次请求)
 gemini_limiter = RateLimiter(max_calls=15, time_frame=60)
@@ -29,32 +32,63 @@ def configure_gemini_api():
     返回：
         bool: 配置是否成功
     """
-    global model, vision_model, GEMINI_AVAILABLE
+    global _model, _vision_model, _available, _configured
 
+    _configured = True
     try:
         if not GEMINI_API_KEY:
             logger.warning("未设置 GEMINI_API_KEY，Gemini 功能将不可用")
+            _available = False
             return False
 
+        import google.generativeai as genai
+
         genai.configure(api_key=GEMINI_API_KEY)
 
         # 初始化原始模型
-        _model = genai.GenerativeModel("gemini-2.0-pro-exp-02-05")
-        _vision_model = genai.GenerativeModel("gemini-2.0-pro-exp-02-05")
+        raw_model = genai.GenerativeModel("gemini-2.0-pro-exp-02-05")
+        raw_vision_model = genai.GenerativeModel("gemini-2.0-pro-exp-02-05")
 
         # 为 generate_content 方法添加速率限制
-        model = _create_rate_limited_model(_model)
-        vision_model = _create_rate_limited_model(_vision_model)
+        _model = _create_rate_limited_model(raw_model)
+        _vision_model = _create_rate_limited_model(raw_vision_model)
 
-        GEMINI_AVAILABLE = True
+        _available = True
         logger.info("Gemini API 配置成功，已启用请求频率限制 (15 RPM)")
         return True
     except Exception as e:
         logger.error(f"配置 Gemini API 时出错：{e}")
-        GEMINI_AVAILABLE = False
+        _available = False
         return False
 
 
+def _ensure_configured():
+    """第一次使用时配置 Gemini API，多线程同时调用时只配置一次"""
+    if _configured:
+        return
+    with _configure_lock:
+        if not _configured:
+            configure_gemini_api()
+
+
+def get_model():
+    """获取带频率限制的文本模型，未配置时返回 None"""
+    _ensure_configured()
+    return _model
+
+
+def get_vision_model():
+    """获取带频率限制的视觉模型，未配置时返回 None"""
+    _ensure_configured()
+    return _vision_model
+
+
+def is_gemini_available():
+    """Gemini API 是否可用"""
+    _ensure_configured()
+    return _available
+
+
 def _create_rate_limited_model(original_model):
     """
     创建具有请求频率限制的模型包装器
@@ -80,5 +114,29 @@ def _create_rate_limited_model(original_model):
     return RateLimitedModel(original_model)
 
 
-# 自动初始化
-configure_gemini_api()
+class _LazyModel:
+    """在第一次访问属性时才初始化模型的代理对象，兼容 from .client import model 的用法"""
+
+    def __init__(self, getter):
+        self._getter = getter
+
+    def __getattr__(self, name):
+        target = self._getter()
+        if target is None:
+            raise RuntimeError("Gemini API 未配置或不可用")
+        return getattr(target, name)
+
+
+model = _LazyModel(get_model)
+vision_model = _LazyModel(get_vision_model)
+
+
+def __getattr__(name):
+    # 兼容旧的模块属性，访问时才导入 SDK 或初始化模型
+    if name == "GEMINI_AVAILABLE":
+        return is_gemini_available()
+    if name == "genai":
+        import google.generativeai as genai
+
+        return genai
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
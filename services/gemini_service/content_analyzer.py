@@ -17,6 +17,9 @@ from .client import model
 
 logger = logging.getLogger(__name__)
 
+# 调用 Gemini 出错时返回结果中的标题，调用方可以据此判断分析是否失败
+ANALYSIS_ERROR_TITLE = "无法生成标题"
+
 
 def analyze_content(content):
     """
@@ -120,7 +123,7 @@ def analyze_content(content):
 
     except Exception as e:
         logger.error(f"分析内容时出错：{e}")
-        return {"title": "无法生成标题", "summary": "无法生成摘要", "tags": []}
+        return {"title": ANALYSIS_ERROR_TITLE, "summary": "无法生成摘要", "tags": []}
 
 
 def enrich_analysis_with_metadata(analysis: dict, metadata: dict) -> dict:
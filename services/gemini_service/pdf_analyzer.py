@@ -13,7 +13,7 @@ import re
 from config.prompts import NEW_PDF_ANALYSIS_PROMPT, NEW_PDF_TEXT_ANALYSIS_PROMPT
 from utils.gemini_cache import get_from_cache, save_to_cache
 
-from .client import GEMINI_AVAILABLE, model, vision_model
+from .client import is_gemini_available, model, vision_model
 
 logger = logging.getLogger(__name__)
 
@@ -29,7 +29,7 @@ def analyze_pdf_content(pdf_path, url=None):
     返回：
     dict: 包含论文分析的字典
     """
-    if not GEMINI_AVAILABLE:
+    if not is_gemini_available():
         logger.warning("Gemini API 未配置或不可用，无法解析 PDF")
         return None
 
@@ -42,6 +42,7 @@ def generate_weekly_summary(entries):
         # 提取条目中的关键信息
         entries_data = []
         entry_ids = []
+        preview_entries = []
 
         for entry in entries:
             # 跳过周报本身
@@ -65,7 +66,7 @@ def generate_weekly_summary(entries):
 
             # 智能预览：仅为没有充分摘要的条目获取内容预览
             if not entry_data["summary"] or len(entry_data["summary"]) < 30:
-                entry_data["content_preview"] = get_content_preview(entry["id"])
+                preview_entries.append(entry)
             else:
                 # 使用已有摘要，避免额外调用
                 entry_data["content_preview"] = entry_data["summary"][:300]
@@ -76,6 +77,12 @@ def generate_weekly_summary(entries):
         if not entries_data:
             return "本周没有添加任何内容。"
 
+        # 并发读取需要预览的页面，页面没有再编辑时使用缓存
+        previews = get_content_previews(preview_entries)
+        for entry_data in entries_data:
+            if "content_preview" not in entry_data:
+                entry_data["content_preview"] = previews.get(entry_data["id"], "")
+
         # 检查是否有上周生成的相同内容的周报缓存
         # 创建一个基于条目 ID 和日期的哈希键
         current_week = datetime.now().strftime("%Y-W%W")
@@ -172,61 +179,52 @@ def preprocess_code_blocks(text, max_length=1900):
     return processed_text
 
 
-def get_content_preview(page_id, max_length=300):
+def get_content_preview(page_id, max_length=300, last_edited_time=None):
     """
-    获取页面内容的预览，带缓存功能
+    获取页面内容的预览
 
     参数：
     page_id (str): Notion 页面 ID
     max_length (int): 预览最大长度
+    last_edited_time (str): 页面的最后编辑时间，提供时按编辑时间使用缓存
 
     返回：
     str: 页面内容预览
     """
-    # 检查缓存
-    cached_preview = get_from_cache(
-        page_id, "content_preview", ttl=3 * 24 * 60 * 60
-    )  # 3 天缓存
-    if cached_preview:
-        logger.debug(f"使用缓存的内容预览：{page_id[:8]}...")
-        return cached_preview
-
     try:
         # 避免循环导入，延迟导入
-        from services.notion_service.client import get_notion_client
-        from services.notion_service.database.common import extract_notion_block_content
+        from services.notion_service.page_content import get_page_content_service
 
-        # 获取 notion 客户端实例
-        notion = get_notion_client()
-        if not notion:
-            logger.error("无法获取 Notion 客户端")
-            return ""
+        content = get_page_content_service().get_text(page_id, last_edited_time)
+        return _make_preview(content, max_length)
+    except ImportError as e:
+        logger.error(f"导入所需模块时出错：{e}")
+        return ""
 
-        # 获取页面内容块
-        response = notion.blocks.children.list(block_id=page_id)
-        if not response:
-            logger.warning(f"获取页面内容时返回为空：{page_id}")
-            return ""
 
-        blocks = response.get("results", [])
+def get_content_previews(entries, max_length=300):
+    """
+    并发获取多个页面的内容预览，每个页面在没有再编辑时只读取一次
 
-        # 提取文本内容
-        content = extract_notion_block_content(blocks)
+    参数：
+    entries (list): Notion 页面对象列表
+    max_length (int): 预览最大长度
 
-        # 限制长度
-        if len(content) > max_length:
-            preview = content[:max_length] + "..."
-        else:
-            preview = content
+    返回：
+    dict: 页面 ID -> 内容预览
+    """
+    if not entries:
+        return {}
 
-        # 缓存预览
-        if preview:
-            save_to_cache(page_id, preview, "content_preview")
+    # 避免循环导入，延迟导入
+    from services.notion_service.page_content import get_page_content_service
 
-        return preview
-    except ImportError as e:
-        logger.error(f"导入所需模块时出错：{e}")
-        return ""
-    except Exception as e:
-        logger.warning(f"获取页面内容预览时出错：{e}")
-        return ""
+    texts = get_page_content_service().get_texts(entries)
+    return {page_id: _make_preview(text, max_length) for page_id, text in texts.items()}
+
+
+def _make_preview(content, max_length):
+    """限制预览长度"""
+    if len(content) > max_length:
+        return content[:max_length] + "..."
+    return content
@@ -1,23 +1,32 @@
 # 导出所有需要的函数和类，保持原有 API 不变
+from .block_sync import sync_page_children
 from .client import get_notion_client, notion
 from .content_converter import (
     convert_to_notion_blocks,
     create_text_blocks_from_content,
+    iter_block_batches,
+    iter_notion_blocks,
     limit_blocks,
     parse_markdown_formatting,
     split_text,
 )
 from .database.common import (
+    add_stream_to_notion,
     add_to_notion,
     append_blocks_in_batches,
+    append_comment_to_page,
     create_auto_weekly_report,
     create_weekly_report,
     determine_title,
     extract_notion_block_content,
     extract_rich_text,
+    find_weekly_report_page,
     generate_weekly_content,
+    get_page_url,
     get_weekly_entries,  # 添加这个函数导入
+    make_provisional_title,
     process_notion_references,
+    update_page_analysis,
 )
 from .database.papers import (
     add_to_papers_database,
@@ -29,6 +38,48 @@ from .database.papers import (
     prepare_metadata_for_notion,
 )
 from .database.todo import add_to_todo_database
+from .dedup_index import (
+    DedupIndex,
+    canonicalize_url,
+    find_new_text,
+    find_saved_content,
+    get_dedup_index,
+    record_saved_content,
+)
+from .entry_index import (
+    KIND_NOTE,
+    KIND_PAPER,
+    backfill_entry_index,
+    get_entry_index,
+    record_entry,
+    start_entry_index_backfill,
+)
+from .mirror import NotionMirror, get_notion_mirror, record_page, start_notion_mirror
+from .outbox import (
+    NotionOutbox,
+    NotionPageIncomplete,
+    NotionWriteDeferred,
+    get_notion_outbox,
+    register_replay_callback,
+    start_notion_outbox,
+)
+from .page_content import PageContentService, get_page_content_service
+from .query import iter_database_query, query_database
+from .search_index import (
+    KIND_TODO,
+    SearchIndex,
+    get_search_index,
+    record_document,
+    start_search_index_backfill,
+)
+from .schema import (
+    DatabaseSchema,
+    SchemaCache,
+    get_schema_cache,
+    update_page_properties,
+    validate_page_properties,
+)
+from .uploader import BlockUploader, UploadResult, get_block_uploader, is_transient_error
 
 __all__ = [
     "get_notion_client",
@@ -38,6 +89,7 @@ __all__ = [
     "is_pdf_url",
     "download_pdf",
     "add_to_notion",
+    "add_stream_to_notion",
     "add_to_todo_database",
     "add_to_papers_database",
     "get_existing_dois",
@@ -51,9 +103,57 @@ __all__ = [
     "split_text",
     "create_text_blocks_from_content",
     "limit_blocks",
+    "iter_notion_blocks",
+    "iter_block_batches",
     "create_weekly_report",
     "create_auto_weekly_report",
+    "find_weekly_report_page",
+    "sync_page_children",
     "append_blocks_in_batches",
+    "append_comment_to_page",
     "determine_title",
     "get_weekly_entries",  # 添加到 __all__ 列表
+    "get_page_url",
+    "make_provisional_title",
+    "update_page_analysis",
+    "KIND_NOTE",
+    "KIND_PAPER",
+    "get_entry_index",
+    "record_entry",
+    "backfill_entry_index",
+    "start_entry_index_backfill",
+    "PageContentService",
+    "get_page_content_service",
+    "iter_database_query",
+    "query_database",
+    "KIND_TODO",
+    "SearchIndex",
+    "DedupIndex",
+    "canonicalize_url",
+    "find_new_text",
+    "find_saved_content",
+    "get_dedup_index",
+    "record_saved_content",
+    "get_search_index",
+    "record_document",
+    "start_search_index_backfill",
+    "DatabaseSchema",
+    "SchemaCache",
+    "get_schema_cache",
+    "validate_page_properties",
+    "update_page_properties",
+    "BlockUploader",
+    "UploadResult",
+    "get_block_uploader",
+    "is_transient_error",
+    "NotionMirror",
+    "get_notion_mirror",
+    "record_page",
+    "start_notion_mirror",
+    "NotionOutbox",
+    "NotionPageIncomplete",
+    "NotionWriteDeferred",
+    "get_notion_outbox",
+    "register_replay_callback",
+    "start_notion_outbox",
 ]
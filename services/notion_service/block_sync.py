@@ -0,0 +1,264 @@
+"""
+页面内容差异同步模块
+
+把页面的顶层块更新为新生成的块列表，只发送有变化的部分：
+1. 读取页面现有的块（包括子块），把两边的块都转换为可比较的签名
+   （块类型、富文本内容和格式、链接或提及的页面、代码语言等）
+2. 用 difflib.SequenceMatcher 对齐两个签名序列，相同的块保持不变；
+   被替换的块类型相同且都没有子块时原地更新，否则删除旧块并在对应位置插入新块
+3. 插入使用 append 接口的 after 参数，放在前一个保留或插入的块之后
+
+Notion 不支持在第一个块之前插入，需要这样做时（例如开头新增了块）删除全部旧块后重新写入。
+"""
+
+import logging
+import re
+from difflib import SequenceMatcher
+
+from .client import notion
+from .query import call_with_retry
+
+logger = logging.getLogger(__name__)
+
+# 单次追加的块数上限
+MAX_APPEND_BLOCKS = 100
+
+# 比较签名时除富文本外还需要比较的字段及其默认值。Notion 返回的块总会带上这些字段
+# （例如标题的 is_toggleable: false），生成的块通常省略，等于默认值的字段不放入签名
+SIGNATURE_FIELDS = {
+    "checked": False,
+    "language": None,
+    "url": None,
+    "expression": None,
+    "is_toggleable": False,
+}
+
+ANNOTATION_FIELDS = ("bold", "italic", "strikethrough", "underline", "code")
+
+_PAGE_ID_RE = re.compile(r"[0-9a-f]{32}", re.I)
+
+
+def _block_type(block):
+    return block.get("type") or next(
+        (key for key in block if key not in ("object", "id", "has_children")), None
+    )
+
+
+def _normalize_link(url):
+    """Notion 内部链接可能返回为 /页面 ID 或带标题前缀的形式，统一为页面 ID"""
+    if not url:
+        return None
+    if url.startswith("/") or "notion.so" in url:
+        match = _PAGE_ID_RE.search(url.replace("-", ""))
+        if match:
+            return match.group().lower()
+    return url
+
+
+def _rich_text_signature(items):
+    """富文本的签名；相邻且格式相同的文本合并后比较，Notion 可能会合并或拆分文本段"""
+    runs = []
+    for item in items or []:
+        if item.get("type") == "mention":
+            mention = item.get("mention", {})
+            target = mention.get(mention.get("type"), {})
+            key = ("mention", mention.get("type"), str(target.get("id", "")).replace("-", ""))
+            runs.append((key, ""))
+            continue
+
+        text = item.get("text") or {}
+        content = text.get("content", item.get("plain_text", ""))
+        link = (text.get("link") or {}).get("url") or item.get("href")
+        annotations = item.get("annotations") or {}
+        key = (
+            "text",
+            _normalize_link(link),
+            tuple(bool(annotations.get(name)) for name in ANNOTATION_FIELDS),
+        )
+        if runs and runs[-1][0] == key:
+            runs[-1] = (key, runs[-1][1] + content)
+        else:
+            runs.append((key, content))
+    return tuple(runs)
+
+
+def block_signature(block, children=None):
+    """
+    块的可比较签名
+
+    参数：
+        block: 块对象，可以是 Notion 返回的块，也可以是要写入的块
+        children: 现有块的子块列表（Notion 返回的块不包含子块，需要单独读取）
+
+    返回：
+        tuple: 签名
+    """
+    block_type = _block_type(block)
+    payload = block.get(block_type) or {}
+    if children is None:
+        children = payload.get("children") or []
+    fields = []
+    for name, default in SIGNATURE_FIELDS.items():
+        value = payload.get(name, default)
+        if value != default:
+            fields.append((name, repr(value)))
+    return (
+        block_type,
+        _rich_text_signature(payload.get("rich_text")),
+        tuple(fields),
+        tuple(block_signature(child, child.get("_children")) for child in children),
+    )
+
+
+def _has_children(block):
+    if "_children" in block:
+        return bool(block["_children"]) or block.get("has_children", False)
+    return bool((block.get(_block_type(block)) or {}).get("children"))
+
+
+class _SyncPlan:
+    """一次同步要执行的操作和请求统计"""
+
+    def __init__(self, page_id):
+        self.page_id = page_id
+        self.requests = 0
+        self.updated = 0
+        self.inserted = 0
+        self.deleted = 0
+        self.unchanged = 0
+
+    def list_children(self, block_id, depth=0, max_depth=2):
+        """读取块的全部子块，有子块的块读取到 max_depth 层，子块保存在 _children 中"""
+        children = []
+        cursor = None
+        while True:
+            kwargs = {"block_id": block_id, "page_size": 100}
+            if cursor:
+                kwargs["start_cursor"] = cursor
+            response = call_with_retry(notion.blocks.children.list, **kwargs)
+            self.requests += 1
+            children.extend(response.get("results", []))
+            if not response.get("has_more"):
+                break
+            cursor = response.get("next_cursor")
+
+        for child in children:
+            if child.get("has_children") and depth < max_depth:
+                child["_children"] = self.list_children(child["id"], depth + 1, max_depth)
+            else:
+                child["_children"] = []
+        return children
+
+    def update(self, old, new):
+        block_type = _block_type(new)
+        payload = {key: value for key, value in new[block_type].items() if key != "children"}
+        call_with_retry(
+            notion.request, path=f"blocks/{old['id']}", method="PATCH", body={block_type: payload}
+        )
+        self.requests += 1
+        self.updated += 1
+
+    def delete(self, old):
+        call_with_retry(notion.blocks.delete, block_id=old["id"])
+        self.requests += 1
+        self.deleted += 1
+
+    def insert(self, blocks, after):
+        """在 after 之后依次插入块，返回最后一个插入的块 ID"""
+        for start in range(0, len(blocks), MAX_APPEND_BLOCKS):
+            body = {"children": blocks[start : start + MAX_APPEND_BLOCKS]}
+            if after:
+                body["after"] = after
+            response = call_with_retry(
+                notion.request, path=f"blocks/{self.page_id}/children", method="PATCH", body=body
+            )
+            self.requests += 1
+            results = response.get("results", [])
+            if results:
+                after = results[-1]["id"]
+        self.inserted += len(blocks)
+        return after
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "updated": self.updated,
+            "inserted": self.inserted,
+            "deleted": self.deleted,
+            "unchanged": self.unchanged,
+        }
+
+
+def sync_page_children(page_id, blocks):
+    """
+    把页面的顶层块同步为 blocks，只发送有变化的部分
+
+    参数：
+        page_id: 页面 ID
+        blocks: 新的块列表（convert_to_notion_blocks 的结果）
+
+    返回：
+        dict: 请求数和更新、插入、删除、保持不变的块数
+    """
+    blocks = list(blocks)
+    plan = _SyncPlan(page_id)
+    existing = plan.list_children(page_id)
+
+    old_signatures = [block_signature(block, block["_children"]) for block in existing]
+    new_signatures = [block_signature(block) for block in blocks]
+    opcodes = SequenceMatcher(None, old_signatures, new_signatures, autojunk=False).get_opcodes()
+
+    # 开头需要插入新块时没有可以作为位置的前一个块，改为整体重写
+    if existing and opcodes and opcodes[0][0] in ("insert", "replace"):
+        tag, i1, i2, j1, j2 = opcodes[0]
+        first_old, first_new = existing[0], blocks[0]
+        if tag == "insert" or not _can_update(first_old, first_new):
+            logger.info(f"页面 {page_id} 开头的块有变化，删除全部旧块后重新写入")
+            for block in existing:
+                plan.delete(block)
+            plan.insert(blocks, None)
+            return plan.stats()
+
+    anchor = None
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal":
+            plan.unchanged += i2 - i1
+            anchor = existing[i2 - 1]["id"]
+            continue
+
+        olds = existing[i1:i2]
+        news = blocks[j1:j2]
+        pending = []
+
+        # 按位置配对，类型相同且都没有子块的块原地更新
+        for index in range(max(len(olds), len(news))):
+            old = olds[index] if index < len(olds) else None
+            new = news[index] if index < len(news) else None
+            if old is not None and new is not None and _can_update(old, new):
+                if pending:
+                    anchor = plan.insert(pending, anchor)
+                    pending = []
+                plan.update(old, new)
+                anchor = old["id"]
+                continue
+            if old is not None:
+                plan.delete(old)
+            if new is not None:
+                pending.append(new)
+
+        if pending:
+            anchor = plan.insert(pending, anchor)
+
+    logger.info(
+        f"已同步页面 {page_id} 的内容：更新 {plan.updated} 个块，插入 {plan.inserted} 个，"
+        f"删除 {plan.deleted} 个，{plan.unchanged} 个不变，共 {plan.requests} 次请求"
+    )
+    return plan.stats()
+
+
+def _can_update(old, new):
+    return (
+        _block_type(old) == _block_type(new)
+        and not _has_children(old)
+        and not _has_children(new)
+    )
@@ -1,18 +1,36 @@
 import logging
+import threading
 
-from notion_client import Client
-
-from config import NOTION_TOKEN
+from config import NOTION_REQUESTS_PER_SECOND, NOTION_TOKEN
+from utils.rate_limiter import RateLimiter
 
 logger = logging.getLogger(__name__)
 
-# 在 client.py 中
-notion = None
+# Notion API 请求限流器：10 秒窗口内平均每秒不超过 NOTION_REQUESTS_PER_SECOND 次
+notion_limiter = RateLimiter(max_calls=NOTION_REQUESTS_PER_SECOND * 10, time_frame=10)
+
+# Notion 客户端实例，在第一次使用时创建
+_client = None
+_client_lock = threading.Lock()
 
 
 def get_notion_client():
-    """获取 Notion 客户端"""
-    global notion
-    if notion is None:
-        notion = Client(auth=NOTION_TOKEN)
-    return notion
+    """获取 Notion 客户端，第一次调用时才导入 SDK 并创建客户端"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from notion_client import Client
+
+                _client = Client(auth=NOTION_TOKEN)
+    return _client
+
+
+class _LazyNotionClient:
+    """访问属性时才创建真正客户端的代理对象，模块可以在导入时直接引用 notion"""
+
+    def __getattr__(self, name):
+        return getattr(get_notion_client(), name)
+
+
+notion = _LazyNotionClient()
@@ -1,249 +1,202 @@
+"""
+Markdown → Notion 块转换模块
+
+convert_to_notion_blocks 是一个单遍编译器：
+1. 每行只用一个预编译的正则表达式分类（标题、列表、引用、代码块、表格、分隔线、段落）
+2. 行内格式同样一次扫描完成，支持嵌套的加粗、斜体、删除线、行内代码和链接
+3. 生成的块已经满足 Notion API 的限制：每个富文本对象不超过 2000 字符，
+   每个块不超过 100 个富文本对象，嵌套不超过两层，每个块最多 100 个子块
+4. 缩进的列表生成嵌套的子块，Markdown 表格生成 table 块
+
+因此写入 Notion 前不再需要逐块检查长度、拆分块的后处理。
+"""
+
 import logging
 import re
 
 logger = logging.getLogger(__name__)
 
-
-def convert_to_notion_blocks(content):
+# Notion API 限制
+MAX_TEXT_LENGTH = 2000  # 单个富文本对象的字符数
+MAX_RICH_TEXT_ELEMENTS = 100  # 单个块的富文本对象数
+MAX_CHILDREN = 100  # 单个块的子块数（表格的行数）
+MAX_NESTING_DEPTH = 2  # 一次请求中允许的子块嵌套层数
+
+# 列表每级缩进的空格数（制表符按 4 个空格计算）
+LIST_INDENT_WIDTH = 2
+
+# 行分类：每行只匹配一次
+_LINE_PATTERN = re.compile(
+    r"""
+    (?P<fence>^\s*```\s*(?P<lang>[^`]*?)\s*$)
+    |(?P<heading>^\s*(?P<hashes>\#{1,6})\s+(?P<heading_text>.+?)(?:\s+\#+)?\s*$)
+    |(?P<divider>^\s*(?:-{3,}|\*{3,}|_{3,})\s*$)
+    |(?P<bullet>^(?P<bullet_indent>[ \t]*)[-*+]\s+(?P<bullet_text>.*\S.*)$)
+    |(?P<number>^(?P<number_indent>[ \t]*)\d{1,9}[.)]\s+(?P<number_text>.*\S.*)$)
+    |(?P<quote>^\s*>\s?(?P<quote_text>.*)$)
+    |(?P<table>^\s*\|(?P<cells>.*)\|\s*$)
+    """,
+    re.VERBOSE,
+)
+
+# 表格分隔行，例如 |---|:---:|
+_TABLE_SEPARATOR_PATTERN = re.compile(r"^\s*\|?\s*:?-+:?\s*(?:\|\s*:?-+:?\s*)*\|?\s*$")
+
+# 行内格式：一次扫描识别代码、链接、括号包裹的 URL 和强调标记
+# 开头的前瞻让正则引擎跳过不可能开始匹配的字符，而不是在每个位置尝试所有分支
+_INLINE_PATTERN = re.compile(
+    r"""
+    (?=[`\[(*~])
+    (?:
+    `(?P<code>[^`]+)`
+    |\[(?P<link_text>[^\]]+)\]\((?P<link_url>[^)\s]+)\)
+    |\((?P<bracket_url>https?://[^\s)]+)\)
+    |(?P<bold>\*\*)
+    |(?P<strikethrough>~~)
+    |(?P<italic>\*)
+    )
+    """,
+    re.VERBOSE,
+)
+
+# 可能包含行内格式的字符，没有这些字符的文本跳过解析
+_INLINE_TRIGGER = re.compile(r"[`\[(*~]")
+
+_NOTION_PAGE_PATTERN = re.compile(r"https://notion\.so/([a-zA-Z0-9]+)")
+_VALID_LINK_PATTERN = re.compile(r"(?:https?://|mailto:)\S+")
+
+# 强调标记的分组名就是对应的 Notion 注释名
+_DELIMITER_ANNOTATIONS = frozenset(("bold", "italic", "strikethrough"))
+
+# Notion 代码块支持的语言，其他语言使用 plain text
+NOTION_CODE_LANGUAGES = {
+    "abap", "arduino", "bash", "basic", "c", "clojure", "coffeescript", "c++",
+    "c#", "css", "dart", "diff", "docker", "elixir", "elm", "erlang", "flow",
+    "fortran", "f#", "gherkin", "glsl", "go", "graphql", "groovy", "haskell",
+    "html", "java", "javascript", "json", "julia", "kotlin", "latex", "less",
+    "lisp", "livescript", "lua", "makefile", "markdown", "markup", "matlab",
+    "mermaid", "nix", "objective-c", "ocaml", "pascal", "perl", "php",
+    "plain text", "powershell", "prolog", "protobuf", "python", "r", "reason",
+    "ruby", "rust", "sass", "scala", "scheme", "scss", "shell", "sql", "swift",
+    "typescript", "vb.net", "verilog", "vhdl", "visual basic", "webassembly",
+    "xml", "yaml", "java/c/c++/c#",
+}
+CODE_LANGUAGE_ALIASES = {
+    "py": "python", "js": "javascript", "ts": "typescript", "sh": "shell",
+    "zsh": "shell", "console": "shell", "yml": "yaml", "cpp": "c++",
+    "cs": "c#", "csharp": "c#", "rb": "ruby", "rs": "rust", "golang": "go",
+    "dockerfile": "docker", "md": "markdown", "tex": "latex", "text": "plain text",
+    "txt": "plain text", "kt": "kotlin", "objc": "objective-c", "ps1": "powershell",
+}
+
+
+def _text_object(content, annotations=(), link=None):
+    """创建一个富文本对象"""
+    text = {"content": content}
+    if link:
+        text["link"] = {"url": link}
+    rich_text = {"type": "text", "text": text}
+    if annotations:
+        rich_text["annotations"] = {name: True for name in annotations}
+    return rich_text
+
+
+def _add_segment(segments, annotations, link, content):
+    """追加一段文本；与前一段格式相同时合并"""
+    if segments:
+        last = segments[-1]
+        if isinstance(last, list) and last[0] == annotations and last[1] == link:
+            last[2].append(content)
+            return
+    segments.append([annotations, link, [content]])
+
+
+def _parse_inline(text, segments, base=(), link=None):
     """
-    将文本内容转换为 Notion 块格式，支持 Markdown 语法
+    把一行文本解析为格式片段 [注释, 链接, 文本片段列表]；页面提及直接生成富文本对象
 
     参数：
-    content (str): 要转换的文本内容
-
-    返回：
-    list: Notion 块对象列表
+        text: 文本
+        segments: 输出的片段列表
+        base: 外层已生效的格式（链接文本中使用）
+        link: 外层链接
     """
-
-    # Notion API 文本块长度限制
-    MAX_TEXT_LENGTH = 2000
-
-    # 如果内容为空，返回简单段落
-    if not content or len(content.strip()) == 0:
-        return [
-            {"object": "block", "paragraph": {"rich_text": [{"text": {"content": ""}}]}}
-        ]
-
-    # 将内容分成行
-    lines = content.split("\n")
-    blocks = []
-
-    i = 0
-    current_list_type = None  # 'bulleted'  or 'numbered'
-    list_levels = []  # 保存当前层级的列表项信息
-
-    while i < len(lines):
-        line = lines[i].strip()
-
-        # 处理标题 (# 标题)
-        header_match = re.match(r"^(#{1,3})\s+(.+)$", line)
-        if header_match:
-            # 如果之前在处理列表，结束列表
-            current_list_type = None
-            list_levels = []
-
-            level = len(header_match.group(1))
-            heading_text = header_match.group(2)
-
-            # 确保标题文本不超过限制
-            if len(heading_text) > MAX_TEXT_LENGTH:
-                heading_text = heading_text[: MAX_TEXT_LENGTH - 3] + "..."
-
-            heading_type = f"heading_{level}"
-            blocks.append(
-                {
-                    "object": "block",
-                    heading_type: {
-                        "rich_text": parse_markdown_formatting(heading_text)
-                    },
-                }
-            )
-            i += 1
-            continue
-
-        # 处理列表项，支持多级列表
-        # 检查列表项的缩进级别
-        list_match = re.match(r"^(\s*)[-*]\s+(.+)$", line)
-        if list_match:
-            indent = len(list_match.group(1))
-            list_text = list_match.group(2)
-
-            # 确定列表级别 (基于缩进)
-            indent_level = indent // 2  # 假设每级缩进为 2 个空格
-
-            # 更新列表级别信息
-            if current_list_type != "bulleted" or indent_level != len(list_levels):
-                # 新的列表类型 or 新的缩进级别
-                current_list_type = "bulleted"
-
-                # 调整 list_levels 以匹配当前级别
-                if indent_level > len(list_levels):
-                    # 增加缩进级别
-                    while len(list_levels) < indent_level:
-                        list_levels.append("bulleted")
-                else:
-                    # 减少缩进级别
-                    list_levels = list_levels[:indent_level]
-                list_levels.append("bulleted")
-
-            # 分割长列表项
-            for chunk in split_text(list_text, MAX_TEXT_LENGTH):
-                # 根据缩进级别创建嵌套结构
-                block = {
-                    "object": "block",
-                    "bulleted_list_item": {
-                        "rich_text": parse_markdown_formatting(chunk)
-                    },
-                }
-
-                # 处理子项
-                if indent_level > 0:
-                    # 添加缩进信息
-                    block["bulleted_list_item"]["color"] = "default"
-
-                blocks.append(block)
-            i += 1
-            continue
-
-        # 处理数字列表项，支持多级列表
-        num_list_match = re.match(r"^(\s*)(\d+)\.\s+(.+)$", line)
-        if num_list_match:
-            indent = len(num_list_match.group(1))
-            num = num_list_match.group(2)  # noqa: F841
-            list_text = num_list_match.group(3)
-
-            # 确定列表级别 (基于缩进)
-            indent_level = indent // 2  # 假设每级缩进为 2 个空格
-
-            # 更新列表级别信息
-            if current_list_type != "numbered" or indent_level != len(list_levels):
-                current_list_type = "numbered"
-
-                # 调整 list_levels 以匹配当前级别
-                if indent_level > len(list_levels):
-                    # 增加缩进级别
-                    while len(list_levels) < indent_level:
-                        list_levels.append("numbered")
-                else:
-                    # 减少缩进级别
-                    list_levels = list_levels[:indent_level]
-                list_levels.append("numbered")
-
-            # 分割长列表项
-            for chunk in split_text(list_text, MAX_TEXT_LENGTH):
-                # 创建编号列表项
-                block = {
-                    "object": "block",
-                    "numbered_list_item": {
-                        "rich_text": parse_markdown_formatting(chunk)
-                    },
-                }
-
-                # 处理子项
-                if indent_level > 0:
-                    # 添加缩进信息
-                    block["numbered_list_item"]["color"] = "default"
-
-                blocks.append(block)
-            i += 1
-            continue
-
-        # 如果遇到空行 or 其他非列表项，重置列表状态
-        if not line:
-            current_list_type = None
-            list_levels = []
-
-        # 处理引用块 (> 引用)
-        quote_match = re.match(r"^>\s+(.+)$", line)
-        if quote_match:
-            # 结束之前的列表
-            current_list_type = None
-            list_levels = []
-
-            quote_text = quote_match.group(1)
-
-            # 分割长引用
-            for chunk in split_text(quote_text, MAX_TEXT_LENGTH):
-                blocks.append(
-                    {
-                        "object": "block",
-                        "quote": {"rich_text": parse_markdown_formatting(chunk)},
-                    }
-                )
-            i += 1
+    # 没有任何格式字符时直接作为普通文本
+    if not _INLINE_TRIGGER.search(text):
+        _add_segment(segments, base, link, text)
+        return
+
+    matches = list(_INLINE_PATTERN.finditer(text))
+
+    # 每种强调标记按顺序两两配对，落单的最后一个按普通文本处理
+    delimiter_counts = {}
+    last_delimiter = {}
+    for index, match in enumerate(matches):
+        kind = match.lastgroup
+        if kind in _DELIMITER_ANNOTATIONS:
+            delimiter_counts[kind] = delimiter_counts.get(kind, 0) + 1
+            last_delimiter[kind] = index
+    unpaired = {
+        last_delimiter[kind] for kind, count in delimiter_counts.items() if count % 2
+    }
+
+    active = base
+    last_end = 0
+    for index, match in enumerate(matches):
+        kind = match.lastgroup
+        if index in unpaired:
+            # 不推进 last_end，标记留在下一段普通文本中
             continue
 
-        # 处理代码块 (```language 代码 ```)
-        if line.startswith("```"):
-            # 结束之前的列表
-            current_list_type = None
-            list_levels = []
-
-            code_lang = line[3:].strip()
-            code_content = []
-            i += 1
-
-            while i < len(lines) and not lines[i].strip().endswith("```"):
-                code_content.append(lines[i])
-                i += 1
+        start = match.start()
+        if start > last_end:
+            _add_segment(segments, active, link, text[last_end:start])
+        last_end = match.end()
 
-            if i < len(lines):  # 找到了结束标记
-                code_text = "\n".join(code_content)
-                blocks.append(
+        if kind in _DELIMITER_ANNOTATIONS:
+            if kind in active:
+                active = tuple(a for a in active if a != kind)
+            else:
+                active = tuple(sorted(active + (kind,)))
+        elif kind == "code":
+            annotations = active if "code" in active else tuple(sorted(active + ("code",)))
+            _add_segment(segments, annotations, link, match.group("code"))
+        elif kind == "bracket_url":
+            url = match.group("bracket_url")
+            _add_segment(segments, active, url if link is None else link, url)
+        else:
+            link_text, url = match.group("link_text", "link_url")
+            page_match = _NOTION_PAGE_PATTERN.fullmatch(url)
+            if link is not None:
+                # 链接文本中不再嵌套链接
+                _add_segment(segments, active, link, match.group())
+            elif page_match:
+                # 创建页面引用/提及
+                segments.append(
                     {
-                        "object": "block",
-                        "code": {
-                            "language": code_lang if code_lang else "plain text",
-                            "rich_text": [{"text": {"content": code_text}}],
-                        },
+                        "type": "mention",
+                        "mention": {"type": "page", "page": {"id": page_match.group(1)}},
+                        "plain_text": link_text,
+                        "href": url,
                     }
                 )
-                i += 1
-                continue
-
-        # 处理表格行 (| 列 1 | 列 2 | 列 3 |)
-        table_match = re.match(r"^\s*\|(.+)\|\s*$", line)
-        if table_match:
-            # 检测到表格，但 Notion API 当前有一些限制，我们先跳过它
-            # 在未来的版本可以处理表格转换
-            current_list_type = None
-            list_levels = []
-
-            # 提取表格行的内容
-            cells = [cell.strip() for cell in table_match.group(1).split("|")]
-
-            # 把表格行转为普通文本
-            table_line = "| " + " | ".join(cells) + " |"
-            blocks.append(
-                {
-                    "object": "block",
-                    "paragraph": {"rich_text": [{"text": {"content": table_line}}]},
-                }
-            )
-            i += 1
-            continue
-
-        # 处理普通段落
-        if line:
-            # 结束之前的列表
-            current_list_type = None
-            list_levels = []
+            elif _VALID_LINK_PATTERN.fullmatch(url) and len(url) <= MAX_TEXT_LENGTH:
+                _parse_inline(link_text, segments, active, url)
+            else:
+                # Notion 不接受相对路径等无效链接，保留为普通文本
+                _add_segment(segments, active, link, match.group())
 
-            # 分割长段落
-            for chunk in split_text(line, MAX_TEXT_LENGTH):
-                blocks.append(
-                    {
-                        "object": "block",
-                        "paragraph": {"rich_text": parse_markdown_formatting(chunk)},
-                    }
-                )
-        else:
-            # 空行，添加空段落
-            blocks.append({"object": "block", "paragraph": {"rich_text": []}})
+    if last_end < len(text):
+        _add_segment(segments, active, link, text[last_end:])
 
-        i += 1
 
-    return blocks
+def _append_text(result, content, annotations=(), link=None):
+    """追加文本，超过长度限制时拆分为多个富文本对象"""
+    if len(content) <= MAX_TEXT_LENGTH:
+        result.append(_text_object(content, annotations, link))
+        return
+    for i in range(0, len(content), MAX_TEXT_LENGTH):
+        result.append(_text_object(content[i : i + MAX_TEXT_LENGTH], annotations, link))
 
 
 def parse_markdown_formatting(text):
@@ -259,126 +212,293 @@ def parse_markdown_formatting(text):
     - [内容](https://notion.so/PAGE_ID) 作为 Notion 页面链接
     - (URL) - 括号包裹的 URL
 
+    强调标记可以嵌套（例如 **加粗 *斜体* 加粗**），没有配对的标记按原样保留。
+    每个富文本对象不超过 2000 字符。
+
     参数：
     text (str): 包含 Markdown 格式的文本
 
     返回：
     list: Notion rich_text 对象列表
     """
-
-    # 如果文本为空，返回空列表
     if not text:
         return []
 
-    # 创建一个结果列表
+    segments = []
+    _parse_inline(text, segments)
+
     result = []
+    for segment in segments:
+        if isinstance(segment, dict):
+            result.append(segment)
+        else:
+            annotations, link, parts = segment
+            _append_text(result, "".join(parts), annotations, link)
+    return result
 
-    # 使用一个更精确的方法来处理格式化文本
-    # 1. 首先识别所有特殊格式的位置 and 类型
-    formats = []
-
-    # 定义正则表达式模式
-    patterns = [
-        # Notion 页面链接 [text](https://notion.so/pageid)
-        (r"\[(.+?)\]\(https://notion\.so/([a-zA-Z0-9]+)\)", "notion_page"),
-        # 普通链接 [text](url)
-        (r"\[(.+?)\]\((?!https://notion\.so/)(.+?)\)", "link"),
-        # 括号包裹的 URL (http://example.com)
-        (r"\((https?://[^\s\)]+)\)", "bracket_link"),
-        # 加粗 **text**
-        (r"\*\*(.+?)\*\*", "bold"),
-        # 斜体 *text*
-        (r"\*(.+?)\*", "italic"),
-        # 删除线 ~~text~~
-        (r"~~(.+?)~~", "strikethrough"),
-        # 代码 `text`
-        (r"`(.+?)`", "code"),
+
+def _rich_text_groups(rich_text):
+    """把富文本对象按每块 100 个分组；空列表返回一个空组"""
+    if not rich_text:
+        return [[]]
+    return [
+        rich_text[i : i + MAX_RICH_TEXT_ELEMENTS]
+        for i in range(0, len(rich_text), MAX_RICH_TEXT_ELEMENTS)
     ]
 
-    # 查找所有格式标记的位置
-    for pattern, format_type in patterns:
-        for match in re.finditer(pattern, text):
-            start, end = match.span()
-
-            # 处理不同类型的格式
-            if format_type == "notion_page":
-                content = match.group(1)  # 链接文本
-                page_id = match.group(2)  # 页面 ID
-                formats.append((start, end, format_type, content, page_id))
-            elif format_type == "link":
-                content = match.group(1)  # 链接文本
-                url = match.group(2)  # URL
-                formats.append((start, end, format_type, content, url))
-            elif format_type == "bracket_link":
-                url = match.group(1)  # URL (不含括号)
-                # 对于括号包裹的链接，使用 URL 本身作为显示文本
-                formats.append((start, end, "link", url, url))
-            else:
-                content = match.group(1)  # 格式内的实际文本
-                formats.append((start, end, format_type, content, None))
 
-    # 2. 按照起始位置排序格式标记
-    formats.sort(key=lambda x: x[0])
+def _make_block(block_type, rich_text, **extra):
+    """创建一个块"""
+    return {
+        "object": "block",
+        "type": block_type,
+        block_type: {"rich_text": rich_text, **extra},
+    }
 
-    # 3. 处理文本，避免重复
-    if not formats:
-        # 没有格式，直接返回纯文本
-        return [{"text": {"content": text}}]
 
-    # 处理有格式的文本
-    last_end = 0
-    processed = []  # 用来跟踪已处理的文本范围
+def _text_blocks(block_type, text):
+    """
+    创建文本类块，富文本对象超过 100 个时拆分，后续部分使用段落块
 
-    for start, end, format_type, content, link_data in formats:
-        # 检查这个区域是否已被处理
-        if any(s <= start < e or s < end <= e for s, e in processed):
-            continue
+    返回：
+        list: 块列表
+    """
+    groups = _rich_text_groups(parse_markdown_formatting(text))
+    blocks = [_make_block(block_type, groups[0])]
+    blocks.extend(_make_block("paragraph", group) for group in groups[1:])
+    return blocks
 
-        # 添加格式标记前的普通文本
-        if start > last_end:
-            plain_text = text[last_end:start]
-            if plain_text:
-                result.append({"text": {"content": plain_text}})
-
-        # 添加格式化文本
-        if format_type == "notion_page":
-            # 创建页面引用/提及
-            result.append(
-                {
-                    "mention": {"type": "page", "page": {"id": link_data}},
-                    "plain_text": content,
-                    "href": f"https://notion.so/{link_data}",
-                }
+
+def normalize_code_language(language):
+    """把代码块语言转换为 Notion 支持的名称"""
+    language = (language or "").strip().lower()
+    language = CODE_LANGUAGE_ALIASES.get(language, language)
+    return language if language in NOTION_CODE_LANGUAGES else "plain text"
+
+
+def _code_blocks(code_text, language):
+    """创建代码块，内容按 2000 字符拆分为多个富文本对象"""
+    rich_text = []
+    _append_text(rich_text, code_text)
+    language = normalize_code_language(language)
+    return [
+        _make_block("code", group, language=language)
+        for group in _rich_text_groups(rich_text)
+    ]
+
+
+def _split_table_row(cells_text):
+    """拆分表格行的单元格，支持 \\| 转义"""
+    cells = re.split(r"(?<!\\)\|", cells_text)
+    return [cell.strip().replace("\\|", "|") for cell in cells]
+
+
+def _table_blocks(rows, has_header):
+    """
+    创建表格块，超过 100 行时拆分为多个表格，后续表格重复表头
+
+    参数：
+        rows: 单元格文本列表的列表
+        has_header: 第一行是否为表头
+    """
+    width = max(len(row) for row in rows)
+    header = rows[0] if has_header else None
+    body = rows[1:] if has_header else rows
+    per_table = MAX_CHILDREN - 1 if has_header else MAX_CHILDREN
+
+    blocks = []
+    for i in range(0, max(len(body), 1), per_table):
+        table_rows = ([header] if header else []) + body[i : i + per_table]
+        children = []
+        for row in table_rows:
+            cells = []
+            for cell in row + [""] * (width - len(row)):
+                cells.append(parse_markdown_formatting(cell)[:MAX_RICH_TEXT_ELEMENTS])
+            children.append(
+                {"object": "block", "type": "table_row", "table_row": {"cells": cells}}
             )
-        else:
-            # 标准文本格式
-            rich_text = {"text": {"content": content}}
-
-            if format_type == "link" and url:
-                rich_text["text"]["link"] = {"url": url}
-
-            # 设置文本的格式注释
-            annotations = {
-                "bold": False,
-                "italic": False,
-                "strikethrough": False,
-                "code": False,
+        blocks.append(
+            {
+                "object": "block",
+                "type": "table",
+                "table": {
+                    "table_width": width,
+                    "has_column_header": has_header,
+                    "has_row_header": False,
+                    "children": children,
+                },
             }
-            if format_type in annotations:
-                annotations[format_type] = True
-            rich_text["annotations"] = annotations
+        )
+    return blocks
 
-            result.append(rich_text)
 
-        # 更新已处理的范围
-        processed.append((start, end))
-        last_end = end
+class _ListBuilder:
+    """根据缩进把列表项挂到正确的父项下"""
+
+    def __init__(self, blocks):
+        self.blocks = blocks
+        self.stack = []  # (缩进, 块, 嵌套层数)
+
+    def reset(self):
+        self.stack = []
+
+    def add(self, block_type, indent_text, text):
+        indent = len(indent_text.expandtabs(4))
+
+        # 弹出缩进不小于当前项的列表项，剩下的栈顶就是父项
+        while self.stack and self.stack[-1][0] >= indent:
+            self.stack.pop()
+
+        parent = None
+        depth = 0
+        # Notion 一次请求最多嵌套两层，超过时挂到允许的最深一层；子块已满时作为父项的兄弟项
+        while self.stack:
+            parent_indent, parent_block, parent_depth = self.stack[-1]
+            children = parent_block[parent_block["type"]].get("children", [])
+            if (
+                indent - parent_indent >= LIST_INDENT_WIDTH
+                and parent_depth < MAX_NESTING_DEPTH
+                and len(children) < MAX_CHILDREN
+            ):
+                parent = parent_block
+                depth = parent_depth + 1
+                break
+            self.stack.pop()
+
+        new_blocks = _text_blocks(block_type, text)
+        if parent is None:
+            self.blocks.extend(new_blocks)
+        else:
+            parent[parent["type"]].setdefault("children", []).extend(
+                new_blocks[: MAX_CHILDREN - len(parent[parent["type"]].get("children", []))]
+            )
 
-    # 添加最后一段普通文本
-    if last_end < len(text):
-        result.append({"text": {"content": text[last_end:]}})
+        self.stack.append((indent, new_blocks[0], depth))
 
-    return result
+
+def convert_to_notion_blocks(content):
+    """
+    将文本内容转换为 Notion 块格式，支持 Markdown 语法
+
+    参数：
+    content (str): 要转换的文本内容
+
+    返回：
+    list: Notion 块对象列表，已满足 Notion API 的长度和数量限制
+    """
+    # 如果内容为空，返回简单段落
+    if not content or len(content.strip()) == 0:
+        return [_make_block("paragraph", [])]
+
+    lines = content.split("\n")
+    blocks = []
+    lists = _ListBuilder(blocks)
+
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        match = _LINE_PATTERN.match(line)
+        # 外层分组最后结束，lastgroup 就是行的类型
+        kind = match.lastgroup if match else None
+
+        if kind == "bullet":
+            lists.add("bulleted_list_item", match.group("bullet_indent"), match.group("bullet_text"))
+            i += 1
+            continue
+        if kind == "number":
+            lists.add("numbered_list_item", match.group("number_indent"), match.group("number_text"))
+            i += 1
+            continue
+
+        # 其他行结束当前列表
+        lists.reset()
+
+        if kind == "fence":
+            # 代码块 (```language 代码 ```)，没有结束标记时包含剩余全部内容
+            language = match.group("lang")
+            code_lines = []
+            i += 1
+            while i < len(lines) and not lines[i].strip().startswith("```"):
+                code_lines.append(lines[i])
+                i += 1
+            blocks.extend(_code_blocks("\n".join(code_lines), language))
+            i += 1
+            continue
+
+        if kind == "table":
+            rows = []
+            has_header = False
+            while i < len(lines):
+                table_match = _LINE_PATTERN.match(lines[i])
+                if not table_match or table_match.group("table") is None:
+                    break
+                if _TABLE_SEPARATOR_PATTERN.match(lines[i]):
+                    # 紧跟在第一行之后的分隔行表示第一行是表头
+                    has_header = has_header or len(rows) == 1
+                else:
+                    rows.append(_split_table_row(table_match.group("cells")))
+                i += 1
+            if rows:
+                blocks.extend(_table_blocks(rows, has_header))
+            continue
+
+        if kind == "heading":
+            # 只有三级标题，更深的标题按三级处理
+            level = min(len(match.group("hashes")), 3)
+            blocks.extend(_text_blocks(f"heading_{level}", match.group("heading_text")))
+        elif kind == "divider":
+            blocks.append({"object": "block", "type": "divider", "divider": {}})
+        elif kind == "quote":
+            blocks.extend(_text_blocks("quote", match.group("quote_text")))
+        elif line.strip():
+            blocks.extend(_text_blocks("paragraph", line.strip()))
+        else:
+            # 空行，添加空段落
+            blocks.append(_make_block("paragraph", []))
+
+        i += 1
+
+    return blocks
+
+
+def iter_notion_blocks(fragments):
+    """
+    逐个转换 Markdown 片段，按顺序生成 Notion 块
+
+    片段之间不生成空段落；每个片段应当是完整的 Markdown 结构（段落、整个列表、整个表格），
+    这样按片段转换的结果与整篇转换一致，同一时间只有一个片段的块在内存中
+
+    参数：
+    fragments (iterable): Markdown 片段，例如遍历 url_service.UrlContentStream 得到的片段
+
+    返回：
+    generator: Notion 块对象
+    """
+    for fragment in fragments:
+        fragment = fragment.strip() if fragment else ""
+        if fragment:
+            yield from convert_to_notion_blocks(fragment)
+
+
+def iter_block_batches(blocks, batch_size=MAX_CHILDREN):
+    """
+    把块按上传批次分组，每批不超过 batch_size 个顶层块
+
+    参数：
+    blocks (iterable): Notion 块对象
+    batch_size (int): 每批最大块数，默认 100 (Notion API 限制)
+
+    返回：
+    generator: 块列表
+    """
+    batch = []
+    for block in blocks:
+        batch.append(block)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 
 def split_text(text, max_length):
@@ -521,9 +641,9 @@ def limit_blocks(blocks, max_blocks=100):
         # 处理不同类型的块
         if block_type == "block":
             # 获取块类型（paragraph, heading_x, code 等）
-            content_type = list(block.keys())[0] if block else None
-            if not content_type or content_type == "object":
-                content_type = list(block.keys())[1] if len(block.keys()) > 1 else None
+            content_type = block.get("type") or next(
+                (key for key in block if key not in ("object", "type")), None
+            )
 
             if content_type:
                 # 处理代码块（特别需要注意，因为它们通常包含较长文本）
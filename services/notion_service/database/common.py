@@ -1,227 +1,44 @@
 import logging
-import time
+import threading
 from datetime import datetime, timedelta
 
 import pytz
 
-from config import NOTION_DATABASE_ID
+from config import NOTION_DATABASE_ID, NOTION_MIRROR_ENABLED, SEARCH_CONTENT_LENGTH
 from services.gemini_service import analyze_content
 from utils.helpers import truncate_text
 
-from ..client import get_notion_client
+from ..block_sync import sync_page_children
 from ..content_converter import convert_to_notion_blocks
+from ..dedup_index import record_saved_content
+from ..entry_index import KIND_NOTE, record_entry, update_entry
+from ..mirror import get_notion_mirror
+from ..outbox import (
+    NotionPageIncomplete,
+    NotionWriteDeferred,
+    get_notion_outbox,
+    register_replay_callback,
+)
+from ..page_content import get_page_content_service
+from ..query import iter_database_query
+from ..schema import update_page_properties
+from ..search_index import record_document, update_document
 
 logger = logging.getLogger(__name__)
-notion = get_notion_client()
 
+# 周报（generate_weekly_content、generate_weekly_summary）用到的页面属性
+WEEKLY_ENTRY_PROPERTIES = ("Name", "Summary", "Tags", "Created", "URL")
 
-def _split_text_into_chunks(text, max_length):
-    """
-    将文本分割成不超过最大长度的块
+WEEKLY_REPORT_TAG = "周报"
 
-    参数：
-    text (str): 要分割的文本
-    max_length (int): 每个块的最大长度
+# ISO 周 (年, 周数) -> 周报页面 ID，刚创建的页面可能还查询不到
+_weekly_report_pages = {}
+_weekly_report_lock = threading.Lock()
 
-    返回：
-    list: 文本块列表
-    """
-    if not text:
-        return []
-
-    if len(text) <= max_length:
-        return [text]
-
-    chunks = []
-    start = 0
-
-    while start < len(text):
-        # 确定当前块的结束位置
-        end = start + max_length
-
-        # 如果没有到达文本末尾，尝试找一个合适的断点
-        if end < len(text):
-            # 尝试在段落、句子或单词结束处断开
-            # 优先级：段落 > 句子 > 单词 > 字符
-            paragraph_end = text.rfind("\n\n", start, end)
-            sentence_end = text.rfind(". ", start, end)
-            space_end = text.rfind(" ", start, end)
-
-            # 选择最合适的断点
-            if paragraph_end > start + max_length // 2:  # 至少有一半内容
-                end = paragraph_end + 2  # 包含段落结束符
-            elif sentence_end > start + max_length // 3:  # 至少有 1/3 内容
-                end = sentence_end + 2  # 包含句号和空格
-            elif space_end > start + max_length // 4:  # 至少有 1/4 内容
-                end = space_end + 1  # 包含空格
-            else:
-                # 如果找不到好的断点，就严格按照最大长度截断
-                end = start + max_length
-
-        # 添加当前块
-        chunks.append(text[start:end])
-        start = end
-
-    return chunks
-
-
-def process_blocks_content(blocks, max_length=2000):
-    """
-    处理块列表，确保每个块中的富文本内容不超过最大长度限制
 
-    参数：
-    blocks (list): Notion 块列表
-    max_length (int): 富文本内容的最大长度
-
-    返回：
-    list: 处理后的块列表
-    """
-    processed_blocks = []
-
-    for block in blocks:
-        block_type = block.get("type")
-        if not block_type:
-            processed_blocks.append(block)
-            continue
-
-        # 处理代码块
-        if block_type == "code" and "code" in block and "rich_text" in block["code"]:
-            if block["code"]["rich_text"] and "text" in block["code"]["rich_text"][0]:
-                content = block["code"]["rich_text"][0]["text"]["content"]
-
-                if len(content) > max_length:
-                    # 分割内容
-                    chunks = _split_text_into_chunks(content, max_length)
-                    language = block["code"]["language"]
-
-                    # 创建多个代码块
-                    for i, chunk in enumerate(chunks):
-                        code_block = {
-                            "object": "block",
-                            "type": "code",
-                            "code": {
-                                "rich_text": [
-                                    {"type": "text", "text": {"content": chunk}}
-                                ],
-                                "language": language,
-                            },
-                        }
-                        # 如果是多块中的一个，添加注释
-                        if len(chunks) > 1:
-                            prefix = (
-                                f"# 第 {i + 1}/{len(chunks)} 部分\n" if i > 0 else ""
-                            )
-                            code_block["code"]["rich_text"][0]["text"]["content"] = (
-                                prefix + chunk
-                            )
-
-                        processed_blocks.append(code_block)
-                else:
-                    processed_blocks.append(block)
-            else:
-                # 如果没有文本内容，直接添加块
-                processed_blocks.append(block)
-
-        # 处理其他包含 rich_text 的块类型
-        elif block_type in [
-            "paragraph",
-            "heading_1",
-            "heading_2",
-            "heading_3",
-            "bulleted_list_item",
-            "numbered_list_item",
-            "quote",
-            "callout",
-        ]:
-            if block_type in block and "rich_text" in block[block_type]:
-                if (
-                    block[block_type]["rich_text"]
-                    and "text" in block[block_type]["rich_text"][0]
-                ):
-                    content = block[block_type]["rich_text"][0]["text"]["content"]
-
-                    if len(content) > max_length:
-                        # 分割内容
-                        chunks = _split_text_into_chunks(content, max_length)
-
-                        # 添加第一个块（保持原块类型）
-                        first_block = block.copy()  # 创建原块的副本
-                        first_block[block_type]["rich_text"][0]["text"]["content"] = (
-                            chunks[0]
-                        )
-                        processed_blocks.append(first_block)
-
-                        # 其余内容作为段落添加
-                        for chunk in chunks[1:]:
-                            para_block = {
-                                "object": "block",
-                                "type": "paragraph",
-                                "paragraph": {
-                                    "rich_text": [
-                                        {"type": "text", "text": {"content": chunk}}
-                                    ]
-                                },
-                            }
-                            processed_blocks.append(para_block)
-                    else:
-                        processed_blocks.append(block)
-                else:
-                    # 处理没有文本内容的富文本块
-                    processed_blocks.append(block)
-            else:
-                processed_blocks.append(block)
-        # 处理可能嵌套的块
-        elif block_type == "toggle" and "toggle" in block:
-            # 处理 toggle 块的标题文本
-            if (
-                "rich_text" in block["toggle"]
-                and block["toggle"]["rich_text"]
-                and "text" in block["toggle"]["rich_text"][0]
-            ):
-                content = block["toggle"]["rich_text"][0]["text"]["content"]
-                if len(content) > max_length:
-                    chunks = _split_text_into_chunks(content, max_length)
-                    block["toggle"]["rich_text"][0]["text"]["content"] = chunks[0]
-
-                    # 额外的内容会在子块中处理
-
-            # 递归处理子块
-            if "children" in block["toggle"]:
-                block["toggle"]["children"] = process_blocks_content(
-                    block["toggle"]["children"], max_length
-                )
-
-            processed_blocks.append(block)
-        # 处理表格行和单元格
-        elif block_type == "table" and "table" in block:
-            # 表格本身不包含文本内容，但需要处理其行
-            if "children" in block:
-                block["children"] = process_blocks_content(
-                    block["children"], max_length
-                )
-            processed_blocks.append(block)
-        elif block_type == "table_row" and "table_row" in block:
-            # 处理表格行中的单元格
-            for cell in block["table_row"]["cells"]:
-                for rt in cell:
-                    if "text" in rt and "content" in rt["text"]:
-                        content = rt["text"]["content"]
-                        if len(content) > max_length:
-                            rt["text"]["content"] = content[:max_length]
-            processed_blocks.append(block)
-        # 处理列表块
-        elif block_type in ["bulleted_list", "numbered_list"] and "children" in block:
-            # 递归处理子块
-            block["children"] = process_blocks_content(block["children"], max_length)
-            processed_blocks.append(block)
-        else:
-            # 其他块类型直接添加
-            processed_blocks.append(block)
-
-    return processed_blocks
-
-
-def add_to_notion(content, summary, tags, url="", created_at=None):
+def add_to_notion(
+    content, summary, tags, url="", created_at=None, title=None, replay_meta=None
+):
     """
     将内容添加到 Notion 数据库
 
@@ -231,139 +48,210 @@ def add_to_notion(content, summary, tags, url="", created_at=None):
     tags (list): AI 生成的标签列表
     url (str): 可选的 URL
     created_at (datetime): 创建时间
+    title (str): 可选的页面标题，为空时由 determine_title 确定
+    replay_meta (dict): Notion 不可用、页面延迟创建时传给重放回调的附加数据
 
     返回：
     str: 创建的页面 ID
+
+    异常：
+    NotionWriteDeferred: Notion 暂时不可用，页面已保存到 outbox，恢复后自动创建
     """
     if not created_at:
-        created_at = datetime.now()
-        # 修复时区问题
-        created_at = created_at.astimezone(pytz.timezone("Asia/Shanghai"))
+        created_at = default_created_at()
 
     # 确定页面标题
-    title = determine_title(content, url, summary)
-
-    # 准备标签格式
-    tag_objects = []
-    for tag in tags:
-        tag_objects.append({"name": tag})
+    if not title:
+        title = determine_title(content, url, summary)
 
-    # 将内容转换为 Notion 块格式
+    # 将内容转换为 Notion 块格式（转换时已满足长度限制）
     content_blocks = convert_to_notion_blocks(content)
 
-    # 处理可能超过长度限制的块
-    content_blocks = process_blocks_content(content_blocks)
-
     # 截断摘要，确保不超过 2000 个字符
     truncated_summary = summary[:2000] if summary else ""
 
-    # 创建 Notion 页面
+    # 创建 Notion 页面，前 100 个块随页面一起创建，其余分批追加
+    result = _create_note_page(
+        content_blocks, title, truncated_summary, tags, url, created_at, replay_meta, content
+    )
+    page_id = result.page_id
+    logger.info(
+        f"成功创建 Notion 页面：{page_id}，包含 {len(content_blocks)} 个块，"
+        f"共 {result.requests} 次请求"
+    )
+
+    # 记录到本地搜索索引，供内联搜索和 /search 使用
+    record_entry(page_id, KIND_NOTE, title, truncated_summary, tags, url, created_at)
+    record_document(page_id, KIND_NOTE, title, truncated_summary, tags, content, url, created_at)
+    record_saved_content(page_id, url, content)
+    return page_id
+
+
+def _create_note_page(
+    blocks, title, summary, tags, url, created_at, replay_meta=None, content=""
+):
+    """通过 outbox 创建笔记页面，延迟创建时由重放回调记录搜索索引"""
+    meta = {
+        "title": title,
+        "summary": summary,
+        "tags": list(tags),
+        "url": url,
+        "created_at": created_at.isoformat(),
+        "content": (content or "")[:SEARCH_CONTENT_LENGTH],
+    }
+    meta.update(replay_meta or {})
+
     try:
-        # 块的数量
-        blocks_count = len(content_blocks)
+        return get_notion_outbox().create_page(
+            parent={"database_id": NOTION_DATABASE_ID},
+            properties=build_page_properties(title, summary, tags, url, created_at),
+            blocks=blocks,
+            kind=KIND_NOTE,
+            meta=meta,
+        )
+    except NotionWriteDeferred as e:
+        logger.warning(str(e))
+        raise
+    except Exception as e:
+        logger.error(f"创建 Notion 页面时出错：{e}")
+        raise
 
-        # 如果块数量超过 API 限制 (100)，我们需要分批添加
-        if blocks_count > 100:
-            logger.info(f"内容包含 {blocks_count} 个块，超过 API 限制，将分批添加")
 
-            # 先创建没有子块的页面
-            new_page = notion.pages.create(
-                parent={"database_id": NOTION_DATABASE_ID},
-                properties={
-                    "Name": {"title": [{"text": {"content": title}}]},
-                    "Summary": {
-                        "rich_text": [{"text": {"content": truncated_summary}}]
-                    },
-                    "Tags": {"multi_select": tag_objects},
-                    "URL": {"url": url if url else None},
-                    "Created": {"date": {"start": created_at.isoformat()}},
-                },
-            )
+def _record_replayed_note(page_id, meta):
+    """延迟创建的笔记页面写入后，记录到本地搜索索引"""
+    record_entry(
+        page_id,
+        KIND_NOTE,
+        meta.get("title", ""),
+        meta.get("summary", ""),
+        meta.get("tags", []),
+        meta.get("url", ""),
+        meta.get("created_at"),
+    )
+    # 边转换边上传的页面没有完整正文，使用两阶段保存记录的内容开头
+    record_document(
+        page_id,
+        KIND_NOTE,
+        meta.get("title", ""),
+        meta.get("summary", ""),
+        meta.get("tags", []),
+        meta.get("content") or meta.get("enrich_content", ""),
+        meta.get("url", ""),
+        meta.get("created_at"),
+    )
+    record_saved_content(
+        page_id, meta.get("url"), meta.get("content") or meta.get("enrich_content")
+    )
 
-            # 获取新创建页面的 ID
-            page_id = new_page["id"]
 
-            # 然后分批添加子块
-            append_blocks_in_batches(page_id, content_blocks)
+register_replay_callback(KIND_NOTE, _record_replayed_note)
 
-            logger.info(
-                f"成功创建 Notion 页面并分批添加 {blocks_count} 个块：{page_id}"
-            )
-            return page_id
-        else:
-            # 如果块数量不超过限制，直接创建带有子块的页面
-            new_page = notion.pages.create(
-                parent={"database_id": NOTION_DATABASE_ID},
-                properties={
-                    "Name": {"title": [{"text": {"content": title}}]},
-                    "Summary": {
-                        "rich_text": [{"text": {"content": truncated_summary}}]
-                    },
-                    "Tags": {"multi_select": tag_objects},
-                    "URL": {"url": url if url else None},
-                    "Created": {"date": {"start": created_at.isoformat()}},
-                },
-                children=content_blocks,
-            )
 
-            logger.info(
-                f"成功创建 Notion 页面：{new_page['id']}，包含 {len(content_blocks)} 个块"
-            )
-            return new_page["id"]
+def default_created_at():
+    """当前时间（上海时区），用作页面的创建时间"""
+    # 修复时区问题
+    return datetime.now().astimezone(pytz.timezone("Asia/Shanghai"))
 
-    except Exception as e:
-        logger.error(f"创建 Notion 页面时出错：{e}")
-        raise
 
+def build_page_properties(title, summary, tags, url, created_at):
+    """构建笔记数据库页面的属性"""
+    return {
+        "Name": {"title": [{"text": {"content": title}}]},
+        "Summary": {"rich_text": [{"text": {"content": summary}}]},
+        "Tags": {"multi_select": [{"name": tag} for tag in tags]},
+        "URL": {"url": url if url else None},
+        "Created": {"date": {"start": created_at.isoformat()}},
+    }
 
-def append_blocks_in_batches(page_id, blocks, batch_size=100):
+
+def add_stream_to_notion(
+    blocks, title, summary="", tags=None, url="", created_at=None, replay_meta=None
+):
     """
-    分批将块添加到 Notion 页面
+    边转换边上传：用第一批块创建页面，之后每凑满一批就追加到页面
+
+    blocks 通常是生成器（例如 iter_notion_blocks(UrlContentStream(url))），
+    页面在转换完成前就已创建，内存中最多只有一批块
 
     参数：
-    page_id (str): Notion 页面 ID
-    blocks (list): 要添加的块列表
-    batch_size (int): 每批最大块数，默认 100 (Notion API 限制)
+    blocks (iterable): Notion 块对象
+    title (str): 页面标题
+    summary (str): 摘要，可以之后用 update_page_analysis 补充
+    tags (list): 标签列表
+    url (str): 可选的 URL
+    created_at (datetime): 创建时间
+    replay_meta (dict): 页面延迟创建时传给重放回调的附加数据
 
     返回：
-    bool: 是否成功添加所有块
+    UploadResult: 上传结果，page_id 为创建的页面 ID，未能写入的块数在
+        queued_blocks（稍后重放）和 dead_blocks（Notion 拒绝）中
+
+    异常：
+    NotionWriteDeferred: Notion 暂时不可用，剩余内容已逐批保存到 outbox
+    NotionPageIncomplete: 页面已创建，但读取或转换内容时出错，页面只有出错前的内容
     """
-    total_blocks = len(blocks)
-    batches_count = (total_blocks + batch_size - 1) // batch_size  # 向上取整
+    if not created_at:
+        created_at = default_created_at()
+    tags = tags or []
+    truncated_summary = summary[:2000] if summary else ""
 
-    logger.info(f"开始分批添加 {total_blocks} 个块，分为 {batches_count} 批")
+    # 上传的同时提取块中的文本，供全文索引使用
+    collected = []
+
+    def collect(blocks):
+        size = 0
+        for block in blocks:
+            if size < SEARCH_CONTENT_LENGTH:
+                text = extract_notion_block_content([block])
+                if text:
+                    collected.append(text)
+                    size += len(text) + 1
+            yield block
+
+    def record(page_id):
+        record_entry(page_id, KIND_NOTE, title, truncated_summary, tags, url, created_at)
+        collected_text = "\n".join(collected)
+        record_document(
+            page_id, KIND_NOTE, title, truncated_summary, tags, collected_text, url, created_at
+        )
+        record_saved_content(page_id, url, collected_text)
 
-    for i in range(0, total_blocks, batch_size):
-        batch = blocks[i : i + batch_size]
-        batch_num = i // batch_size + 1
+    try:
+        result = _create_note_page(
+            collect(blocks), title[:2000], truncated_summary, tags, url, created_at, replay_meta
+        )
+    except NotionPageIncomplete as e:
+        # 页面已经存在，已写入的部分照常加入索引
+        record(e.page_id)
+        raise
+    record(result.page_id)
+    logger.info(
+        f"成功创建 Notion 页面：{result.page_id}，写入 {result.sent_blocks} 个块，"
+        f"共 {result.requests} 次请求"
+    )
+    return result
 
-        try:
-            # 添加一批块
-            notion.blocks.children.append(block_id=page_id, children=batch)
 
-            logger.info(
-                f"成功添加第 {batch_num}/{batches_count} 批，包含 {len(batch)} 个块"
-            )
+def append_blocks_in_batches(page_id, blocks):
+    """
+    分批将块添加到 Notion 页面
 
-            # 添加短暂延迟避免请求过于频繁
-            if batch_num < batches_count:
-                time.sleep(0.5)
+    写入前先记录到 outbox；临时错误会重试，仍无法写入的块留在 outbox 中稍后重放，不会被跳过
 
-        except Exception as e:
-            logger.error(f"添加第 {batch_num}/{batches_count} 批块时出错：{e}")
+    参数：
+    page_id (str): Notion 页面 ID
+    blocks (iterable): 要添加的块
 
-            # 尝试细分批次重试
-            if len(batch) > 10:
-                logger.info("尝试将批次细分后重试...")
-                smaller_batch_size = len(batch) // 2
-                success = append_blocks_in_batches(page_id, batch, smaller_batch_size)
-                if not success:
-                    return False
-            else:
-                # 如果批次已经很小仍然失败，则跳过该批次
-                logger.warning(f"跳过添加失败的 {len(batch)} 个块")
+    返回：
+    bool: 是否已写入所有块（False 表示剩余的块已保存在 outbox 中，稍后重放）
 
-    return True
+    异常：
+    Notion 拒绝写入时抛出对应的错误，这些块不会重放
+    """
+    result = get_notion_outbox().append_blocks(page_id, blocks)
+    if result.dead_blocks:
+        raise result.error
+    return result.complete
 
 
 # TODO: 重构 determine_title
@@ -385,10 +273,86 @@ def determine_title(content, url, summary):
     return analyze_content(content)["title"]
 
 
+def append_comment_to_page(page_id, text, created_at=None):
+    """
+    把重复发送时附带的新内容作为引用块追加到已有页面末尾
+
+    参数：
+    page_id (str): Notion 页面 ID
+    text (str): 新消息的内容
+    created_at (datetime): 消息时间
+
+    返回：
+    bool: 是否已写入（False 表示已保存在 outbox 中，稍后重放）
+    """
+    if not created_at:
+        created_at = default_created_at()
+    content = f"💬 {created_at:%Y-%m-%d %H:%M} 再次发送：\n{text.strip()}"
+    rich_text = [
+        {"type": "text", "text": {"content": content[start : start + 2000]}}
+        for start in range(0, len(content), 2000)
+    ][:100]
+    block = {"object": "block", "type": "quote", "quote": {"rich_text": rich_text}}
+    return append_blocks_in_batches(page_id, [block])
+
+
+def get_page_url(page_id):
+    """根据页面 ID 生成 Notion 页面链接"""
+    return f"https://notion.so/{page_id.replace('-', '')}"
+
+
+def make_provisional_title(content, max_length=50):
+    """
+    不调用 AI，使用内容的第一行生成临时标题
+
+    参数：
+    content (str): 消息内容
+    max_length (int): 标题最大长度
+
+    返回：
+    str: 临时标题
+    """
+    first_line = content.strip().split("\n", 1)[0].strip()
+    if len(first_line) > max_length:
+        return first_line[: max_length - 3] + "..."
+    return first_line or "未命名笔记"
+
+
+def update_page_analysis(page_id, title=None, summary=None, tags=None):
+    """
+    用 AI 分析结果更新已创建页面的标题、摘要和标签
+
+    只更新传入的字段，重复调用的结果相同，可以安全重试
+
+    参数：
+    page_id (str): Notion 页面 ID
+    title (str): 页面标题
+    summary (str): 摘要
+    tags (list): 标签列表
+    """
+    properties = {}
+    if title:
+        properties["Name"] = {"title": [{"text": {"content": title[:2000]}}]}
+    if summary is not None:
+        properties["Summary"] = {"rich_text": [{"text": {"content": summary[:2000]}}]}
+    if tags is not None:
+        properties["Tags"] = {"multi_select": [{"name": tag} for tag in tags]}
+
+    if not properties:
+        return
+
+    properties = update_page_properties(NOTION_DATABASE_ID, page_id, properties)
+    logger.info(f"已更新页面 {page_id} 的分析结果：{', '.join(properties)}")
+    update_entry(page_id, title=title, summary=summary, tags=tags)
+    update_document(page_id, title=title, summary=summary, tags=tags)
+
+
 def get_weekly_entries(days=7):
     """
     获取过去几天内添加的所有条目
 
+    启用本地镜像时只向 Notion 请求变化的页面，然后查询本地数据
+
     参数：
     days (int): 要检索的天数
 
@@ -401,10 +365,16 @@ def get_weekly_entries(days=7):
     end_date = datetime.now()
     start_date = end_date - timedelta(days=days)
 
-    # 查询 Notion 数据库
+    # 本地镜像可用时先同步最新变化，再直接查询本地数据
+    if NOTION_MIRROR_ENABLED:
+        mirror = get_notion_mirror()
+        if mirror.refresh(NOTION_DATABASE_ID):
+            return mirror.get_pages_created_since(NOTION_DATABASE_ID, start_date)
+
+    # 查询 Notion 数据库，自动翻页，只返回周报用到的属性
     try:
-        response = notion.databases.query(
-            database_id=NOTION_DATABASE_ID,
+        pages = iter_database_query(
+            NOTION_DATABASE_ID,
             filter={
                 "and": [
                     {
@@ -414,25 +384,80 @@ def get_weekly_entries(days=7):
                 ]
             },
             sorts=[{"property": "Created", "direction": "ascending"}],
+            filter_properties=WEEKLY_ENTRY_PROPERTIES,
         )
 
-        return response["results"]
+        return list(pages)
 
     except Exception as e:
         logger.error(f"查询 Notion 数据库时出错：{e}")
         raise
 
 
+def _week_key(day=None):
+    """日期所在的 ISO 周 (年, 周数)"""
+    return tuple((day or datetime.now().date()).isocalendar()[:2])
+
+
+def find_weekly_report_page(day=None):
+    """
+    查找某一天所在 ISO 周（周一至周日）已创建的周报页面
+
+    参数：
+    day (datetime): 周内的任意一天，默认为今天
+
+    返回：
+    dict/None: 最早创建的周报页面对象，没有时返回 None
+    """
+    day = (day or datetime.now()).date()
+    monday = day - timedelta(days=day.weekday())
+    week_key = _week_key(day)
+
+    page = _weekly_report_pages.get(week_key)
+    if page:
+        return page
+
+    filter = {
+        "and": [
+            {"property": "Tags", "multi_select": {"contains": WEEKLY_REPORT_TAG}},
+            {"property": "Created", "date": {"on_or_after": monday.isoformat()}},
+            {"property": "Created", "date": {"before": (monday + timedelta(days=7)).isoformat()}},
+        ]
+    }
+    for page in iter_database_query(
+        NOTION_DATABASE_ID,
+        filter=filter,
+        sorts=[{"property": "Created", "direction": "ascending"}],
+        page_size=1,
+        prefetch=False,
+    ):
+        title = extract_rich_text(page["properties"].get("Name", {}).get("title"))
+        _remember_weekly_report(week_key, page["id"], title)
+        return page
+    return None
+
+
+def _remember_weekly_report(week_key, page_id, title):
+    """缓存本周的周报页面，只保留 ID 和标题"""
+    _weekly_report_pages[week_key] = {
+        "id": page_id,
+        "properties": {"Name": {"title": [{"plain_text": title}]}},
+    }
+
+
 def create_weekly_report(title, content):
     """
-    创建周报页面
+    创建或更新本周的周报页面
+
+    每个 ISO 周只有一个周报页面：本周已有周报时，只把新内容与页面现有的块做差异比较，
+    发送需要的插入、更新和删除，本周重复生成时只需要少量请求
 
     参数：
     title (str): 周报标题
     content (str): 周报内容，可以包含 [引用文本](ref:页面 ID) 格式的引用
 
     返回：
-    str: 创建的页面 URL
+    str: 周报页面 URL
     """
     try:
         # 将内容中的引用格式 [标题](ref:页面 ID) 转换为 Notion 内链格式
@@ -442,55 +467,56 @@ def create_weekly_report(title, content):
         # 将内容转换为 Notion block 格式，支持内链
         blocks = convert_to_notion_blocks(processed_content)
 
-        # 处理可能超过长度限制的块
-        blocks = process_blocks_content(blocks)
-
-        # 创建页面
-        blocks_count = len(blocks)
-
-        # 如果块数量超过 API 限制，分批添加
-        if blocks_count > 100:
-            logger.info(f"周报包含 {blocks_count} 个块，超过 API 限制，将分批添加")
-
-            # 先创建没有子块的页面
-            new_page = notion.pages.create(
-                parent={"database_id": NOTION_DATABASE_ID},
-                properties={
-                    "Name": {"title": [{"text": {"content": title}}]},
-                    "Tags": {"multi_select": [{"name": "周报"}]},
-                    "Created": {"date": {"start": datetime.now().isoformat()}},
-                },
-            )
-
-            # 获取新创建页面的 ID
-            page_id = new_page["id"]
-
-            # 然后分批添加子块
-            append_blocks_in_batches(page_id, blocks)
-
-            logger.info(f"成功创建周报页面并分批添加 {blocks_count} 个块：{page_id}")
-        else:
-            new_page = notion.pages.create(
+        # 定时任务和 /weekly 可能同时运行，串行执行避免同一周创建两个页面
+        with _weekly_report_lock:
+            page = find_weekly_report_page()
+            if page:
+                try:
+                    return _update_weekly_report(page, title, blocks)
+                except Exception as e:
+                    if getattr(e, "status", None) != 404:
+                        raise
+                    # 缓存的周报页面已在 Notion 中删除，重新创建
+                    logger.warning(f"本周周报页面 {page['id']} 已不存在，重新创建")
+                    _weekly_report_pages.pop(_week_key(), None)
+
+            # 创建页面，前 100 个块随页面一起创建，其余分批追加
+            result = get_notion_outbox().create_page(
                 parent={"database_id": NOTION_DATABASE_ID},
                 properties={
                     "Name": {"title": [{"text": {"content": title}}]},
-                    "Tags": {"multi_select": [{"name": "周报"}]},
+                    "Tags": {"multi_select": [{"name": WEEKLY_REPORT_TAG}]},
                     "Created": {"date": {"start": datetime.now().isoformat()}},
                 },
-                children=blocks,
+                blocks=blocks,
             )
 
-            page_id = new_page["id"]
+            page_id = result.page_id
+            _remember_weekly_report(_week_key(), page_id, title)
             logger.info(f"成功创建周报页面：{page_id}，包含 {len(blocks)} 个块")
 
         # 返回页面 URL
-        return f"https://notion.so/{page_id.replace('-', '')}"
+        return get_page_url(page_id)
 
     except Exception as e:
         logger.error(f"创建周报页面时出错：{e}")
         raise
 
 
+def _update_weekly_report(page, title, blocks):
+    """按差异更新已有的周报页面，返回页面 URL"""
+    page_id = page["id"]
+    if extract_rich_text(page["properties"].get("Name", {}).get("title")) != title:
+        update_page_properties(
+            NOTION_DATABASE_ID, page_id, {"Name": {"title": [{"text": {"content": title}}]}}
+        )
+        _remember_weekly_report(_week_key(), page_id, title)
+
+    stats = sync_page_children(page_id, blocks)
+    logger.info(f"已更新本周周报页面：{page_id}，共 {stats['requests']} 次请求")
+    return get_page_url(page_id)
+
+
 def process_notion_references(content):
     """
     处理文本中的 Notion 引用标记，转换为 Notion 链接格式
@@ -572,6 +598,16 @@ def generate_weekly_content(entries):
 
         entries_by_date[created_date].append(entry)
 
+    # 只为没有摘要的条目读取页面内容，并发读取，页面没有再编辑时使用缓存
+    page_texts = get_page_content_service().get_texts(
+        [
+            entry
+            for date_entries in entries_by_date.values()
+            for entry in date_entries
+            if not entry["properties"].get("Summary", {}).get("rich_text")
+        ]
+    )
+
     # 按日期排序
     for date in sorted(entries_by_date.keys()):
         content.append(f"## {date}\n")
@@ -608,18 +644,9 @@ def generate_weekly_content(entries):
                 ):
                     summary = summary_objects[0]["text"]["content"]
 
-            # 尝试获取内容块以提取更多详细信息
-            try:
-                page_content = notion.blocks.children.list(block_id=entry["id"])
-                content_text = extract_notion_block_content(
-                    page_content.get("results", [])
-                )
-
-                # 如果提取到内容，使用内容的前一部分作为摘要展示
-                if content_text and not summary:
-                    summary = truncate_text(content_text, 150)  # 限制摘要长度
-            except Exception as e:
-                logger.warning(f"提取页面内容时出错：{e}")
+            # 没有摘要时使用页面内容的前一部分作为摘要展示
+            if not summary and page_texts.get(entry["id"]):
+                summary = truncate_text(page_texts[entry["id"]], 150)  # 限制摘要长度
 
             # 截断摘要
             if len(summary) > 150:
@@ -2,16 +2,40 @@ import logging
 import os
 import re
 import tempfile
-import time
+import threading
 
 import requests
 
-from config import NOTION_PAPERS_DATABASE_ID
+from config import NOTION_PAPERS_DATABASE_ID, SEARCH_CONTENT_LENGTH
 
-from ..client import notion
+from ..client import notion, notion_limiter
+from ..content_converter import convert_to_notion_blocks
+from ..dedup_index import record_saved_content
+from ..entry_index import KIND_PAPER, record_entry
+from ..outbox import NotionWriteDeferred, get_notion_outbox, register_replay_callback
+from ..query import iter_database_query
+from ..schema import get_schema_cache, update_page_properties, validate_page_properties
+from ..search_index import record_document
+from ..uploader import is_transient_error
+from .common import default_created_at
 
 logger = logging.getLogger(__name__)
 
+# 论文分析写入正文的部分及其标题
+ANALYSIS_SECTIONS = (
+    ("brief_summary", "摘要"),
+    ("insight", "主要贡献"),
+    ("details", "详细分析"),
+)
+
+# 更新已存在的论文时保持不变的属性
+PRESERVED_PROPERTIES = frozenset(("Created",))
+
+# 按 DOI/ZoteroID 的写入锁，以及本进程已写入的页面
+_paper_locks = {}
+_known_paper_pages = {}
+_locks_guard = threading.Lock()
+
 # 导入 Gemini 服务
 # try:
 #     from services.gemini_service import analyze_pdf_content
@@ -35,40 +59,27 @@ def get_existing_dois():
 
     try:
         # 检查数据库是否有 DOI 字段
-        db_info = notion.databases.retrieve(database_id=NOTION_PAPERS_DATABASE_ID)
-        if "DOI" not in db_info.get("properties", {}):
+        schema = get_schema_cache().get(NOTION_PAPERS_DATABASE_ID)
+        if schema is None or not schema.has_property("DOI"):
             logger.warning("论文数据库中没有 DOI 字段，无法检查重复")
             return set()
 
-        # 查询所有条目
+        # 查询所有条目，只返回 DOI 属性
         existing_dois = set()
-        start_cursor = None
-        has_more = True
-
-        while has_more:
-            response = notion.databases.query(
-                database_id=NOTION_PAPERS_DATABASE_ID,
-                start_cursor=start_cursor,
-                page_size=100,  # 每页最多获取 100 条
-                filter={"property": "DOI", "rich_text": {"is_not_empty": True}},
-            )
-
-            # 提取 DOI
-            for page in response["results"]:
-                if "DOI" in page["properties"]:
-                    rich_text = page["properties"]["DOI"].get("rich_text", [])
-                    if rich_text and "plain_text" in rich_text[0]:
-                        doi = rich_text[0]["plain_text"].strip().lower()
-                        if doi:
-                            existing_dois.add(doi)
-
-            # 检查是否有更多数据
-            has_more = response.get("has_more", False)
-            start_cursor = response.get("next_cursor")
+        pages = iter_database_query(
+            NOTION_PAPERS_DATABASE_ID,
+            filter={"property": "DOI", "rich_text": {"is_not_empty": True}},
+            filter_properties=["DOI"],
+        )
 
-            if has_more:
-                # 避免请求过于频繁
-                time.sleep(0.5)
+        # 提取 DOI
+        for page in pages:
+            if "DOI" in page["properties"]:
+                rich_text = page["properties"]["DOI"].get("rich_text", [])
+                if rich_text and "plain_text" in rich_text[0]:
+                    doi = rich_text[0]["plain_text"].strip().lower()
+                    if doi:
+                        existing_dois.add(doi)
 
         logger.info(f"从 Notion 中获取到 {len(existing_dois)} 个已同步的 DOI")
         return existing_dois
@@ -81,9 +92,295 @@ def get_existing_dois():
 def add_to_papers_database(
     title, analysis, created_at=None, pdf_url=None, metadata=None, zotero_id=None
 ):
-    """将论文分析添加到论文数据库"""
-    # 原函数内容
-    pass
+    """
+    将论文分析写入论文数据库，已存在的论文（DOI 或 ZoteroID 相同）只更新有变化的属性
+
+    同一篇论文的写入按 DOI/ZoteroID 加锁，多个同步线程同时处理同一篇论文时不会重复创建页面；
+    已存在的页面不会重建，正文保持不变。查询时 Notion 暂时不可用则按新论文写入 outbox，
+    outbox 中已有同一篇论文等待创建的记录时不再创建，直接抛出 NotionWriteDeferred
+
+    参数：
+    title (str): 论文标题
+    analysis (dict): 论文分析结果，包含 brief_summary、details、insight
+    created_at (datetime): 创建时间
+    pdf_url (str): PDF 链接，本地文件路径不会写入
+    metadata (dict): prepare_metadata_for_notion 格式的元数据
+    zotero_id (str): Zotero 条目 ID
+
+    返回：
+    str: 新建或已存在的页面 ID
+
+    异常：
+    NotionWriteDeferred: Notion 暂时不可用，页面已保存到 outbox，恢复后自动创建
+    """
+    if not NOTION_PAPERS_DATABASE_ID:
+        logger.error("未设置论文数据库 ID")
+        raise ValueError("未设置论文数据库 ID")
+
+    analysis = analysis or {}
+    metadata = dict(metadata or {})
+    if zotero_id and not metadata.get("zotero_id"):
+        metadata["zotero_id"] = zotero_id
+    if metadata.get("doi"):
+        metadata["doi"] = metadata["doi"].lower().strip()
+    if not created_at:
+        created_at = default_created_at()
+
+    title = (title or analysis.get("title") or "未命名论文")[:2000]
+    summary = (analysis.get("brief_summary") or "")[:2000]
+    url = pdf_url if pdf_url and re.match(r"https?://", pdf_url) else ""
+    ensure_papers_database_properties()
+    # 按缓存的数据库结构规范化，与页面现有属性比较时两边格式一致
+    properties = validate_page_properties(
+        {"database_id": NOTION_PAPERS_DATABASE_ID},
+        build_paper_properties(title, summary, url, created_at, metadata),
+    )
+
+    keys = _paper_keys(metadata.get("doi"), metadata.get("zotero_id"))
+
+    with _PaperLocks(keys):
+        pending = _find_pending_paper(keys)
+        if pending is not None:
+            # 之前的创建记录还在 outbox 中等待，重放时会创建页面，这里不再创建第二个
+            raise NotionWriteDeferred(pending, "这篇论文的页面正在等待写入")
+
+        try:
+            page = _find_paper_page(metadata.get("doi"), metadata.get("zotero_id"))
+        except Exception as e:
+            if not is_transient_error(e):
+                raise
+            # Notion 暂时不可用：按新论文写入 outbox，创建记录按 DOI/ZoteroID 登记，避免重复创建
+            logger.warning(f"查询论文页面时出错：{e}，按新论文处理")
+            page = None
+
+        if page:
+            page_id = page["id"]
+            changed = diff_page_properties(page.get("properties", {}), properties)
+            if changed:
+                update_page_properties(NOTION_PAPERS_DATABASE_ID, page_id, changed)
+                logger.info(f"已更新论文页面 {page_id} 的属性：{', '.join(changed)}")
+            else:
+                logger.info(f"论文页面 {page_id} 没有变化，跳过更新")
+        else:
+            page_id = _create_paper_page(
+                title, summary, url, created_at, properties, analysis, keys
+            )
+
+        for key in keys:
+            _known_paper_pages[key] = page_id
+
+    tags = _property_tags(properties)
+    record_entry(page_id, KIND_PAPER, title, summary, tags, url, created_at)
+    record_document(
+        page_id, KIND_PAPER, title, summary, tags, build_analysis_markdown(analysis), url, created_at
+    )
+    record_saved_content(page_id, url)
+    return page_id
+
+
+def build_paper_properties(title, summary, url, created_at, metadata):
+    """构建论文数据库页面的属性"""
+    properties = {
+        "Name": {"title": [{"text": {"content": title}}]},
+        "Abstract": {"rich_text": [{"text": {"content": summary}}]},
+        "Created": {"date": {"start": created_at.isoformat()}},
+    }
+    if url:
+        properties["URL"] = {"url": url}
+    return add_paper_metadata_to_properties(properties, metadata)
+
+
+def build_analysis_markdown(analysis):
+    """把论文分析的各部分拼接为 Markdown，交给块转换器生成正文"""
+    sections = []
+    for key, heading in ANALYSIS_SECTIONS:
+        text = (analysis.get(key) or "").strip()
+        if text:
+            sections.append(f"## {heading}\n\n{text}")
+    return "\n\n".join(sections)
+
+
+def diff_page_properties(existing, desired):
+    """
+    比较页面现有属性和要写入的属性
+
+    参数：
+    existing (dict): 页面对象中的 properties
+    desired (dict): 要写入的属性
+
+    返回：
+    dict: 值有变化的属性，Created 保持首次写入的时间，不参与比较
+    """
+    changed = {}
+    for name, value in desired.items():
+        if name in PRESERVED_PROPERTIES:
+            continue
+        if _property_value(value) != _property_value(existing.get(name)):
+            changed[name] = value
+    return changed
+
+
+def _property_value(prop):
+    """把页面返回的属性和要写入的属性转换为可以比较的值"""
+    if not prop:
+        return None
+    if "title" in prop or "rich_text" in prop:
+        parts = prop.get("title") or prop.get("rich_text") or []
+        return "".join(
+            part.get("plain_text") or part.get("text", {}).get("content", "") for part in parts
+        ) or None
+    if "multi_select" in prop:
+        return frozenset(option["name"] for option in prop["multi_select"] or []) or None
+    if "date" in prop:
+        return (prop["date"] or {}).get("start")
+    if "url" in prop:
+        return prop["url"] or None
+    return None
+
+
+def _property_tags(properties):
+    """属性中的标签名列表"""
+    return [option["name"] for option in properties.get("Tags", {}).get("multi_select", [])]
+
+
+def _paper_keys(doi, zotero_id):
+    """论文的去重键，按固定顺序排列，加锁时避免死锁"""
+    keys = []
+    if doi:
+        keys.append(f"doi:{doi.lower().strip()}")
+    if zotero_id:
+        keys.append(f"zotero:{zotero_id.lower().strip()}")
+    return sorted(keys)
+
+
+class _PaperLocks:
+    """按论文去重键加锁，不同论文之间互不阻塞"""
+
+    def __init__(self, keys):
+        with _locks_guard:
+            self.locks = [_paper_locks.setdefault(key, threading.Lock()) for key in keys]
+
+    def __enter__(self):
+        for lock in self.locks:
+            lock.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for lock in reversed(self.locks):
+            lock.release()
+
+
+def _find_paper_page(doi, zotero_id):
+    """
+    通过 DOI 或 ZoteroID 查找已存在的论文页面
+
+    先查本进程刚创建的页面（Notion 查询结果有延迟，刚创建的页面可能查不到），
+    再用一次 or 查询同时匹配 DOI 和 ZoteroID
+
+    返回：
+    dict: 页面对象，未找到时返回 None
+    """
+    conditions = []
+    if doi:
+        conditions.append({"property": "DOI", "rich_text": {"equals": doi}})
+    if zotero_id:
+        conditions.append({"property": "ZoteroID", "rich_text": {"equals": zotero_id}})
+    if not conditions:
+        return None
+
+    for key in _paper_keys(doi, zotero_id):
+        page_id = _known_paper_pages.get(key)
+        if page_id:
+            notion_limiter.wait_if_limited()
+            return notion.pages.retrieve(page_id=page_id)
+
+    pages = iter_database_query(
+        NOTION_PAPERS_DATABASE_ID,
+        filter=conditions[0] if len(conditions) == 1 else {"or": conditions},
+        page_size=1,
+        prefetch=False,
+    )
+    return next(pages, None)
+
+
+def _find_pending_paper(keys):
+    """
+    查找 outbox 中同一篇论文（DOI 或 ZoteroID 相同）还没创建出页面的记录
+
+    返回：
+    int: 记录 ID，没有时返回 None
+    """
+    if not keys:
+        return None
+    for entry_id, meta in get_notion_outbox().pending_creates(KIND_PAPER):
+        if set(meta.get("paper_keys", [])) & set(keys):
+            return entry_id
+    return None
+
+
+def _create_paper_page(title, summary, url, created_at, properties, analysis, keys=()):
+    """通过 outbox 创建论文页面，正文为分析结果；keys 保存在记录中，用于查找等待中的同一篇论文"""
+    content = build_analysis_markdown(analysis)
+    blocks = convert_to_notion_blocks(content)
+    meta = {
+        "title": title,
+        "summary": summary,
+        "tags": _property_tags(properties),
+        "url": url,
+        "created_at": created_at.isoformat(),
+        "content": content[:SEARCH_CONTENT_LENGTH],
+        "paper_keys": list(keys),
+    }
+
+    try:
+        result = get_notion_outbox().create_page(
+            parent={"database_id": NOTION_PAPERS_DATABASE_ID},
+            properties=properties,
+            blocks=blocks,
+            kind=KIND_PAPER,
+            meta=meta,
+        )
+    except NotionWriteDeferred as e:
+        logger.warning(str(e))
+        raise
+    except Exception as e:
+        logger.error(f"创建论文页面时出错：{e}")
+        raise
+
+    logger.info(
+        f"成功创建论文页面：{result.page_id}，包含 {len(blocks)} 个块，共 {result.requests} 次请求"
+    )
+    return result.page_id
+
+
+def _record_replayed_paper(page_id, meta):
+    """延迟创建的论文页面写入后，记录到本地搜索索引"""
+    # Notion 查询结果有延迟，之后同一篇论文的写入先按已知页面查找
+    for key in meta.get("paper_keys", []):
+        _known_paper_pages[key] = page_id
+    record_entry(
+        page_id,
+        KIND_PAPER,
+        meta.get("title", ""),
+        meta.get("summary", ""),
+        meta.get("tags", []),
+        meta.get("url", ""),
+        meta.get("created_at"),
+    )
+    record_document(
+        page_id,
+        KIND_PAPER,
+        meta.get("title", ""),
+        meta.get("summary", ""),
+        meta.get("tags", []),
+        meta.get("content", ""),
+        meta.get("url", ""),
+        meta.get("created_at"),
+    )
+    record_saved_content(page_id, meta.get("url"))
+
+
+register_replay_callback(KIND_PAPER, _record_replayed_paper)
 
 
 def add_paper_metadata_to_properties(properties, metadata):
@@ -177,12 +474,14 @@ def add_paper_metadata_to_properties(properties, metadata):
 def ensure_papers_database_properties():
     """
     确保论文数据库拥有所需的所有属性/字段
-    第一次使用时会初始化数据库结构
+    第一次使用时会初始化数据库结构，之后使用缓存的结构检查，不再请求 Notion
     """
     try:
         # 获取当前数据库结构
-        db_info = notion.databases.retrieve(database_id=NOTION_PAPERS_DATABASE_ID)
-        existing_properties = db_info.get("properties", {})
+        schema = get_schema_cache().get(NOTION_PAPERS_DATABASE_ID)
+        if schema is None:
+            return
+        existing_properties = schema.properties
 
         # 检查并添加缺失的属性
         required_properties = {
@@ -212,6 +511,7 @@ def ensure_papers_database_properties():
             notion.databases.update(
                 database_id=NOTION_PAPERS_DATABASE_ID, properties=missing_properties
             )
+            get_schema_cache().invalidate(NOTION_PAPERS_DATABASE_ID)
             logger.info("数据库结构已更新")
 
     except Exception as e:
@@ -307,30 +607,33 @@ def check_paper_exists_in_notion(doi: str = None, zotero_id: str = None) -> bool
         先通过 DOI 检查，如果没有 DOI  or 未找到，则通过 ZoteroID 检查
     """
     try:
-        # 保持对同一个 notion 客户端的引用
-        global notion
-
         # 首先通过 DOI 检查（如果提供）
         if doi:
-            response = notion.databases.query(
-                database_id=NOTION_PAPERS_DATABASE_ID,
+            pages = iter_database_query(
+                NOTION_PAPERS_DATABASE_ID,
                 filter={"property": "DOI", "rich_text": {"equals": doi}},
+                filter_properties=["DOI"],
+                page_size=1,
+                prefetch=False,
             )
 
             # 如果找到结果，则论文已存在
-            if len(response.get("results", [])) > 0:
+            if next(pages, None) is not None:
                 logger.info(f"通过 DOI 找到已存在的论文记录：{doi}")
                 return True
 
         # 如果 DOI 检查未找到结果，且提供了 ZoteroID，则通过 ZoteroID 检查
         if zotero_id:
-            response = notion.databases.query(
-                database_id=NOTION_PAPERS_DATABASE_ID,
+            pages = iter_database_query(
+                NOTION_PAPERS_DATABASE_ID,
                 filter={"property": "ZoteroID", "rich_text": {"equals": zotero_id}},
+                filter_properties=["ZoteroID"],
+                page_size=1,
+                prefetch=False,
             )
 
             # 如果找到结果，则论文已存在
-            if len(response.get("results", [])) > 0:
+            if next(pages, None) is not None:
                 logger.info(f"通过 ZoteroID 找到已存在的论文记录：{zotero_id}")
                 return True
 
@@ -355,40 +658,27 @@ def get_existing_zotero_ids():
 
     try:
         # 检查数据库是否有 ZoteroID 字段
-        db_info = notion.databases.retrieve(database_id=NOTION_PAPERS_DATABASE_ID)
-        if "ZoteroID" not in db_info.get("properties", {}):
+        schema = get_schema_cache().get(NOTION_PAPERS_DATABASE_ID)
+        if schema is None or not schema.has_property("ZoteroID"):
             logger.warning("论文数据库中没有 ZoteroID 字段，无法检查重复")
             return set()
 
-        # 查询所有条目
+        # 查询所有条目，只返回 ZoteroID 属性
         existing_zotero_ids = set()
-        start_cursor = None
-        has_more = True
-
-        while has_more:
-            response = notion.databases.query(
-                database_id=NOTION_PAPERS_DATABASE_ID,
-                start_cursor=start_cursor,
-                page_size=100,  # 每页最多获取 100 条
-                filter={"property": "ZoteroID", "rich_text": {"is_not_empty": True}},
-            )
+        pages = iter_database_query(
+            NOTION_PAPERS_DATABASE_ID,
+            filter={"property": "ZoteroID", "rich_text": {"is_not_empty": True}},
+            filter_properties=["ZoteroID"],
+        )
 
-            # 提取 ZoteroID
-            for page in response["results"]:
-                if "ZoteroID" in page["properties"]:
-                    rich_text = page["properties"]["ZoteroID"].get("rich_text", [])
-                    if rich_text and "plain_text" in rich_text[0]:
-                        zotero_id = rich_text[0]["plain_text"].strip().lower()
-                        if zotero_id:
-                            existing_zotero_ids.add(zotero_id)
-
-            # 检查是否有更多数据
-            has_more = response.get("has_more", False)
-            start_cursor = response.get("next_cursor")
-
-            if has_more:
-                # 避免请求过于频繁
-                time.sleep(0.5)
+        # 提取 ZoteroID
+        for page in pages:
+            if "ZoteroID" in page["properties"]:
+                rich_text = page["properties"]["ZoteroID"].get("rich_text", [])
+                if rich_text and "plain_text" in rich_text[0]:
+                    zotero_id = rich_text[0]["plain_text"].strip().lower()
+                    if zotero_id:
+                        existing_zotero_ids.add(zotero_id)
 
         logger.info(
             f"从 Notion 中获取到 {len(existing_zotero_ids)} 个已同步的 ZoteroID"
@@ -6,10 +6,10 @@ import pytz
 from config import NOTION_TODO_DATABASE_ID
 from utils.helpers import truncate_text
 
-from ..client import get_notion_client
+from ..outbox import NotionWriteDeferred, get_notion_outbox, register_replay_callback
+from ..search_index import KIND_TODO, record_document
 
 logger = logging.getLogger(__name__)
-notion = get_notion_client()
 
 
 def add_to_todo_database(content, created_at=None, duration_hours=None):
@@ -23,6 +23,9 @@ def add_to_todo_database(content, created_at=None, duration_hours=None):
 
     返回：
     str: 创建的页面 ID
+
+    异常：
+    NotionWriteDeferred: Notion 暂时不可用，待办事项已保存到 outbox
     """
     if not NOTION_TODO_DATABASE_ID:
         logger.error("未设置待办事项数据库 ID")
@@ -53,7 +56,8 @@ def add_to_todo_database(content, created_at=None, duration_hours=None):
         # 添加结束时间
         date_property["end"] = end_time.isoformat()
 
-        new_page = notion.pages.create(
+        # 先记录到 outbox，Notion 不可用时恢复后自动创建
+        result = get_notion_outbox().create_page(
             parent={"database_id": NOTION_TODO_DATABASE_ID},
             properties={
                 "Name": {"title": [{"text": {"content": title}}]},
@@ -61,16 +65,36 @@ def add_to_todo_database(content, created_at=None, duration_hours=None):
                 "Priority": {"select": {"name": "中"}},
                 "Created": {"date": date_property},
             },
-            children=[
+            blocks=[
                 {
                     "object": "block",
                     "paragraph": {"rich_text": [{"text": {"content": content}}]},
                 }
             ],
+            kind=KIND_TODO,
+            meta={"title": title, "content": content, "created_at": created_at.isoformat()},
         )
-        logger.info(f"成功创建待办事项：{new_page['id']}")
-        return new_page["id"]
+        logger.info(f"成功创建待办事项：{result.page_id}")
+        record_document(result.page_id, KIND_TODO, title, content=content, created_at=created_at)
+        return result.page_id
 
+    except NotionWriteDeferred as e:
+        logger.warning(f"待办事项暂存到 outbox：{e}")
+        raise
     except Exception as e:
         logger.error(f"创建待办事项时出错：{e}")
         raise
+
+
+def _record_replayed_todo(page_id, meta):
+    """延迟创建的待办事项写入后，记录到全文索引"""
+    record_document(
+        page_id,
+        KIND_TODO,
+        meta.get("title", ""),
+        content=meta.get("content", ""),
+        created_at=meta.get("created_at"),
+    )
+
+
+register_replay_callback(KIND_TODO, _record_replayed_todo)
@@ -0,0 +1,397 @@
+"""
+已保存内容的去重索引
+
+记录每个页面的规范化链接和正文指纹，收到消息时在抓取网页、调用 AI 之前先查询：
+1. 链接去掉跟踪参数（utm_*、fbclid 等）和锚点，统一协议、主机名大小写、www 前缀和末尾斜杠，
+   同一篇文章的不同分享链接得到相同的键
+2. 正文按 entry_index.tokenize 切分后计算 64 位 SimHash，汉明距离不超过 DEDUP_SIMHASH_DISTANCE
+   视为近似重复；指纹按 16 位分为 4 段建索引，距离不超过 3 时至少有一段完全相同，只比较这些候选
+3. 过短的内容不计算指纹（短消息的完全重复由 idempotency 模块处理）
+
+索引保存在 DATA_DIR/dedup_index.db 中；第一次启用时从全文索引导入已有页面的链接和正文。
+页面在 Notion 中被删除后，本地镜像（mirror 模块）发现时同时从索引中移除，不再作为重复内容回复。
+"""
+
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from config import DEDUP_MIN_CONTENT_LENGTH, DEDUP_SIMHASH_DISTANCE
+from utils.sqlite_store import SQLiteStore
+
+from .entry_index import normalize_query, tokenize
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    url_key TEXT PRIMARY KEY,
+    page_id TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_urls_page ON urls (page_id);
+CREATE TABLE IF NOT EXISTS fingerprints (
+    page_id TEXT PRIMARY KEY,
+    simhash TEXT NOT NULL,
+    band0 INTEGER NOT NULL,
+    band1 INTEGER NOT NULL,
+    band2 INTEGER NOT NULL,
+    band3 INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fingerprints_band0 ON fingerprints (band0);
+CREATE INDEX IF NOT EXISTS idx_fingerprints_band1 ON fingerprints (band1);
+CREATE INDEX IF NOT EXISTS idx_fingerprints_band2 ON fingerprints (band2);
+CREATE INDEX IF NOT EXISTS idx_fingerprints_band3 ON fingerprints (band3);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+SIMHASH_BITS = 64
+BANDS = 4
+BAND_BITS = SIMHASH_BITS // BANDS
+
+# 所有网站通用的跟踪参数
+TRACKING_PARAMS = frozenset(
+    (
+        "fbclid",
+        "gclid",
+        "gclsrc",
+        "dclid",
+        "msclkid",
+        "yclid",
+        "igshid",
+        "mc_cid",
+        "mc_eid",
+        "_hsenc",
+        "_hsmi",
+        "mkt_tok",
+        "ref_src",
+        "spm",
+    )
+)
+TRACKING_PREFIXES = ("utm_",)
+
+# 只在特定网站上作为跟踪参数的参数名（在其他网站上可能是内容参数）
+HOST_TRACKING_PARAMS = {
+    "mp.weixin.qq.com": frozenset(
+        (
+            "chksm",
+            "scene",
+            "subscene",
+            "srcid",
+            "sharer_sharetime",
+            "sharer_shareid",
+            "sharer_shareinfo",
+            "sharer_shareinfo_first",
+            "clicktime",
+            "enterid",
+            "ascene",
+            "devicetype",
+            "version",
+            "nettype",
+            "lang",
+            "exportkey",
+            "pass_ticket",
+            "wx_header",
+            "from",
+            "sessionid",
+        )
+    ),
+    "bilibili.com": frozenset(
+        ("vd_source", "spm_id_from", "share_source", "share_medium", "share_plat", "share_from")
+    ),
+    "youtube.com": frozenset(("si", "feature", "pp")),
+    "youtu.be": frozenset(("si", "feature")),
+    "twitter.com": frozenset(("s", "t")),
+    "x.com": frozenset(("s", "t")),
+    "zhihu.com": frozenset(("utm_psn", "share_code", "utm_id")),
+    "xiaohongshu.com": frozenset(("xsec_source", "xhsshare", "appuid", "apptime", "share_id")),
+}
+
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+# 单例实例
+_index_instance = None
+_instance_lock = threading.Lock()
+
+
+def canonicalize_url(url):
+    """
+    规范化链接，作为去重的键
+
+    参数：
+        url: 原始链接
+
+    返回：
+        str: 规范化后的链接，不是 http(s) 链接时返回空字符串
+    """
+    try:
+        parts = urlsplit((url or "").strip())
+    except ValueError:
+        return ""
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return ""
+
+    host = parts.hostname.lower().rstrip(".")
+    if host.startswith("www."):
+        host = host[4:]
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and str(port) != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+
+    host_params = HOST_TRACKING_PARAMS.get(host.split(":")[0], frozenset())
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS
+        and key not in host_params
+        and not key.lower().startswith(TRACKING_PREFIXES)
+    )
+
+    path = re.sub(r"/{2,}", "/", parts.path or "/")
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    # http 和 https 视为同一个链接；锚点只定位页面内的位置，不区分内容
+    return urlunsplit(("https", host, path, urlencode(query), ""))
+
+
+def compute_simhash(text):
+    """
+    计算文本的 64 位 SimHash
+
+    返回：
+        int/None: 指纹，文本规范化后短于 DEDUP_MIN_CONTENT_LENGTH 时返回 None
+    """
+    normalized = normalize_query(text)
+    if len(normalized) < DEDUP_MIN_CONTENT_LENGTH:
+        return None
+
+    features = Counter(tokenize(normalized))
+    if not features:
+        return None
+
+    weights = [0] * SIMHASH_BITS
+    for feature, count in features.items():
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += count if value >> bit & 1 else -count
+
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def _bands(simhash):
+    mask = (1 << BAND_BITS) - 1
+    return [simhash >> (i * BAND_BITS) & mask for i in range(BANDS)]
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class DedupIndex:
+    """规范化链接和正文指纹 -> 页面 ID"""
+
+    def __init__(self, store=None, max_distance=DEDUP_SIMHASH_DISTANCE):
+        self.store = store or SQLiteStore("dedup_index.db", SCHEMA)
+        self.max_distance = max_distance
+
+    def record(self, page_id, url=None, content=None):
+        """
+        记录页面的链接和正文指纹
+
+        参数：
+            page_id: Notion 页面 ID
+            url: 页面对应的原文链接
+            content: 页面正文（或开头部分）
+        """
+        url_key = canonicalize_url(url)
+        simhash = compute_simhash(content) if content else None
+        if not url_key and simhash is None:
+            return
+
+        now = time.time()
+        with self.store.transaction() as conn:
+            if url_key:
+                # 同一链接保留最早保存的页面
+                conn.execute(
+                    "INSERT OR IGNORE INTO urls (url_key, page_id, created_at) VALUES (?, ?, ?)",
+                    (url_key, page_id, now),
+                )
+            if simhash is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO fingerprints "
+                    "(page_id, simhash, band0, band1, band2, band3, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (page_id, format(simhash, "016x"), *_bands(simhash), now),
+                )
+
+    def find_by_url(self, url):
+        """
+        查找保存过相同链接的页面
+
+        返回：
+            str/None: 页面 ID
+        """
+        url_key = canonicalize_url(url)
+        if not url_key:
+            return None
+        row = self.store.query_one("SELECT page_id FROM urls WHERE url_key = ?", (url_key,))
+        return row["page_id"] if row else None
+
+    def find_similar(self, content):
+        """
+        查找正文近似的页面
+
+        返回：
+            tuple/None: (页面 ID, 汉明距离)，距离最小的页面；没有时返回 None
+        """
+        simhash = compute_simhash(content)
+        if simhash is None:
+            return None
+
+        bands = _bands(simhash)
+        rows = self.store.query(
+            "SELECT page_id, simhash FROM fingerprints "
+            "WHERE band0 = ? OR band1 = ? OR band2 = ? OR band3 = ?",
+            bands,
+        )
+
+        best = None
+        for row in rows:
+            distance = hamming_distance(simhash, int(row["simhash"], 16))
+            if distance <= self.max_distance and (best is None or distance < best[1]):
+                best = (row["page_id"], distance)
+        return best
+
+    def find(self, url=None, content=None):
+        """
+        按链接和正文查找已保存的页面，链接优先
+
+        返回：
+            str/None: 页面 ID
+        """
+        page_id = self.find_by_url(url) if url else None
+        if page_id is None and content:
+            similar = self.find_similar(content)
+            if similar:
+                page_id = similar[0]
+        return page_id
+
+    def remove(self, *page_ids):
+        """删除页面的记录"""
+        params = [(page_id,) for page_id in page_ids]
+        with self.store.transaction() as conn:
+            conn.executemany("DELETE FROM urls WHERE page_id = ?", params)
+            conn.executemany("DELETE FROM fingerprints WHERE page_id = ?", params)
+
+    def is_backfilled(self):
+        return self.store.query_one("SELECT value FROM state WHERE key = 'backfilled_at'") is not None
+
+    def mark_backfilled(self):
+        with self.store.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO state (key, value) VALUES ('backfilled_at', ?)",
+                (str(time.time()),),
+            )
+
+
+def get_dedup_index():
+    """获取去重索引单例"""
+    global _index_instance
+    if _index_instance is None:
+        with _instance_lock:
+            if _index_instance is None:
+                _index_instance = DedupIndex()
+    return _index_instance
+
+
+def record_saved_content(page_id, url=None, content=None):
+    """记录新保存的页面，出错时只记录日志，不影响保存流程"""
+    if not page_id:
+        return
+    try:
+        get_dedup_index().record(page_id, url, content)
+    except Exception as e:
+        logger.warning(f"更新去重索引时出错：{e}")
+
+
+def forget_saved_content(page_ids):
+    """页面已在 Notion 中删除时移除记录，出错时只记录日志"""
+    if not page_ids:
+        return
+    try:
+        get_dedup_index().remove(*page_ids)
+    except Exception as e:
+        logger.warning(f"从去重索引中移除页面时出错：{e}")
+
+
+def find_saved_content(url=None, content=None):
+    """
+    查找保存过相同链接或近似正文的页面，出错时返回 None（按新内容处理）
+
+    返回：
+        str/None: 页面 ID
+    """
+    try:
+        return get_dedup_index().find(url, content)
+    except Exception as e:
+        logger.warning(f"查询去重索引时出错：{e}")
+        return None
+
+
+def find_new_text(page_id, text):
+    """
+    找出近似重复的消息中已保存页面没有的行（与全文索引中保存的正文比较）
+
+    返回：
+        str: 新增的行，没有时返回空字符串
+    """
+    # 避免循环导入，延迟导入
+    from .search_index import get_search_index
+
+    try:
+        saved = normalize_query(get_search_index().get_content(page_id))
+    except Exception as e:
+        logger.warning(f"读取页面 {page_id} 的已保存正文时出错：{e}")
+        saved = ""
+    lines = [
+        line for line in (text or "").splitlines() if line.strip() and normalize_query(line) not in saved
+    ]
+    return "\n".join(lines)
+
+
+def backfill_dedup_index(index=None):
+    """
+    从全文索引导入已有页面的链接和正文，不请求 Notion
+
+    返回：
+        int: 导入的页面数
+    """
+    # 避免循环导入，延迟导入
+    from .search_index import KIND_TODO, get_search_index
+
+    index = index or get_dedup_index()
+    imported = 0
+    for row in get_search_index().store.query(
+        "SELECT page_id, url, content FROM documents WHERE kind != ? ORDER BY created_at",
+        (KIND_TODO,),
+    ):
+        index.record(row["page_id"], row["url"], row["content"])
+        imported += 1
+
+    index.mark_backfilled()
+    logger.info(f"已从全文索引导入 {imported} 个页面到去重索引")
+    return imported
@@ -0,0 +1,492 @@
+"""
+已保存条目的本地搜索索引
+
+保存笔记和论文时记录标题、标签、摘要和链接，供内联搜索使用：
+1. 条目持久化在 DATA_DIR/entries.db 中，启动后第一次搜索时载入内存
+2. 词元经过 Unicode 规范化和大小写折叠，中日韩文字按二元组切分
+3. 前缀字典树支持输入过程中的不完整词，结果按字段权重和逆文档频率排序
+4. 查询结果按规范化后的关键词缓存，索引变化时清空缓存
+
+内联查询每输入一个字符就会触发一次，全部在本地完成，不调用 Notion 搜索接口。
+"""
+
+import json
+import logging
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime
+
+from config import NOTION_DATABASE_ID, NOTION_PAPERS_DATABASE_ID
+from utils.sqlite_store import SQLiteStore
+
+from .query import iter_database_query
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    page_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    summary TEXT NOT NULL DEFAULT '',
+    tags TEXT NOT NULL DEFAULT '[]',
+    url TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL
+);
+"""
+
+KIND_NOTE = "note"
+KIND_PAPER = "paper"
+
+# 各字段命中时的权重
+FIELD_WEIGHTS = {"title": 3.0, "tags": 2.0, "summary": 1.0, "url": 0.5}
+# 前缀匹配（词未输入完整）相对完整匹配的得分比例
+PREFIX_MATCH_FACTOR = 0.6
+# 每个查询词最多展开的前缀候选词数
+MAX_PREFIX_EXPANSIONS = 200
+# 单次查询最多返回的条目数
+MAX_RESULTS = 200
+# 查询结果缓存的条目数
+QUERY_CACHE_SIZE = 256
+# 摘要只索引开头部分
+SUMMARY_INDEX_LENGTH = 1000
+
+_CJK = "぀-ヿ㐀-䶿一-鿿가-힯"
+_TOKEN_RE = re.compile(f"[{_CJK}]+|[^\\W_{_CJK}]+")
+_CJK_RE = re.compile(f"[{_CJK}]")
+
+# 单例实例
+_index_instance = None
+_instance_lock = threading.Lock()
+
+
+def normalize_query(text):
+    """规范化文本：统一 Unicode 形式和大小写，合并空白字符"""
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def tokenize(text):
+    """
+    把文本切分为词元
+
+    拉丁字母和数字按单词切分；中日韩文字没有空格分词，按相邻两字切分为二元组，
+    单个字保留为一个词元（查询时通过前缀匹配命中以该字开头的二元组）
+
+    返回：
+        list: 词元列表
+    """
+    tokens = []
+    for run in _TOKEN_RE.findall(normalize_query(text)):
+        if len(run) > 1 and _CJK_RE.match(run):
+            tokens.extend(run[i : i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def to_timestamp(created_at):
+    """把 datetime 或 ISO 格式字符串转换为时间戳"""
+    if isinstance(created_at, (int, float)):
+        return float(created_at)
+    if isinstance(created_at, datetime):
+        return created_at.timestamp()
+    if isinstance(created_at, str) and created_at:
+        try:
+            return datetime.fromisoformat(created_at.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            pass
+    return time.time()
+
+
+class _TrieNode:
+    __slots__ = ("children", "terminal")
+
+    def __init__(self):
+        self.children = {}
+        self.terminal = False
+
+
+class PrefixTrie:
+    """词元前缀字典树"""
+
+    def __init__(self):
+        self.root = _TrieNode()
+
+    def insert(self, token):
+        node = self.root
+        for char in token:
+            node = node.children.setdefault(char, _TrieNode())
+        node.terminal = True
+
+    def complete(self, prefix, limit=MAX_PREFIX_EXPANSIONS):
+        """
+        返回以 prefix 开头的词元（包括 prefix 本身）
+
+        参数：
+            prefix: 前缀
+            limit: 最多返回的词元数
+
+        返回：
+            list: 词元列表，较短的词元在前
+        """
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+
+        # 广度优先遍历，优先返回较短（与前缀更接近）的词元
+        results = []
+        level = [(prefix, node)]
+        while level and len(results) < limit:
+            next_level = []
+            for token, current in level:
+                if current.terminal:
+                    results.append(token)
+                    if len(results) >= limit:
+                        break
+                next_level.extend(
+                    (token + char, child) for char, child in current.children.items()
+                )
+            level = next_level
+        return results
+
+
+class EntryIndex:
+    """已保存笔记和论文的本地倒排索引"""
+
+    def __init__(self, store=None, cache_size=QUERY_CACHE_SIZE):
+        """
+        初始化索引
+
+        参数：
+            store: SQLiteStore 实例，默认使用 DATA_DIR/entries.db
+            cache_size: 查询结果缓存的条目数
+        """
+        self.store = store or SQLiteStore("entries.db", SCHEMA)
+        self.cache_size = cache_size
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._entries = {}
+        self._doc_tokens = {}
+        self._postings = {}
+        self._trie = PrefixTrie()
+        self._cache = OrderedDict()
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+    def _ensure_loaded(self):
+        """第一次使用时从数据库载入全部条目并建立索引"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            started = time.perf_counter()
+            for row in self.store.query("SELECT * FROM entries"):
+                entry = dict(row)
+                entry["tags"] = json.loads(entry["tags"] or "[]")
+                self._index_entry(entry)
+            self._loaded = True
+            logger.info(
+                f"已载入 {len(self._entries)} 个条目的搜索索引，"
+                f"耗时 {time.perf_counter() - started:.3f} 秒"
+            )
+
+    def _index_entry(self, entry):
+        """把条目加入内存索引（调用方持有锁）"""
+        page_id = entry["page_id"]
+        self._unindex_entry(page_id)
+
+        weights = {}
+        fields = {
+            "title": entry["title"],
+            "tags": " ".join(entry["tags"]),
+            "summary": entry["summary"][:SUMMARY_INDEX_LENGTH],
+            "url": entry["url"],
+        }
+        for field, text in fields.items():
+            # 同一字段中重复出现的词只计一次，避免长摘要刷高得分
+            for token in set(tokenize(text)):
+                weights[token] = weights.get(token, 0.0) + FIELD_WEIGHTS[field]
+
+        for token, weight in weights.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                self._trie.insert(token)
+            postings[page_id] = weight
+
+        self._entries[page_id] = entry
+        self._doc_tokens[page_id] = set(weights)
+        self._cache.clear()
+
+    def _unindex_entry(self, page_id):
+        """从内存索引中移除条目（调用方持有锁）"""
+        for token in self._doc_tokens.pop(page_id, ()):
+            postings = self._postings.get(token)
+            if postings:
+                postings.pop(page_id, None)
+        self._entries.pop(page_id, None)
+
+    def add(self, page_id, kind, title, summary="", tags=(), url="", created_at=None):
+        """
+        添加或更新条目
+
+        参数：
+            page_id: Notion 页面 ID
+            kind: 条目类型，KIND_NOTE 或 KIND_PAPER
+            title: 标题
+            summary: 摘要
+            tags: 标签列表
+            url: 原始链接
+            created_at: 创建时间（datetime 或 ISO 字符串）
+        """
+        entry = {
+            "page_id": page_id,
+            "kind": kind,
+            "title": title or "",
+            "summary": summary or "",
+            "tags": list(tags or []),
+            "url": url or "",
+            "created_at": to_timestamp(created_at),
+        }
+        self._ensure_loaded()
+        with self._lock:
+            with self.store.transaction() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries "
+                    "(page_id, kind, title, summary, tags, url, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        page_id,
+                        kind,
+                        entry["title"],
+                        entry["summary"],
+                        json.dumps(entry["tags"], ensure_ascii=False),
+                        entry["url"],
+                        entry["created_at"],
+                    ),
+                )
+            self._index_entry(entry)
+
+    def update(self, page_id, title=None, summary=None, tags=None):
+        """
+        更新已有条目的部分字段，条目不存在时忽略
+
+        参数：
+            page_id: Notion 页面 ID
+            title: 新标题，None 表示不修改
+            summary: 新摘要，None 表示不修改
+            tags: 新标签列表，None 表示不修改
+        """
+        self._ensure_loaded()
+        with self._lock:
+            entry = self._entries.get(page_id)
+            if entry is None:
+                return
+            entry = dict(entry)
+            if title:
+                entry["title"] = title
+            if summary is not None:
+                entry["summary"] = summary
+            if tags is not None:
+                entry["tags"] = list(tags)
+            self.add(**entry)
+
+    def search(self, query, limit=MAX_RESULTS):
+        """
+        搜索条目
+
+        所有查询词都必须命中（最后一个词可以是未输入完整的前缀），
+        得分相同时较新的条目在前；空查询返回最近保存的条目
+
+        参数：
+            query: 查询文本
+            limit: 最多返回的条目数
+
+        返回：
+            list: 条目字典列表，按相关度排序
+        """
+        self._ensure_loaded()
+        key = normalize_query(query)
+
+        with self._lock:
+            page_ids = self._cache.get(key)
+            if page_ids is not None:
+                self._cache.move_to_end(key)
+                self._cache_hits += 1
+            else:
+                self._cache_misses += 1
+                page_ids = self._rank(key)
+                self._cache[key] = page_ids
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+            return [dict(self._entries[page_id]) for page_id in page_ids[:limit]]
+
+    def _rank(self, query):
+        """计算查询结果的页面 ID 列表（调用方持有锁）"""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            recent = sorted(
+                self._entries.values(), key=lambda e: e["created_at"], reverse=True
+            )
+            return [entry["page_id"] for entry in recent[:MAX_RESULTS]]
+
+        total = len(self._entries) or 1
+        scores = None
+        for token in tokens:
+            token_scores = {}
+            for candidate in self._trie.complete(token):
+                postings = self._postings.get(candidate)
+                if not postings:
+                    continue
+                idf = math.log(1 + total / len(postings))
+                factor = 1.0 if candidate == token else PREFIX_MATCH_FACTOR
+                for page_id, weight in postings.items():
+                    score = weight * idf * factor
+                    if score > token_scores.get(page_id, 0.0):
+                        token_scores[page_id] = score
+
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {
+                    page_id: score + token_scores[page_id]
+                    for page_id, score in scores.items()
+                    if page_id in token_scores
+                }
+            if not scores:
+                return []
+
+        ranked = sorted(
+            scores,
+            key=lambda page_id: (scores[page_id], self._entries[page_id]["created_at"]),
+            reverse=True,
+        )
+        return ranked[:MAX_RESULTS]
+
+    def count(self):
+        """返回索引中的条目数"""
+        self._ensure_loaded()
+        return len(self._entries)
+
+    def get_stats(self):
+        """返回索引统计信息"""
+        self._ensure_loaded()
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "tokens": len(self._postings),
+                "cached_queries": len(self._cache),
+                "cache_hits": self._cache_hits,
+                "cache_misses": self._cache_misses,
+            }
+
+
+def get_entry_index():
+    """获取条目索引单例"""
+    global _index_instance
+    if _index_instance is None:
+        with _instance_lock:
+            if _index_instance is None:
+                _index_instance = EntryIndex()
+    return _index_instance
+
+
+def record_entry(page_id, kind, title, summary="", tags=(), url="", created_at=None):
+    """
+    记录新保存的条目，出错时只记录日志，不影响保存流程
+
+    参数同 EntryIndex.add
+    """
+    if not page_id:
+        return
+    try:
+        get_entry_index().add(page_id, kind, title, summary, tags, url, created_at)
+    except Exception as e:
+        logger.warning(f"更新搜索索引时出错：{e}")
+
+
+def update_entry(page_id, title=None, summary=None, tags=None):
+    """
+    更新条目的分析结果，出错时只记录日志
+
+    参数同 EntryIndex.update
+    """
+    try:
+        get_entry_index().update(page_id, title=title, summary=summary, tags=tags)
+    except Exception as e:
+        logger.warning(f"更新搜索索引时出错：{e}")
+
+
+def entry_from_page(page, kind):
+    """从 Notion 页面对象中提取索引字段"""
+    title = summary = url = ""
+    tags = []
+    for name, prop in page.get("properties", {}).items():
+        prop_type = prop.get("type")
+        if prop_type == "title":
+            title = "".join(t.get("plain_text", "") for t in prop.get("title", []))
+        elif prop_type == "rich_text" and name in ("Summary", "Abstract") and not summary:
+            summary = "".join(t.get("plain_text", "") for t in prop.get("rich_text", []))
+        elif prop_type == "multi_select" and name == "Tags":
+            tags = [option["name"] for option in prop.get("multi_select", [])]
+        elif prop_type == "url" and name == "URL":
+            url = prop.get("url") or ""
+
+    created = page.get("properties", {}).get("Created", {}).get("date") or {}
+    return {
+        "page_id": page["id"],
+        "kind": kind,
+        "title": title,
+        "summary": summary,
+        "tags": tags,
+        "url": url,
+        "created_at": created.get("start") or page.get("created_time"),
+    }
+
+
+def backfill_entry_index(index=None):
+    """
+    从 Notion 数据库导入已有条目
+
+    参数：
+        index: EntryIndex 实例，默认使用单例
+
+    返回：
+        int: 导入的条目数
+    """
+    index = index or get_entry_index()
+    databases = [(NOTION_DATABASE_ID, KIND_NOTE), (NOTION_PAPERS_DATABASE_ID, KIND_PAPER)]
+
+    imported = 0
+    for database_id, kind in databases:
+        if not database_id:
+            continue
+
+        for page in iter_database_query(database_id):
+            index.add(**entry_from_page(page, kind))
+            imported += 1
+
+    logger.info(f"已从 Notion 导入 {imported} 个条目到搜索索引")
+    return imported
+
+
+def start_entry_index_backfill():
+    """索引为空时（首次启用内联搜索）在后台线程中从 Notion 导入已有条目"""
+
+    def run():
+        try:
+            if get_entry_index().count() == 0:
+                backfill_entry_index()
+        except Exception as e:
+            logger.error(f"导入搜索索引时出错：{e}")
+
+    threading.Thread(target=run, name="entry-index-backfill", daemon=True).start()
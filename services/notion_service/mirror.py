@@ -0,0 +1,338 @@
+"""
+Notion 数据库本地镜像模块
+
+在本地 SQLite 中保存主数据库（NOTION_DATABASE_ID）和论文数据库中页面的属性，
+周报、统计等只读功能直接查询本地数据，只有变化的部分才请求 Notion：
+1. 通过 outbox 创建页面、通过 update_page_properties 更新属性时，Notion 返回的页面对象直接写入镜像
+2. 后台线程定期查询 last_edited_time 不早于水位线的页面，写入镜像并推进水位线
+3. 数据库查询不会返回已删除（归档）的页面，因此每隔 NOTION_MIRROR_RECONCILE_INTERVAL
+   拉取一次全部页面 ID（只带标题属性），删除本地多余的页面，同时从去重索引中移除
+页面正文的纯文本由 page_content 模块按 (page_id, last_edited_time) 保存在同一个数据库文件中
+"""
+
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+
+from config import (
+    NOTION_DATABASE_ID,
+    NOTION_MIRROR_POLL_INTERVAL,
+    NOTION_MIRROR_RECONCILE_INTERVAL,
+    NOTION_PAPERS_DATABASE_ID,
+)
+from utils.sqlite_store import SQLiteStore
+
+from .dedup_index import forget_saved_content
+from .query import iter_database_query
+from .schema import get_schema_cache
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    page_id TEXT PRIMARY KEY,
+    database_id TEXT NOT NULL,
+    properties TEXT NOT NULL,
+    created_ts REAL,
+    created_time TEXT,
+    last_edited_time TEXT NOT NULL,
+    url TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_pages_created ON pages (database_id, created_ts);
+CREATE TABLE IF NOT EXISTS watermarks (
+    database_id TEXT PRIMARY KEY,
+    last_edited_time TEXT,
+    synced_at REAL NOT NULL,
+    reconciled_at REAL NOT NULL DEFAULT 0
+);
+"""
+
+# 单例实例
+_mirror_instance = None
+_instance_lock = threading.Lock()
+
+
+def normalize_id(notion_id):
+    """Notion ID 可能带或不带连字符，统一为不带连字符的小写形式"""
+    return (notion_id or "").replace("-", "").lower()
+
+
+def _to_timestamp(value):
+    """把 Notion 日期（日期或带时区的时间）转换为时间戳，无时区时按本地时间处理"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+class NotionMirror:
+    """Notion 数据库的本地镜像"""
+
+    def __init__(self, store=None, database_ids=None):
+        """
+        参数：
+            store: SQLiteStore 实例，默认使用 DATA_DIR/notion_mirror.db
+            database_ids: 要镜像的数据库 ID，默认为主数据库和论文数据库
+        """
+        self.store = store or SQLiteStore("notion_mirror.db", SCHEMA)
+        if database_ids is None:
+            database_ids = [NOTION_DATABASE_ID, NOTION_PAPERS_DATABASE_ID]
+        self.database_ids = {normalize_id(db): db for db in database_ids if db}
+        self._sync_locks = {db: threading.Lock() for db in self.database_ids}
+        self._stop_event = threading.Event()
+        self._worker = None
+
+    def is_mirrored(self, database_id):
+        return normalize_id(database_id) in self.database_ids
+
+    def upsert_page(self, page, database_id=None):
+        """
+        写入或更新一个页面
+
+        参数：
+            page: Notion 页面对象（查询、创建或更新页面返回的结果）
+            database_id: 页面所在的数据库，为空时从 page["parent"] 中获取
+
+        返回：
+            bool: 页面属于镜像的数据库并已写入时返回 True
+        """
+        database_id = normalize_id(database_id or (page.get("parent") or {}).get("database_id"))
+        if database_id not in self.database_ids:
+            return False
+
+        if page.get("archived") or page.get("in_trash"):
+            self.delete_page(page["id"])
+            return True
+
+        created = (page.get("properties", {}).get("Created", {}) or {}).get("date") or {}
+        with self.store.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO pages "
+                "(page_id, database_id, properties, created_ts, created_time, last_edited_time, url) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    page["id"],
+                    database_id,
+                    json.dumps(page.get("properties", {}), ensure_ascii=False),
+                    _to_timestamp(created.get("start") or page.get("created_time")),
+                    page.get("created_time"),
+                    page.get("last_edited_time") or "",
+                    page.get("url"),
+                ),
+            )
+        return True
+
+    def delete_page(self, page_id):
+        with self.store.transaction() as conn:
+            conn.execute("DELETE FROM pages WHERE page_id = ?", (page_id,))
+        # 已删除的页面不再作为重复内容的保存位置
+        forget_saved_content([page_id])
+
+    def get_watermark(self, database_id):
+        row = self.store.query_one(
+            "SELECT * FROM watermarks WHERE database_id = ?", (normalize_id(database_id),)
+        )
+        return dict(row) if row else None
+
+    def is_ready(self, database_id):
+        """数据库是否已完成过一次同步，可以只读本地数据"""
+        return self.get_watermark(database_id) is not None
+
+    def sync(self, database_id):
+        """
+        拉取水位线之后编辑过的页面，第一次同步时拉取全部页面
+
+        返回：
+            int: 写入的页面数
+        """
+        key = normalize_id(database_id)
+        if key not in self.database_ids:
+            return 0
+
+        with self._sync_locks[key]:
+            watermark = self.get_watermark(key) or {}
+            since = watermark.get("last_edited_time")
+            filter = None
+            if since:
+                # last_edited_time 只精确到分钟，使用不早于水位线的条件，重复写入的页面结果相同
+                filter = {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": since}}
+
+            count = 0
+            latest = since
+            for page in iter_database_query(
+                self.database_ids[key],
+                filter=filter,
+                sorts=[{"timestamp": "last_edited_time", "direction": "ascending"}],
+            ):
+                self.upsert_page(page, key)
+                count += 1
+                if not latest or page["last_edited_time"] > latest:
+                    latest = page["last_edited_time"]
+
+            with self.store.transaction() as conn:
+                conn.execute(
+                    "INSERT INTO watermarks (database_id, last_edited_time, synced_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(database_id) DO UPDATE SET "
+                    "last_edited_time = excluded.last_edited_time, synced_at = excluded.synced_at",
+                    (key, latest, time.time()),
+                )
+
+        if count:
+            logger.info(f"已同步数据库 {database_id} 的 {count} 个页面到本地镜像")
+        return count
+
+    def reconcile(self, database_id):
+        """
+        删除 Notion 中已不存在（已删除或归档）的页面
+
+        返回：
+            int: 删除的页面数
+        """
+        key = normalize_id(database_id)
+        if key not in self.database_ids:
+            return 0
+
+        schema = get_schema_cache().get(self.database_ids[key])
+        title = [schema.title_property] if schema and schema.title_property else None
+        remote = {
+            page["id"]
+            for page in iter_database_query(self.database_ids[key], filter_properties=title)
+        }
+
+        with self._sync_locks[key], self.store.transaction() as conn:
+            local = {
+                row["page_id"]
+                for row in conn.execute("SELECT page_id FROM pages WHERE database_id = ?", (key,))
+            }
+            removed = local - remote
+            conn.executemany("DELETE FROM pages WHERE page_id = ?", [(page_id,) for page_id in removed])
+            conn.execute(
+                "UPDATE watermarks SET reconciled_at = ? WHERE database_id = ?", (time.time(), key)
+            )
+
+        if removed:
+            forget_saved_content(removed)
+            logger.info(f"已从本地镜像中删除数据库 {database_id} 的 {len(removed)} 个页面")
+        return len(removed)
+
+    def refresh(self, database_id):
+        """
+        读取前同步最新变化，Notion 不可用时使用已有的本地数据
+
+        返回：
+            bool: 本地数据是否可用
+        """
+        try:
+            self.sync(database_id)
+        except Exception as e:
+            logger.warning(f"同步本地镜像时出错：{e}，使用已有的本地数据")
+        return self.is_ready(database_id)
+
+    def get_pages_created_since(self, database_id, since):
+        """
+        按 Created 属性查询某个时间之后创建的页面，按创建时间升序
+
+        参数：
+            database_id: 数据库 ID
+            since: datetime，无时区时按本地时间处理
+
+        返回：
+            list: 与 Notion 查询结果格式相同的页面对象（id、properties、created_time、last_edited_time）
+        """
+        rows = self.store.query(
+            "SELECT * FROM pages WHERE database_id = ? AND created_ts >= ? ORDER BY created_ts",
+            (normalize_id(database_id), since.timestamp()),
+        )
+        return [_page_from_row(row) for row in rows]
+
+    def get_stats(self):
+        """
+        获取每个数据库的页面数和上次同步时间
+
+        返回：
+            dict: 数据库 ID -> {"pages": 页面数, "synced_at": 时间戳}
+        """
+        counts = {
+            row["database_id"]: row["n"]
+            for row in self.store.query(
+                "SELECT database_id, COUNT(*) AS n FROM pages GROUP BY database_id"
+            )
+        }
+        synced = {
+            row["database_id"]: row["synced_at"]
+            for row in self.store.query("SELECT database_id, synced_at FROM watermarks")
+        }
+        return {
+            db: {"pages": counts.get(db, 0), "synced_at": synced.get(db)} for db in self.database_ids
+        }
+
+    def sync_all(self):
+        """同步所有数据库，到期时顺便清理已删除的页面"""
+        for key, database_id in self.database_ids.items():
+            try:
+                self.sync(database_id)
+                watermark = self.get_watermark(key) or {}
+                if time.time() - watermark.get("reconciled_at", 0) > NOTION_MIRROR_RECONCILE_INTERVAL:
+                    self.reconcile(database_id)
+            except Exception as e:
+                logger.warning(f"同步数据库 {database_id} 的本地镜像时出错：{e}")
+
+    def start(self):
+        """启动后台同步线程"""
+        if self._worker and self._worker.is_alive():
+            return
+        self._stop_event.clear()
+        self._worker = threading.Thread(target=self._run, name="notion-mirror", daemon=True)
+        self._worker.start()
+        logger.info("Notion 本地镜像后台同步已启动")
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self.sync_all()
+            self._stop_event.wait(NOTION_MIRROR_POLL_INTERVAL)
+
+
+def _page_from_row(row):
+    return {
+        "object": "page",
+        "id": row["page_id"],
+        "properties": json.loads(row["properties"]),
+        "created_time": row["created_time"],
+        "last_edited_time": row["last_edited_time"],
+        "url": row["url"],
+    }
+
+
+def get_notion_mirror():
+    """获取本地镜像单例"""
+    global _mirror_instance
+    if _mirror_instance is None:
+        with _instance_lock:
+            if _mirror_instance is None:
+                _mirror_instance = NotionMirror()
+    return _mirror_instance
+
+
+def record_page(page, database_id=None):
+    """把自己写入的页面记录到本地镜像，出错时只记录日志，不影响写入流程"""
+    if not page:
+        return
+    try:
+        get_notion_mirror().upsert_page(page, database_id)
+    except Exception as e:
+        logger.warning(f"更新本地镜像时出错：{e}")
+
+
+def start_notion_mirror():
+    """启动后台同步线程，出错时只记录日志"""
+    try:
+        get_notion_mirror().start()
+    except Exception as e:
+        logger.error(f"启动 Notion 本地镜像时出错：{e}")
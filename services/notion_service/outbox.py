@@ -0,0 +1,572 @@
+"""
+Notion 写入 outbox 模块
+
+每次创建页面或追加块之前先写入本地日志（SQLite），再尝试发送：
+1. 发送成功后记录标记为完成
+2. Notion 不可用（网络错误、限流、服务端错误）时记录保留在本地，调用方收到 NotionWriteDeferred，
+   不需要等待 Notion 恢复；流式内容的剩余部分也按批次写入日志
+3. 后台线程按退避策略重放到期的记录，每个通道（目标数据库或页面）内严格按写入顺序执行，
+   请求频率由上传器的 Notion 限流器控制；页面还有未写入的正文时，之后向该页面追加的块排在正文后面
+4. Notion 拒绝的请求（例如校验错误）不再重试，记录标记为 dead 并保留内容，在 /stats 中显示
+
+创建页面的记录可以指定 kind，重放成功后调用 register_replay_callback 注册的回调，
+例如更新搜索索引、安排 AI 分析。
+"""
+
+import json
+import logging
+import threading
+import time
+from itertools import chain
+
+from config import NOTION_OUTBOX_POLL_INTERVAL, NOTION_OUTBOX_RETRY_MAX_DELAY
+from utils.sqlite_store import SQLiteStore
+
+from .mirror import record_page
+from .schema import validate_page_properties
+from .uploader import UploadResult, get_block_uploader, is_transient_error, iter_upload_batches
+
+logger = logging.getLogger(__name__)
+
+OP_CREATE = "create"
+OP_APPEND = "append"
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_DEAD = "dead"  # Notion 拒绝的请求，保留内容但不再重试
+
+RETRY_BASE_DELAY = 10.0
+# 已完成记录的保留时间（秒）
+DONE_RETENTION = 7 * 24 * 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    lane TEXT NOT NULL,
+    op TEXT NOT NULL,
+    kind TEXT,
+    target TEXT,
+    depends_on INTEGER,
+    payload TEXT NOT NULL,
+    meta TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    page_id TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_status ON outbox (status, id);
+CREATE INDEX IF NOT EXISTS idx_outbox_lane ON outbox (lane, status, id);
+"""
+
+# 单例实例
+_outbox_instance = None
+_instance_lock = threading.Lock()
+
+# kind -> 回调列表，回调参数为 (page_id, meta)
+_replay_callbacks = {}
+
+
+class NotionWriteDeferred(Exception):
+    """Notion 暂时不可用，写入已保存到本地 outbox，恢复后自动重放"""
+
+    def __init__(self, entry_id, error=None):
+        self.entry_id = entry_id
+        self.error = error
+        super().__init__(f"Notion 暂时不可用，写入已保存到本地（记录 {entry_id}）：{error}")
+
+
+class NotionPageIncomplete(Exception):
+    """页面已创建，但生成后续内容时出错（例如网页下载中断），页面只有出错前的内容"""
+
+    def __init__(self, result, error):
+        self.result = result
+        self.error = error
+        super().__init__(f"页面 {result.page_id} 已创建，但内容不完整：{error}")
+
+    @property
+    def page_id(self):
+        return self.result.page_id
+
+
+def _stop_on_error(blocks, errors):
+    """生成块出错时结束迭代，异常保存在 errors 中"""
+    try:
+        yield from blocks
+    except Exception as e:
+        logger.error(f"生成 Notion 块时出错：{e}，之后的内容不会写入")
+        errors.append(e)
+
+
+def register_replay_callback(kind, callback):
+    """
+    注册创建页面的记录重放成功后的回调
+
+    参数：
+        kind: 记录类型，与 create_page 的 kind 参数对应
+        callback: 回调函数，参数为 (page_id, meta)
+    """
+    _replay_callbacks.setdefault(kind, []).append(callback)
+
+
+class NotionOutbox:
+    """Notion 写入的本地日志和后台重放"""
+
+    def __init__(self, store=None, uploader=None):
+        """
+        参数：
+            store: SQLiteStore 实例，默认使用 DATA_DIR/notion_outbox.db
+            uploader: BlockUploader 实例，默认使用单例
+        """
+        self.store = store or SQLiteStore("notion_outbox.db", SCHEMA)
+        self._uploader = uploader
+        self._worker = None
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+
+    @property
+    def uploader(self):
+        if self._uploader is None:
+            self._uploader = get_block_uploader()
+        return self._uploader
+
+    def _journal(self, lane, op, payload, status, kind=None, meta=None, target=None, depends_on=None):
+        now = time.time()
+        with self.store.transaction() as conn:
+            cursor = conn.execute(
+                """
+                INSERT INTO outbox (lane, op, kind, target, depends_on, payload, meta, status,
+                                    next_attempt_at, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    lane,
+                    op,
+                    kind,
+                    target,
+                    depends_on,
+                    json.dumps(payload, ensure_ascii=False),
+                    json.dumps(meta or {}, ensure_ascii=False),
+                    status,
+                    now,
+                    now,
+                    now,
+                ),
+            )
+            return cursor.lastrowid
+
+    def _lane_blocked(self, lane, entry_id):
+        """通道中是否还有更早的未写入记录"""
+        row = self.store.query_one(
+            "SELECT 1 FROM outbox WHERE lane = ? AND status = ? AND id < ? LIMIT 1",
+            (lane, STATUS_PENDING, entry_id),
+        )
+        return row is not None
+
+    def _append_lane(self, block_id):
+        """
+        追加块使用的通道：页面创建时剩余的块还没写入（它们在数据库的通道中）时，
+        排在这些记录后面，保证后追加的内容不会出现在页面正文之前
+        """
+        row = self.store.query_one(
+            """
+            SELECT lane FROM outbox
+            WHERE status IN (?, ?)
+              AND (target = ? OR depends_on IN (SELECT id FROM outbox WHERE page_id = ?))
+            ORDER BY id DESC LIMIT 1
+            """,
+            (STATUS_PENDING, STATUS_RUNNING, block_id, block_id),
+        )
+        return row["lane"] if row else block_id
+
+    def create_page(self, parent, properties, blocks=(), kind=None, meta=None):
+        """
+        记录并创建页面，第一批块随页面一起发送，其余块随后追加
+
+        参数：
+            parent: 父级，例如 {"database_id": ...}
+            properties: 页面属性
+            blocks: Notion 块，可以是生成器
+            kind: 记录类型，延迟写入的页面创建后调用该类型的回调
+            meta: 传给回调的数据
+
+        返回：
+            UploadResult: page_id 为新页面 ID；未能写入的块已保存，稍后重放的块数在 queued_blocks 中，
+                Notion 拒绝的块数在 dead_blocks 中
+
+        异常：
+            NotionWriteDeferred: Notion 不可用，整个页面已保存到 outbox
+            NotionPageIncomplete: 页面已创建，但 blocks 生成器出错，之后的内容没有写入
+            其他异常: Notion 拒绝创建页面
+        """
+        lane = parent.get("database_id") or parent.get("page_id") or ""
+        # 生成块时出错不中断上传：已生成的块照常写入，页面创建后再报告错误
+        errors = []
+        batches = iter_upload_batches(_stop_on_error(blocks, errors))
+        first_batch = next(batches, [])
+        payload = {"parent": parent, "properties": properties, "children": first_batch}
+        entry_id = self._journal(lane, OP_CREATE, payload, STATUS_RUNNING, kind=kind, meta=meta)
+
+        if self._lane_blocked(lane, entry_id):
+            # 前面的记录还没写入，新页面排在它们后面，保证同一数据库中的顺序
+            self._defer_rest(entry_id, lane, batches)
+            self._release(entry_id)
+            raise NotionWriteDeferred(entry_id, "前面还有等待写入的记录")
+
+        # 记录中保存原始属性，发送前才按数据库结构规范化（重放时也一样），
+        # 获取结构需要请求 Notion，不能放在写日志之前
+        properties = validate_page_properties(parent, properties)
+        try:
+            result = self.uploader.create_page(parent, properties, first_batch)
+        except Exception as e:
+            if not is_transient_error(e):
+                self._mark_dead(entry_id, e)
+                raise
+            self._defer_rest(entry_id, lane, batches)
+            self._mark_failed(entry_id, 1, e)
+            raise NotionWriteDeferred(entry_id, e) from e
+
+        record_page(result.page, parent.get("database_id"))
+        # 页面已创建：记录立即改为向该页面追加，之后无论出什么错都不会重放创建请求
+        self._mark_created(entry_id, result.page_id)
+
+        try:
+            if result.remaining:
+                result.remaining.extend(chain.from_iterable(batches))
+            else:
+                rest = self.uploader.append(result.page_id, chain.from_iterable(batches))
+                result.sent_blocks += rest.sent_blocks
+                result.requests += rest.requests
+                result.retries += rest.retries
+                result.remaining = rest.remaining
+                result.error = rest.error
+        finally:
+            self._complete(entry_id, 0, result)
+
+        if errors:
+            raise NotionPageIncomplete(result, errors[0]) from errors[0]
+        return result
+
+    def append_blocks(self, block_id, blocks):
+        """
+        记录并追加块
+
+        参数：
+            block_id: 页面或块 ID
+            blocks: Notion 块
+
+        返回：
+            UploadResult: 未能写入的块已保存，稍后重放的块数在 queued_blocks 中，
+                Notion 拒绝的块数在 dead_blocks 中
+        """
+        blocks = list(blocks)
+        lane = self._append_lane(block_id)
+        entry_id = self._journal(lane, OP_APPEND, {"children": blocks}, STATUS_RUNNING, target=block_id)
+
+        if self._lane_blocked(lane, entry_id):
+            self._release(entry_id)
+            result = UploadResult(block_id)
+            result.queued_blocks = len(blocks)
+            return result
+
+        result = self.uploader.append(block_id, blocks)
+        self._complete(entry_id, 0, result)
+        return result
+
+    def update_meta(self, entry_id, **values):
+        """补充记录的回调数据，例如延迟写入后才得到的分析内容"""
+        with self.store.transaction() as conn:
+            row = conn.execute("SELECT meta FROM outbox WHERE id = ?", (entry_id,)).fetchone()
+            if row is None:
+                return
+            meta = json.loads(row["meta"] or "{}")
+            meta.update(values)
+            conn.execute(
+                "UPDATE outbox SET meta = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(meta, ensure_ascii=False), time.time(), entry_id),
+            )
+
+    def pending_creates(self, kind):
+        """
+        还没有创建出页面的记录，调用方据此避免为同一内容再次创建页面
+
+        返回：
+            list: (记录 ID, meta) 列表，按写入顺序排列
+        """
+        rows = self.store.query(
+            "SELECT id, meta FROM outbox WHERE kind = ? AND op = ? AND status IN (?, ?) ORDER BY id",
+            (kind, OP_CREATE, STATUS_PENDING, STATUS_RUNNING),
+        )
+        return [(row["id"], json.loads(row["meta"] or "{}")) for row in rows]
+
+    def _defer_rest(self, entry_id, lane, batches):
+        """页面还没创建时，剩余的块逐批写入日志，追加到该页面"""
+        for batch in batches:
+            self._journal(lane, OP_APPEND, {"children": batch}, STATUS_PENDING, depends_on=entry_id)
+
+    def _mark_created(self, entry_id, page_id):
+        """页面已创建：记录改为向该页面追加（暂时没有块），中断后恢复时不会再次创建"""
+        with self.store.transaction() as conn:
+            conn.execute(
+                """
+                UPDATE outbox SET op = ?, target = ?, page_id = ?, payload = ?, updated_at = ?
+                WHERE id = ?
+                """,
+                (OP_APPEND, page_id, page_id, json.dumps({"children": []}), time.time(), entry_id),
+            )
+
+    def _release(self, entry_id):
+        with self.store.transaction() as conn:
+            conn.execute(
+                "UPDATE outbox SET status = ?, updated_at = ? WHERE id = ?",
+                (STATUS_PENDING, time.time(), entry_id),
+            )
+
+    def _mark_failed(self, entry_id, attempts, error):
+        """临时错误：按指数退避安排重放，不限制次数"""
+        delay = min(RETRY_BASE_DELAY * (2 ** (attempts - 1)), NOTION_OUTBOX_RETRY_MAX_DELAY)
+        now = time.time()
+        with self.store.transaction() as conn:
+            conn.execute(
+                """
+                UPDATE outbox
+                SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, updated_at = ?
+                WHERE id = ?
+                """,
+                (STATUS_PENDING, attempts, now + delay, str(error)[:2000], now, entry_id),
+            )
+        logger.warning(f"Notion 写入记录 {entry_id} 失败：{error}，{delay:.0f} 秒后重放")
+
+    def _mark_dead(self, entry_id, error):
+        with self.store.transaction() as conn:
+            conn.execute(
+                "UPDATE outbox SET status = ?, last_error = ?, updated_at = ? WHERE id = ?",
+                (STATUS_DEAD, str(error)[:2000], time.time(), entry_id),
+            )
+        logger.error(f"Notion 拒绝写入记录 {entry_id}：{error}，内容保留在 outbox 中")
+
+    def _complete(self, entry_id, attempts, result):
+        """
+        根据上传结果更新记录：页面已创建但有块未写入时，记录改为向该页面追加剩余的块
+
+        返回：
+            bool: 同一通道的后续记录是否可以继续执行
+        """
+        now = time.time()
+        if not result.remaining:
+            with self.store.transaction() as conn:
+                conn.execute(
+                    """
+                    UPDATE outbox SET status = ?, page_id = ?, last_error = NULL, updated_at = ?
+                    WHERE id = ?
+                    """,
+                    (STATUS_DONE, result.page_id, now, entry_id),
+                )
+            return True
+
+        with self.store.transaction() as conn:
+            conn.execute(
+                """
+                UPDATE outbox SET op = ?, target = ?, page_id = ?, payload = ?, updated_at = ?
+                WHERE id = ?
+                """,
+                (
+                    OP_APPEND,
+                    result.page_id,
+                    result.page_id,
+                    json.dumps({"children": result.remaining}, ensure_ascii=False),
+                    now,
+                    entry_id,
+                ),
+            )
+
+        blocks = len(result.remaining)
+        result.remaining = []
+        if is_transient_error(result.error):
+            result.queued_blocks = blocks
+            self._mark_failed(entry_id, attempts + 1, result.error)
+            return False
+        result.dead_blocks = blocks
+        self._mark_dead(entry_id, result.error)
+        return True
+
+    def _claim(self, entry_id):
+        with self.store.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE outbox SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (STATUS_RUNNING, time.time(), entry_id, STATUS_PENDING),
+            )
+        return cursor.rowcount == 1
+
+    def _replay(self, entry_id):
+        """
+        重放一条记录
+
+        返回：
+            bool: 同一通道的后续记录是否可以继续执行
+        """
+        row = self.store.query_one("SELECT * FROM outbox WHERE id = ?", (entry_id,))
+        payload = json.loads(row["payload"])
+        attempts = row["attempts"]
+
+        try:
+            if row["op"] == OP_CREATE:
+                result = self.uploader.create_page(
+                    payload["parent"],
+                    validate_page_properties(payload["parent"], payload["properties"]),
+                    payload["children"],
+                )
+                record_page(result.page, payload["parent"].get("database_id"))
+            else:
+                target = row["target"]
+                if not target:
+                    parent = self.store.query_one(
+                        "SELECT status, page_id FROM outbox WHERE id = ?", (row["depends_on"],)
+                    )
+                    if parent is None or not parent["page_id"]:
+                        if parent is not None and parent["status"] != STATUS_DEAD:
+                            # 页面还没创建（正常情况下不会出现，创建记录排在前面）
+                            self._release(entry_id)
+                            return False
+                        self._mark_dead(entry_id, "所属页面创建失败")
+                        return True
+                    target = parent["page_id"]
+                result = self.uploader.append(target, payload["children"])
+        except Exception as e:
+            if is_transient_error(e):
+                self._mark_failed(entry_id, attempts + 1, e)
+                return False
+            self._mark_dead(entry_id, e)
+            return True
+
+        can_continue = self._complete(entry_id, attempts, result)
+        if row["op"] == OP_CREATE:
+            self._run_callbacks(row["kind"], result.page_id, json.loads(row["meta"] or "{}"))
+        logger.info(f"已重放 Notion 写入记录 {entry_id}（{row['op']}）")
+        return can_continue
+
+    @staticmethod
+    def _run_callbacks(kind, page_id, meta):
+        for callback in _replay_callbacks.get(kind, []):
+            try:
+                callback(page_id, meta)
+            except Exception as e:
+                logger.error(f"执行 {kind} 记录的重放回调时出错：{e}")
+
+    def replay_due(self):
+        """
+        按通道顺序重放到期的记录，某条记录因临时错误失败时跳过该通道的后续记录
+
+        返回：
+            int: 重放的记录数
+        """
+        rows = self.store.query(
+            "SELECT id, lane, next_attempt_at FROM outbox WHERE status = ? ORDER BY id",
+            (STATUS_PENDING,),
+        )
+        now = time.time()
+        blocked_lanes = set()
+        replayed = 0
+
+        for row in rows:
+            lane = row["lane"]
+            if lane in blocked_lanes:
+                continue
+            if row["next_attempt_at"] > now or not self._claim(row["id"]):
+                blocked_lanes.add(lane)
+                continue
+            if not self._replay(row["id"]):
+                blocked_lanes.add(lane)
+            replayed += 1
+
+        return replayed
+
+    def recover(self):
+        """
+        将上次运行时中断的记录恢复为待写入状态
+
+        返回：
+            int: 恢复的记录数
+        """
+        with self.store.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE outbox SET status = ?, next_attempt_at = ?, updated_at = ? WHERE status = ?",
+                (STATUS_PENDING, time.time(), time.time(), STATUS_RUNNING),
+            )
+        if cursor.rowcount:
+            logger.info(f"恢复了 {cursor.rowcount} 条未完成的 Notion 写入记录")
+        return cursor.rowcount
+
+    def purge_done(self, retention=DONE_RETENTION):
+        """清理过期的已完成记录"""
+        with self.store.transaction() as conn:
+            conn.execute(
+                "DELETE FROM outbox WHERE status = ? AND updated_at < ?",
+                (STATUS_DONE, time.time() - retention),
+            )
+
+    def get_stats(self):
+        """
+        获取各状态的记录数量，以及最早的待写入记录已等待的时间
+
+        返回：
+            dict: 状态 -> 数量，oldest_pending_age -> 秒
+        """
+        rows = self.store.query("SELECT status, COUNT(*) AS n FROM outbox GROUP BY status")
+        stats = {row["status"]: row["n"] for row in rows}
+        oldest = self.store.query_one(
+            "SELECT MIN(created_at) AS created_at FROM outbox WHERE status = ?", (STATUS_PENDING,)
+        )
+        stats["oldest_pending_age"] = (
+            time.time() - oldest["created_at"] if oldest and oldest["created_at"] else 0.0
+        )
+        return stats
+
+    def start(self):
+        """恢复中断的记录并启动后台重放线程"""
+        self.recover()
+        if self._worker and self._worker.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._worker = threading.Thread(target=self._run, name="notion-outbox", daemon=True)
+        self._worker.start()
+        logger.info("Notion outbox 后台线程已启动")
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def _run(self):
+        last_purge = 0.0
+        while not self._stop_event.is_set():
+            try:
+                self.replay_due()
+                if time.time() - last_purge > 3600:
+                    self.purge_done()
+                    last_purge = time.time()
+            except Exception as e:
+                logger.error(f"重放 Notion outbox 时出错：{e}")
+            self._wake_event.wait(NOTION_OUTBOX_POLL_INTERVAL)
+            self._wake_event.clear()
+
+
+def get_notion_outbox():
+    """获取 Notion outbox 单例"""
+    global _outbox_instance
+    if _outbox_instance is None:
+        with _instance_lock:
+            if _outbox_instance is None:
+                _outbox_instance = NotionOutbox()
+    return _outbox_instance
+
+
+def start_notion_outbox():
+    """启动后台重放线程，出错时只记录日志"""
+    try:
+        get_notion_outbox().start()
+    except Exception as e:
+        logger.error(f"启动 Notion outbox 时出错：{e}")
@@ -0,0 +1,206 @@
+"""
+Notion 页面内容读取模块
+
+读取页面正文并提取为纯文本，供周报、内容预览等只需要文本的功能使用：
+1. 多个页面并发读取，请求频率由 Notion 限流器控制
+2. 自动翻页并进入子块（列表、折叠块等），提取的文本达到字符预算后立即停止，不读取剩余的块
+3. 提取结果按 (page_id, last_edited_time) 缓存在本地，页面没有再编辑时不会重复读取
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import NOTION_PAGE_FETCH_WORKERS
+from utils.sqlite_store import SQLiteStore
+
+from .client import notion
+from .query import call_with_retry
+
+logger = logging.getLogger(__name__)
+
+# 默认的字符预算，周报摘要和内容预览都只用到开头的一部分
+DEFAULT_MAX_CHARS = 2000
+
+# 子页面和子数据库是独立的页面，不计入父页面的内容
+SKIPPED_CHILD_TYPES = frozenset(("child_page", "child_database"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS page_text (
+    page_id TEXT PRIMARY KEY,
+    last_edited_time TEXT NOT NULL,
+    text TEXT NOT NULL,
+    max_chars INTEGER NOT NULL,
+    complete INTEGER NOT NULL,
+    fetched_at REAL NOT NULL
+);
+"""
+
+# 单例实例
+_service_instance = None
+_instance_lock = threading.Lock()
+
+
+class PageContentService:
+    """
+    页面纯文本读取服务
+
+    用法：
+        texts = get_page_content_service().get_texts(pages)  # pages 为数据库查询返回的页面对象
+        text = get_page_content_service().get_text(page_id, last_edited_time)
+    """
+
+    def __init__(self, store=None, max_workers=NOTION_PAGE_FETCH_WORKERS):
+        self.store = store or SQLiteStore("page_text.db", SCHEMA)
+        if store is not None:
+            # 使用其他模块的数据库文件时，在其中创建本模块的表
+            with self.store.transaction() as conn:
+                conn.executescript(SCHEMA)
+        self.max_workers = max_workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def get_text(self, page_id, last_edited_time=None, max_chars=DEFAULT_MAX_CHARS):
+        """
+        获取页面正文的纯文本
+
+        参数：
+            page_id: 页面 ID
+            last_edited_time: 页面的最后编辑时间，为空时不使用缓存
+            max_chars: 字符预算，超过时截断
+
+        返回：
+            str: 页面文本，读取失败时返回空字符串
+        """
+        if last_edited_time:
+            cached = self._lookup(page_id, last_edited_time, max_chars)
+            if cached is not None:
+                return cached
+
+        try:
+            text, complete = self._fetch(page_id, max_chars)
+        except Exception as e:
+            logger.warning(f"读取页面 {page_id} 的内容时出错：{e}")
+            return ""
+
+        if last_edited_time:
+            self._save(page_id, last_edited_time, text, max_chars, complete)
+        return text
+
+    def get_texts(self, pages, max_chars=DEFAULT_MAX_CHARS):
+        """
+        并发获取多个页面的纯文本，已缓存且没有再编辑的页面不会请求 Notion
+
+        参数：
+            pages: 页面对象列表，需要包含 id 和 last_edited_time
+            max_chars: 每个页面的字符预算
+
+        返回：
+            dict: page_id -> 文本
+        """
+        texts = {}
+        missing = []
+        for page in pages:
+            cached = self._lookup(page["id"], page.get("last_edited_time"), max_chars)
+            if cached is None:
+                missing.append(page)
+            else:
+                texts[page["id"]] = cached
+
+        if missing:
+            started = time.perf_counter()
+            results = self._get_executor().map(
+                lambda page: self.get_text(page["id"], page.get("last_edited_time"), max_chars),
+                missing,
+            )
+            for page, text in zip(missing, results):
+                texts[page["id"]] = text
+            logger.info(
+                f"读取了 {len(missing)} 个页面的内容（{len(texts) - len(missing)} 个使用缓存），"
+                f"耗时 {time.perf_counter() - started:.2f} 秒"
+            )
+        return texts
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="notion-page"
+                    )
+        return self._executor
+
+    def _lookup(self, page_id, last_edited_time, max_chars):
+        """缓存中的文本；页面已编辑过或缓存的预算不够时返回 None"""
+        if not last_edited_time:
+            return None
+        row = self.store.query_one(
+            "SELECT text, max_chars, complete FROM page_text WHERE page_id = ? AND last_edited_time = ?",
+            (page_id, last_edited_time),
+        )
+        if row is None or (not row["complete"] and row["max_chars"] < max_chars):
+            return None
+        return row["text"][:max_chars]
+
+    def _save(self, page_id, last_edited_time, text, max_chars, complete):
+        with self.store.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO page_text "
+                "(page_id, last_edited_time, text, max_chars, complete, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (page_id, last_edited_time, text, max_chars, int(complete), time.time()),
+            )
+
+    def _fetch(self, page_id, max_chars):
+        """
+        按文档顺序读取页面的块并提取文本，达到字符预算后停止
+
+        返回：
+            tuple: (文本, 是否已读完整个页面)
+        """
+        # 避免循环导入，延迟导入
+        from .database.common import extract_notion_block_content
+
+        parts = []
+        size = 0
+
+        def walk(block_id, depth):
+            nonlocal size
+            cursor = None
+            while True:
+                kwargs = {"block_id": block_id, "page_size": 100}
+                if cursor:
+                    kwargs["start_cursor"] = cursor
+                response = call_with_retry(notion.blocks.children.list, **kwargs)
+
+                for block in response.get("results", []):
+                    text = extract_notion_block_content([block])
+                    if text:
+                        parts.append("  " * depth + text)
+                        size += len(parts[-1]) + 1
+                        if size >= max_chars:
+                            return False
+                    if block.get("has_children") and block.get("type") not in SKIPPED_CHILD_TYPES:
+                        if not walk(block["id"], depth + 1):
+                            return False
+
+                if not response.get("has_more"):
+                    return True
+                cursor = response.get("next_cursor")
+
+        complete = walk(page_id, 0)
+        return "\n".join(parts)[:max_chars], complete
+
+
+def get_page_content_service():
+    """获取页面内容读取服务单例"""
+    global _service_instance
+    if _service_instance is None:
+        with _instance_lock:
+            if _service_instance is None:
+                # 与本地镜像使用同一个数据库文件，页面属性和正文文本可以一起查询
+                from .mirror import get_notion_mirror
+
+                _service_instance = PageContentService(store=get_notion_mirror().store)
+    return _service_instance
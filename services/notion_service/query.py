@@ -0,0 +1,151 @@
+"""
+Notion 数据库查询模块
+
+iter_database_query 按 next_cursor 逐页查询数据库，以生成器的形式逐条返回页面：
+1. 调用方处理当前页时，后台线程已经在请求下一页
+2. filter_properties 只返回需要的属性，属性名按缓存的数据库结构转换为属性 ID，减小响应大小
+3. 请求经过 Notion 限流器，临时错误（网络错误、限流、服务端错误）按退避重试
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+
+from config import NOTION_UPLOAD_MAX_ATTEMPTS
+
+from .client import notion, notion_limiter
+from .schema import get_schema_cache
+from .uploader import get_retry_delay, is_transient_error
+
+logger = logging.getLogger(__name__)
+
+MAX_PAGE_SIZE = 100
+
+# 预取下一页的线程池，在第一次查询时创建
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="notion-query")
+    return _executor
+
+
+def _resolve_property_ids(database_id, names):
+    """把属性名转换为属性 ID，获取不到数据库结构时使用属性名"""
+    schema = get_schema_cache().get(database_id)
+    if schema is None:
+        return list(names)
+
+    ids = []
+    for name in names:
+        prop = schema.properties.get(name)
+        if prop is None:
+            logger.debug(f"数据库 {database_id} 中没有属性 {name}，查询时忽略")
+            continue
+        # Notion 返回的属性 ID 已经过 URL 编码，作为查询参数发送时会再编码一次
+        ids.append(unquote(prop["id"]) if prop.get("id") else name)
+    return ids
+
+
+def call_with_retry(func, **kwargs):
+    """经过 Notion 限流器发送一个读取请求，临时错误按退避重试，其他错误直接抛出"""
+    attempt = 1
+    while True:
+        notion_limiter.wait_if_limited()
+        try:
+            return func(**kwargs)
+        except Exception as e:
+            if attempt >= NOTION_UPLOAD_MAX_ATTEMPTS or not is_transient_error(e):
+                raise
+            delay = get_retry_delay(e, attempt)
+            logger.warning(f"Notion 请求失败（第 {attempt} 次）：{e}，{delay:.1f} 秒后重试")
+            attempt += 1
+            time.sleep(delay)
+
+
+def query_database(
+    database_id, filter=None, sorts=None, start_cursor=None, page_size=MAX_PAGE_SIZE, property_ids=None
+):
+    """
+    查询数据库的一页结果
+
+    参数：
+        database_id: 数据库 ID
+        filter: 过滤条件
+        sorts: 排序条件
+        start_cursor: 上一页返回的 next_cursor
+        page_size: 每页条数，最多 100
+        property_ids: 只返回这些属性（属性 ID）
+
+    返回：
+        dict: Notion 返回的查询结果
+    """
+    body = {"page_size": min(page_size, MAX_PAGE_SIZE)}
+    if filter:
+        body["filter"] = filter
+    if sorts:
+        body["sorts"] = sorts
+    if start_cursor:
+        body["start_cursor"] = start_cursor
+    query = {"filter_properties": property_ids} if property_ids else None
+
+    return call_with_retry(
+        notion.request, path=f"databases/{database_id}/query", method="POST", query=query, body=body
+    )
+
+
+def iter_database_query(
+    database_id,
+    filter=None,
+    sorts=None,
+    filter_properties=None,
+    page_size=MAX_PAGE_SIZE,
+    prefetch=True,
+):
+    """
+    逐条返回数据库查询结果，自动翻页
+
+    参数：
+        database_id: 数据库 ID
+        filter: 过滤条件
+        sorts: 排序条件
+        filter_properties: 只返回这些属性（属性名），为空时返回全部属性
+        page_size: 每页条数，最多 100
+        prefetch: 处理当前页时是否提前请求下一页；只需要第一条结果时设为 False
+
+    返回：
+        generator: Notion 页面对象
+    """
+    property_ids = _resolve_property_ids(database_id, filter_properties) if filter_properties else None
+
+    def fetch(cursor):
+        return query_database(database_id, filter, sorts, cursor, page_size, property_ids)
+
+    response = fetch(None)
+    pages = 1
+    while True:
+        pending = None
+        if response.get("has_more") and prefetch:
+            pending = _get_executor().submit(fetch, response.get("next_cursor"))
+
+        try:
+            yield from response.get("results", [])
+        except GeneratorExit:
+            # 调用方提前结束迭代，还没开始的预取请求不再发送
+            if pending is not None:
+                pending.cancel()
+            raise
+
+        if not response.get("has_more"):
+            break
+        response = pending.result() if pending is not None else fetch(response.get("next_cursor"))
+        pages += 1
+
+    logger.debug(f"查询数据库 {database_id} 共请求 {pages} 页")
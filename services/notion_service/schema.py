@@ -0,0 +1,276 @@
+"""
+Notion 数据库结构缓存模块
+
+按数据库 ID 缓存 databases.retrieve 返回的属性定义：
+1. 缓存在 NOTION_SCHEMA_CACHE_TTL 秒内有效，过期后下次使用时重新获取
+2. Notion 返回校验错误（例如属性被改名或删除）时立即失效，下次写入前重新获取
+3. 创建和更新页面前按缓存的结构在本地校验并规范化属性：
+   - 数据库中不存在的属性直接丢弃，标题属性按数据库实际的标题属性名写入
+   - 文本按 2000 个字符拆分，多选项名称去掉逗号并截断到 100 个字符，去重
+   这样不会因为一个属性不匹配而浪费一次失败的写入
+获取结构失败时（例如 Notion 不可用）不做校验，按原样发送；失败会缓存 SCHEMA_FAILURE_TTL 秒，
+这段时间内的写入不再等待 databases.retrieve
+"""
+
+import logging
+import threading
+import time
+
+from config import NOTION_SCHEMA_CACHE_TTL
+
+from .client import notion, notion_limiter
+
+logger = logging.getLogger(__name__)
+
+# Notion API 对属性值的限制
+MAX_TEXT_LENGTH = 2000  # 单个富文本对象的字符数
+MAX_RICH_TEXT_ITEMS = 100  # 富文本数组的元素数
+MAX_OPTION_LENGTH = 100  # 选项名称的字符数
+MAX_URL_LENGTH = 2000
+
+TEXT_TYPES = ("title", "rich_text")
+OPTION_TYPES = ("select", "multi_select")
+
+# 获取结构失败后，在这段时间（秒）内直接返回 None，不再请求
+SCHEMA_FAILURE_TTL = 30
+
+# 单例实例
+_cache_instance = None
+_instance_lock = threading.Lock()
+
+
+def is_validation_error(error):
+    """是否为 Notion 的请求校验错误"""
+    return getattr(error, "code", None) == "validation_error" or getattr(error, "status", None) == 400
+
+
+def _value_type(value):
+    """属性值的类型，例如 {"rich_text": [...]} 为 rich_text"""
+    if "type" in value:
+        return value["type"]
+    return next((key for key in value if key != "id"), None)
+
+
+def _normalize_text(items):
+    """把富文本数组中过长的文本拆分为多个对象，并限制数组长度"""
+    normalized = []
+    for item in items or []:
+        text = item.get("text")
+        if not text or len(text.get("content", "")) <= MAX_TEXT_LENGTH:
+            normalized.append(item)
+            continue
+        content = text["content"]
+        for start in range(0, len(content), MAX_TEXT_LENGTH):
+            part = dict(item)
+            part["text"] = dict(text, content=content[start : start + MAX_TEXT_LENGTH])
+            normalized.append(part)
+    if len(normalized) > MAX_RICH_TEXT_ITEMS:
+        logger.warning(f"富文本超过 {MAX_RICH_TEXT_ITEMS} 个元素，已截断")
+    return normalized[:MAX_RICH_TEXT_ITEMS]
+
+
+def normalize_option_name(name):
+    """规范化选项名称：Notion 不接受逗号，名称最长 100 个字符"""
+    return " ".join(str(name).replace(",", " ").split())[:MAX_OPTION_LENGTH]
+
+
+def _normalize_options(options):
+    names = []
+    for option in options or []:
+        name = normalize_option_name(option.get("name", ""))
+        if name and name not in names:
+            names.append(name)
+    return [{"name": name} for name in names]
+
+
+class DatabaseSchema:
+    """一个数据库的属性定义"""
+
+    def __init__(self, database_id, properties, fetched_at=None):
+        self.database_id = database_id
+        self.properties = properties  # 属性名 -> 属性定义
+        self.fetched_at = fetched_at or time.time()
+        self.title_property = next(
+            (name for name, prop in properties.items() if prop.get("type") == "title"), None
+        )
+
+    def has_property(self, name):
+        return name in self.properties
+
+    def property_type(self, name):
+        prop = self.properties.get(name)
+        return prop.get("type") if prop else None
+
+    def normalize(self, properties):
+        """
+        按数据库结构校验并规范化页面属性
+
+        参数：
+            properties: 要写入的页面属性
+
+        返回：
+            dict: 规范化后的属性，不能写入的属性已丢弃
+        """
+        normalized = {}
+        for name, value in properties.items():
+            value_type = _value_type(value)
+            if value_type == "title" and self.title_property:
+                # 标题属性在不同数据库中的名称可能不同（Name、标题……）
+                name = self.title_property
+
+            schema_type = self.property_type(name)
+            if schema_type is None:
+                logger.warning(f"数据库 {self.database_id} 中没有属性 {name}，已跳过")
+                continue
+
+            if schema_type != value_type:
+                if schema_type in TEXT_TYPES and value_type in TEXT_TYPES:
+                    value = {schema_type: value[value_type]}
+                elif schema_type in OPTION_TYPES and value_type in OPTION_TYPES:
+                    options = value[value_type]
+                    if isinstance(options, dict):
+                        options = [options]
+                    if schema_type == "select":
+                        options = options[:1]
+                        value = {"select": options[0] if options else None}
+                    else:
+                        value = {"multi_select": options or []}
+                else:
+                    logger.warning(
+                        f"属性 {name} 的类型为 {schema_type}，不能写入 {value_type}，已跳过"
+                    )
+                    continue
+
+            normalized[name] = self._normalize_value(schema_type, value)
+        return normalized
+
+    @staticmethod
+    def _normalize_value(prop_type, value):
+        if prop_type in TEXT_TYPES:
+            return {prop_type: _normalize_text(value[prop_type])}
+        if prop_type == "multi_select":
+            return {"multi_select": _normalize_options(value["multi_select"])}
+        if prop_type == "select":
+            options = _normalize_options([value["select"]] if value["select"] else [])
+            return {"select": options[0] if options else None}
+        if prop_type == "url":
+            url = value["url"] or None
+            if url and len(url) > MAX_URL_LENGTH:
+                logger.warning(f"URL 超过 {MAX_URL_LENGTH} 个字符，已跳过：{url[:100]}...")
+                url = None
+            return {"url": url}
+        return value
+
+
+class SchemaCache:
+    """按数据库 ID 缓存数据库结构"""
+
+    def __init__(self, ttl=NOTION_SCHEMA_CACHE_TTL, failure_ttl=SCHEMA_FAILURE_TTL):
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self._schemas = {}
+        self._failures = {}  # 数据库 ID -> 最近一次获取失败的时间
+        self._lock = threading.Lock()
+
+    def get(self, database_id):
+        """
+        获取数据库结构，缓存过期时重新获取
+
+        请求在锁外发送，一个数据库的请求变慢不会阻塞其他数据库的写入
+
+        返回：
+            DatabaseSchema: 数据库结构，获取失败时返回 None
+        """
+        if not database_id:
+            return None
+
+        now = time.time()
+        with self._lock:
+            schema = self._schemas.get(database_id)
+            if schema and now - schema.fetched_at < self.ttl:
+                return schema
+            if now - self._failures.get(database_id, 0) < self.failure_ttl:
+                return None
+
+        try:
+            notion_limiter.wait_if_limited()
+            database = notion.databases.retrieve(database_id=database_id)
+        except Exception as e:
+            logger.warning(f"获取数据库 {database_id} 的结构时出错：{e}")
+            with self._lock:
+                self._failures[database_id] = time.time()
+            return None
+
+        schema = DatabaseSchema(database_id, database.get("properties", {}))
+        with self._lock:
+            self._schemas[database_id] = schema
+            self._failures.pop(database_id, None)
+        return schema
+
+    def invalidate(self, database_id=None):
+        """使缓存失效，不指定数据库时清空全部缓存"""
+        with self._lock:
+            if database_id is None:
+                self._schemas.clear()
+                self._failures.clear()
+            else:
+                self._schemas.pop(database_id, None)
+                self._failures.pop(database_id, None)
+
+
+def get_schema_cache():
+    """获取数据库结构缓存单例"""
+    global _cache_instance
+    if _cache_instance is None:
+        with _instance_lock:
+            if _cache_instance is None:
+                _cache_instance = SchemaCache()
+    return _cache_instance
+
+
+def validate_page_properties(parent, properties):
+    """
+    按父级数据库的结构规范化页面属性，父级不是数据库或获取结构失败时原样返回
+
+    参数：
+        parent: 父级，例如 {"database_id": ...}
+        properties: 页面属性
+
+    返回：
+        dict: 规范化后的属性
+    """
+    schema = get_schema_cache().get((parent or {}).get("database_id"))
+    if schema is None:
+        return properties
+    return schema.normalize(properties)
+
+
+def update_page_properties(database_id, page_id, properties):
+    """
+    校验后更新页面属性，Notion 返回校验错误时使结构缓存失效
+
+    参数：
+        database_id: 页面所在的数据库 ID
+        page_id: 页面 ID
+        properties: 要更新的属性
+
+    返回：
+        dict: 实际发送的属性，全部被丢弃时不发送请求
+    """
+    properties = validate_page_properties({"database_id": database_id}, properties)
+    if not properties:
+        return properties
+
+    notion_limiter.wait_if_limited()
+    try:
+        page = notion.pages.update(page_id=page_id, properties=properties)
+    except Exception as e:
+        if is_validation_error(e):
+            get_schema_cache().invalidate(database_id)
+        raise
+
+    # 避免循环导入，延迟导入
+    from .mirror import record_page
+
+    record_page(page, database_id)
+    return properties
@@ -0,0 +1,412 @@
+"""
+已保存内容的全文搜索索引
+
+为 /search 命令在本地 SQLite FTS5 中索引笔记、论文和待办事项的标题、标签、摘要、正文和链接：
+1. 创建笔记、论文、待办事项以及 AI 分析更新页面时同步写入，Notion 不可用时由重放回调写入
+2. 第一次启用时在后台从 Notion 导入已有页面一次，正文由 page_content 模块并发读取
+3. FTS5 的 unicode61 分词器不切分中文，写入和查询前都用 entry_index.tokenize 预先切分为词元，
+   中日韩文字按二元组索引
+4. 结果按 bm25 排序（标题、标签的权重高于摘要和正文），摘要片段从原文中截取并标出命中的关键词
+
+索引保存在 DATA_DIR/search_index.db 中，搜索全部在本地完成，不调用 Notion 搜索接口。
+"""
+
+import html
+import json
+import logging
+import re
+import threading
+import time
+
+from config import (
+    NOTION_DATABASE_ID,
+    NOTION_PAPERS_DATABASE_ID,
+    NOTION_TODO_DATABASE_ID,
+    SEARCH_CONTENT_LENGTH,
+)
+from utils.sqlite_store import SQLiteStore
+
+from .entry_index import KIND_NOTE, KIND_PAPER, entry_from_page, to_timestamp, tokenize
+from .query import iter_database_query
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    page_id TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    summary TEXT NOT NULL DEFAULT '',
+    tags TEXT NOT NULL DEFAULT '[]',
+    content TEXT NOT NULL DEFAULT '',
+    url TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    title, tags, summary, content, url, tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# 待办事项，由 database.todo 创建
+KIND_TODO = "todo"
+
+# bm25 的字段权重，顺序与 documents_fts 的列相同
+FIELD_WEIGHTS = (10.0, 5.0, 3.0, 1.0, 0.5)
+
+# 摘要片段在命中位置前后保留的字符数
+SNIPPET_CONTEXT = 60
+
+# 从 Notion 导入时每批读取正文的页面数
+BACKFILL_BATCH_SIZE = 50
+
+# 单例实例
+_index_instance = None
+_instance_lock = threading.Lock()
+
+
+def _index_text(text):
+    """把文本切分为词元后用空格连接，写入 FTS5 列"""
+    return " ".join(tokenize(text))
+
+
+def build_match_query(query):
+    """
+    把用户输入转换为 FTS5 查询表达式
+
+    所有词元都必须命中；最后一个词元和单个中文字按前缀匹配（单字可以命中以它开头的二元组）
+
+    返回：
+        str: FTS5 查询表达式，没有可搜索的词元时返回空字符串
+    """
+    tokens = list(dict.fromkeys(tokenize(query)))
+    terms = []
+    for i, token in enumerate(tokens):
+        term = '"' + token.replace('"', '""') + '"'
+        if i == len(tokens) - 1 or len(token) == 1:
+            term += "*"
+        terms.append(term)
+    return " AND ".join(terms)
+
+
+def build_snippet(text, query, context=SNIPPET_CONTEXT):
+    """
+    截取原文中第一个命中位置附近的片段，转义为 HTML 并加粗命中的关键词
+
+    参数：
+        text: 原文
+        query: 用户输入的查询
+        context: 命中位置前后保留的字符数
+
+    返回：
+        str: HTML 片段，没有命中时返回空字符串
+    """
+    words = sorted({w for w in query.split() if w}, key=len, reverse=True)
+    if not text or not words:
+        return ""
+    pattern = re.compile("|".join(re.escape(w) for w in words), re.IGNORECASE)
+    match = pattern.search(text)
+    if match is None:
+        return ""
+
+    start = max(0, match.start() - context)
+    end = min(len(text), match.end() + context)
+    fragment = " ".join(text[start:end].split())
+
+    parts = []
+    last = 0
+    for m in pattern.finditer(fragment):
+        parts.append(html.escape(fragment[last : m.start()]))
+        parts.append(f"<b>{html.escape(m.group())}</b>")
+        last = m.end()
+    parts.append(html.escape(fragment[last:]))
+
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if end < len(text) else ""
+    return prefix + "".join(parts) + suffix
+
+
+class SearchIndex:
+    """
+    SQLite FTS5 全文索引
+
+    用法：
+        index = get_search_index()
+        index.add(page_id, KIND_NOTE, title, summary, tags, content, url, created_at)
+        total, results = index.search("关键词", offset=0, limit=5)
+    """
+
+    def __init__(self, store=None):
+        self.store = store or SQLiteStore("search_index.db", SCHEMA)
+
+    def add(
+        self, page_id, kind, title, summary="", tags=(), content="", url="", created_at=None
+    ):
+        """
+        写入或替换一个条目
+
+        参数：
+            page_id: Notion 页面 ID
+            kind: 条目类型（KIND_NOTE、KIND_PAPER、KIND_TODO）
+            title: 标题
+            summary: 摘要
+            tags: 标签列表
+            content: 正文，只保留开头 SEARCH_CONTENT_LENGTH 个字符
+            url: 原文链接
+            created_at: 创建时间（datetime、ISO 字符串或时间戳）
+        """
+        title = title or ""
+        summary = summary or ""
+        tags = list(tags or [])
+        content = (content or "")[:SEARCH_CONTENT_LENGTH]
+        url = url or ""
+
+        with self.store.transaction() as conn:
+            conn.execute(
+                "INSERT INTO documents (page_id, kind, title, summary, tags, content, url, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(page_id) DO UPDATE SET kind = excluded.kind, title = excluded.title, "
+                "summary = excluded.summary, tags = excluded.tags, content = excluded.content, "
+                "url = excluded.url, created_at = excluded.created_at",
+                (
+                    page_id,
+                    kind,
+                    title,
+                    summary,
+                    json.dumps(tags, ensure_ascii=False),
+                    content,
+                    url,
+                    to_timestamp(created_at),
+                ),
+            )
+            rowid = conn.execute(
+                "SELECT id FROM documents WHERE page_id = ?", (page_id,)
+            ).fetchone()["id"]
+            conn.execute("DELETE FROM documents_fts WHERE rowid = ?", (rowid,))
+            conn.execute(
+                "INSERT INTO documents_fts (rowid, title, tags, summary, content, url) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    rowid,
+                    _index_text(title),
+                    _index_text(" ".join(tags)),
+                    _index_text(summary),
+                    _index_text(content),
+                    _index_text(url),
+                ),
+            )
+
+    def update(self, page_id, title=None, summary=None, tags=None, content=None):
+        """
+        更新已有条目的部分字段，条目不存在时忽略
+
+        参数：
+            page_id: Notion 页面 ID
+            title: 新标题，None 表示不修改
+            summary: 新摘要，None 表示不修改
+            tags: 新标签列表，None 表示不修改
+            content: 新正文，None 表示不修改
+        """
+        row = self.store.query_one("SELECT * FROM documents WHERE page_id = ?", (page_id,))
+        if row is None:
+            return
+        self.add(
+            page_id,
+            row["kind"],
+            title or row["title"],
+            row["summary"] if summary is None else summary,
+            json.loads(row["tags"]) if tags is None else tags,
+            row["content"] if content is None else content,
+            row["url"],
+            row["created_at"],
+        )
+
+    def remove(self, page_id):
+        """删除条目"""
+        with self.store.transaction() as conn:
+            row = conn.execute("SELECT id FROM documents WHERE page_id = ?", (page_id,)).fetchone()
+            if row is None:
+                return
+            conn.execute("DELETE FROM documents_fts WHERE rowid = ?", (row["id"],))
+            conn.execute("DELETE FROM documents WHERE id = ?", (row["id"],))
+
+    def get_content(self, page_id):
+        """条目保存的正文（开头部分），没有该条目时返回空字符串"""
+        row = self.store.query_one("SELECT content FROM documents WHERE page_id = ?", (page_id,))
+        return row["content"] if row else ""
+
+    def search(self, query, offset=0, limit=5):
+        """
+        搜索条目
+
+        参数：
+            query: 用户输入的查询
+            offset: 跳过的结果数
+            limit: 最多返回的结果数
+
+        返回：
+            tuple: (命中总数, 结果列表)；结果为条目字典，包含 snippet（HTML 片段）
+        """
+        match = build_match_query(query)
+        if not match:
+            return 0, []
+
+        total = self.store.query_one(
+            "SELECT COUNT(*) AS n FROM documents_fts WHERE documents_fts MATCH ?", (match,)
+        )["n"]
+        if not total:
+            return 0, []
+
+        weights = ", ".join(str(w) for w in FIELD_WEIGHTS)
+        rows = self.store.query(
+            f"SELECT d.*, bm25(documents_fts, {weights}) AS score "
+            "FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid "
+            "WHERE documents_fts MATCH ? "
+            "ORDER BY score, d.created_at DESC LIMIT ? OFFSET ?",
+            (match, limit, offset),
+        )
+
+        results = []
+        for row in rows:
+            entry = {
+                "page_id": row["page_id"],
+                "kind": row["kind"],
+                "title": row["title"],
+                "tags": json.loads(row["tags"]),
+                "url": row["url"],
+                "created_at": row["created_at"],
+            }
+            # 优先从摘要中截取片段，摘要没有命中时再看正文
+            entry["snippet"] = (
+                build_snippet(row["summary"], query)
+                or build_snippet(row["content"], query)
+                or html.escape(" ".join(row["summary"].split())[: SNIPPET_CONTEXT * 2])
+            )
+            results.append(entry)
+        return total, results
+
+    def count(self):
+        """返回索引中的条目数"""
+        return self.store.query_one("SELECT COUNT(*) AS n FROM documents")["n"]
+
+    def is_backfilled(self):
+        return self.store.query_one("SELECT value FROM state WHERE key = 'backfilled_at'") is not None
+
+    def mark_backfilled(self):
+        with self.store.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO state (key, value) VALUES ('backfilled_at', ?)",
+                (str(time.time()),),
+            )
+
+
+def get_search_index():
+    """获取全文搜索索引单例"""
+    global _index_instance
+    if _index_instance is None:
+        with _instance_lock:
+            if _index_instance is None:
+                _index_instance = SearchIndex()
+    return _index_instance
+
+
+def record_document(
+    page_id, kind, title, summary="", tags=(), content="", url="", created_at=None
+):
+    """
+    记录新保存的条目，出错时只记录日志，不影响保存流程
+
+    参数同 SearchIndex.add
+    """
+    if not page_id:
+        return
+    try:
+        get_search_index().add(page_id, kind, title, summary, tags, content, url, created_at)
+    except Exception as e:
+        logger.warning(f"更新全文索引时出错：{e}")
+
+
+def update_document(page_id, title=None, summary=None, tags=None, content=None):
+    """
+    更新条目的分析结果，出错时只记录日志
+
+    参数同 SearchIndex.update
+    """
+    try:
+        get_search_index().update(
+            page_id, title=title, summary=summary, tags=tags, content=content
+        )
+    except Exception as e:
+        logger.warning(f"更新全文索引时出错：{e}")
+
+
+def backfill_search_index(index=None):
+    """
+    从 Notion 导入已有的笔记、论文和待办事项，包括页面正文
+
+    参数：
+        index: SearchIndex 实例，默认使用单例
+
+    返回：
+        int: 导入的条目数
+    """
+    # 避免循环导入，延迟导入
+    from .page_content import get_page_content_service
+
+    index = index or get_search_index()
+    content_service = get_page_content_service()
+    databases = [
+        (NOTION_DATABASE_ID, KIND_NOTE),
+        (NOTION_PAPERS_DATABASE_ID, KIND_PAPER),
+        (NOTION_TODO_DATABASE_ID, KIND_TODO),
+    ]
+
+    def flush(pages, kind):
+        texts = content_service.get_texts(pages, max_chars=SEARCH_CONTENT_LENGTH)
+        for page in pages:
+            entry = entry_from_page(page, kind)
+            index.add(content=texts.get(page["id"], ""), **entry)
+
+    imported = 0
+    for database_id, kind in databases:
+        if not database_id:
+            continue
+
+        batch = []
+        for page in iter_database_query(database_id):
+            batch.append(page)
+            if len(batch) >= BACKFILL_BATCH_SIZE:
+                flush(batch, kind)
+                imported += len(batch)
+                batch = []
+        if batch:
+            flush(batch, kind)
+            imported += len(batch)
+
+    index.mark_backfilled()
+    logger.info(f"已从 Notion 导入 {imported} 个条目到全文索引")
+    return imported
+
+
+def start_search_index_backfill():
+    """
+    还没有从 Notion 导入过时，在后台线程中导入一次已有页面；
+    之后用全文索引中的链接和正文填充去重索引
+    """
+    # 避免循环导入，延迟导入
+    from .dedup_index import backfill_dedup_index, get_dedup_index
+
+    def run():
+        try:
+            if not get_search_index().is_backfilled():
+                backfill_search_index()
+            if not get_dedup_index().is_backfilled():
+                backfill_dedup_index()
+        except Exception as e:
+            logger.error(f"导入全文索引时出错：{e}")
+
+    threading.Thread(target=run, name="search-index-backfill", daemon=True).start()
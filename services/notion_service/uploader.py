@@ -0,0 +1,278 @@
+"""
+Notion 块上传模块
+
+尽量减少请求次数，并且不丢弃任何块：
+1. 创建页面时直接在 pages.create 中带上第一批块，不再先创建空页面
+2. 之后的批次同时按块数（100）、嵌套块总数（1000）和序列化后的请求大小限制分组
+3. 每个请求经过 Notion 限流器；只有网络错误、限流、服务端错误等临时错误按退避重试
+4. 重试后仍无法发送的块（以及它后面的所有块，保证顺序）不会被丢弃，
+   放在上传结果的 remaining 中，由 outbox 保存到本地并在之后重放
+"""
+
+import json
+import logging
+import threading
+import time
+
+from config import NOTION_UPLOAD_MAX_ATTEMPTS
+
+from .client import notion, notion_limiter
+from .content_converter import MAX_CHILDREN
+from .schema import get_schema_cache, is_validation_error
+
+logger = logging.getLogger(__name__)
+
+# Notion API 单个请求的限制
+MAX_BATCH_BLOCKS = MAX_CHILDREN  # 顶层块数
+MAX_BATCH_ELEMENTS = 1000  # 包括子块在内的块总数
+MAX_BATCH_BYTES = 450 * 1024  # 请求体上限为 500KB，留出属性和 JSON 结构的余量
+
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+
+# 可以重试的临时错误
+TRANSIENT_STATUS_CODES = frozenset((409, 429, 500, 502, 503, 504))
+TRANSIENT_ERROR_CODES = frozenset(
+    (
+        "rate_limited",
+        "conflict_error",
+        "internal_server_error",
+        "service_unavailable",
+        "notionhq_client_request_timeout",
+    )
+)
+
+# 单例实例
+_uploader_instance = None
+_instance_lock = threading.Lock()
+
+
+def is_transient_error(error):
+    """是否为可以重试的临时错误（网络错误、超时、限流、服务端错误）"""
+    if getattr(error, "status", None) in TRANSIENT_STATUS_CODES:
+        return True
+    if getattr(error, "code", None) in TRANSIENT_ERROR_CODES:
+        return True
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+
+    # httpx 随 notion-client 安装，只在出错时才需要导入
+    import httpx
+
+    return isinstance(error, httpx.TransportError)
+
+
+def get_retry_delay(error, attempt):
+    """第 attempt 次失败后的等待时间，限流时优先使用 Retry-After"""
+    headers = getattr(error, "headers", None)
+    if headers:
+        try:
+            return min(float(headers.get("retry-after")), RETRY_MAX_DELAY)
+        except (TypeError, ValueError):
+            pass
+    return min(RETRY_BASE_DELAY * (2 ** (attempt - 1)), RETRY_MAX_DELAY)
+
+
+def count_block_elements(block):
+    """块及其所有子块的数量"""
+    count = 1
+    block_type = block.get("type") or next((key for key in block if key != "object"), None)
+    for child in (block.get(block_type) or {}).get("children", []):
+        count += count_block_elements(child)
+    return count
+
+
+def iter_upload_batches(
+    blocks,
+    max_blocks=MAX_BATCH_BLOCKS,
+    max_elements=MAX_BATCH_ELEMENTS,
+    max_bytes=MAX_BATCH_BYTES,
+):
+    """
+    按块数、嵌套块总数和序列化大小把块分成上传批次
+
+    单个块超过大小限制时单独成批，由 Notion 决定是否接受，不会被丢弃
+
+    参数：
+    blocks (iterable): Notion 块对象，可以是生成器
+
+    返回：
+    generator: 块列表
+    """
+    batch = []
+    elements = 0
+    size = 0
+    for block in blocks:
+        block_elements = count_block_elements(block)
+        # 与 httpx 发送请求体时的序列化方式一致
+        block_size = len(json.dumps(block)) + 2
+        if batch and (
+            len(batch) >= max_blocks
+            or elements + block_elements > max_elements
+            or size + block_size > max_bytes
+        ):
+            yield batch
+            batch = []
+            elements = 0
+            size = 0
+        batch.append(block)
+        elements += block_elements
+        size += block_size
+    if batch:
+        yield batch
+
+
+class UploadResult:
+    """一次上传的结果"""
+
+    def __init__(self, page_id=None):
+        self.page_id = page_id
+        self.page = None  # 创建页面时 Notion 返回的页面对象
+        self.sent_blocks = 0
+        self.remaining = []  # 未能发送的块，按原顺序
+        self.queued_blocks = 0  # 已保存到 outbox 等待重放的块数
+        self.dead_blocks = 0  # Notion 拒绝写入、不会重放的块数（内容保留在 outbox 中）
+        self.requests = 0
+        self.retries = 0
+        self.error = None  # 导致块未能发送的异常
+
+    @property
+    def complete(self):
+        return not self.remaining and not self.queued_blocks and not self.dead_blocks
+
+    def describe(self):
+        """给用户看的未完成说明，全部发送时为空字符串"""
+        lines = []
+        if self.queued_blocks:
+            lines.append(
+                f"⚠️ 有 {self.queued_blocks} 个内容块暂时未能写入页面，已保存到本地，稍后会自动补充"
+            )
+        if self.dead_blocks:
+            lines.append(f"⚠️ 有 {self.dead_blocks} 个内容块被 Notion 拒绝，未能写入页面：{self.error}")
+        return "\n".join(lines)
+
+
+class BlockUploader:
+    """
+    分批上传 Notion 块，不负责保存失败的块（见 outbox 模块）
+
+    用法：
+        result = get_block_uploader().create_page(parent, properties, blocks)
+        result = get_block_uploader().append(page_id, blocks)
+    """
+
+    def __init__(self, limiter=notion_limiter, max_attempts=NOTION_UPLOAD_MAX_ATTEMPTS):
+        self.limiter = limiter
+        self.max_attempts = max_attempts
+
+    def _call(self, result, func, **kwargs):
+        """发送一个请求，临时错误按退避重试，其他错误直接抛出"""
+        attempt = 1
+        while True:
+            if self.limiter is not None:
+                self.limiter.wait_if_limited()
+            result.requests += 1
+            try:
+                return func(**kwargs)
+            except Exception as e:
+                if attempt >= self.max_attempts or not is_transient_error(e):
+                    raise
+                delay = get_retry_delay(e, attempt)
+                logger.warning(f"Notion 请求失败（第 {attempt} 次）：{e}，{delay:.1f} 秒后重试")
+                result.retries += 1
+                attempt += 1
+                time.sleep(delay)
+
+    def create_page(self, parent, properties, blocks=()):
+        """
+        创建页面，第一批块随 pages.create 一起发送，其余批次依次追加
+
+        页面本身创建失败时抛出异常；块发送失败时不抛出，未发送的块在结果的 remaining 中
+
+        参数：
+        parent (dict): 父级，例如 {"database_id": ...}
+        properties (dict): 页面属性
+        blocks (iterable): Notion 块对象，可以是生成器
+
+        返回：
+        UploadResult: 上传结果，page_id 为新页面 ID
+        """
+        result = UploadResult()
+        batches = iter_upload_batches(blocks)
+        first_batch = next(batches, [])
+
+        try:
+            page = self._call(
+                result, notion.pages.create, parent=parent, properties=properties, children=first_batch
+            )
+        except Exception as e:
+            if is_validation_error(e) and parent.get("database_id"):
+                # 可能是数据库结构已变化，下次写入前重新获取
+                get_schema_cache().invalidate(parent["database_id"])
+            if not first_batch or is_transient_error(e):
+                raise
+            # 可能是某个块不被接受：先创建不带子块的页面，块留给调用方保存，不丢弃内容
+            logger.error(f"创建带内容的页面失败：{e}，改为先创建空页面")
+            page = self._call(result, notion.pages.create, parent=parent, properties=properties)
+            result.page_id = page["id"]
+            result.page = page
+            self._keep_remaining(result, first_batch, batches, e)
+            return result
+
+        result.page_id = page["id"]
+        result.page = page
+        result.sent_blocks += len(first_batch)
+        self._append_batches(result, result.page_id, batches)
+        return result
+
+    def append(self, block_id, blocks):
+        """
+        把块追加到已有页面或块的末尾
+
+        参数：
+        block_id (str): 页面或块 ID
+        blocks (iterable): Notion 块对象，可以是生成器
+
+        返回：
+        UploadResult: 上传结果，未发送的块在 remaining 中
+        """
+        result = UploadResult(block_id)
+        self._append_batches(result, block_id, iter_upload_batches(blocks))
+        return result
+
+    def _append_batches(self, result, block_id, batches):
+        for batch in batches:
+            try:
+                self._call(result, notion.blocks.children.append, block_id=block_id, children=batch)
+            except Exception as e:
+                self._keep_remaining(result, batch, batches, e)
+                return
+            result.sent_blocks += len(batch)
+
+        logger.info(
+            f"已向 {block_id} 写入 {result.sent_blocks} 个块，"
+            f"共 {result.requests} 次请求（重试 {result.retries} 次）"
+        )
+
+    @staticmethod
+    def _keep_remaining(result, batch, batches, error):
+        """失败的批次和之后的所有块按顺序保留在结果中"""
+        remaining = list(batch)
+        for rest in batches:
+            remaining.extend(rest)
+        result.remaining = remaining
+        result.error = error
+        logger.error(
+            f"向 {result.page_id} 写入块失败：{error}，{len(remaining)} 个块未发送"
+            f"（已写入 {result.sent_blocks} 个）"
+        )
+
+
+def get_block_uploader():
+    """获取块上传器单例"""
+    global _uploader_instance
+    if _uploader_instance is None:
+        with _instance_lock:
+            if _uploader_instance is None:
+                _uploader_instance = BlockUploader()
+    return _uploader_instance
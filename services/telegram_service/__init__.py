@@ -1,15 +1,32 @@
-# 导出所有需要的函数和类，保持原有 API 不变
-from .client import error_handler, setup_telegram_bot
-from .handlers.command_handlers import help_command, start, weekly_report_command
-from .handlers.message_handlers import process_document, process_message
-from .handlers.pdf_handlers import handle_pdf_document, handle_pdf_url
-from .handlers.todo_handlers import handle_todo_message
-from .handlers.url_handlers import handle_multiple_urls_message, handle_url_message
-from .utils import (
-    enrich_analysis_with_metadata,
-    extract_metadata_from_filename,
-    prepare_metadata_for_notion,
-)
+# 导出所有需要的函数和类，保持原有 API 不变。
+# 子模块在第一次访问对应名称时才导入，导入本包不会加载处理函数及其依赖的 AI / Notion 服务
+import importlib
+
+_EXPORTS = {
+    "setup_telegram_bot": ".client",
+    "error_handler": ".client",
+    "get_dispatcher": ".dispatcher",
+    "run_in_lane": ".dispatcher",
+    "format_dispatch_stats": ".dispatcher",
+    "start": ".handlers.command_handlers",
+    "help_command": ".handlers.command_handlers",
+    "stats_command": ".handlers.command_handlers",
+    "weekly_report_command": ".handlers.command_handlers",
+    "search_command": ".handlers.search_handlers",
+    "process_message": ".handlers.message_handlers",
+    "process_document": ".handlers.message_handlers",
+    "handle_pdf_document": ".handlers.pdf_handlers",
+    "handle_pdf_url": ".handlers.pdf_handlers",
+    "handle_todo_message": ".handlers.todo_handlers",
+    "handle_url_message": ".handlers.url_handlers",
+    "handle_multiple_urls_message": ".handlers.url_handlers",
+    "send_message": ".sender",
+    "edit_message_text": ".sender",
+    "reply_text": ".sender",
+    "enrich_analysis_with_metadata": ".utils",
+    "extract_metadata_from_filename": ".utils",
+    "prepare_metadata_for_notion": ".utils",
+}
 
 # 确保函数被正确导出
 __all__ = [
@@ -22,6 +39,14 @@ __all__ = [
     "process_document",
     "handle_pdf_document",
     "weekly_report_command",
+    "stats_command",
+    "search_command",
+    "get_dispatcher",
+    "run_in_lane",
+    "format_dispatch_stats",
+    "send_message",
+    "edit_message_text",
+    "reply_text",
     "handle_pdf_url",
     "handle_multiple_urls_message",
     "enrich_analysis_with_metadata",
@@ -29,3 +54,18 @@ __all__ = [
     "extract_metadata_from_filename",
     "prepare_metadata_for_notion",
 ]
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    # 缓存到包的命名空间，之后的访问不再经过 __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_EXPORTS))
@@ -3,19 +3,31 @@ import os
 
 import urllib3
 from telegram import ParseMode
-from telegram.ext import CommandHandler, Filters, MessageHandler, Updater
+from telegram.ext import (
+    CallbackQueryHandler,
+    CommandHandler,
+    Filters,
+    InlineQueryHandler,
+    MessageHandler,
+    Updater,
+)
+
+from config import (
+    ALLOWED_USER_IDS,
+    INGEST_QUEUE_ENABLED,
+    INLINE_SEARCH_ENABLED,
+    NOTION_MIRROR_ENABLED,
+    TELEGRAM_BOT_TOKEN,
+)
 
-from config import ALLOWED_USER_IDS, TELEGRAM_BOT_TOKEN
+from .files import get_bot_api_kwargs
+from .sender import send_message
 
 # 尽早导入并使用 SSL 配置
 
 # 禁用不安全请求的警告
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-# 设置日志
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
 # 添加自定义警告记录
@@ -37,9 +49,10 @@ def error_handler(update, context):
 
     # 如果可能，向用户发送错误通知
     if update and update.effective_chat:
-        context.bot.send_message(
-            chat_id=update.effective_chat.id,
-            text="抱歉，处理您的请求时发生了错误。错误已被记录，我们会尽快解决。",
+        send_message(
+            context.bot,
+            update.effective_chat.id,
+            "抱歉，处理您的请求时发生了错误。错误已被记录，我们会尽快解决。",
         )
 
 
@@ -84,7 +97,9 @@ def setup_telegram_bot(updater=None):
             request_kwargs["urllib3_proxy_kwargs"] = urllib3_kwargs
 
         # 创建 Updater 并提供网络设置
-        updater = Updater(TELEGRAM_BOT_TOKEN, request_kwargs=request_kwargs)
+        updater = Updater(
+            TELEGRAM_BOT_TOKEN, request_kwargs=request_kwargs, **get_bot_api_kwargs()
+        )
         dispatcher = updater.dispatcher
 
         # 设置默认解析模式为 Markdown
@@ -100,17 +115,53 @@ def setup_telegram_bot(updater=None):
         sync_papers_by_days,
     )
 
-    from .handlers.command_handlers import help_command, start, weekly_report_command
+    from .dispatcher import LANE_CHAT, LANE_COMMAND, run_in_lane
+    from .handlers.command_handlers import (
+        help_command,
+        start,
+        stats_command,
+        weekly_report_command,
+    )
     from .handlers.message_handlers import process_document, process_message
+    from .handlers.search_handlers import search_command, search_page_callback
 
     # 创建用户过滤器
     user_filter = Filters.user(user_id=ALLOWED_USER_IDS) if ALLOWED_USER_IDS else None
 
+    # 耗时的处理函数交给调度器：消息按聊天串行，命令在单独的通道中执行，
+    # 轻量命令仍在 Dispatcher 线程中直接执行。
+    # 启用接收队列时，更新先持久化再执行，重启后可以继续处理
+    if INGEST_QUEUE_ENABLED:
+        from .enrichment import register_enrichment
+        from .ingest_queue import get_ingest_queue, run_durable
+
+        # 两阶段保存的后台分析任务也通过接收队列执行，需要在恢复任务之前注册
+        register_enrichment(get_ingest_queue())
+
+        def wrap(kind, handler, lane):
+            return run_durable(kind, handler, lane)
+
+    else:
+
+        def wrap(kind, handler, lane):
+            return run_in_lane(handler, lane)
+
+    message_handler = wrap("message", process_message, LANE_CHAT)
+    document_handler = wrap("document", process_document, LANE_CHAT)
+
     # 注册处理程序
     dispatcher.add_handler(CommandHandler("start", start, filters=user_filter))
     dispatcher.add_handler(CommandHandler("help", help_command, filters=user_filter))
+    dispatcher.add_handler(CommandHandler("stats", stats_command, filters=user_filter))
+    # 全文搜索只查询本地索引，直接在 Dispatcher 线程中执行
+    dispatcher.add_handler(CommandHandler("search", search_command, filters=user_filter))
+    dispatcher.add_handler(CallbackQueryHandler(search_page_callback, pattern=r"^search:"))
     dispatcher.add_handler(
-        CommandHandler("weekly", weekly_report_command, filters=user_filter)
+        CommandHandler(
+            "weekly",
+            wrap("weekly", weekly_report_command, LANE_COMMAND),
+            filters=user_filter,
+        )
     )
 
     # 添加论文处理命令
@@ -118,22 +169,59 @@ def setup_telegram_bot(updater=None):
         CommandHandler("collections", list_collections, filters=user_filter)
     )
     dispatcher.add_handler(
-        CommandHandler("sync_papers", sync_papers_by_count, filters=user_filter)
+        CommandHandler(
+            "sync_papers",
+            wrap("sync_papers", sync_papers_by_count, LANE_COMMAND),
+            filters=user_filter,
+        )
     )
     dispatcher.add_handler(
-        CommandHandler("sync_days", sync_papers_by_days, filters=user_filter)
+        CommandHandler(
+            "sync_days",
+            wrap("sync_days", sync_papers_by_days, LANE_COMMAND),
+            filters=user_filter,
+        )
     )
 
     # 添加消息处理器
     dispatcher.add_handler(
-        MessageHandler(Filters.text & ~Filters.command, process_message)
+        MessageHandler(Filters.text & ~Filters.command, message_handler)
     )
-    dispatcher.add_handler(MessageHandler(Filters.photo, process_message))
-    dispatcher.add_handler(MessageHandler(Filters.document, process_document))
-    dispatcher.add_handler(MessageHandler(Filters.video, process_message))
+    dispatcher.add_handler(MessageHandler(Filters.photo, message_handler))
+    dispatcher.add_handler(MessageHandler(Filters.document, document_handler))
+    dispatcher.add_handler(MessageHandler(Filters.video, message_handler))
+
+    # 后台重放 Notion 不可用时保存在本地的写入（包括上次运行遗留的）
+    from services.notion_service import start_notion_outbox
+
+    start_notion_outbox()
+
+    # 后台同步 Notion 本地镜像，周报等直接查询本地数据
+    if NOTION_MIRROR_ENABLED:
+        from services.notion_service import start_notion_mirror
+
+        start_notion_mirror()
+
+    # 第一次启用全文搜索时从 Notion 导入已有页面
+    from services.notion_service import start_search_index_backfill
+
+    start_search_index_backfill()
+
+    # 内联搜索只读本地索引，直接在 Dispatcher 线程中应答，不进入调度通道
+    if INLINE_SEARCH_ENABLED:
+        from services.notion_service import start_entry_index_backfill
+
+        from .handlers.inline_handlers import inline_search
+
+        dispatcher.add_handler(InlineQueryHandler(inline_search))
+        start_entry_index_backfill()
 
     # 添加错误处理器
     dispatcher.add_error_handler(error_handler)
     logger.info("已添加命令和消息处理器")
 
+    # 启动接收队列，继续执行上次未完成的任务
+    if INGEST_QUEUE_ENABLED:
+        get_ingest_queue().start(dispatcher)
+
     return updater
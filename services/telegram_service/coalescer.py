@@ -0,0 +1,195 @@
+"""
+消息合并模块
+
+用户一次转发一串消息或发送相册时，Telegram 会逐条推送。本模块在每个聊天上维护一个
+去抖窗口，把同一相册（media_group_id）或同一转发来源、且到达间隔在窗口内的消息合并为
+一批，由调用方只做一次分析、写入一个 Notion 页面并回复一次。
+"""
+
+import logging
+import threading
+import time
+
+from config import COALESCE_MAX_ITEMS, COALESCE_MAX_WAIT, COALESCE_WINDOW
+
+from .dispatcher import LANE_CHAT, get_dispatcher
+
+logger = logging.getLogger(__name__)
+
+# 单例实例
+_coalescer_instance = None
+_instance_lock = threading.Lock()
+
+
+def get_burst_key(message):
+    """
+    计算消息所属的合并分组键
+
+    参数：
+        message: Telegram 消息对象
+
+    返回：
+        str/None: 分组键，不需要合并的消息返回 None
+    """
+    if message.media_group_id:
+        return f"album:{message.media_group_id}"
+
+    if message.forward_date:
+        # 从频道或群组转发的消息按来源聊天分组，从个人转发的消息合并为一组
+        if message.forward_from_chat:
+            return f"forward:chat:{message.forward_from_chat.id}"
+        return "forward:users"
+
+    return None
+
+
+def describe_forward_origin(message):
+    """
+    返回转发来源的可读名称
+
+    参数：
+        message: Telegram 消息对象
+
+    返回：
+        str: 来源名称，不是转发消息时返回空字符串
+    """
+    if message.forward_from_chat:
+        return message.forward_from_chat.title or message.forward_from_chat.username or ""
+    if message.forward_from:
+        return message.forward_from.full_name
+    if message.forward_sender_name:
+        return message.forward_sender_name
+    return ""
+
+
+class _Burst:
+    """一个聊天中正在收集的一批消息"""
+
+    def __init__(self, key):
+        self.key = key
+        self.items = []
+        self.started_at = time.monotonic()
+        self.timer = None
+
+
+class MessageCoalescer:
+    """
+    按聊天合并突发消息
+
+    每收到一条同组消息就重置去抖计时器；窗口内没有新消息、累计等待超过上限、
+    消息数超过上限或同一聊天来了不同组的消息时，这一批消息被提交给回调处理
+    """
+
+    def __init__(
+        self,
+        window=COALESCE_WINDOW,
+        max_wait=COALESCE_MAX_WAIT,
+        max_items=COALESCE_MAX_ITEMS,
+    ):
+        """
+        初始化合并器
+
+        参数：
+            window: 去抖窗口（秒），两条消息的到达间隔超过该值时结束一批
+            max_wait: 一批消息从第一条开始最多等待的时间（秒）
+            max_items: 一批消息的最大条数
+        """
+        self.window = window
+        self.max_wait = max_wait
+        self.max_items = max_items
+        self._bursts = {}  # chat_id -> _Burst
+        self._lock = threading.Lock()
+
+    def add(self, chat_id, key, item, on_flush):
+        """
+        将消息加入所在聊天的当前批次
+
+        参数：
+            chat_id: 聊天 ID
+            key: 分组键（见 get_burst_key）
+            item: 调用方的消息数据
+            on_flush: 批次完成时调用的函数 on_flush(items)，在该聊天的调度通道中执行
+        """
+        flush_previous = None
+        flush_now = None
+
+        with self._lock:
+            burst = self._bursts.get(chat_id)
+
+            # 同一聊天出现了不同组的消息，先结束之前的批次
+            if burst and burst.key != key:
+                flush_previous = self._detach(chat_id)
+                burst = None
+
+            if burst is None:
+                burst = _Burst(key)
+                self._bursts[chat_id] = burst
+
+            burst.items.append((item, on_flush))
+
+            elapsed = time.monotonic() - burst.started_at
+            if len(burst.items) >= self.max_items or elapsed >= self.max_wait:
+                flush_now = self._detach(chat_id)
+            else:
+                if burst.timer:
+                    burst.timer.cancel()
+                burst.timer = threading.Timer(
+                    self.window, self._on_timer, args=(chat_id, burst)
+                )
+                burst.timer.daemon = True
+                burst.timer.start()
+
+        if flush_previous:
+            self._submit(chat_id, flush_previous)
+        if flush_now:
+            self._submit(chat_id, flush_now)
+
+    def flush(self, chat_id):
+        """
+        在当前线程中立即处理聊天中未完成的批次
+
+        普通消息在处理前调用，确保之前转发的内容先于后续消息保存
+
+        参数：
+            chat_id: 聊天 ID
+        """
+        with self._lock:
+            burst = self._detach(chat_id)
+        if burst:
+            self._run(burst)
+
+    def _detach(self, chat_id):
+        """从缓冲区中取出批次并取消计时器，调用方需持有锁"""
+        burst = self._bursts.pop(chat_id, None)
+        if burst and burst.timer:
+            burst.timer.cancel()
+        return burst
+
+    def _on_timer(self, chat_id, burst):
+        with self._lock:
+            # 计时器触发前批次可能已被其他路径取走
+            if self._bursts.get(chat_id) is not burst:
+                return
+            self._detach(chat_id)
+        self._submit(chat_id, burst)
+
+    def _submit(self, chat_id, burst):
+        """将批次提交到该聊天的调度通道，保持与其他消息的顺序"""
+        get_dispatcher().submit((LANE_CHAT, chat_id), self._run, burst)
+
+    @staticmethod
+    def _run(burst):
+        items = [item for item, _ in burst.items]
+        on_flush = burst.items[-1][1]
+        logger.info(f"合并 {len(items)} 条消息（{burst.key}）")
+        on_flush(items)
+
+
+def get_coalescer():
+    """获取消息合并器单例"""
+    global _coalescer_instance
+    if _coalescer_instance is None:
+        with _instance_lock:
+            if _coalescer_instance is None:
+                _coalescer_instance = MessageCoalescer()
+    return _coalescer_instance
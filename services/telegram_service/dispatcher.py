@@ -0,0 +1,245 @@
+"""
+Telegram 更新并发调度模块
+
+python-telegram-bot 的 Dispatcher 默认在单线程中依次执行处理函数，
+一个耗时的同步命令或大 PDF 会阻塞所有用户的消息。本模块提供按聊天分通道的调度器：
+
+1. 处理函数在有界线程池上运行
+2. 同一聊天内的消息进入同一条串行通道，保持到达顺序
+3. 不同聊天、同一聊天的命令通道之间可以并行执行
+4. 统计每条通道的排队深度和等待时间
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from config import TELEGRAM_LANE_WAIT_WARNING, TELEGRAM_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# 通道类型
+LANE_CHAT = "chat"  # 普通消息：同一聊天内严格串行
+LANE_COMMAND = "command"  # 耗时命令：与同一聊天的消息通道并行，命令之间串行
+LANE_ENRICH = "enrich"  # 后台 AI 补充分析：不阻塞同一聊天的新消息
+
+# 单例实例
+_dispatcher_instance = None
+_instance_lock = threading.Lock()
+
+
+class ChatLaneDispatcher:
+    """
+    按聊天分通道的调度器
+
+    每个通道键对应一个先进先出队列，同一时刻每个通道最多只有一个任务在执行。
+    通道每执行完一个任务就把自己重新提交到线程池末尾，避免单个繁忙的聊天独占工作线程。
+    """
+
+    def __init__(self, max_workers=TELEGRAM_WORKERS):
+        """
+        初始化调度器
+
+        参数：
+            max_workers: 工作线程数上限
+        """
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="tg-lane"
+        )
+        self._lanes = {}  # 通道键 -> 待执行任务队列
+        self._active = set()  # 已在线程池中排队或执行的通道
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "max_depth": 0,
+            "total_wait": 0.0,
+            "max_wait": 0.0,
+        }
+
+    def submit(self, lane_key, func, *args, **kwargs):
+        """
+        提交任务到指定通道
+
+        参数：
+            lane_key: 通道键，None 表示不需要排序，直接并行执行
+            func: 要执行的函数
+            *args, **kwargs: 传给函数的参数
+        """
+        task = (time.monotonic(), func, args, kwargs)
+
+        with self._lock:
+            self._stats["submitted"] += 1
+
+            if lane_key is None:
+                self._executor.submit(self._run_task, None, task)
+                return
+
+            lane = self._lanes.setdefault(lane_key, deque())
+            lane.append(task)
+            self._stats["max_depth"] = max(self._stats["max_depth"], len(lane))
+
+            # 通道空闲时才需要调度，否则由正在执行的任务在结束后继续调度
+            if lane_key not in self._active:
+                self._active.add(lane_key)
+                self._executor.submit(self._drain_one, lane_key)
+
+    def _drain_one(self, lane_key):
+        """从通道中取出一个任务执行，然后把通道重新放回线程池队列"""
+        with self._lock:
+            lane = self._lanes.get(lane_key)
+            if not lane:
+                self._lanes.pop(lane_key, None)
+                self._active.discard(lane_key)
+                return
+            task = lane.popleft()
+
+        try:
+            self._run_task(lane_key, task)
+        finally:
+            with self._lock:
+                if self._lanes.get(lane_key):
+                    self._executor.submit(self._drain_one, lane_key)
+                else:
+                    self._lanes.pop(lane_key, None)
+                    self._active.discard(lane_key)
+
+    def _run_task(self, lane_key, task):
+        """执行单个任务并记录等待时间"""
+        enqueued_at, func, args, kwargs = task
+        wait_time = time.monotonic() - enqueued_at
+
+        with self._lock:
+            self._stats["total_wait"] += wait_time
+            self._stats["max_wait"] = max(self._stats["max_wait"], wait_time)
+
+        if wait_time > TELEGRAM_LANE_WAIT_WARNING:
+            logger.warning(f"通道 {lane_key} 中的任务排队等待了 {wait_time:.1f} 秒")
+
+        try:
+            func(*args, **kwargs)
+            with self._lock:
+                self._stats["completed"] += 1
+        except Exception as e:
+            with self._lock:
+                self._stats["failed"] += 1
+            logger.error(f"通道 {lane_key} 中的任务执行出错：{e}", exc_info=True)
+
+    def get_stats(self):
+        """
+        获取调度统计信息
+
+        返回：
+            dict: 包含任务计数、等待时间和各通道当前深度
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            lane_depths = {
+                str(key): len(lane) for key, lane in self._lanes.items() if lane
+            }
+
+        finished = stats["completed"] + stats["failed"]
+        stats["avg_wait"] = stats["total_wait"] / finished if finished else 0.0
+        stats["lane_depths"] = lane_depths
+        stats["active_lanes"] = len(lane_depths)
+        stats["workers"] = self.max_workers
+        return stats
+
+    def shutdown(self, wait=True):
+        """关闭线程池"""
+        self._executor.shutdown(wait=wait)
+
+
+def get_dispatcher():
+    """获取调度器单例"""
+    global _dispatcher_instance
+    if _dispatcher_instance is None:
+        with _instance_lock:
+            if _dispatcher_instance is None:
+                _dispatcher_instance = ChatLaneDispatcher()
+                logger.info(
+                    f"已创建并发调度器，工作线程数：{_dispatcher_instance.max_workers}"
+                )
+    return _dispatcher_instance
+
+
+def get_lane_key(update, lane=LANE_CHAT):
+    """
+    根据更新确定通道键
+
+    参数：
+        update: Telegram 更新对象
+        lane: 通道类型
+
+    返回：
+        tuple/None: 通道键，无法确定聊天时返回 None
+    """
+    chat = update.effective_chat if update else None
+    if not chat:
+        return None
+    return (lane, chat.id)
+
+
+def run_in_lane(handler, lane=LANE_CHAT):
+    """
+    包装处理函数，使其在调度器的对应通道中异步执行
+
+    处理函数抛出的异常会转交给 Dispatcher 注册的错误处理器
+
+    参数：
+        handler: 原始处理函数 (update, context)
+        lane: 通道类型
+
+    返回：
+        function: 可直接注册到 python-telegram-bot 的处理函数
+    """
+
+    def call_handler(update, context):
+        try:
+            handler(update, context)
+        except Exception as e:
+            dispatcher = getattr(context, "dispatcher", None)
+            if dispatcher is not None:
+                dispatcher.dispatch_error(update, e)
+            else:
+                raise
+
+    @wraps(handler)
+    def wrapped(update, context):
+        get_dispatcher().submit(get_lane_key(update, lane), call_handler, update, context)
+
+    return wrapped
+
+
+def format_dispatch_stats(stats=None):
+    """
+    将调度统计信息格式化为可读文本
+
+    参数：
+        stats: get_stats() 的结果，为空时自动获取
+
+    返回：
+        str: 格式化后的文本
+    """
+    if stats is None:
+        stats = get_dispatcher().get_stats()
+
+    lines = [
+        "调度器状态：",
+        f"- 工作线程：{stats['workers']}",
+        f"- 已提交 / 完成 / 失败：{stats['submitted']} / {stats['completed']} / {stats['failed']}",
+        f"- 平均等待：{stats['avg_wait']:.2f} 秒，最长等待：{stats['max_wait']:.2f} 秒",
+        f"- 历史最大通道深度：{stats['max_depth']}",
+        f"- 当前排队通道：{stats['active_lanes']}",
+    ]
+    for key, depth in stats["lane_depths"].items():
+        lines.append(f"  · {key}: {depth}")
+
+    return "\n".join(lines)
@@ -0,0 +1,104 @@
+"""
+两阶段保存的后台分析模块
+
+第一阶段由消息处理函数完成：不调用 AI，直接用原始内容和临时标题创建 Notion 页面并回复链接。
+第二阶段在本模块中执行：后台调用 Gemini 分析内容，再更新页面的标题、摘要和标签。
+
+启用接收队列时，分析任务作为 "enrich" 类型的任务写入队列，失败后按退避策略重试，
+重启后继续执行；同一条消息只会有一个分析任务，页面属性的更新也可以重复执行。
+"""
+
+import logging
+
+from config import INGEST_QUEUE_ENABLED
+from services.gemini_service import analyze_content, analyze_short_content, is_gemini_available
+from services.gemini_service.content_analyzer import ANALYSIS_ERROR_TITLE
+from services.notion_service import KIND_NOTE, register_replay_callback, update_page_analysis
+
+from .dispatcher import LANE_ENRICH, get_dispatcher, get_lane_key
+
+logger = logging.getLogger(__name__)
+
+KIND_ENRICH = "enrich"
+
+# 不超过该长度的内容直接用作标题（与 determine_title 一致）
+TITLE_CONTENT_LIMIT = 100
+
+
+def enrich_page(page_id, content, short=False):
+    """
+    分析内容并更新页面的标题、摘要和标签
+
+    参数：
+        page_id: 第一阶段创建的页面 ID
+        content: 消息内容
+        short: 是否为短内容；短内容保留原文作为摘要，只补充标签（以及较长时的标题）
+    """
+    # Gemini 未配置时重试也不会成功，直接跳过，页面保留第一阶段的临时标题
+    if not is_gemini_available():
+        logger.warning(f"Gemini 未配置，跳过页面 {page_id} 的后台分析")
+        return
+
+    if short:
+        result = analyze_short_content(content)
+    else:
+        result = analyze_content(content)
+
+    # 分析失败时抛出异常，由接收队列安排重试，页面保持第一阶段的内容
+    if result.get("title") == ANALYSIS_ERROR_TITLE:
+        raise RuntimeError("Gemini 内容分析失败")
+
+    title = result.get("title") if len(content) > TITLE_CONTENT_LIMIT else None
+    summary = None if short else result.get("summary", "")
+
+    update_page_analysis(page_id, title=title, summary=summary, tags=result.get("tags", []))
+
+
+def enrich_replayed_page(page_id, meta):
+    """Notion 不可用时延迟创建的页面写入后，补充第一阶段没有完成的 AI 分析"""
+    content = meta.get("enrich_content")
+    if content:
+        enrich_page(page_id, content, meta.get("enrich_short", False))
+
+
+register_replay_callback(KIND_NOTE, enrich_replayed_page)
+
+
+def enrich_handler(update, context):
+    """接收队列中 enrich 任务的处理函数，任务数据在 context.job_data 中"""
+    data = context.job_data
+    enrich_page(data["page_id"], data["content"], data.get("short", False))
+
+
+def schedule_enrichment(update, page_id, content, short=False):
+    """
+    安排第二阶段的后台分析
+
+    参数：
+        update: 触发保存的 Telegram 更新
+        page_id: 第一阶段创建的页面 ID
+        content: 消息内容
+        short: 是否为短内容
+    """
+    if INGEST_QUEUE_ENABLED:
+        from .ingest_queue import get_ingest_queue
+
+        queue = get_ingest_queue()
+        job_id = queue.enqueue(
+            KIND_ENRICH,
+            update,
+            extra={"page_id": page_id, "content": content, "short": short},
+        )
+        if job_id is not None:
+            queue.dispatch(job_id)
+        return
+
+    # 未启用接收队列时只在内存中执行一次，失败后页面保留临时标题
+    get_dispatcher().submit(
+        get_lane_key(update, LANE_ENRICH), enrich_page, page_id, content, short
+    )
+
+
+def register_enrichment(queue):
+    """在接收队列中注册 enrich 任务的处理函数"""
+    queue.register(KIND_ENRICH, enrich_handler, LANE_ENRICH)
@@ -0,0 +1,111 @@
+"""
+Telegram 文件索引模块
+
+记录 Telegram 文件的 file_unique_id 与文件内容哈希、分析缓存键和 Notion 页面 ID 的对应关系。
+同一个文件再次发送或被转发时，file_unique_id 不变，可以直接回复已保存的页面链接，
+不需要重新下载、计算哈希或调用 Gemini。
+"""
+
+import logging
+import threading
+import time
+
+from utils.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file_unique_id TEXT PRIMARY KEY,
+    content_hash TEXT,
+    cache_key TEXT,
+    page_id TEXT,
+    file_name TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_files_hash ON files (content_hash);
+"""
+
+# 单例实例
+_index_instance = None
+_instance_lock = threading.Lock()
+
+
+class TelegramFileIndex:
+    """file_unique_id → 内容哈希 / 缓存键 / 页面 ID 的持久化映射"""
+
+    def __init__(self, store=None):
+        """
+        初始化文件索引
+
+        参数：
+            store: SQLiteStore 实例，默认使用 DATA_DIR/files.db
+        """
+        self.store = store or SQLiteStore("files.db", SCHEMA)
+
+    def lookup(self, file_unique_id):
+        """
+        按 file_unique_id 查找文件记录
+
+        返回：
+            dict/None: 文件记录，没有记录时返回 None
+        """
+        row = self.store.query_one(
+            "SELECT * FROM files WHERE file_unique_id = ?", (file_unique_id,)
+        )
+        return dict(row) if row else None
+
+    def lookup_by_hash(self, content_hash):
+        """
+        按内容哈希查找已保存到 Notion 的文件记录
+
+        同一份 PDF 重新上传时 file_unique_id 不同，但内容哈希相同
+
+        返回：
+            dict/None: 带有页面 ID 的文件记录，没有记录时返回 None
+        """
+        row = self.store.query_one(
+            "SELECT * FROM files WHERE content_hash = ? AND page_id IS NOT NULL "
+            "ORDER BY updated_at DESC LIMIT 1",
+            (content_hash,),
+        )
+        return dict(row) if row else None
+
+    def remember(self, file_unique_id, content_hash=None, cache_key=None, page_id=None, file_name=None):
+        """
+        记录或更新文件信息，已有字段不会被空值覆盖
+
+        参数：
+            file_unique_id: Telegram 文件的唯一 ID
+            content_hash: 文件内容哈希
+            cache_key: 分析结果的缓存键
+            page_id: 保存到的 Notion 页面 ID
+            file_name: 文件名
+        """
+        now = time.time()
+        with self.store.transaction() as conn:
+            conn.execute(
+                """
+                INSERT INTO files
+                    (file_unique_id, content_hash, cache_key, page_id, file_name, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (file_unique_id) DO UPDATE SET
+                    content_hash = COALESCE(excluded.content_hash, content_hash),
+                    cache_key = COALESCE(excluded.cache_key, cache_key),
+                    page_id = COALESCE(excluded.page_id, page_id),
+                    file_name = COALESCE(excluded.file_name, file_name),
+                    updated_at = excluded.updated_at
+                """,
+                (file_unique_id, content_hash, cache_key, page_id, file_name, now, now),
+            )
+
+
+def get_file_index():
+    """获取文件索引单例"""
+    global _index_instance
+    if _index_instance is None:
+        with _instance_lock:
+            if _index_instance is None:
+                _index_instance = TelegramFileIndex()
+    return _index_instance
@@ -0,0 +1,95 @@
+"""
+Telegram 文件下载模块
+
+支持自建 Bot API 服务器（telegram-bot-api --local）：
+1. 配置 TELEGRAM_API_BASE_URL 后，机器人请求发往自建服务器，不再受 20MB 下载限制
+2. 本地模式下 getFile 返回服务器磁盘上的绝对路径，直接读取该文件，不经过 HTTP 传输
+3. 未配置自建服务器时仍通过官方 API 下载到临时文件
+"""
+
+import logging
+import os
+import tempfile
+
+from config import (
+    TELEGRAM_API_BASE_URL,
+    TELEGRAM_API_FILE_URL,
+    TELEGRAM_LOCAL_FILES_DIR,
+    TELEGRAM_LOCAL_SERVER_DIR,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def get_bot_api_kwargs():
+    """
+    获取创建 Bot 或 Updater 时使用的 API 地址参数
+
+    返回：
+        dict: 包含 base_url 和 base_file_url 的参数，未配置自建服务器时为空字典
+    """
+    kwargs = {}
+    if TELEGRAM_API_BASE_URL:
+        kwargs["base_url"] = TELEGRAM_API_BASE_URL
+        # 文件地址默认与 API 地址在同一服务器上
+        base_file_url = TELEGRAM_API_FILE_URL
+        if not base_file_url and TELEGRAM_API_BASE_URL.endswith("/bot"):
+            base_file_url = TELEGRAM_API_BASE_URL[: -len("/bot")] + "/file/bot"
+        if base_file_url:
+            kwargs["base_file_url"] = base_file_url
+    return kwargs
+
+
+def resolve_local_path(bot, file_path):
+    """
+    将 getFile 返回的路径转换为本机可以直接读取的文件路径
+
+    参数：
+        bot: Telegram Bot 对象
+        file_path: File.file_path
+
+    返回：
+        str/None: 本机文件路径，不是本地模式的文件或文件不存在时返回 None
+    """
+    if not file_path:
+        return None
+
+    # 服务器路径在本机不存在时，python-telegram-bot 会把它当作相对路径拼接到文件地址后面
+    prefix = f"{bot.base_file_url}/"
+    if file_path.startswith(prefix):
+        file_path = file_path[len(prefix):]
+
+    if not os.path.isabs(file_path):
+        return None
+
+    if TELEGRAM_LOCAL_FILES_DIR and file_path.startswith(TELEGRAM_LOCAL_SERVER_DIR):
+        relative = os.path.relpath(file_path, TELEGRAM_LOCAL_SERVER_DIR)
+        file_path = os.path.join(TELEGRAM_LOCAL_FILES_DIR, relative)
+
+    return file_path if os.path.isfile(file_path) else None
+
+
+def download_telegram_file(bot, file_id, suffix=""):
+    """
+    获取 Telegram 文件的本机路径
+
+    使用本地模式的自建服务器时直接返回服务器数据目录中的文件，否则下载到临时文件
+
+    参数：
+        bot: Telegram Bot 对象
+        file_id: 文件 ID
+        suffix: 临时文件的后缀名
+
+    返回：
+        tuple: (文件路径, 是否为临时文件)，只有临时文件需要调用方删除
+    """
+    file = bot.get_file(file_id)
+
+    local_path = resolve_local_path(bot, file.file_path)
+    if local_path:
+        logger.info(f"直接读取 Bot API 服务器上的文件：{local_path}")
+        return local_path, False
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+        file.download(custom_path=temp_file.name)
+        return temp_file.name, True
@@ -1,10 +1,14 @@
 import logging
+import time
 
 from telegram import Update
 from telegram.ext import CallbackContext
 
 from config import ALLOWED_USER_IDS
 
+from ..ingest_queue import is_retryable_error
+from ..sender import get_scheduler, reply_text
+
 # 配置日志
 logger = logging.getLogger(__name__)
 
@@ -13,10 +17,11 @@ def start(update: Update, context: CallbackContext) -> None:
     """发送开始消息"""
     user_id = update.effective_user.id
     if user_id not in ALLOWED_USER_IDS:
-        update.message.reply_text("对不起，您没有权限使用此机器人。")
+        reply_text(update.message, "对不起，您没有权限使用此机器人。")
         return
 
-    update.message.reply_text(
+    reply_text(
+        update.message,
         "欢迎使用 TG-Notion 自动化机器人!\n"
         "您可以直接发送消息、链接或文件，机器人会将其保存到 Notion 数据库。\n"
         "\n"
@@ -40,7 +45,8 @@ def help_command(update: Update, context: CallbackContext) -> None:
     if update.effective_user.id not in ALLOWED_USER_IDS:
         return
 
-    update.message.reply_text(
+    reply_text(
+        update.message,
         "使用指南:\n"
         "1. 直接发送任何消息，机器人会自动处理并保存到 Notion\n"
         "2. 发送纯链接时会自动提取网页内容并分析\n"
@@ -49,6 +55,8 @@ def help_command(update: Update, context: CallbackContext) -> None:
         "5. 使用 #test 标签可以测试机器人，直接回显原始消息\n"
         "6. 内容会被 AI 自动分析并生成摘要和标签\n"
         "7. 每周自动生成周报总结\n"
+        "8. 在任意聊天中输入 @机器人用户名 关键词，搜索已保存的笔记和论文\n"
+        "9. 使用 /search 关键词 在标题、标签、摘要和正文中全文搜索\n"
         "\n"
         "Zotero 相关命令:\n"
         "- /collections - 列出所有 Zotero 收藏集\n"
@@ -58,7 +66,9 @@ def help_command(update: Update, context: CallbackContext) -> None:
         "其他命令:\n"
         "- /start - 显示欢迎信息\n"
         "- /help - 显示此帮助信息\n"
-        "- /weekly - 手动触发生成本周周报",
+        "- /weekly - 手动触发生成本周周报\n"
+        "- /search 关键词 - 全文搜索已保存的内容\n"
+        "- /stats - 查看消息处理队列状态",
         parse_mode=None,  # 禁用 Markdown 解析
     )
 
@@ -70,22 +80,90 @@ def weekly_report_command(update: Update, context: CallbackContext) -> None:
 
     from services.weekly_report import generate_weekly_report
 
-    update.message.reply_text(
+    reply_text(
+        update.message,
         "正在生成本周周报，请稍候...", parse_mode=None
     )  # 禁用 Markdown 解析
 
     try:
         report_url = generate_weekly_report()
         if report_url:
-            update.message.reply_text(
+            reply_text(
+                update.message,
                 f"✅ 周报已生成！查看链接：{report_url}", parse_mode=None
             )  # 禁用 Markdown 解析
         else:
-            update.message.reply_text(
+            reply_text(
+                update.message,
                 "⚠️ 本周没有内容，无法生成周报", parse_mode=None
             )  # 禁用 Markdown 解析
     except Exception as e:
+        if is_retryable_error(e):
+            # 临时错误交给接收队列稍后重试
+            raise
         logger.error(f"生成周报时出错：{e}")
-        update.message.reply_text(
+        reply_text(
+            update.message,
             f"⚠️ 生成周报时出错：{str(e)}", parse_mode=None
         )  # 禁用 Markdown 解析
+
+
+def stats_command(update: Update, context: CallbackContext) -> None:
+    """显示消息调度器的队列状态"""
+    if update.effective_user.id not in ALLOWED_USER_IDS:
+        return
+
+    from config import INGEST_QUEUE_ENABLED, INLINE_SEARCH_ENABLED, NOTION_MIRROR_ENABLED
+
+    from ..dispatcher import format_dispatch_stats
+    from ..router import format_router_stats
+
+    text = format_dispatch_stats()
+    text += "\n\n" + format_router_stats()
+
+    if INGEST_QUEUE_ENABLED:
+        from ..ingest_queue import get_ingest_queue
+
+        queue_stats = get_ingest_queue().get_stats()
+        text += "\n\n接收队列："
+        for status in ("pending", "running", "done", "dead"):
+            text += f"\n- {status}: {queue_stats.get(status, 0)}"
+
+    send_stats = get_scheduler().get_stats()
+    text += (
+        "\n\n出站消息："
+        f"\n- 已发送 / 已编辑 / 失败：{send_stats['sent']} / {send_stats['edited']} / {send_stats['failed']}"
+        f"\n- 合并的编辑：{send_stats['coalesced']}"
+        f"\n- 触发限流：{send_stats['retry_after']}"
+        f"\n- 排队中：{send_stats['queued']}"
+    )
+
+    from services.notion_service import get_notion_outbox
+
+    outbox_stats = get_notion_outbox().get_stats()
+    text += "\n\nNotion 写入 outbox："
+    for status in ("pending", "running", "done", "dead"):
+        text += f"\n- {status}: {outbox_stats.get(status, 0)}"
+    if outbox_stats["oldest_pending_age"]:
+        text += f"\n- 最早的待写入记录已等待 {outbox_stats['oldest_pending_age'] / 60:.0f} 分钟"
+
+    if NOTION_MIRROR_ENABLED:
+        from services.notion_service import get_notion_mirror
+
+        text += "\n\nNotion 本地镜像："
+        for database_id, mirror_stats in get_notion_mirror().get_stats().items():
+            synced_at = mirror_stats["synced_at"]
+            synced = f"{(time.time() - synced_at) / 60:.0f} 分钟前同步" if synced_at else "尚未同步"
+            text += f"\n- {database_id[:8]}：{mirror_stats['pages']} 个页面，{synced}"
+
+    if INLINE_SEARCH_ENABLED:
+        from services.notion_service import get_entry_index
+
+        index_stats = get_entry_index().get_stats()
+        text += (
+            "\n\n搜索索引："
+            f"\n- 条目 / 词元：{index_stats['entries']} / {index_stats['tokens']}"
+            f"\n- 查询缓存命中 / 未命中：{index_stats['cache_hits']} / {index_stats['cache_misses']}"
+        )
+
+    reply_text(update.message, text, parse_mode=None)
@@ -0,0 +1,74 @@
+import logging
+
+from telegram import InlineQueryResultArticle, InputTextMessageContent, Update
+from telegram.error import BadRequest
+from telegram.ext import CallbackContext
+
+from config import ALLOWED_USER_IDS, INLINE_CACHE_TIME
+from services.notion_service import KIND_PAPER, get_entry_index, get_page_url
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 每次应答返回的结果数（Telegram 上限为 50），其余结果通过 next_offset 翻页
+INLINE_PAGE_SIZE = 20
+DESCRIPTION_LENGTH = 120
+
+
+def build_inline_result(entry):
+    """把索引条目转换为内联查询结果，选中后发送标题和 Notion 链接"""
+    page_url = get_page_url(entry["page_id"])
+    icon = "📄" if entry["kind"] == KIND_PAPER else "📝"
+    title = entry["title"] or "未命名笔记"
+
+    description = entry["summary"].replace("\n", " ")[:DESCRIPTION_LENGTH]
+    if entry["tags"]:
+        description = f"{' '.join('#' + tag for tag in entry['tags'])} {description}"
+
+    lines = [f"{icon} {title}", page_url]
+    if entry["url"]:
+        lines.append(f"原文：{entry['url']}")
+
+    return InlineQueryResultArticle(
+        id=entry["page_id"],
+        title=f"{icon} {title}",
+        description=description or None,
+        url=page_url,
+        input_message_content=InputTextMessageContent(
+            "\n".join(lines),
+            parse_mode=None,  # 禁用 Markdown 解析
+            disable_web_page_preview=True,
+        ),
+    )
+
+
+def inline_search(update: Update, context: CallbackContext) -> None:
+    """处理内联查询：在本地索引中搜索已保存的笔记和论文"""
+    inline_query = update.inline_query
+
+    # 内联查询可以在任何聊天中发起，只为允许的用户返回结果
+    if inline_query.from_user.id not in ALLOWED_USER_IDS:
+        inline_query.answer([], cache_time=INLINE_CACHE_TIME, is_personal=True)
+        return
+
+    try:
+        offset = int(inline_query.offset or 0)
+    except ValueError:
+        offset = 0
+
+    entries = get_entry_index().search(inline_query.query)
+    page = entries[offset : offset + INLINE_PAGE_SIZE]
+    next_offset = (
+        str(offset + INLINE_PAGE_SIZE) if len(entries) > offset + INLINE_PAGE_SIZE else ""
+    )
+
+    try:
+        inline_query.answer(
+            [build_inline_result(entry) for entry in page],
+            cache_time=INLINE_CACHE_TIME,
+            is_personal=True,
+            next_offset=next_offset,
+        )
+    except BadRequest as e:
+        # 用户继续输入后旧查询会过期，这种情况无需处理
+        logger.debug(f"应答内联查询失败：{e}")
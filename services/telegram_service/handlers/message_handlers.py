@@ -3,14 +3,16 @@ import logging
 from telegram import Update
 from telegram.ext import CallbackContext
 
-from config import ALLOWED_USER_IDS
-from services.gemini_service import analyze_content
-from utils.helpers import is_url_only
-from utils.text_formatter import (
-    extract_urls_from_entities,
-    parse_message_entities,
-)
+from config import ALLOWED_USER_IDS, COALESCE_ENABLED, TWO_PHASE_SAVE
+from services.gemini_service import analyze_content, analyze_short_content, is_gemini_available
+from utils.text_formatter import extract_urls_from_entities
 
+from ..coalescer import describe_forward_origin, get_burst_key, get_coalescer
+from ..enrichment import TITLE_CONTENT_LIMIT, schedule_enrichment
+from ..idempotency import find_saved_page, remember_saved_page
+from ..ingest_queue import JOB_DEFERRED, get_ingest_queue, is_retryable_error
+from ..router import SHORT_CONTENT_LIMIT, get_router, register_route
+from ..sender import reply_text
 from .pdf_handlers import handle_pdf_document
 from .test_handlers import handle_test_message
 from .todo_handlers import handle_todo_message
@@ -22,144 +24,375 @@ from .url_handlers import handle_multiple_urls_message, handle_url_message
 logger = logging.getLogger(__name__)
 
 
-def process_message(update: Update, context: CallbackContext) -> None:
-    """处理收到的消息"""
+def get_text_and_entities(message):
+    """获取文本内容和实体，区分普通文本和带标题的媒体消息"""
+    if message.text:
+        return message.text, message.entities
+    if message.caption:
+        return message.caption, message.caption_entities
+    return "", []
+
+
+def process_message(update: Update, context: CallbackContext):
+    """处理收到的消息；消息进入合并窗口时返回 JOB_DEFERRED，批次处理完后再完成接收队列任务"""
     if update.effective_user.id not in ALLOWED_USER_IDS:
         return
 
     message = update.message
-    text = None
-    entities = None
-    contains_photo = message.photo and len(message.photo) > 0
+    text, entities = get_text_and_entities(message)
+    chat_id = update.effective_chat.id
 
-    # 获取文本内容和实体，区分普通文本和带标题的媒体消息
-    if message.text:
-        text = message.text
-        entities = message.entities
-    elif message.caption:
-        text = message.caption
-        entities = message.caption_entities
-    else:
-        text = ""
-        entities = []
+    # 相册和连续转发的消息先进入合并窗口，带路由标签（#todo 等）的消息仍单独处理
+    if COALESCE_ENABLED:
+        burst_key = get_burst_key(message)
+        if burst_key and not get_router().has_hashtag_route(text):
+            # 来自接收队列的任务在批次处理完后才标记完成，合并窗口中的消息重启后不会丢失
+            job_id = getattr(context, "job_id", None)
+            get_coalescer().add(chat_id, burst_key, (update, job_id), flush_burst)
+            return JOB_DEFERRED if job_id is not None else None
 
-    # 处理消息实体，提取格式化信息
-    parsed_content = parse_message_entities(text, entities)
+        # 普通消息处理前，先保存之前尚未结束的合并批次，保持顺序；
+        # 批次的任务已由 flush_burst 标记失败并稍后重试，这里的错误不影响当前消息
+        try:
+            get_coalescer().flush(chat_id)
+        except Exception as e:
+            logger.error(f"处理聊天 {chat_id} 之前的合并批次时出错：{e}")
 
-    # 获取创建时间
-    created_at = message.date
+    process_single_message(update, text, entities)
 
-    # 如果消息包含图片，添加前缀
-    if contains_photo:
-        logger.info(
-            f"接收到包含图片的消息，用户 ID: {update.effective_user.id}，将只处理文字部分"
-        )
 
-        # 如果图片消息没有文字说明
-        if not text:
-            update.message.reply_text(
-                "⚠️ 收到图片但没有文字说明。请添加说明后重新发送，或者单独发送要保存的文字内容。",
-                parse_mode=None,  # 禁用 Markdown 解析
-            )
-            return
-
-        # 给原始内容添加前缀，表明它来自包含图片的消息
-        parsed_content["text"] = f"[此内容来自包含图片的消息] {parsed_content['text']}"
-        logger.info(f"处理图片消息的文字内容，长度：{len(parsed_content['text'])} 字符")
-
-    # 提取所有 URL（从实体和文本）
-    urls = extract_urls_from_entities(text, entities)
-
-    # 检查特殊标签
-    if "#test" in parsed_content["text"]:
-        handle_test_message(update, parsed_content)
-        return
+def flush_burst(items) -> None:
+    """
+    处理合并窗口结束的一批消息，然后更新对应的接收队列任务
+
+    参数：
+    items (list): (update, 接收队列任务 ID) 列表，不经过接收队列的消息任务 ID 为 None
+    """
+    job_ids = [job_id for _, job_id in items if job_id is not None]
+    try:
+        process_burst([update for update, _ in items])
+    except Exception as e:
+        for job_id in job_ids:
+            get_ingest_queue().fail(job_id, e)
+        raise
 
-    if "#todo" in parsed_content["text"]:
-        handle_todo_message(update, parsed_content["text"], created_at)
+    for job_id in job_ids:
+        get_ingest_queue().complete(job_id)
+
+
+def process_burst(updates) -> None:
+    """
+    处理合并后的一批消息：只做一次分析、写入一个 Notion 页面并回复一次
+
+    参数：
+    updates (list): 同一聊天中属于同一批次的更新，按到达顺序排列
+    """
+    if len(updates) == 1:
+        text, entities = get_text_and_entities(updates[0].message)
+        process_single_message(updates[0], text, entities)
         return
 
-    # 检查是否是纯 URL 消息
-    if urls and is_url_only(parsed_content["text"]):
-        handle_url_message(update, urls[0], created_at)
+    first = updates[0]
+    parts = []
+    urls = []
+    last_origin = ""
+
+    for update in updates:
+        text, entities = get_text_and_entities(update.message)
+        if not text:
+            continue
+
+        # 转发来源只在变化时标注一次
+        origin = describe_forward_origin(update.message)
+        if origin and origin != last_origin:
+            parts.append(f"[转发自 {origin}]\n{text}")
+        else:
+            parts.append(text)
+        last_origin = origin
+
+        for url in extract_urls_from_entities(text, entities):
+            if url not in urls:
+                urls.append(url)
+
+    if not parts:
+        reply_text(
+            first.message,
+            "⚠️ 收到图片但没有文字说明。请添加说明后重新发送，或者单独发送要保存的文字内容。",
+            parse_mode=None,  # 禁用 Markdown 解析
+        )
         return
 
-    # 多 URL 处理
-    if len(urls) > 1:
-        handle_multiple_urls_message(update, parsed_content["text"], urls, created_at)
+    merged_content = "\n\n".join(parts)
+
+    # 合并批次以第一条消息为键，重试时直接返回已创建的页面
+    existing_page = find_saved_page(first.message, merged_content)
+    if existing_page:
+        reply_already_saved(first.message, existing_page)
         return
-    elif len(urls) == 1:
-        url = urls[0]
+
+    reply_text(
+        first.message,
+        f"正在合并处理 {len(updates)} 条消息...", parse_mode=None
+    )  # 禁用 Markdown 解析
+
+    if len(merged_content) < SHORT_CONTENT_LIMIT:
+        analysis_result = analyze_short_content(merged_content)
     else:
-        url = ""
+        analysis_result = analyze_content(merged_content)
+
+    try:
+        from services.notion_service import add_to_notion
+
+        page_id = add_to_notion(
+            content=merged_content,
+            # 短内容直接使用原文作为摘要，与单条消息的处理方式一致
+            summary=merged_content
+            if len(merged_content) < SHORT_CONTENT_LIMIT
+            else analysis_result["summary"],
+            tags=analysis_result["tags"],
+            url=urls[0] if urls else "",
+            created_at=first.message.date,
+        )
+        remember_saved_page(first.message, page_id, merged_content)
+        reply_text(
+            first.message,
+            f"✅ 已将 {len(updates)} 条消息合并保存到 Notion!", parse_mode=None
+        )  # 禁用 Markdown 解析
+    except Exception as e:
+        if is_retryable_error(e):
+            # 临时错误交给接收队列稍后重试
+            raise
+        logger.error(f"添加合并消息到 Notion 时出错：{e}")
+        reply_text(
+            first.message,
+            f"⚠️ 保存到 Notion 时出错：{str(e)}",
+            parse_mode=None,  # 禁用 Markdown 解析
+        )
+
+
+def process_single_message(update: Update, text, entities) -> None:
+    """处理单条消息的文本内容，按路由表交给对应的处理函数"""
+    get_router().dispatch(update, text, entities)
+
+
+def reply_photo_without_text(parsed) -> None:
+    """图片消息没有文字说明时提示用户"""
+    reply_text(
+        parsed.message,
+        "⚠️ 收到图片但没有文字说明。请添加说明后重新发送，或者单独发送要保存的文字内容。",
+        parse_mode=None,  # 禁用 Markdown 解析
+    )
+
+
+def save_note(parsed) -> None:
+    """默认路由：分析内容并保存为 Notion 笔记"""
+    update = parsed.update
+    message = parsed.message
+    content = parsed.content
+    created_at = message.date
+
+    if parsed.has_photo:
+        logger.info(
+            f"接收到包含图片的消息，用户 ID: {update.effective_user.id}，将只处理文字部分"
+        )
+        logger.info(f"处理图片消息的文字内容，长度：{len(content)} 字符")
+
+    # 两阶段保存：立即创建页面并回复链接，AI 分析在后台完成后再更新页面
+    if TWO_PHASE_SAVE:
+        save_two_phase(update, content, parsed.url, created_at, short=parsed.is_short)
+        return
 
     # 短内容处理：如果内容不是纯 URL 且少于 200 字符，直接将内容作为摘要
-    if len(parsed_content["text"]) < 200:
+    if parsed.is_short:
         # 通知用户正在处理消息
         processing_msg = (
-            "正在处理消息..." if not contains_photo else "正在处理图片消息的文字内容..."
+            "正在处理消息..." if not parsed.has_photo else "正在处理图片消息的文字内容..."
         )
-        update.message.reply_text(processing_msg, parse_mode=None)  # 禁用 Markdown 解析
+        reply_text(message, processing_msg, parse_mode=None)  # 禁用 Markdown 解析
 
-        # 仍需使用 Gemini API 分析提取标签
-        analysis_result = analyze_content(parsed_content["text"])
-        # 存入 Notion，但使用原始内容作为摘要
-        try:
-            from services.notion_service import add_to_notion
-
-            # 注意：此处传递的 content 只包含文本，不包含任何图片数据
-            add_to_notion(
-                content=parsed_content["text"],  # 只传递文本内容
-                summary=parsed_content["text"],  # 直接使用原始内容作为摘要
-                tags=analysis_result["tags"],
-                url=url,
-                created_at=created_at,
-            )
-            update.message.reply_text(
-                "✅ 内容已成功保存到 Notion!", parse_mode=None
-            )  # 禁用 Markdown 解析
-        except Exception as e:
-            logger.error(f"添加到 Notion 时出错：{e}")
-            update.message.reply_text(
-                f"⚠️ 保存到 Notion 时出错：{str(e)}",
-                parse_mode=None,  # 禁用 Markdown 解析
-            )
-        return
-
-    # 长内容处理：通知用户正在处理
-    processing_msg = (
-        "正在处理较长消息，这可能需要一点时间..."
-        if not contains_photo
-        else "正在处理图片消息中的较长文字内容，这可能需要一点时间..."
-    )
-    update.message.reply_text(processing_msg, parse_mode=None)  # 禁用 Markdown 解析
+        # 仍需使用 Gemini API 分析提取标签，与同时到达的其他短消息合并为一次请求
+        analysis_result = analyze_short_content(content)
+        summary = content  # 直接使用原始内容作为摘要
+    else:
+        # 长内容处理：通知用户正在处理
+        processing_msg = (
+            "正在处理较长消息，这可能需要一点时间..."
+            if not parsed.has_photo
+            else "正在处理图片消息中的较长文字内容，这可能需要一点时间..."
+        )
+        reply_text(message, processing_msg, parse_mode=None)  # 禁用 Markdown 解析
 
-    # 使用 Gemini API 完整分析内容
-    analysis_result = analyze_content(parsed_content["text"])
+        # 使用 Gemini API 完整分析内容
+        analysis_result = analyze_content(content)
+        summary = analysis_result["summary"]
 
     # 存入 Notion
-    try:
-        from services.notion_service import add_to_notion
+    from services.notion_service import NotionWriteDeferred, add_to_notion
 
-        add_to_notion(
-            content=parsed_content["text"],
-            summary=analysis_result["summary"],
+    try:
+        # 注意：此处传递的 content 只包含文本，不包含任何图片数据
+        page_id = add_to_notion(
+            content=content,
+            summary=summary,
             tags=analysis_result["tags"],
-            url=url,
+            url=parsed.url,
             created_at=created_at,
         )
-        update.message.reply_text(
+        remember_saved_page(message, page_id)
+        reply_text(
+            message,
             "✅ 内容已成功保存到 Notion!", parse_mode=None
         )  # 禁用 Markdown 解析
+    except NotionWriteDeferred:
+        reply_text(
+            message,
+            "⏳ Notion 暂时无法访问，内容已保存在本地，恢复后会自动写入",
+            parse_mode=None,  # 禁用 Markdown 解析
+        )
     except Exception as e:
+        if is_retryable_error(e):
+            # 临时错误交给接收队列稍后重试
+            raise
         logger.error(f"添加到 Notion 时出错：{e}")
-        update.message.reply_text(
+        reply_text(
+            message,
             f"⚠️ 保存到 Notion 时出错：{str(e)}",
             parse_mode=None,  # 禁用 Markdown 解析
         )
 
 
-def process_document(update: Update, context: CallbackContext) -> None:
+def reply_already_saved(message, page_id) -> None:
+    """回复已保存过的页面链接"""
+    from services.notion_service import get_page_url
+
+    reply_text(
+        message,
+        f"✅ 该内容已保存过，未重复创建：{get_page_url(page_id)}",
+        parse_mode=None,  # 禁用 Markdown 解析
+    )
+
+
+def handle_duplicate(parsed) -> None:
+    """
+    已保存过相同链接或近似内容时不再抓取和分析：
+    按链接命中且消息中还有链接以外的文字时，把新消息作为评论追加到已有页面；
+    按内容近似命中且消息中有已保存的正文里没有的行时，把这些行作为评论追加；否则只回复链接
+    """
+    from services.notion_service import append_comment_to_page, find_new_text, get_page_url
+
+    message = parsed.message
+    page_id, by_url = parsed.duplicate()
+    if by_url:
+        comment = parsed.text
+        for url in parsed.urls:
+            comment = comment.replace(url, "")
+        if comment.strip():
+            comment = parsed.content
+        subject = "该链接"
+    else:
+        comment = find_new_text(page_id, parsed.text)
+        subject = "相似内容"
+
+    if not comment.strip():
+        logger.info(f"消息 {message.chat_id}/{message.message_id} 与页面 {page_id} 重复，跳过")
+        remember_saved_page(message, page_id)
+        reply_already_saved(message, page_id)
+        return
+
+    try:
+        complete = append_comment_to_page(page_id, comment, message.date)
+    except Exception as e:
+        if is_retryable_error(e):
+            # 临时错误交给接收队列稍后重试
+            raise
+        logger.error(f"追加评论到页面 {page_id} 时出错：{e}")
+        reply_text(
+            message,
+            f"⚠️ {subject}已保存过：{get_page_url(page_id)}\n追加新内容时出错：{str(e)}",
+            parse_mode=None,  # 禁用 Markdown 解析
+        )
+        return
+
+    remember_saved_page(message, page_id)
+    status = "已作为评论追加到该页面" if complete else "将在 Notion 恢复后作为评论追加到该页面"
+    new_part = "新消息" if by_url else "新增的内容"
+    reply_text(
+        message,
+        f"✅ {subject}已保存过：{get_page_url(page_id)}\n{new_part}{status}",
+        parse_mode=None,  # 禁用 Markdown 解析
+    )
+
+
+def save_two_phase(update: Update, content, url, created_at, short) -> None:
+    """
+    两阶段保存的第一阶段：不调用 AI，用原始内容和临时标题创建页面并回复链接，
+    然后安排后台分析补充标题、摘要和标签
+
+    参数：
+        update: Telegram 更新
+        content: 消息文本
+        url: 消息中的链接
+        created_at: 消息时间
+        short: 是否为短内容（短内容直接使用原文作为摘要）
+    """
+    from services.notion_service import (
+        NotionWriteDeferred,
+        add_to_notion,
+        get_page_url,
+        make_provisional_title,
+    )
+
+    title = content if len(content) <= TITLE_CONTENT_LIMIT else make_provisional_title(content)
+
+    try:
+        page_id = add_to_notion(
+            content=content,
+            summary=content if short else "",
+            tags=[],
+            url=url,
+            created_at=created_at,
+            title=title,
+            # Notion 不可用时页面稍后才创建，创建后再生成标题、摘要和标签
+            replay_meta={"enrich_content": content, "enrich_short": short},
+        )
+    except NotionWriteDeferred:
+        reply_text(
+            update.message,
+            "⏳ Notion 暂时无法访问，内容已保存在本地，恢复后会自动写入并生成标题、摘要和标签",
+            parse_mode=None,  # 禁用 Markdown 解析
+        )
+        return
+    except Exception as e:
+        if is_retryable_error(e):
+            # 临时错误交给接收队列稍后重试
+            raise
+        logger.error(f"添加到 Notion 时出错：{e}")
+        reply_text(
+            update.message,
+            f"⚠️ 保存到 Notion 时出错：{str(e)}",
+            parse_mode=None,  # 禁用 Markdown 解析
+        )
+        return
+
+    remember_saved_page(update.message, page_id)
+    if not is_gemini_available():
+        # Gemini 未配置时不安排后台分析，页面保留临时标题
+        reply_text(
+            update.message,
+            f"✅ 内容已保存到 Notion：{get_page_url(page_id)}\nGemini 未配置，未生成标题、摘要和标签",
+            parse_mode=None,  # 禁用 Markdown 解析
+        )
+        return
+
+    reply_text(
+        update.message,
+        f"✅ 内容已保存到 Notion：{get_page_url(page_id)}\n正在后台生成标题、摘要和标签...",
+        parse_mode=None,  # 禁用 Markdown 解析
+    )
+    schedule_enrichment(update, page_id, content, short)
+
+
+def process_document(update: Update, context: CallbackContext):
     """处理文档文件，特别是 PDF"""
     if update.effective_user.id not in ALLOWED_USER_IDS:
         return
@@ -170,5 +403,64 @@ def process_document(update: Update, context: CallbackContext) -> None:
     if message.document.file_name.lower().endswith(".pdf"):
         handle_pdf_document(update, context)
     else:
-        # 对于非 PDF 文件，使用常规处理
-        process_message(update, context)
+        # 对于非 PDF 文件，使用常规处理；进入合并窗口时返回 JOB_DEFERRED
+        return process_message(update, context)
+
+
+def register_default_routes() -> None:
+    """
+    注册默认的消息路由
+
+    优先级（数值越小越优先）：
+    无文字的图片 → #test → #todo → 已保存过的消息 → 已保存过的链接或内容 → 纯链接 → 多链接 → 保存为笔记
+    """
+    register_route(
+        "photo_without_text",
+        reply_photo_without_text,
+        predicate=lambda parsed: parsed.has_photo and not parsed.text,
+        priority=0,
+    )
+    register_route(
+        "test",
+        lambda parsed: handle_test_message(parsed.update, parsed.parsed_content),
+        hashtag="#test",
+        priority=10,
+    )
+    register_route(
+        "todo",
+        lambda parsed: handle_todo_message(parsed.update, parsed.content, parsed.message.date),
+        hashtag="#todo",
+        priority=20,
+    )
+    # 重试、重新投递或重复发送的消息直接返回已保存的页面
+    register_route(
+        "already_saved",
+        lambda parsed: reply_already_saved(parsed.message, parsed.saved_page()),
+        predicate=lambda parsed: parsed.saved_page(),
+        priority=30,
+    )
+    # 保存过相同链接或近似内容时，在抓取网页和调用 AI 之前返回已有页面
+    register_route(
+        "duplicate",
+        handle_duplicate,
+        predicate=lambda parsed: parsed.duplicate(),
+        priority=35,
+    )
+    register_route(
+        "url",
+        lambda parsed: handle_url_message(parsed.update, parsed.urls[0], parsed.message.date),
+        predicate=lambda parsed: parsed.url_only and not parsed.has_photo,
+        priority=40,
+    )
+    register_route(
+        "multiple_urls",
+        lambda parsed: handle_multiple_urls_message(
+            parsed.update, parsed.content, parsed.urls, parsed.message.date
+        ),
+        predicate=lambda parsed: len(parsed.urls) > 1,
+        priority=50,
+    )
+    register_route("note", save_note)
+
+
+register_default_routes()
@@ -1,14 +1,23 @@
 import logging
 import os
-import tempfile
 from urllib.parse import urlparse
 
 from telegram import Update
 from telegram.ext import CallbackContext
 
 from services.gemini_service import analyze_pdf_content
-from services.notion_service import add_to_papers_database, download_pdf
-
+from services.gemini_service.pdf_analyzer import calculate_file_hash
+from services.notion_service import (
+    NotionWriteDeferred,
+    add_to_papers_database,
+    download_pdf,
+    get_page_url,
+)
+
+from ..file_index import get_file_index
+from ..files import download_telegram_file
+from ..ingest_queue import is_retryable_error
+from ..sender import reply_text
 from ..utils import extract_metadata_from_filename
 
 # 配置日志
@@ -17,21 +26,49 @@ logger = logging.getLogger(__name__)
 
 def handle_pdf_document(update: Update, context: CallbackContext):
     """处理 PDF 文档，特别是学术论文"""
-    update.message.reply_text("正在处理 PDF 文件，这可能需要几分钟...")
-
     message = update.message
     document = message.document
     created_at = message.date
+    file_index = get_file_index()
+
+    # 同一个文件再次发送或转发时 file_unique_id 不变，直接回复已保存的页面
+    known = file_index.lookup(document.file_unique_id)
+    if known and known["page_id"]:
+        logger.info(f"文件 {document.file_unique_id} 已保存过，跳过下载和分析")
+        reply_text(
+            update.message,
+            f"📄 该 PDF 已保存过 → {get_page_url(known['page_id'])}",
+        )
+        return
+
+    reply_text(update.message, "正在处理 PDF 文件，这可能需要几分钟...")
 
     try:
-        # 下载文件
-        file = context.bot.get_file(document.file_id)
+        # 下载文件（使用自建 Bot API 服务器时直接读取服务器上的文件）
+        pdf_path, is_temp = download_telegram_file(
+            context.bot, document.file_id, suffix=".pdf"
+        )
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-            file.download(custom_path=temp_file.name)
-            pdf_path = temp_file.name
+        # 内容相同但重新上传的文件 file_unique_id 不同，再按内容哈希查找一次
+        content_hash = calculate_file_hash(pdf_path)
+        known = file_index.lookup_by_hash(content_hash) if content_hash else None
+        if known:
+            file_index.remember(
+                document.file_unique_id,
+                content_hash=content_hash,
+                cache_key=known["cache_key"],
+                page_id=known["page_id"],
+                file_name=document.file_name,
+            )
+            if is_temp:
+                os.unlink(pdf_path)
+            reply_text(
+                update.message,
+                f"📄 该 PDF 已保存过 → {get_page_url(known['page_id'])}",
+            )
+            return
 
-        # 使用 Gemini 分析 PDF 内容
+        # 使用 Gemini 分析 PDF 内容（analyze_pdf_content 以文件哈希作为缓存键）
         pdf_analysis = analyze_pdf_content(pdf_path)
 
         # 从文件名提取可能的元数据
@@ -46,20 +83,44 @@ def handle_pdf_document(update: Update, context: CallbackContext):
             metadata=filename_metadata,  # 可能从文件名提取的元数据
         )
 
-        update.message.reply_text(
+        file_index.remember(
+            document.file_unique_id,
+            content_hash=content_hash,
+            cache_key=content_hash,
+            page_id=page_id,
+            file_name=document.file_name,
+        )
+
+        reply_text(
+            update.message,
             "✅ PDF 论文已成功解析并添加到 Notion 数据库！\n包含详细分析和原始 PDF 文件。"
         )
 
+    except NotionWriteDeferred:
+        reply_text(
+            update.message,
+            "⏳ Notion 暂时无法访问，论文分析已保存在本地，恢复后会自动添加到论文数据库",
+        )
+        try:
+            if is_temp and os.path.exists(pdf_path):
+                os.unlink(pdf_path)
+        except Exception as e:
+            logger.debug(f"清理临时文件时出错：{e}")
+
     except Exception as e:
-        logger.error(f"处理 {document.file_id} 文件时出错：{e}")
-        update.message.reply_text(f"⚠️ 处理 {document.file_id} 文件时出错：{str(e)}")
+        retryable = is_retryable_error(e)
+        if not retryable:
+            logger.error(f"处理 {document.file_id} 文件时出错：{e}")
+            reply_text(update.message, f"⚠️ 处理 {document.file_id} 文件时出错：{str(e)}")
         # 确保清理任何临时文件
         try:
-            if "pdf_path" in locals():
+            if "pdf_path" in locals() and is_temp:
                 os.unlink(pdf_path)
         except Exception as e:
             logger.debug(f"清理临时文件时出错：{e}")
-            pass
+        if retryable:
+            # 临时错误交给接收队列稍后重试，重试时重新下载文件
+            raise
 
 
 def handle_pdf_url(update: Update, url, created_at):
@@ -69,7 +130,7 @@ def handle_pdf_url(update: Update, url, created_at):
         pdf_path, file_size = download_pdf(url)
 
         if not pdf_path:
-            update.message.reply_text(f"⚠️ 无法下载 {url} 文件")
+            reply_text(update.message, f"⚠️ 无法下载 {url} 文件")
             return
 
         # 提取文件名
@@ -92,19 +153,33 @@ def handle_pdf_url(update: Update, url, created_at):
             os.unlink(pdf_path)
         except Exception as e:
             logger.debug(f"清理临时文件时出错：{e}")
-            pass
 
-        update.message.reply_text(
+        reply_text(
+            update.message,
             f"✅ {url} 论文已成功解析并添加到 Notion 数据库！\n包含详细分析和原始 PDF 文件链接。"
         )
 
+    except NotionWriteDeferred:
+        reply_text(
+            update.message,
+            f"⏳ Notion 暂时无法访问，{url} 论文分析已保存在本地，恢复后会自动添加到论文数据库",
+        )
+        try:
+            if pdf_path and os.path.exists(pdf_path):
+                os.unlink(pdf_path)
+        except Exception as e:
+            logger.debug(f"清理临时文件时出错：{e}")
+
     except Exception as e:
-        logger.error(f"处理 PDF {url} 时出错：{e}")
-        update.message.reply_text(f"⚠️ 处理 PDF {url} 时出错：{str(e)}")
+        retryable = is_retryable_error(e)
+        if not retryable:
+            logger.error(f"处理 PDF {url} 时出错：{e}")
+            reply_text(update.message, f"⚠️ 处理 PDF {url} 时出错：{str(e)}")
         try:
             if "pdf_path" in locals() and pdf_path and os.path.exists(pdf_path):
                 os.unlink(pdf_path)
         except Exception as e:
             logger.debug(f"清理临时文件时出错：{e}")
-            pass
-            pass
+        if retryable:
+            # 临时错误交给接收队列稍后重试，重试时重新下载 PDF
+            raise
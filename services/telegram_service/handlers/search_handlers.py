@@ -0,0 +1,150 @@
+import html
+import logging
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ParseMode, Update
+from telegram.ext import CallbackContext
+
+from config import ALLOWED_USER_IDS, SEARCH_PAGE_SIZE
+from services.notion_service import KIND_PAPER, KIND_TODO, get_page_url, get_search_index
+
+from ..sender import edit_message_text, reply_text
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 翻页按钮的回调数据前缀，格式为 search:<查询编号>:<偏移量>
+CALLBACK_PREFIX = "search"
+
+# 回调数据最长 64 字节，查询文本保存在内存中，按钮里只放编号；只保留最近的查询
+MAX_SAVED_QUERIES = 256
+
+_queries = OrderedDict()
+_queries_lock = threading.Lock()
+
+KIND_ICONS = {KIND_PAPER: "📄", KIND_TODO: "✅"}
+
+
+def _save_query(query):
+    """保存查询文本，返回放在回调数据中的编号"""
+    token = secrets.token_hex(4)
+    with _queries_lock:
+        _queries[token] = query
+        if len(_queries) > MAX_SAVED_QUERIES:
+            _queries.popitem(last=False)
+    return token
+
+
+def _load_query(token):
+    with _queries_lock:
+        query = _queries.get(token)
+        if query is not None:
+            _queries.move_to_end(token)
+        return query
+
+
+def render_results(query, token, offset):
+    """
+    搜索并生成一页结果的消息文本和翻页按钮
+
+    返回：
+        tuple: (HTML 文本, InlineKeyboardMarkup 或 None)
+    """
+    started = time.perf_counter()
+    total, results = get_search_index().search(query, offset=offset, limit=SEARCH_PAGE_SIZE)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    if not total:
+        return f"🔍 没有找到与 <b>{html.escape(query)}</b> 相关的内容", None
+
+    pages = (total + SEARCH_PAGE_SIZE - 1) // SEARCH_PAGE_SIZE
+    lines = [
+        f"🔍 <b>{html.escape(query)}</b>：共 {total} 条结果，"
+        f"第 {offset // SEARCH_PAGE_SIZE + 1}/{pages} 页（{elapsed_ms:.0f} ms）",
+        "",
+    ]
+    for i, entry in enumerate(results, start=offset + 1):
+        icon = KIND_ICONS.get(entry["kind"], "📝")
+        title = html.escape(entry["title"] or "未命名笔记")
+        lines.append(f'{i}. {icon} <a href="{get_page_url(entry["page_id"])}">{title}</a>')
+        if entry["tags"]:
+            lines.append(html.escape(" ".join("#" + tag for tag in entry["tags"])))
+        if entry["snippet"]:
+            lines.append(entry["snippet"])
+        lines.append("")
+
+    buttons = []
+    if offset > 0:
+        previous = max(0, offset - SEARCH_PAGE_SIZE)
+        buttons.append(
+            InlineKeyboardButton("⬅️ 上一页", callback_data=f"{CALLBACK_PREFIX}:{token}:{previous}")
+        )
+    if offset + SEARCH_PAGE_SIZE < total:
+        buttons.append(
+            InlineKeyboardButton(
+                "下一页 ➡️", callback_data=f"{CALLBACK_PREFIX}:{token}:{offset + SEARCH_PAGE_SIZE}"
+            )
+        )
+
+    return "\n".join(lines).strip(), InlineKeyboardMarkup([buttons]) if buttons else None
+
+
+def search_command(update: Update, context: CallbackContext) -> None:
+    """/search 关键词：在本地全文索引中搜索已保存的笔记、论文和待办事项"""
+    if update.effective_user.id not in ALLOWED_USER_IDS:
+        return
+
+    query = " ".join(context.args or []).strip()
+    if not query:
+        reply_text(
+            update.message,
+            "用法：/search 关键词\n在已保存的笔记、论文和待办事项的标题、标签、摘要和正文中搜索",
+            parse_mode=None,  # 禁用 Markdown 解析
+        )
+        return
+
+    text, keyboard = render_results(query, _save_query(query), 0)
+    reply_text(
+        update.message,
+        text,
+        parse_mode=ParseMode.HTML,
+        reply_markup=keyboard,
+        disable_web_page_preview=True,
+    )
+
+
+def search_page_callback(update: Update, context: CallbackContext) -> None:
+    """处理搜索结果的翻页按钮"""
+    callback_query = update.callback_query
+    if callback_query.from_user.id not in ALLOWED_USER_IDS:
+        callback_query.answer()
+        return
+
+    try:
+        _, token, offset = callback_query.data.split(":")
+        offset = max(0, int(offset))
+    except ValueError:
+        callback_query.answer()
+        return
+
+    query = _load_query(token)
+    if query is None:
+        # 机器人重启后或查询过多时旧的查询已被清除
+        callback_query.answer("搜索结果已过期，请重新发送 /search", show_alert=True)
+        return
+
+    callback_query.answer()
+    text, keyboard = render_results(query, token, offset)
+    message = callback_query.message
+    edit_message_text(
+        message.bot,
+        message.chat_id,
+        message.message_id,
+        text,
+        parse_mode=ParseMode.HTML,
+        reply_markup=keyboard,
+        disable_web_page_preview=True,
+    )
@@ -2,6 +2,8 @@ import logging
 
 from telegram import Update
 
+from ..sender import reply_text
+
 # 配置日志
 logger = logging.getLogger(__name__)
 
@@ -21,7 +23,8 @@ def handle_test_message(update: Update, parsed_content):
     message_id = update.message.message_id
 
     # 转发原消息
-    update.message.reply_text(
+    reply_text(
+        update.message,
         "📝 收到测试消息！以下是原始消息：", parse_mode=None
     )  # 禁用 Markdown 解析
 
@@ -31,7 +34,8 @@ def handle_test_message(update: Update, parsed_content):
         )
     except Exception as e:
         logger.error(f"转发消息失败：{e}")
-        update.message.reply_text(
+        reply_text(
+            update.message,
             f"消息转发失败：{str(e)}", parse_mode=None
         )  # 禁用 Markdown 解析
 
@@ -58,10 +62,11 @@ def handle_test_message(update: Update, parsed_content):
         entity_report += "未检测到任何格式化实体\n"
 
     # 发送解析报告
-    update.message.reply_text(entity_report, parse_mode=None)  # 禁用 Markdown 解析
+    reply_text(update.message, entity_report, parse_mode=None)  # 禁用 Markdown 解析
 
     # 显示处理后的纯文本内容
-    update.message.reply_text(
+    reply_text(
+        update.message,
         f"处理后的纯文本内容：\n\n{clean_text}",
         parse_mode=None,  # 禁用 Markdown 解析
     )
@@ -5,7 +5,10 @@ from datetime import datetime
 import pytz
 from telegram import Update
 
-from services.notion_service import add_to_todo_database
+from services.notion_service import NotionWriteDeferred, add_to_todo_database
+
+from ..ingest_queue import is_retryable_error
+from ..sender import reply_text
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -54,10 +57,20 @@ def handle_todo_message(update: Update, content, created_at):
         # 添加到 Todo 数据库
         page_id = add_to_todo_database(task_content, created_at, duration_hours)  # noqa: F841
 
-        update.message.reply_text(
+        reply_text(
+            update.message,
             f"✅ 任务 {task_content} 已成功添加到待办事项列表！持续时间：{duration_hours:.1f}小时",
             parse_mode=None,  # 禁用 Markdown 解析
         )
+    except NotionWriteDeferred:
+        reply_text(
+            update.message,
+            "⏳ Notion 暂时无法访问，待办事项已保存在本地，恢复后会自动添加",
+            parse_mode=None,  # 禁用 Markdown 解析
+        )
     except Exception as e:
+        if is_retryable_error(e):
+            # 临时错误交给接收队列稍后重试
+            raise
         logger.error(f"添加待办事项时出错：{e}")
-        update.message.reply_text(f"⚠️ 添加待办事项时出错：{str(e)}")
+        reply_text(update.message, f"⚠️ 添加待办事项时出错：{str(e)}")
@@ -2,11 +2,27 @@ import logging
 
 from telegram import Update
 
+from config import TWO_PHASE_SAVE
 from services.gemini_service import analyze_content
-from services.notion_service import add_to_notion, is_pdf_url
-from services.url_service import extract_url_content
+from services.gemini_service.content_analyzer import ANALYSIS_ERROR_TITLE
+from services.notion_service import (
+    NotionPageIncomplete,
+    NotionWriteDeferred,
+    add_stream_to_notion,
+    add_to_notion,
+    get_notion_outbox,
+    get_page_url,
+    is_pdf_url,
+    iter_notion_blocks,
+    update_page_analysis,
+)
+from services.url_service import UrlContentStream
 from utils.text_formatter import extract_urls_from_text
 
+from ..enrichment import schedule_enrichment
+from ..idempotency import remember_saved_page
+from ..ingest_queue import is_retryable_error
+from ..sender import reply_text
 from .pdf_handlers import handle_pdf_url
 
 # 配置日志
@@ -34,45 +50,86 @@ def handle_url_message(update: Update, url, created_at):
 
     # 首先检查是否是 PDF URL
     if is_pdf_url(url):
-        update.message.reply_text(
+        reply_text(
+            update.message,
             "检测到 PDF 链接，正在下载并解析论文内容，请稍候...", parse_mode=None
         )  # 禁用 Markdown 解析
         handle_pdf_url(update, url, created_at)
         return
 
-    update.message.reply_text(
+    reply_text(
+        update.message,
         "正在解析 URL 内容，请稍候...", parse_mode=None
     )  # 禁用 Markdown 解析
 
     try:
-        # 提取网页内容 - 现在不会截断内容
-        content = extract_url_content(url)
-
-        if not content:
-            update.message.reply_text(
-                "⚠️ 无法提取 URL 内容", parse_mode=None
-            )  # 禁用 Markdown 解析
+        # 边下载边转换边上传：页面用网页标题创建，正文按 100 块一批追加，不在内存中保留整篇内容
+        stream = UrlContentStream(url)
+        result = add_stream_to_notion(
+            iter_notion_blocks(stream),
+            title=stream.title or url,
+            url=url,
+            created_at=created_at,
+        )
+        page_id = result.page_id
+        remember_saved_page(update.message, page_id)
+        if not result.complete:
+            reply_text(update.message, result.describe(), parse_mode=None)  # 禁用 Markdown 解析
+
+        # 只有正文开头用于 AI 分析（analyze_content 本来也只分析前 4000 字符）
+        content = stream.prefix
+
+        if TWO_PHASE_SAVE:
+            reply_text(
+                update.message,
+                f"✅ {url} 内容已保存到 Notion：{get_page_url(page_id)}\n正在后台生成标题、摘要和标签...",
+                parse_mode=None,  # 禁用 Markdown 解析
+            )
+            schedule_enrichment(update, page_id, content)
             return
 
-        # 分析内容
+        # 分析内容并更新页面的标题、摘要和标签
         analysis_result = analyze_content(content)
-
-        # 存入 Notion - add_to_notion 函数会在内容过长时自动使用分批处理
-        page_id = add_to_notion(  # noqa: F841
-            content=content,
+        title = analysis_result["title"]
+        update_page_analysis(
+            page_id,
+            title=title if title != ANALYSIS_ERROR_TITLE else None,
             summary=analysis_result["summary"],
             tags=analysis_result["tags"],
-            url=url,
-            created_at=created_at,
         )
 
-        update.message.reply_text(
+        reply_text(
+            update.message,
             f"✅ {url} 内容已成功解析并保存到 Notion！", parse_mode=None
         )  # 禁用 Markdown 解析
 
+    except NotionWriteDeferred as e:
+        # 整个页面已逐批保存在本地；页面创建后用正文开头在后台生成标题、摘要和标签
+        get_notion_outbox().update_meta(e.entry_id, enrich_content=stream.prefix)
+        reply_text(
+            update.message,
+            f"⏳ Notion 暂时无法访问，{url} 的内容已保存在本地，恢复后会自动写入",
+            parse_mode=None,  # 禁用 Markdown 解析
+        )
+
+    except NotionPageIncomplete as e:
+        # 页面已经创建，重复发送时应指向它，而不是再创建一个
+        logger.error(f"读取 {url} 的内容时出错：{e.error}")
+        remember_saved_page(update.message, e.page_id)
+        reply_text(
+            update.message,
+            f"⚠️ 读取 {url} 的内容时出错：{e.error}\n"
+            f"页面已创建但内容不完整，只包含出错前的部分：{get_page_url(e.page_id)}",
+            parse_mode=None,  # 禁用 Markdown 解析
+        )
+
     except Exception as e:
+        if is_retryable_error(e):
+            # 临时错误交给接收队列稍后重试
+            raise
         logger.error(f"处理 URL 时出错：{e}")
-        update.message.reply_text(
+        reply_text(
+            update.message,
             f"⚠️ 处理 {url} 时出错：{str(e)}", parse_mode=None
         )  # 禁用 Markdown 解析
 
@@ -82,7 +139,8 @@ def handle_multiple_urls_message(update: Update, content, urls, created_at):
     # 处理可能在括号内的 URLs
     processed_urls = [extract_url_from_text(url) for url in urls]
 
-    update.message.reply_text(
+    reply_text(
+        update.message,
         f"检测到 {len(processed_urls)} 个链接，正在处理消息内容...",
         parse_mode=None,  # 禁用 Markdown 解析
     )
@@ -107,21 +165,33 @@ def handle_multiple_urls_message(update: Update, content, urls, created_at):
         combined_content = f"{rich_content}\n\n{url_list_content}"
 
         # 创建 Notion 页面
-        page_id = add_to_notion(  # noqa: F841
+        page_id = add_to_notion(
             content=combined_content,
             summary=analysis_result["summary"],
             tags=analysis_result["tags"],
             url=primary_url,  # 主 URL 使用第一个
             created_at=created_at,
         )
+        remember_saved_page(update.message, page_id)
 
         # 返回成功消息
-        update.message.reply_text(
+        reply_text(
+            update.message,
             f"✅ 消息内容及 {len(processed_urls)} 个链接的引用已保存到 Notion!",
             parse_mode=None,  # 禁用 Markdown 解析
         )
+    except NotionWriteDeferred:
+        reply_text(
+            update.message,
+            "⏳ Notion 暂时无法访问，消息内容已保存在本地，恢复后会自动写入",
+            parse_mode=None,  # 禁用 Markdown 解析
+        )
     except Exception as e:
+        if is_retryable_error(e):
+            # 临时错误交给接收队列稍后重试
+            raise
         logger.error(f"处理多 URL 消息时出错：{e}")
-        update.message.reply_text(
+        reply_text(
+            update.message,
             f"⚠️ 处理消息时出错：{str(e)}", parse_mode=None
         )  # 禁用 Markdown 解析
@@ -0,0 +1,185 @@
+"""
+消息保存幂等性模块
+
+记录每条消息保存到的 Notion 页面，避免以下情况产生重复页面：
+1. 页面已创建但回复或后续步骤出错，接收队列重试或用户重新发送
+2. 网络中断后 Telegram 重新投递同一更新
+
+按 (chat_id, message_id) 和规范化后的内容哈希两种键记录页面 ID，
+命中任一键时直接返回已有页面，不再调用 Gemini 或 Notion。
+"""
+
+import hashlib
+import logging
+import re
+import threading
+import time
+import unicodedata
+
+from config import IDEMPOTENCY_CONTENT_WINDOW
+from utils.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS saved_messages (
+    chat_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    content_hash TEXT,
+    page_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (chat_id, message_id)
+);
+CREATE TABLE IF NOT EXISTS saved_contents (
+    chat_id INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    page_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (chat_id, content_hash)
+);
+"""
+
+# 单例实例
+_store_instance = None
+_instance_lock = threading.Lock()
+
+
+def normalize_content(text):
+    """规范化内容：统一 Unicode 形式和大小写，合并空白字符"""
+    text = unicodedata.normalize("NFKC", text or "")
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+def get_content_key(text):
+    """
+    计算规范化内容的哈希
+
+    返回：
+        str/None: 内容哈希，空内容返回 None
+    """
+    normalized = normalize_content(text)
+    if not normalized:
+        return None
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def get_message_text(message):
+    """获取消息的文本或媒体说明"""
+    return message.text or message.caption or ""
+
+
+class IdempotencyStore:
+    """消息 / 内容 → Notion 页面 ID 的持久化映射"""
+
+    def __init__(self, store=None, content_window=IDEMPOTENCY_CONTENT_WINDOW):
+        """
+        初始化存储
+
+        参数：
+            store: SQLiteStore 实例，默认使用 DATA_DIR/idempotency.db
+            content_window: 相同内容视为重复发送的时间窗口（秒），0 表示不按内容去重
+        """
+        self.store = store or SQLiteStore("idempotency.db", SCHEMA)
+        self.content_window = content_window
+
+    def find(self, chat_id, message_id, content=None):
+        """
+        查找消息或相同内容已保存到的页面
+
+        参数：
+            chat_id: 聊天 ID
+            message_id: 消息 ID
+            content: 消息内容
+
+        返回：
+            str/None: 页面 ID，没有记录时返回 None
+        """
+        row = self.store.query_one(
+            "SELECT page_id FROM saved_messages WHERE chat_id = ? AND message_id = ?",
+            (chat_id, message_id),
+        )
+        if row:
+            return row["page_id"]
+
+        content_key = get_content_key(content)
+        if content_key and self.content_window > 0:
+            row = self.store.query_one(
+                "SELECT page_id FROM saved_contents "
+                "WHERE chat_id = ? AND content_hash = ? AND created_at >= ?",
+                (chat_id, content_key, time.time() - self.content_window),
+            )
+            if row:
+                return row["page_id"]
+
+        return None
+
+    def record(self, chat_id, message_id, content, page_id):
+        """
+        记录消息保存到的页面
+
+        参数：
+            chat_id: 聊天 ID
+            message_id: 消息 ID
+            content: 消息内容
+            page_id: Notion 页面 ID
+        """
+        if not page_id:
+            return
+
+        content_key = get_content_key(content)
+        now = time.time()
+        with self.store.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO saved_messages "
+                "(chat_id, message_id, content_hash, page_id, created_at) VALUES (?, ?, ?, ?, ?)",
+                (chat_id, message_id, content_key, page_id, now),
+            )
+            if content_key:
+                conn.execute(
+                    "INSERT OR REPLACE INTO saved_contents "
+                    "(chat_id, content_hash, page_id, created_at) VALUES (?, ?, ?, ?)",
+                    (chat_id, content_key, page_id, now),
+                )
+
+
+def get_idempotency_store():
+    """获取幂等性存储单例"""
+    global _store_instance
+    if _store_instance is None:
+        with _instance_lock:
+            if _store_instance is None:
+                _store_instance = IdempotencyStore()
+    return _store_instance
+
+
+def find_saved_page(message, content=None):
+    """
+    查找消息已保存到的页面
+
+    参数：
+        message: Telegram 消息
+        content: 用于内容去重的文本，默认使用消息文本
+
+    返回：
+        str/None: 页面 ID
+    """
+    if content is None:
+        content = get_message_text(message)
+    page_id = get_idempotency_store().find(message.chat_id, message.message_id, content)
+    if page_id:
+        logger.info(f"消息 {message.chat_id}/{message.message_id} 已保存到页面 {page_id}，跳过")
+    return page_id
+
+
+def remember_saved_page(message, page_id, content=None):
+    """
+    记录消息保存到的页面
+
+    参数：
+        message: Telegram 消息
+        page_id: Notion 页面 ID
+        content: 用于内容去重的文本，默认使用消息文本
+    """
+    if content is None:
+        content = get_message_text(message)
+    get_idempotency_store().record(message.chat_id, message.message_id, content, page_id)
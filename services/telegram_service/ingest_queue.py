@@ -0,0 +1,473 @@
+"""
+持久化消息接收队列
+
+处理函数收到更新后只把精简的任务记录写入本地 SQLite（WAL）队列并立即返回，
+后台工作线程从队列中取出任务交给调度器执行。失败的任务按指数退避重试，
+机器人重启后会继续执行未完成的任务，因此启动时不再需要丢弃待处理的更新。
+
+处理函数返回 JOB_DEFERRED 时任务保持执行中状态（例如消息进入了合并窗口），
+由处理函数在真正处理完后调用 complete 或 fail；中途重启时任务会被恢复并重新执行。
+处理函数自己捕获异常并回复用户，但遇到 is_retryable_error 判断为临时的错误时应重新抛出，
+任务才会按退避策略重试。
+"""
+
+import json
+import logging
+import threading
+import time
+
+from telegram import Update
+from telegram.ext import CallbackContext
+
+from config import (
+    INGEST_MAX_ATTEMPTS,
+    INGEST_POLL_INTERVAL,
+    INGEST_RETRY_BASE_DELAY,
+    INGEST_RETRY_MAX_DELAY,
+)
+from utils.sqlite_store import SQLiteStore
+
+from .dispatcher import LANE_CHAT, get_dispatcher
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_DEAD = "dead"  # 超过最大重试次数
+
+# 处理函数的返回值：任务尚未处理完，稍后由处理函数调用 complete/fail
+JOB_DEFERRED = "deferred"
+
+# 值得重试的 HTTP 状态码（限流和服务端错误），适用于抓取网页、Gemini 等接口
+RETRYABLE_STATUS_CODES = frozenset((429, 500, 502, 503, 504))
+
+# 已完成任务保留时间（秒）
+DONE_RETENTION = 7 * 24 * 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    lane TEXT NOT NULL,
+    chat_id INTEGER,
+    message_id INTEGER,
+    user_id INTEGER,
+    text TEXT,
+    entities TEXT,
+    file_ids TEXT,
+    message_date TEXT,
+    payload TEXT NOT NULL,
+    extra TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_message
+    ON jobs (kind, chat_id, message_id);
+CREATE INDEX IF NOT EXISTS idx_jobs_status
+    ON jobs (status, next_attempt_at);
+"""
+
+# 单例实例
+_queue_instance = None
+_instance_lock = threading.Lock()
+
+
+def is_retryable_error(error):
+    """
+    处理函数遇到的错误是否是临时的（网络错误、超时、限流、服务端错误），任务稍后重试可能成功
+
+    参数：
+        error: 异常
+
+    返回：
+        bool: 是否应重新抛出，交给接收队列重试
+    """
+    # 只在出错时才需要导入
+    import requests
+
+    from services.notion_service import is_transient_error
+
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if getattr(error, "code", None) in RETRYABLE_STATUS_CODES:
+        return True
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) in RETRYABLE_STATUS_CODES:
+        return True
+    return is_transient_error(error)
+
+
+def build_job_record(update):
+    """
+    从 Telegram 更新中提取精简的任务记录
+
+    参数：
+        update: Telegram 更新对象
+
+    返回：
+        dict: 包含聊天、消息 ID、文本/实体、文件 ID 和时间戳的记录
+    """
+    message = update.effective_message
+    record = {
+        "chat_id": update.effective_chat.id if update.effective_chat else None,
+        "message_id": message.message_id if message else None,
+        "user_id": update.effective_user.id if update.effective_user else None,
+        "text": "",
+        "entities": [],
+        "file_ids": [],
+        "message_date": message.date.isoformat() if message and message.date else None,
+    }
+
+    if not message:
+        return record
+
+    if message.text:
+        record["text"] = message.text
+        record["entities"] = [entity.to_dict() for entity in message.entities or []]
+    elif message.caption:
+        record["text"] = message.caption
+        record["entities"] = [
+            entity.to_dict() for entity in message.caption_entities or []
+        ]
+
+    if message.document:
+        record["file_ids"].append(
+            {
+                "file_id": message.document.file_id,
+                "file_unique_id": message.document.file_unique_id,
+                "file_name": message.document.file_name,
+            }
+        )
+    if message.photo:
+        # 只记录最大尺寸的图片
+        photo = message.photo[-1]
+        record["file_ids"].append(
+            {"file_id": photo.file_id, "file_unique_id": photo.file_unique_id}
+        )
+    if message.video:
+        record["file_ids"].append(
+            {
+                "file_id": message.video.file_id,
+                "file_unique_id": message.video.file_unique_id,
+            }
+        )
+
+    return record
+
+
+class IngestQueue:
+    """
+    基于 SQLite 的持久化任务队列
+
+    每种任务类型（kind）注册一个处理函数和调度通道，任务入队后立即尝试执行，
+    同时后台轮询线程负责重试到期的失败任务和重启前未完成的任务
+    """
+
+    def __init__(self, store=None):
+        """
+        初始化队列
+
+        参数：
+            store: SQLiteStore 实例，默认使用 DATA_DIR/ingest.db
+        """
+        self.store = store or SQLiteStore("ingest.db", SCHEMA)
+        self._handlers = {}  # kind -> (handler, lane)
+        self._dispatcher = None
+        self._poller = None
+        self._stop_event = threading.Event()
+
+    def register(self, kind, handler, lane=LANE_CHAT):
+        """
+        注册任务类型的处理函数
+
+        参数：
+            kind: 任务类型
+            handler: 处理函数 (update, context)
+            lane: 调度通道类型
+        """
+        self._handlers[kind] = (handler, lane)
+
+    def enqueue(self, kind, update, extra=None):
+        """
+        将更新写入队列
+
+        参数：
+            kind: 任务类型
+            update: Telegram 更新对象
+            extra: 附加数据（可 JSON 序列化），执行时通过 context.job_data 获取
+
+        返回：
+            int/None: 任务 ID，重复投递的消息返回 None
+        """
+        record = build_job_record(update)
+        lane = self._handlers.get(kind, (None, LANE_CHAT))[1]
+        now = time.time()
+
+        with self.store.transaction() as conn:
+            cursor = conn.execute(
+                """
+                INSERT OR IGNORE INTO jobs (
+                    kind, lane, chat_id, message_id, user_id, text, entities,
+                    file_ids, message_date, payload, extra, status, attempts,
+                    next_attempt_at, created_at, updated_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0, ?, ?, ?)
+                """,
+                (
+                    kind,
+                    lane,
+                    record["chat_id"],
+                    record["message_id"],
+                    record["user_id"],
+                    record["text"],
+                    json.dumps(record["entities"], ensure_ascii=False),
+                    json.dumps(record["file_ids"], ensure_ascii=False),
+                    record["message_date"],
+                    json.dumps(update.to_dict(), ensure_ascii=False),
+                    json.dumps(extra, ensure_ascii=False) if extra is not None else None,
+                    STATUS_PENDING,
+                    now,
+                    now,
+                    now,
+                ),
+            )
+            if cursor.rowcount == 0:
+                logger.info(
+                    f"忽略重复投递的消息：chat={record['chat_id']} message={record['message_id']}"
+                )
+                return None
+            return cursor.lastrowid
+
+    def _claim(self, job_id):
+        """将待执行任务标记为执行中，返回任务行；已被其他线程领取时返回 None"""
+        with self.store.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (STATUS_RUNNING, time.time(), job_id, STATUS_PENDING),
+            )
+            if cursor.rowcount == 0:
+                return None
+            return conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+    def dispatch(self, job_id):
+        """领取任务并提交到调度器对应的通道"""
+        job = self._claim(job_id)
+        if job is None:
+            return False
+
+        lane_key = (job["lane"], job["chat_id"]) if job["chat_id"] is not None else None
+        get_dispatcher().submit(lane_key, self._run_job, job)
+        return True
+
+    def _run_job(self, job):
+        """执行单个任务并更新状态"""
+        handler_entry = self._handlers.get(job["kind"])
+        if handler_entry is None:
+            logger.error(f"任务 {job['id']} 的类型 {job['kind']} 没有注册处理函数")
+            self._mark_failed(job, "未注册的任务类型")
+            return
+
+        handler = handler_entry[0]
+        update = None
+        try:
+            update, context = self._rebuild(job)
+            if handler(update, context) == JOB_DEFERRED:
+                return
+            self._mark_done(job["id"])
+        except Exception as e:
+            logger.error(f"执行任务 {job['id']} ({job['kind']}) 时出错：{e}", exc_info=True)
+            dead = self._mark_failed(job, str(e))
+            if dead and update is not None and self._dispatcher is not None:
+                self._dispatcher.dispatch_error(update, e)
+
+    def _rebuild(self, job):
+        """从任务记录重建 Update 和 CallbackContext"""
+        if self._dispatcher is None:
+            raise RuntimeError("接收队列尚未绑定 Dispatcher")
+
+        update = Update.de_json(json.loads(job["payload"]), self._dispatcher.bot)
+        context = CallbackContext.from_update(update, self._dispatcher)
+        context.job_data = json.loads(job["extra"]) if job["extra"] else {}
+        context.job_id = job["id"]
+
+        # 命令的参数在 CommandHandler 中解析，重放时需要自行恢复
+        text = job["text"] or ""
+        if text.startswith("/"):
+            context.args = text.split()[1:]
+
+        return update, context
+
+    def complete(self, job_id):
+        """将延迟完成（JOB_DEFERRED）的任务标记为完成"""
+        self._mark_done(job_id)
+
+    def fail(self, job_id, error):
+        """延迟完成的任务处理失败，按退避策略重新执行"""
+        job = self.store.query_one("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        if job is not None:
+            self._mark_failed(job, str(error))
+
+    def _mark_done(self, job_id):
+        with self.store.transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, last_error = NULL, updated_at = ? WHERE id = ?",
+                (STATUS_DONE, time.time(), job_id),
+            )
+
+    def _mark_failed(self, job, error):
+        """
+        记录失败并按指数退避安排重试
+
+        返回：
+            bool: 是否已超过最大重试次数
+        """
+        attempts = job["attempts"] + 1
+        now = time.time()
+        dead = attempts >= INGEST_MAX_ATTEMPTS
+        delay = min(INGEST_RETRY_BASE_DELAY * (2 ** (attempts - 1)), INGEST_RETRY_MAX_DELAY)
+
+        with self.store.transaction() as conn:
+            conn.execute(
+                """
+                UPDATE jobs
+                SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, updated_at = ?
+                WHERE id = ?
+                """,
+                (
+                    STATUS_DEAD if dead else STATUS_PENDING,
+                    attempts,
+                    now + delay,
+                    error[:2000],
+                    now,
+                    job["id"],
+                ),
+            )
+
+        if dead:
+            logger.error(f"任务 {job['id']} 已失败 {attempts} 次，不再重试")
+        else:
+            logger.info(f"任务 {job['id']} 将在 {delay:.0f} 秒后第 {attempts + 1} 次尝试")
+        return dead
+
+    def recover(self):
+        """
+        将上次运行时中断的任务恢复为待执行状态
+
+        返回：
+            int: 恢复的任务数
+        """
+        with self.store.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, next_attempt_at = ?, updated_at = ? WHERE status = ?",
+                (STATUS_PENDING, time.time(), time.time(), STATUS_RUNNING),
+            )
+        if cursor.rowcount:
+            logger.info(f"恢复了 {cursor.rowcount} 个未完成的任务")
+        return cursor.rowcount
+
+    def dispatch_due(self):
+        """
+        提交所有到期的待执行任务，按入队顺序执行
+
+        返回：
+            int: 提交的任务数
+        """
+        rows = self.store.query(
+            "SELECT id FROM jobs WHERE status = ? AND next_attempt_at <= ? ORDER BY id",
+            (STATUS_PENDING, time.time()),
+        )
+        return sum(1 for row in rows if self.dispatch(row["id"]))
+
+    def purge_done(self, retention=DONE_RETENTION):
+        """清理过期的已完成任务"""
+        with self.store.transaction() as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE status = ? AND updated_at < ?",
+                (STATUS_DONE, time.time() - retention),
+            )
+
+    def get_stats(self):
+        """
+        获取各状态的任务数量
+
+        返回：
+            dict: 状态 -> 数量
+        """
+        rows = self.store.query("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")
+        return {row["status"]: row["n"] for row in rows}
+
+    def start(self, dispatcher):
+        """
+        绑定 Dispatcher 并启动后台轮询线程
+
+        参数：
+            dispatcher: python-telegram-bot 的 Dispatcher，用于重建上下文和报告错误
+        """
+        self._dispatcher = dispatcher
+        self.recover()
+
+        if self._poller and self._poller.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._poller = threading.Thread(
+            target=self._poll_loop, name="ingest-poller", daemon=True
+        )
+        self._poller.start()
+        logger.info("接收队列后台线程已启动")
+
+    def stop(self):
+        """停止后台轮询线程"""
+        self._stop_event.set()
+
+    def _poll_loop(self):
+        last_purge = 0.0
+        while not self._stop_event.is_set():
+            try:
+                self.dispatch_due()
+                if time.time() - last_purge > 3600:
+                    self.purge_done()
+                    last_purge = time.time()
+            except Exception as e:
+                logger.error(f"轮询接收队列时出错：{e}")
+            self._stop_event.wait(INGEST_POLL_INTERVAL)
+
+
+def get_ingest_queue():
+    """获取接收队列单例"""
+    global _queue_instance
+    if _queue_instance is None:
+        with _instance_lock:
+            if _queue_instance is None:
+                _queue_instance = IngestQueue()
+    return _queue_instance
+
+
+def run_durable(kind, handler, lane=LANE_CHAT):
+    """
+    包装处理函数：收到更新时先持久化到接收队列，再异步执行
+
+    参数：
+        kind: 任务类型，用于在重启后找到对应的处理函数
+        handler: 原始处理函数 (update, context)
+        lane: 调度通道类型
+
+    返回：
+        function: 可直接注册到 python-telegram-bot 的处理函数
+    """
+    queue = get_ingest_queue()
+    queue.register(kind, handler, lane)
+
+    def wrapped(update, context):
+        job_id = queue.enqueue(kind, update)
+        if job_id is not None:
+            queue.dispatch(job_id)
+
+    wrapped.__name__ = getattr(handler, "__name__", kind)
+    wrapped.__doc__ = handler.__doc__
+    return wrapped
@@ -0,0 +1,319 @@
+"""
+消息路由模块
+
+把消息处理从 process_message 中的固定判断链改为声明式的路由表：
+1. 每条消息只解析一次，得到 ParsedMessage（话题标签、链接、媒体类型、长度分类）
+2. 话题标签路由保存在字典中，按标签 O(1) 查找；其他路由是按优先级排序的条件函数
+3. 新的路由（例如 #paper、#read）通过 register_route 注册，不需要修改消息处理函数
+4. 统计每条路由的命中次数和处理耗时，以及解析和匹配本身的耗时
+"""
+
+import logging
+import re
+import threading
+import time
+
+from config import DEDUP_ENABLED
+from utils.helpers import is_url_only
+from utils.text_formatter import extract_urls_from_entities, parse_message_entities
+
+logger = logging.getLogger(__name__)
+
+# 少于该长度的内容视为短内容，直接使用原文作为摘要
+SHORT_CONTENT_LIMIT = 200
+
+LENGTH_EMPTY = "empty"
+LENGTH_SHORT = "short"
+LENGTH_LONG = "long"
+
+PHOTO_PREFIX = "[此内容来自包含图片的消息] "
+
+# 不匹配链接中的锚点（例如 https://example.com/page#section）；路由标签只含 ASCII 字母、数字和下划线，
+# 这样 "#todo买牛奶" 这种标签后面紧跟中文的写法也能识别为 #todo
+HASHTAG_PATTERN = re.compile(r"(?<![\w/])#([A-Za-z0-9_]+)")
+
+# 单例实例
+_router_instance = None
+_instance_lock = threading.Lock()
+
+
+class ParsedMessage:
+    """一次解析得到的消息信息，路由条件和处理函数都只读取这里的字段"""
+
+    def __init__(self, update, text, entities):
+        message = update.message
+        self.update = update
+        self.message = message
+        self.text = text or ""
+        self.entities = entities or []
+
+        self.has_photo = bool(message.photo)
+        self.has_document = message.document is not None
+        self.hashtags = self._parse_hashtags()
+        self.urls = extract_urls_from_entities(self.text, self.entities)
+        self.url_only = bool(self.urls) and is_url_only(self.text)
+
+        if not self.text:
+            self.length_class = LENGTH_EMPTY
+        elif len(self.content) < SHORT_CONTENT_LIMIT:
+            self.length_class = LENGTH_SHORT
+        else:
+            self.length_class = LENGTH_LONG
+
+        self._parsed_content = None
+        self._saved_page = False
+        self._duplicate = False
+
+    def _parse_hashtags(self):
+        """
+        提取话题标签（小写，不含 #）
+
+        只用正则表达式：Telegram 实体的 offset 按 UTF-16 计算，文本中有表情符号时直接切片会错位，
+        而且实体会把 #todo买牛奶 整体当作一个标签
+        """
+        return frozenset(match.group(1).lower() for match in HASHTAG_PATTERN.finditer(self.text))
+
+    @property
+    def content(self):
+        """保存到 Notion 的文本，图片消息的文字会加上前缀"""
+        if self.has_photo:
+            return PHOTO_PREFIX + self.text
+        return self.text
+
+    @property
+    def parsed_content(self):
+        """parse_message_entities 的结果，只在需要时计算"""
+        if self._parsed_content is None:
+            self._parsed_content = parse_message_entities(self.text, self.entities)
+            self._parsed_content["text"] = self.content
+        return self._parsed_content
+
+    @property
+    def url(self):
+        """消息中唯一的链接；没有链接或有多个链接时为空字符串"""
+        return self.urls[0] if len(self.urls) == 1 else ""
+
+    @property
+    def is_short(self):
+        return self.length_class == LENGTH_SHORT
+
+    def saved_page(self):
+        """查询消息已保存到的页面，结果在本次路由中缓存"""
+        if self._saved_page is False:
+            from .idempotency import find_saved_page
+
+            self._saved_page = find_saved_page(self.message)
+        return self._saved_page
+
+    def duplicate(self):
+        """
+        查询保存过相同链接或近似内容的页面，结果在本次路由中缓存
+
+        返回：
+            tuple/None: (页面 ID, 是否按链接命中)
+        """
+        if self._duplicate is False:
+            self._duplicate = None
+            if DEDUP_ENABLED and self.text:
+                from services.notion_service import find_saved_content
+
+                link = self.urls[0] if self.url_only else self.url
+                page_id = find_saved_content(url=link) if link else None
+                if page_id:
+                    self._duplicate = (page_id, True)
+                else:
+                    page_id = find_saved_content(content=self.text)
+                    if page_id:
+                        self._duplicate = (page_id, False)
+        return self._duplicate
+
+
+class Route:
+    """一条路由：匹配条件和处理函数"""
+
+    def __init__(self, name, handler, hashtag=None, predicate=None, priority=100):
+        self.name = name
+        self.handler = handler
+        self.hashtag = hashtag.lstrip("#").lower() if hashtag else None
+        self.predicate = predicate
+        self.priority = priority
+
+
+class MessageRouter:
+    """
+    消息路由表
+
+    匹配顺序由 priority 决定（数值越小越优先）：
+    话题标签路由通过字典直接查找，条件路由只检查优先级更高的部分，
+    都不匹配时交给默认路由
+    """
+
+    def __init__(self):
+        self._hashtag_routes = {}
+        self._rules = []
+        self._fallback = None
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self._route_stats = {}
+        self._routed = 0
+        self._routing_time = 0.0
+
+    def register(self, route):
+        """
+        注册路由，同名路由会被替换
+
+        参数：
+            route: Route 实例；既没有 hashtag 也没有 predicate 的路由作为默认路由
+        """
+        with self._lock:
+            self._unregister(route.name)
+            if route.hashtag:
+                self._hashtag_routes[route.hashtag] = route
+            elif route.predicate:
+                self._rules.append(route)
+                self._rules.sort(key=lambda r: r.priority)
+            else:
+                self._fallback = route
+            self._route_stats.setdefault(route.name, {"count": 0, "time": 0.0, "max_time": 0.0})
+        logger.debug(f"已注册消息路由：{route.name}")
+
+    def _unregister(self, name):
+        self._hashtag_routes = {
+            tag: route for tag, route in self._hashtag_routes.items() if route.name != name
+        }
+        self._rules = [route for route in self._rules if route.name != name]
+        if self._fallback and self._fallback.name == name:
+            self._fallback = None
+
+    def has_hashtag_route(self, text):
+        """文本中是否包含已注册路由的话题标签"""
+        return any(
+            match.group(1).lower() in self._hashtag_routes
+            for match in HASHTAG_PATTERN.finditer(text or "")
+        )
+
+    def match(self, parsed):
+        """
+        查找消息对应的路由
+
+        参数：
+            parsed: ParsedMessage
+
+        返回：
+            Route/None: 匹配的路由
+        """
+        best = None
+        for tag in parsed.hashtags:
+            route = self._hashtag_routes.get(tag)
+            if route and (best is None or route.priority < best.priority):
+                best = route
+
+        for route in self._rules:
+            if best is not None and route.priority >= best.priority:
+                break
+            if route.predicate(parsed):
+                return route
+
+        return best or self._fallback
+
+    def dispatch(self, update, text, entities):
+        """
+        解析消息并交给匹配的路由处理
+
+        参数：
+            update: Telegram 更新
+            text: 消息文本或媒体说明
+            entities: 消息实体
+
+        返回：
+            str/None: 处理消息的路由名
+        """
+        started = time.perf_counter()
+        parsed = ParsedMessage(update, text, entities)
+        route = self.match(parsed)
+        routed_at = time.perf_counter()
+
+        with self._lock:
+            self._routed += 1
+            self._routing_time += routed_at - started
+
+        if route is None:
+            logger.warning("没有匹配的消息路由")
+            return None
+
+        try:
+            route.handler(parsed)
+        finally:
+            elapsed = time.perf_counter() - routed_at
+            with self._lock:
+                stats = self._route_stats[route.name]
+                stats["count"] += 1
+                stats["time"] += elapsed
+                stats["max_time"] = max(stats["max_time"], elapsed)
+
+        return route.name
+
+    def get_stats(self):
+        """返回路由统计信息"""
+        with self._lock:
+            return {
+                "routed": self._routed,
+                "avg_routing_ms": self._routing_time / self._routed * 1000 if self._routed else 0.0,
+                "routes": {name: dict(stats) for name, stats in self._route_stats.items()},
+            }
+
+
+def get_router():
+    """获取消息路由表单例"""
+    global _router_instance
+    if _router_instance is None:
+        with _instance_lock:
+            if _router_instance is None:
+                _router_instance = MessageRouter()
+    return _router_instance
+
+
+def register_route(name, handler, hashtag=None, predicate=None, priority=100):
+    """
+    注册消息路由
+
+    参数：
+        name: 路由名，用于统计
+        handler: 处理函数，参数为 ParsedMessage
+        hashtag: 触发路由的话题标签（例如 "#paper"）
+        predicate: 匹配条件函数，参数为 ParsedMessage
+        priority: 优先级，数值越小越优先
+
+    用法：
+        register_route("paper", handle_paper, hashtag="#paper", priority=25)
+    """
+    get_router().register(Route(name, handler, hashtag, predicate, priority))
+
+
+def format_router_stats(stats=None):
+    """
+    将路由统计信息格式化为可读文本
+
+    参数：
+        stats: get_stats() 的结果，为空时自动获取
+
+    返回：
+        str: 格式化后的文本
+    """
+    if stats is None:
+        stats = get_router().get_stats()
+
+    lines = [
+        "消息路由：",
+        f"- 已路由：{stats['routed']}，平均解析和匹配耗时 {stats['avg_routing_ms']:.3f} 毫秒",
+    ]
+    for name, route_stats in stats["routes"].items():
+        if not route_stats["count"]:
+            continue
+        avg = route_stats["time"] / route_stats["count"]
+        lines.append(
+            f"  · {name}: {route_stats['count']} 次，平均 {avg:.2f} 秒，最长 {route_stats['max_time']:.2f} 秒"
+        )
+
+    return "\n".join(lines)
@@ -0,0 +1,323 @@
+"""
+Telegram 出站消息调度模块
+
+所有回复和消息编辑都经过这里排队发送：
+1. 每个聊天一条发送队列，按入队顺序发送，同一聊天的发送间隔不低于 TELEGRAM_CHAT_INTERVAL
+2. 全局发送速率不超过 TELEGRAM_GLOBAL_RATE 条/秒
+3. 对同一条消息的多次编辑，如果前一次还没发出，只发送最新的内容
+4. 遇到 RetryAfter 时按 Telegram 要求的时间暂停该聊天后重试
+5. 超过 4096 字符的文本自动拆分为多条消息
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from telegram.error import BadRequest, RetryAfter, TelegramError
+
+from config import TELEGRAM_CHAT_INTERVAL, TELEGRAM_GLOBAL_RATE
+
+logger = logging.getLogger(__name__)
+
+# Telegram 单条消息的最大长度
+MAX_MESSAGE_LENGTH = 4096
+# 实际执行发送请求的线程数
+SENDER_WORKERS = 4
+
+# 单例实例
+_scheduler_instance = None
+_instance_lock = threading.Lock()
+
+
+def split_message(text, limit=MAX_MESSAGE_LENGTH):
+    """
+    将长文本按行拆分为不超过限制的多段
+
+    参数：
+        text: 要拆分的文本
+        limit: 每段最大长度
+
+    返回：
+        list: 文本段列表
+    """
+    if len(text) <= limit:
+        return [text]
+
+    chunks = []
+    current = ""
+    for line in text.split("\n"):
+        # 单行超长时按长度硬拆分
+        while len(line) > limit:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:limit])
+            line = line[limit:]
+
+        candidate = f"{current}\n{line}" if current else line
+        if len(candidate) > limit:
+            chunks.append(current)
+            current = line
+        else:
+            current = candidate
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class _Operation:
+    """一次待执行的发送或编辑"""
+
+    def __init__(self, kind, bot, chat_id, text, kwargs, message_id=None):
+        self.kind = kind  # "send" 或 "edit"
+        self.bot = bot
+        self.chat_id = chat_id
+        self.text = text
+        self.kwargs = kwargs
+        self.message_id = message_id
+        self.futures = [Future()]
+
+
+class _ChatQueue:
+    def __init__(self):
+        self.ops = deque()
+        self.next_at = 0.0  # 该聊天下一次允许发送的时间
+        self.busy = False  # 是否有请求正在执行
+
+
+class MessageScheduler:
+    """
+    出站消息调度器
+
+    调度线程负责挑选可以发送的聊天并遵守速率限制，实际的网络请求在线程池中执行，
+    同一聊天同一时刻只有一个请求在执行，因此保持发送顺序
+    """
+
+    def __init__(self, global_rate=TELEGRAM_GLOBAL_RATE, chat_interval=TELEGRAM_CHAT_INTERVAL):
+        """
+        初始化调度器
+
+        参数：
+            global_rate: 全局每秒最多发送的消息数
+            chat_interval: 同一聊天两次发送之间的最小间隔（秒）
+        """
+        self.global_interval = 1.0 / global_rate if global_rate > 0 else 0.0
+        self.chat_interval = chat_interval
+        self._chats = {}
+        self._global_next = 0.0
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(
+            max_workers=SENDER_WORKERS, thread_name_prefix="tg-sender"
+        )
+        self._stats = {"sent": 0, "edited": 0, "coalesced": 0, "retry_after": 0, "failed": 0}
+
+        self._thread = threading.Thread(
+            target=self._run, name="tg-send-scheduler", daemon=True
+        )
+        self._thread.start()
+
+    def send_message(self, bot, chat_id, text, **kwargs):
+        """
+        排队发送消息，超长文本自动拆分
+
+        返回：
+            Future: 结果为第一段消息的 Message 对象
+        """
+        chunks = split_message(text)
+        ops = [_Operation("send", bot, chat_id, chunk, kwargs) for chunk in chunks]
+
+        with self._cond:
+            queue = self._chats.setdefault(chat_id, _ChatQueue())
+            queue.ops.extend(ops)
+            self._cond.notify()
+
+        return ops[0].futures[0]
+
+    def edit_message_text(self, bot, chat_id, message_id, text, **kwargs):
+        """
+        排队编辑消息；同一消息尚未发出的旧编辑会被新内容替换
+
+        返回：
+            Future: 结果为编辑后的 Message 对象
+        """
+        chunks = split_message(text)
+        head, rest = chunks[0], chunks[1:]
+
+        with self._cond:
+            queue = self._chats.setdefault(chat_id, _ChatQueue())
+
+            pending = None
+            for op in queue.ops:
+                if op.kind == "edit" and op.message_id == message_id:
+                    pending = op
+                    break
+
+            if pending is not None:
+                # 合并被覆盖的编辑：只保留最新内容，所有调用方共享同一结果
+                pending.text = head
+                pending.kwargs = kwargs
+                pending.futures.append(Future())
+                future = pending.futures[-1]
+                self._stats["coalesced"] += 1
+            else:
+                op = _Operation("edit", bot, chat_id, head, kwargs, message_id=message_id)
+                queue.ops.append(op)
+                future = op.futures[0]
+
+            # 编辑后超出长度的部分作为新消息发送
+            for chunk in rest:
+                queue.ops.append(_Operation("send", bot, chat_id, chunk, kwargs))
+
+            self._cond.notify()
+
+        return future
+
+    def _next_ready(self, now):
+        """
+        挑选下一个可以执行的操作，调用方需持有锁
+
+        返回：
+            tuple: (操作或 None, 需要等待的秒数或 None)
+        """
+        if now < self._global_next:
+            return None, self._global_next - now
+
+        ready_chat = None
+        wait = None
+        idle = []
+        for chat_id, queue in self._chats.items():
+            if queue.busy:
+                continue
+            if not queue.ops:
+                # 发送间隔已过的空闲聊天不再需要保留状态
+                if queue.next_at <= now:
+                    idle.append(chat_id)
+                continue
+            if queue.next_at <= now:
+                # 选择等待最久的聊天，避免某个聊天长期占用发送额度
+                if ready_chat is None or queue.next_at < self._chats[ready_chat].next_at:
+                    ready_chat = chat_id
+            else:
+                delay = queue.next_at - now
+                wait = delay if wait is None else min(wait, delay)
+
+        for chat_id in idle:
+            del self._chats[chat_id]
+
+        if ready_chat is None:
+            return None, wait
+
+        queue = self._chats[ready_chat]
+        queue.busy = True
+        self._global_next = max(now, self._global_next) + self.global_interval
+        return queue.ops.popleft(), None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                op, wait = self._next_ready(time.monotonic())
+                while op is None:
+                    self._cond.wait(timeout=wait)
+                    op, wait = self._next_ready(time.monotonic())
+            self._executor.submit(self._execute, op)
+
+    def _execute(self, op):
+        """执行一次发送或编辑，并根据结果更新聊天队列状态"""
+        result = None
+        error = None
+        retry_after = None
+
+        try:
+            if op.kind == "send":
+                result = op.bot.send_message(chat_id=op.chat_id, text=op.text, **op.kwargs)
+            else:
+                result = op.bot.edit_message_text(
+                    chat_id=op.chat_id, message_id=op.message_id, text=op.text, **op.kwargs
+                )
+        except RetryAfter as e:
+            retry_after = float(e.retry_after)
+        except BadRequest as e:
+            # 内容没有变化的编辑不算失败
+            if op.kind == "edit" and "not modified" in str(e).lower():
+                result = None
+            else:
+                error = e
+        except TelegramError as e:
+            error = e
+        except Exception as e:
+            error = e
+
+        with self._cond:
+            queue = self._chats[op.chat_id]
+            queue.busy = False
+            now = time.monotonic()
+
+            if retry_after is not None:
+                logger.warning(f"聊天 {op.chat_id} 触发限流，{retry_after:.0f} 秒后重试")
+                self._stats["retry_after"] += 1
+                queue.ops.appendleft(op)
+                queue.next_at = now + retry_after
+            else:
+                queue.next_at = now + self.chat_interval
+                if error is not None:
+                    self._stats["failed"] += 1
+                else:
+                    self._stats["sent" if op.kind == "send" else "edited"] += 1
+
+            self._cond.notify()
+
+        if retry_after is not None:
+            return
+
+        if error is not None:
+            logger.error(f"向聊天 {op.chat_id} 发送消息失败：{error}")
+        for future in op.futures:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def get_stats(self):
+        """获取发送统计信息"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats["queued"] = sum(len(q.ops) for q in self._chats.values())
+        return stats
+
+
+def get_scheduler():
+    """获取出站消息调度器单例"""
+    global _scheduler_instance
+    if _scheduler_instance is None:
+        with _instance_lock:
+            if _scheduler_instance is None:
+                _scheduler_instance = MessageScheduler()
+    return _scheduler_instance
+
+
+def send_message(bot, chat_id, text, **kwargs):
+    """排队发送消息，参数与 Bot.send_message 相同，返回 Future"""
+    return get_scheduler().send_message(bot, chat_id, text, **kwargs)
+
+
+def edit_message_text(bot, chat_id, message_id, text, **kwargs):
+    """排队编辑消息，参数与 Bot.edit_message_text 相同，返回 Future"""
+    return get_scheduler().edit_message_text(bot, chat_id, message_id, text, **kwargs)
+
+
+def reply_text(message, text, **kwargs):
+    """
+    排队回复消息所在的聊天，替代 message.reply_text
+
+    参数：
+        message: 收到的 Telegram 消息
+        text: 回复文本
+        **kwargs: 传给 Bot.send_message 的其他参数
+
+    返回：
+        Future: 结果为发送的 Message 对象
+    """
+    return send_message(message.bot, message.chat_id, text, **kwargs)
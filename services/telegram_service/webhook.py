@@ -0,0 +1,240 @@
+"""
+Webhook 模式模块
+
+使用内置 HTTP 服务器接收 Telegram 推送的更新，替代长轮询：
+1. 校验 X-Telegram-Bot-Api-Secret-Token 请求头
+2. 将更新放入与轮询模式相同的 Dispatcher 队列
+3. TLS 可以由上游反向代理终止，也可以直接配置证书
+"""
+
+import hmac
+import json
+import logging
+import secrets
+import ssl
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+# Telegram 单个更新的请求体不会超过这个大小，超过的请求直接拒绝
+MAX_BODY_SIZE = 2 * 1024 * 1024
+HEALTH_PATH = "/healthz"
+
+
+def normalize_path(path):
+    """将 URL 路径规范化为以 / 开头、不以 / 结尾的形式"""
+    return "/" + path.strip("/")
+
+
+def generate_secret_token():
+    """生成符合 Telegram 要求（A-Z a-z 0-9 _ -）的随机密钥"""
+    return secrets.token_urlsafe(32)
+
+
+def _make_request_handler(server):
+    """为指定的 WebhookServer 创建请求处理类"""
+
+    class WebhookRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            # 供反向代理和容器健康检查使用
+            if self.path == HEALTH_PATH:
+                self._respond(200, b"ok")
+            else:
+                self._respond(404)
+
+        def do_POST(self):
+            if self.path.split("?", 1)[0] != server.url_path:
+                self._respond(404)
+                return
+
+            token = self.headers.get(SECRET_TOKEN_HEADER, "")
+            if not hmac.compare_digest(token, server.secret_token):
+                logger.warning(f"拒绝了密钥不匹配的 webhook 请求：{self.client_address[0]}")
+                self._respond(403)
+                return
+
+            try:
+                length = int(self.headers.get("Content-Length", "0"))
+            except ValueError:
+                length = 0
+            if length <= 0 or length > MAX_BODY_SIZE:
+                self._respond(400 if length <= 0 else 413)
+                return
+
+            try:
+                data = json.loads(self.rfile.read(length).decode("utf-8"))
+            except (UnicodeDecodeError, json.JSONDecodeError) as e:
+                logger.warning(f"无法解析 webhook 请求体：{e}")
+                self._respond(400)
+                return
+
+            # 先返回 200，处理过程不占用 Telegram 的推送连接
+            self._respond(200)
+            server.feed(data)
+
+        def _respond(self, status, body=b""):
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if body:
+                self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(f"webhook {self.client_address[0]} - {format % args}")
+
+    return WebhookRequestHandler
+
+
+class WebhookServer:
+    """
+    内置 webhook HTTP 服务器
+
+    收到的更新会反序列化为 Update 对象并放入 update_queue，
+    由 python-telegram-bot 的 Dispatcher 按已注册的处理函数分发
+    """
+
+    def __init__(
+        self,
+        bot,
+        update_queue,
+        listen="0.0.0.0",
+        port=8443,
+        url_path="telegram",
+        secret_token=None,
+        cert=None,
+        key=None,
+    ):
+        """
+        初始化服务器
+
+        参数：
+            bot: Telegram Bot 对象，用于反序列化更新
+            update_queue: Dispatcher 的更新队列
+            listen: 监听地址
+            port: 监听端口
+            url_path: 接收更新的路径
+            secret_token: 校验请求头的密钥，为空时自动生成
+            cert: TLS 证书路径（可选，通常由反向代理终止 TLS）
+            key: TLS 私钥路径
+        """
+        self.bot = bot
+        self.update_queue = update_queue
+        self.url_path = normalize_path(url_path)
+        self.secret_token = secret_token or generate_secret_token()
+        self.received_count = 0
+
+        self._httpd = ThreadingHTTPServer((listen, port), _make_request_handler(self))
+        self._httpd.daemon_threads = True
+
+        if cert:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(cert, key)
+            self._httpd.socket = context.wrap_socket(
+                self._httpd.socket, server_side=True
+            )
+
+        self._thread = None
+
+    @property
+    def port(self):
+        """实际监听的端口（port=0 时由系统分配）"""
+        return self._httpd.server_address[1]
+
+    def feed(self, data):
+        """
+        将一条更新放入 Dispatcher 队列
+
+        参数：
+            data: Telegram 推送的更新 JSON
+        """
+        update = Update.de_json(data, self.bot)
+        if update:
+            self.received_count += 1
+            self.update_queue.put(update)
+
+    def start(self):
+        """在后台线程中启动服务器"""
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name="webhook-server", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Webhook 服务器已启动，监听端口 {self.port}，路径 {self.url_path}")
+
+    def stop(self):
+        """停止服务器"""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        logger.info("Webhook 服务器已停止")
+
+
+def start_webhook(
+    updater,
+    webhook_url,
+    listen="0.0.0.0",
+    port=8443,
+    url_path="telegram",
+    secret_token=None,
+    cert=None,
+    key=None,
+    allowed_updates=None,
+    drop_pending_updates=False,
+    set_webhook=True,
+):
+    """
+    以 webhook 模式启动机器人
+
+    参数：
+        updater: 已注册处理函数的 Updater
+        webhook_url: Telegram 推送更新的公网地址（不含路径）
+        listen, port, url_path, secret_token, cert, key: 见 WebhookServer
+        allowed_updates: 接收的更新类型
+        drop_pending_updates: 是否丢弃 Telegram 服务器上积压的更新
+        set_webhook: 是否向 Telegram 注册 webhook（离线测试时可关闭）
+
+    返回：
+        WebhookServer: 已启动的服务器
+    """
+    dispatcher = updater.dispatcher
+
+    if not secret_token:
+        logger.warning("未配置 WEBHOOK_SECRET_TOKEN，已生成本次运行使用的临时密钥")
+
+    server = WebhookServer(
+        updater.bot,
+        dispatcher.update_queue,
+        listen=listen,
+        port=port,
+        url_path=url_path,
+        secret_token=secret_token,
+        cert=cert,
+        key=key,
+    )
+
+    # Dispatcher 在后台线程中消费更新队列
+    dispatcher_thread = threading.Thread(
+        target=dispatcher.start, name="dispatcher", daemon=True
+    )
+    dispatcher_thread.start()
+    server.start()
+
+    if set_webhook:
+        full_url = webhook_url.rstrip("/") + server.url_path
+        updater.bot.set_webhook(
+            url=full_url,
+            allowed_updates=allowed_updates,
+            drop_pending_updates=drop_pending_updates,
+            secret_token=server.secret_token,
+        )
+        logger.info(f"已注册 webhook：{full_url}")
+
+    return server
+
+
+def stop_webhook(updater, server):
+    """停止 webhook 服务器和 Dispatcher"""
+    server.stop()
+    updater.dispatcher.stop()
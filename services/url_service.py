@@ -1,16 +1,517 @@
+"""
+网页内容提取模块
+
+网页按流处理，不再一次性下载整个页面、构建完整的 BeautifulSoup 树再转换：
+1. 分块读取响应（HTML 块）
+2. 增量解析 HTML，正文中的每个顶层块元素（段落、标题、整个列表、整个表格等）结束时
+   单独用 markdownify 转换（Markdown 片段）
+3. 调用方逐个消费片段，例如交给 notion_service.iter_notion_blocks 转换为 Notion 块并分批上传
+
+同一时间只保留当前块元素的 HTML 和少量待定片段，内存占用与页面大小无关。
+不是 HTML 的响应（纯文本、Markdown 等）不解析标签，按空行分段后原样作为片段输出。
+"""
+
+import codecs
 import logging
+import re
+from collections import deque
+from html import escape
+from html.parser import HTMLParser
 
 import requests
-from bs4 import BeautifulSoup
 from markdownify import markdownify as md
 
 logger = logging.getLogger(__name__)
 
+REQUEST_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+REQUEST_TIMEOUT = 10
+
+CHUNK_SIZE = 64 * 1024  # 每次从网络读取的字节数
+ANALYSIS_PREFIX_LENGTH = 4000  # 保留用于 AI 分析的正文长度，与 analyze_content 的截断长度一致
+
+# 找到正文区域之前，body 中的片段先暂存；超过该长度仍未找到时按整个 body 处理
+MAX_PENDING_CHARS = 64 * 1024
+# 单个块元素（例如很长的表格或列表）的 HTML 超过该长度时，在子元素结束处拆分
+MAX_FRAGMENT_CHARS = 256 * 1024
+
+# 从正文中移除的元素
+SKIPPED_TAGS = frozenset(
+    ("script", "style", "nav", "footer", "header", "noscript", "template", "svg")
+)
+# 可以出现在 <head> 中的元素，遇到其他元素说明已进入正文
+HEAD_TAGS = frozenset(
+    ("html", "head", "title", "meta", "link", "base", "style", "script", "noscript", "template")
+)
+VOID_TAGS = frozenset(
+    ("area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr")
+)
+# 每个元素单独转换为一个 Markdown 片段
+BLOCK_TAGS = frozenset(
+    ("p", "h1", "h2", "h3", "h4", "h5", "h6", "ul", "ol", "dl", "pre", "blockquote", "table", "figure")
+)
+# 出现在块元素之外时，与相邻文字合并为一个段落
+INLINE_TAGS = frozenset(
+    (
+        "a", "abbr", "b", "bdi", "bdo", "br", "cite", "code", "del", "dfn", "em", "i", "img",
+        "ins", "kbd", "mark", "q", "s", "samp", "small", "span", "strong", "sub", "sup",
+        "time", "u", "var",
+    )
+)
+# 转换 Markdown 时用到的属性，其他属性（样式、脚本、data-*）不保留
+KEPT_ATTRIBUTES = frozenset(("href", "src", "alt", "title", "class", "colspan", "rowspan", "start"))
+# 正文区域的候选 class，对应原来的 div.content、div.post、div.article
+CONTENT_CLASSES = frozenset(("content", "post", "article"))
+
+# 按 HTML 解析的 Content-Type，其他类型按纯文本处理；没有 Content-Type 时按 HTML 处理
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+
+_META_CHARSET_PATTERN = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+MODE_PENDING = "pending"  # 在 body 中，还没找到正文区域
+MODE_ROOT = "root"  # 在正文区域中
+MODE_BODY = "body"  # 没有正文区域，使用整个 body
+MODE_DONE = "done"  # 正文区域已结束
+
+
+class MainContentParser(HTMLParser):
+    """
+    增量提取网页正文并生成 Markdown 片段
+
+    正文区域是第一个出现的 article、main、div#content、div.content、div.post 或 div.article；
+    在它之前的 body 内容先暂存，找到正文区域后丢弃，文档结束或暂存内容过多时仍未找到则使用整个 body。
+    与原来按选择器优先级查找不同，流式解析无法回看，所以取的是最先出现的候选元素。
+
+    用法：
+        parser = MainContentParser()
+        parser.feed(chunk)
+        while parser.ready:
+            fragment = parser.ready.popleft()
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.ready = deque()  # 已确定的 Markdown 片段
+        self.title = ""
+        self.head_done = False
+
+        self._mode = MODE_PENDING
+        self._in_body = False
+        self._title_parts = None
+        self._pending = []
+        self._pending_chars = 0
+
+        # 打开的元素：(标签名, 重建的开始标签)
+        self._stack = []
+        self._skip_at = None  # 被移除元素在栈中的位置
+        self._root_at = None  # 正文区域在栈中的位置
+        self._block_at = None  # 当前块元素在栈中的位置
+        self._block = []
+        self._block_chars = 0
+        self._loose = []
+        self._loose_chars = 0
+
+    def handle_starttag(self, tag, attrs):
+        if self._mode == MODE_DONE:
+            return
+        if self._skip_at is not None:
+            if tag not in VOID_TAGS:
+                self._stack.append((tag, ""))
+            return
+
+        if tag == "title" and not self._in_body:
+            self._title_parts = []
+            self._stack.append((tag, ""))
+            return
+
+        if not self._in_body and (tag == "body" or tag not in HEAD_TAGS):
+            self._in_body = True
+            self.head_done = True
+        if not self._in_body or tag in SKIPPED_TAGS:
+            if tag not in VOID_TAGS:
+                if tag in SKIPPED_TAGS:
+                    self._skip_at = len(self._stack)
+                self._stack.append((tag, ""))
+            return
+
+        start_html = self._format_starttag(tag, attrs)
+
+        if tag in VOID_TAGS:
+            if self._block_at is not None:
+                self._add_block(start_html)
+            elif tag == "hr":
+                self._flush_loose()
+                self._emit(start_html)
+            elif tag in INLINE_TAGS:
+                self._add_loose(start_html)
+            return
+
+        if self._block_at is not None:
+            # 段落遇到非行内元素时隐式结束
+            if self._stack[self._block_at][0] != "p" or tag in INLINE_TAGS:
+                self._stack.append((tag, start_html))
+                self._add_block(start_html)
+                return
+            self._close_block()
+
+        if self._mode == MODE_PENDING and self._is_content_root(tag, attrs):
+            # 正文区域之前的内容（导航、横幅等）全部丢弃
+            self._pending = []
+            self._pending_chars = 0
+            self._loose = []
+            self._loose_chars = 0
+            self._mode = MODE_ROOT
+            self._root_at = len(self._stack)
+            self._stack.append((tag, start_html))
+            return
+
+        if tag in BLOCK_TAGS:
+            self._flush_loose()
+            self._block_at = len(self._stack)
+            self._stack.append((tag, start_html))
+            self._block = [start_html]
+            self._block_chars = len(start_html)
+            return
+
+        if tag in INLINE_TAGS:
+            self._add_loose(start_html)
+        else:
+            # 容器元素（div、section 等）的边界也是片段的边界
+            self._flush_loose()
+        self._stack.append((tag, start_html))
+
+    def handle_endtag(self, tag):
+        if self._mode == MODE_DONE:
+            return
+
+        index = len(self._stack) - 1
+        while index >= 0 and self._stack[index][0] != tag:
+            index -= 1
+        if index < 0:
+            # 没有对应开始标签的结束标签（包括空元素），忽略
+            return
+
+        if self._skip_at is not None:
+            if index <= self._skip_at:
+                self._skip_at = None
+            del self._stack[index:]
+            return
+
+        if tag == "title" and self._title_parts is not None:
+            self.title = _WHITESPACE_PATTERN.sub(" ", "".join(self._title_parts)).strip()
+            self._title_parts = None
+            self.head_done = True
+            del self._stack[index:]
+            return
+
+        if self._block_at is not None:
+            if index > self._block_at:
+                del self._stack[index:]
+                self._add_block(f"</{tag}>")
+                if self._block_chars > MAX_FRAGMENT_CHARS:
+                    self._split_block()
+                return
+            block_at = self._block_at
+            self._close_block()
+            if index == block_at:
+                return
+
+        if self._root_at is not None and index <= self._root_at:
+            self._flush_loose()
+            self._mode = MODE_DONE
+            self._stack = []
+            return
+
+        if tag in INLINE_TAGS:
+            self._add_loose(f"</{tag}>")
+        else:
+            self._flush_loose()
+        del self._stack[index:]
+
+    def handle_data(self, data):
+        if self._mode == MODE_DONE or self._skip_at is not None:
+            return
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+            return
+        if not self._in_body:
+            # 与浏览器一致，<head> 之外的文字说明已进入正文（例如没有 <body> 标签的页面）
+            if not data.strip():
+                return
+            self._in_body = True
+            self.head_done = True
+
+        text = escape(data, quote=False)
+        if self._block_at is not None:
+            self._add_block(text)
+        elif data.strip() or self._loose:
+            self._add_loose(text)
+            if self._loose_chars > MAX_FRAGMENT_CHARS:
+                self._flush_loose()
+
+    def close(self):
+        """处理剩余的 HTML，并输出所有未完成和暂存的片段"""
+        super().close()
+        if self._block_at is not None:
+            self._close_block()
+        self._flush_loose()
+        if self._mode == MODE_PENDING:
+            self.ready.extend(self._pending)
+            self._pending = []
+        self._mode = MODE_DONE
+        self.head_done = True
+
+    @staticmethod
+    def _format_starttag(tag, attrs):
+        parts = [f"<{tag}"]
+        for name, value in attrs:
+            if name in KEPT_ATTRIBUTES:
+                parts.append(f' {name}="{escape(value or "")}"')
+        parts.append(">")
+        return "".join(parts)
+
+    @staticmethod
+    def _is_content_root(tag, attrs):
+        if tag in ("article", "main"):
+            return True
+        if tag != "div":
+            return False
+        attributes = dict(attrs)
+        if attributes.get("id") == "content":
+            return True
+        return bool(CONTENT_CLASSES.intersection((attributes.get("class") or "").split()))
+
+    def _add_block(self, html):
+        self._block.append(html)
+        self._block_chars += len(html)
+
+    def _add_loose(self, html):
+        self._loose.append(html)
+        self._loose_chars += len(html)
+
+    def _close_block(self):
+        """结束当前块元素，补全未关闭的子元素并输出"""
+        for tag, _ in reversed(self._stack[self._block_at :]):
+            self._block.append(f"</{tag}>")
+        del self._stack[self._block_at :]
+        self._emit("".join(self._block))
+        self._block_at = None
+        self._block = []
+        self._block_chars = 0
+
+    def _split_block(self):
+        """输出当前块元素已读取的部分，并重新打开仍未关闭的元素继续读取"""
+        open_elements = self._stack[self._block_at :]
+        for tag, _ in reversed(open_elements):
+            self._block.append(f"</{tag}>")
+        self._emit("".join(self._block))
+        self._block = [start_html for _, start_html in open_elements]
+        self._block_chars = sum(len(html) for html in self._block)
+
+    def _flush_loose(self):
+        """块元素之外的文字和行内元素作为一个段落输出"""
+        if self._loose:
+            self._emit("<p>" + "".join(self._loose) + "</p>")
+            self._loose = []
+            self._loose_chars = 0
+
+    def _emit(self, html):
+        markdown = md(html, heading_style="ATX").strip()
+        if not markdown:
+            return
+        if self._mode != MODE_PENDING:
+            self.ready.append(markdown)
+            return
+
+        self._pending.append(markdown)
+        self._pending_chars += len(markdown)
+        if self._pending_chars > MAX_PENDING_CHARS:
+            # 暂存内容过多仍未找到正文区域，按整个 body 处理，之后的片段直接输出
+            self._mode = MODE_BODY
+            self.ready.extend(self._pending)
+            self._pending = []
+            self._pending_chars = 0
+
+
+class PlainTextParser:
+    """
+    非 HTML 响应的解析器，接口与 MainContentParser 相同
+
+    文字按空行分段，每段原样作为一个 Markdown 片段；代码块（```）中的空行不分段
+    """
+
+    def __init__(self):
+        self.ready = deque()
+        self.title = ""
+        self.head_done = True
+
+        self._line = ""
+        self._paragraph = []
+        self._chars = 0
+        self._in_fence = False
+
+    def feed(self, data):
+        lines = (self._line + data).split("\n")
+        self._line = lines.pop()
+        for line in lines:
+            self._add_line(line.rstrip("\r"))
+
+    def close(self):
+        if self._line:
+            self._add_line(self._line.rstrip("\r"))
+            self._line = ""
+        self._flush()
+
+    def _add_line(self, line):
+        if line.lstrip().startswith("```"):
+            self._in_fence = not self._in_fence
+        elif not line.strip() and not self._in_fence:
+            self._flush()
+            return
+
+        self._paragraph.append(line)
+        self._chars += len(line) + 1
+        if self._chars > MAX_FRAGMENT_CHARS and not self._in_fence:
+            self._flush()
+
+    def _flush(self):
+        if self._paragraph:
+            self.ready.append("\n".join(self._paragraph))
+            self._paragraph = []
+            self._chars = 0
+
+
+def _is_html(response):
+    content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+    return not content_type or content_type in HTML_CONTENT_TYPES
+
+
+def _detect_encoding(response, first_chunk):
+    """优先使用响应头中的编码，其次是 <meta charset>，默认 UTF-8"""
+    if "charset" in response.headers.get("content-type", "").lower() and response.encoding:
+        encoding = response.encoding
+    else:
+        match = _META_CHARSET_PATTERN.search(first_chunk)
+        encoding = match.group(1).decode("ascii") if match else "utf-8"
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        encoding = "utf-8"
+    return encoding
+
+
+class UrlContentStream:
+    """
+    流式读取网页并生成正文的 Markdown 片段
+
+    创建时发送请求并读取到 <head> 结束，之后可以立即获取页面标题；
+    遍历时边下载边转换，同时保留正文开头的一部分供 AI 分析
+
+    用法：
+        stream = UrlContentStream(url)
+        title = stream.title
+        for fragment in stream:
+            ...
+        analysis = analyze_content(stream.prefix)
+    """
+
+    def __init__(self, url, prefix_length=ANALYSIS_PREFIX_LENGTH):
+        self.url = url
+        self.prefix_length = prefix_length
+        self.chars = 0  # 已生成的 Markdown 字符数
+        self.fragments = 0
+        self.bytes_read = 0
+
+        self._prefix = []
+        self._prefix_chars = 0
+        self._parser = None
+        self._decoder = None
+        self._finished = False
+        self._response = None
+
+        self._response = requests.get(
+            url, headers=REQUEST_HEADERS, timeout=REQUEST_TIMEOUT, stream=True
+        )
+        try:
+            self._response.raise_for_status()
+            self._parser = MainContentParser() if _is_html(self._response) else PlainTextParser()
+            self._chunks = self._response.iter_content(chunk_size=CHUNK_SIZE)
+            while not self._parser.head_done and self._read_chunk():
+                pass
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def title(self):
+        return self._parser.title
+
+    @property
+    def prefix(self):
+        """正文开头最多 prefix_length 个字符，格式与完整内容相同"""
+        return "\n\n".join(self._prefix)
+
+    def __iter__(self):
+        try:
+            if self.title:
+                yield self._record(f"# {self.title}")
+            while True:
+                while self._parser.ready:
+                    yield self._record(self._parser.ready.popleft())
+                if self._finished:
+                    break
+                self._read_chunk()
+        finally:
+            self.close()
+
+        logger.info(
+            f"已流式提取 URL 内容：读取 {self.bytes_read} 字节，"
+            f"生成 {self.fragments} 个片段，共 {self.chars} 字符"
+        )
+
+    def close(self):
+        """关闭网络连接，未读取的内容不再下载"""
+        if self._response is not None:
+            self._response.close()
+
+    def _read_chunk(self):
+        """读取并解析一个 HTML 块，没有更多内容时返回 False"""
+        if self._finished:
+            return False
+
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            if self._decoder is not None:
+                self._parser.feed(self._decoder.decode(b"", final=True))
+            self._parser.close()
+            self._finished = True
+            return False
+
+        if self._decoder is None:
+            encoding = _detect_encoding(self._response, chunk)
+            self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self.bytes_read += len(chunk)
+        self._parser.feed(self._decoder.decode(chunk))
+        return True
+
+    def _record(self, fragment):
+        self.fragments += 1
+        self.chars += len(fragment)
+        if self._prefix_chars < self.prefix_length:
+            part = fragment[: self.prefix_length - self._prefix_chars]
+            self._prefix.append(part)
+            self._prefix_chars += len(part) + 2
+        return fragment
+
 
 def extract_url_content(url):
     """
     从 URL 中提取网页内容并转换为 Markdown 格式
 
+    需要完整内容时使用；保存到 Notion 时使用 UrlContentStream 边转换边上传
+
     参数：
     url (str): 需要提取内容的 URL
 
@@ -18,66 +519,7 @@ def extract_url_content(url):
     str: 提取并转换为 Markdown 格式的网页内容
     """
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-
-        # 获取网页内容
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-
-        # 使用 BeautifulSoup 解析 HTML
-        soup = BeautifulSoup(response.text, "html.parser")
-
-        # 提取标题
-        title = soup.title.string if soup.title else ""
-
-        # 提取正文内容 - 首先尝试找到主要内容区域
-        main_content = None
-        for selector in [
-            "article",
-            "main",
-            "div#content",
-            "div.content",
-            "div.post",
-            "div.article",
-            "body",
-        ]:
-            if selector.startswith("div"):
-                # 处理带 class 或 id 的选择器
-                attrs = {}
-                if "." in selector:
-                    tag, cls = selector.split(".")
-                    attrs["class"] = cls
-                elif "#" in selector:
-                    tag, id = selector.split("#")
-                    attrs["id"] = id
-                element = soup.find(tag, attrs)
-            else:
-                element = soup.find(selector)
-
-            if element:
-                main_content = element
-                break
-
-        # 如果没找到主要内容区域，使用整个 body
-        if not main_content:
-            main_content = soup.body if soup.body else soup
-
-        # 从内容中移除不需要的元素
-        for element in main_content.find_all(
-            ["script", "style", "nav", "footer", "header"]
-        ):
-            element.extract()
-
-        # 将 HTML 转换为 Markdown
-        markdown_content = md(str(main_content), heading_style="ATX")
-
-        # 格式化内容，确保标题在最前面
-        formatted_content = f"# {title}\n\n{markdown_content}"
-
-        # 移除内容截断代码 - 让 Notion Service 的分批处理机制处理长内容
-
+        formatted_content = "\n\n".join(UrlContentStream(url))
         logger.info(f"成功提取并转换 URL 内容，长度：{len(formatted_content)} 字符")
         return formatted_content
 
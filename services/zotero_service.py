@@ -328,6 +328,11 @@ class ZoteroService:
                 else:
                     errors.append(f"Failed to sync: {metadata['title']}")
 
+            except notion_service.NotionWriteDeferred:
+                # 页面已保存到 outbox，Notion 恢复后自动创建
+                success_count += 1
+                logger.warning(f"Notion unavailable, queued for sync: {metadata['title']}")
+
             except Exception as e:
                 logger.error(f"Error processing item: {str(e)}")
                 errors.append(
@@ -9,6 +9,15 @@ import requests
 
 logger = logging.getLogger(__name__)
 
+# URL 正则表达式，在模块加载时编译一次
+_URL_BODY = r"http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+"
+# 1. 标准 URL 模式
+STANDARD_URL_PATTERN = re.compile(_URL_BODY)
+# 2. 括号内 URL 模式 - 特别匹配 (http://example.com) 格式
+BRACKETED_URL_PATTERN = re.compile(rf"\(({_URL_BODY})\)")
+# 3. Telegram/Markdown 格式化链接 - [文本](URL)
+FORMATTED_LINK_PATTERN = re.compile(rf"\[.+?\]\(({_URL_BODY})\)")
+
 
 def truncate_text(text, max_length=100):
     """截断文本至指定长度"""
@@ -42,20 +51,10 @@ def extract_all_urls_from_text(text):
     list: 提取的 URL 列表
     """
 
-    # 使用多个正则表达式模式
-    # 1. 标准 URL 模式
-    standard_url_pattern = r"http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+"
-
-    # 2. 括号内 URL 模式 - 特别匹配 (http://example.com) 格式
-    bracketed_url_pattern = r"\((http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+)\)"
-
-    # 3. Telegram/Markdown 格式化链接 - [文本](URL)
-    formatted_link_pattern = r"\[.+?\]\((http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+)\)"
-
     # 提取各种格式的 URLs
-    standard_urls = re.findall(standard_url_pattern, text)
-    bracketed_urls = re.findall(bracketed_url_pattern, text)
-    formatted_urls = re.findall(formatted_link_pattern, text)
+    standard_urls = STANDARD_URL_PATTERN.findall(text)
+    bracketed_urls = BRACKETED_URL_PATTERN.findall(text)
+    formatted_urls = FORMATTED_LINK_PATTERN.findall(text)
 
     # 合并结果，确保所有 URL 都被识别
     all_urls = standard_urls + bracketed_urls + formatted_urls
@@ -95,20 +94,10 @@ def is_url_only(text):
     # 去除空白字符
     text = text.strip()
 
-    # 检查是否是标准 URL
-    standard_url_pattern = r"^http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+$"
-
-    # 检查是否是括号内 URL
-    bracketed_url_pattern = r"^\((http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+)\)$"
-
-    is_standard_url = bool(re.match(standard_url_pattern, text))
-    bracketed_match = re.match(bracketed_url_pattern, text)
-
-    # 如果是括号内 URL，返回提取的 URL
-    if bracketed_match:
-        return True
-
-    return is_standard_url
+    # 检查整段文本是否是标准 URL 或括号内 URL
+    return bool(
+        STANDARD_URL_PATTERN.fullmatch(text) or BRACKETED_URL_PATTERN.fullmatch(text)
+    )
 
 
 def download_file(url, file_extension=None):
@@ -12,12 +12,6 @@ from datetime import datetime
 
 import requests
 
-# 配置日志
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO,
-    handlers=[logging.FileHandler("logs/keep_alive.log"), logging.StreamHandler()],
-)
 logger = logging.getLogger("keep_alive")
 
 # 保活设置
@@ -73,6 +67,14 @@ def keep_connection_alive():
 
 
 if __name__ == "__main__":
+    # 只在单独运行时配置日志，作为模块导入时沿用主程序的日志配置
+    os.makedirs("logs", exist_ok=True)
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=logging.INFO,
+        handlers=[logging.FileHandler("logs/keep_alive.log"), logging.StreamHandler()],
+    )
+
     if KEEP_ALIVE:
         logger.info("启动网络连接保活服务")
         # 在单独的线程中运行保活程序
@@ -79,9 +79,10 @@ class RateLimiter:
             # 添加当前请求的时间戳
             self.calls_timestamps.append(now)
             current_rpm = len(self.calls_timestamps) / (self.time_frame / 60)
-            if current_rpm > self.max_calls * 0.8:  # 当使用超过 80% 容量时记录警告
+            limit_rpm = self.max_calls / (self.time_frame / 60)
+            if current_rpm > limit_rpm * 0.8:  # 当使用超过 80% 容量时记录警告
                 logger.warning(
-                    f"API 请求频率较高：当前 {current_rpm:.1f} RPM，限制 {self.max_calls} RPM"
+                    f"API 请求频率较高：当前 {current_rpm:.1f} RPM，限制 {limit_rpm:.0f} RPM"
                 )
             else:
                 logger.debug(f"当前请求频率：{current_rpm:.1f} RPM")
@@ -0,0 +1,94 @@
+"""
+本地 SQLite 存储模块
+
+为队列、索引等需要持久化的本地数据提供统一的数据库连接，
+默认启用 WAL 模式，允许后台线程写入时其他线程继续读取
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from config import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteStore:
+    """
+    线程安全的 SQLite 数据库封装
+
+    所有写操作通过 transaction() 串行执行，适合机器人这种写入量不大的场景
+    """
+
+    def __init__(self, filename, schema=""):
+        """
+        打开（或创建）数据库并初始化表结构
+
+        参数：
+            filename: 数据文件名，存放在 DATA_DIR 目录下；":memory:" 表示内存数据库
+            schema: 建表 SQL 脚本
+        """
+        if filename == ":memory:":
+            self.path = filename
+        else:
+            os.makedirs(DATA_DIR, exist_ok=True)
+            self.path = str(Path(DATA_DIR) / filename)
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+
+        if self.path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+
+        if schema:
+            with self.transaction() as conn:
+                conn.executescript(schema)
+
+        logger.debug(f"已打开本地数据库：{self.path}")
+
+    @contextmanager
+    def transaction(self):
+        """
+        在事务中执行操作，出错时自动回滚
+
+        用法：
+            with store.transaction() as conn:
+                conn.execute(...)
+        """
+        with self._lock:
+            try:
+                yield self._conn
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def query(self, sql, params=()):
+        """
+        执行查询并返回全部结果
+
+        参数：
+            sql: 查询语句
+            params: 查询参数
+
+        返回：
+            list: sqlite3.Row 列表
+        """
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def query_one(self, sql, params=()):
+        """执行查询并返回第一行结果，没有结果时返回 None"""
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
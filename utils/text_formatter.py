@@ -6,6 +6,9 @@ logger = logging.getLogger(__name__)
 # MarkdownV2 需要转义的字符
 MARKDOWN_V2_SPECIAL_CHARS = r"_*[]()~>#+-=|{}.!"
 
+# 匹配标准 URL
+URL_PATTERN = re.compile(r"https?://[^\s\)\]\"\']+(?:\.[^\s\)\]\"\']+)+")
+
 
 def escape_markdown_v2(text):
     """
@@ -121,26 +124,24 @@ def extract_urls_from_entities(text, entities):
     返回：
     list: 提取的 URL 列表
     """
-    urls = []
     if not text or not entities:
-        return urls
+        return []
 
+    # 用字典按出现顺序去重
+    urls = {}
     for entity in entities:
         if entity.type == "url":
             # 直接 URL
-            url = text[entity.offset : entity.offset + entity.length]
-            if url not in urls:
-                urls.append(url)
+            urls[text[entity.offset : entity.offset + entity.length]] = None
         elif entity.type == "text_link" and hasattr(entity, "url"):
             # 文本链接
-            if entity.url not in urls:
-                urls.append(entity.url)
+            urls[entity.url] = None
 
     # 如果没有通过实体找到 URL，尝试使用正则表达式
     if not urls:
-        urls = extract_urls_from_text(text)
+        return extract_urls_from_text(text)
 
-    return urls
+    return list(urls)
 
 
 def extract_urls_from_text(text):
@@ -153,16 +154,5 @@ def extract_urls_from_text(text):
     返回：
     list: 提取的 URL 列表
     """
-    # 匹配标准 URL
-    url_pattern = r"https?://[^\s\)\]\"\']+(?:\.[^\s\)\]\"\']+)+"
-
-    # 找到所有 URL
-    urls = re.findall(url_pattern, text)
-
-    # 去重
-    unique_urls = []
-    for url in urls:
-        if url not in unique_urls:
-            unique_urls.append(url)
-
-    return unique_urls
+    # 找到所有 URL 并按出现顺序去重
+    return list(dict.fromkeys(URL_PATTERN.findall(text)))